@@ -0,0 +1 @@
+"""Benchmarks of the MCP tools against a simulated vSphere endpoint."""
@@ -0,0 +1,47 @@
+"""Command line entry point of the benchmark harness (python -m benchmarks)."""
+
+import argparse
+import json
+import logging
+
+from .harness import Benchmark, format_report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ESXi MCP Server tools against a simulated vCenter")
+    parser.add_argument("--vms", type=int, default=1000, help="VMs in the simulated inventory (default: 1000)")
+    parser.add_argument("--hosts", type=int, default=None, help="ESXi hosts (default: one per 40 VMs)")
+    parser.add_argument("--datastores", type=int, default=None, help="Datastores (default: one per 250 VMs)")
+    parser.add_argument("--latency-ms", type=float, default=1.0, help="Delay added to every request (default: 1)")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Random extra delay up to this value")
+    parser.add_argument("--task-ms", type=float, default=50.0, help="Duration of simulated vSphere tasks")
+    parser.add_argument("--iterations", type=int, default=20, help="Timed calls per read-only tool")
+    parser.add_argument("--write-iterations", type=int, default=3, help="Timed calls per mutating tool")
+    parser.add_argument("--warmup", type=int, default=2, help="Untimed calls per read-only tool first")
+    parser.add_argument("--concurrency", type=int, default=1, help="Concurrent calls per read-only tool round")
+    parser.add_argument("--tool", action="append", dest="tools", help="Only benchmark this tool (repeatable)")
+    parser.add_argument("--set", action="append", dest="overrides", default=[], metavar="KEY=VALUE",
+                        help="Override a server configuration item, e.g. --set inventory_cache=false")
+    parser.add_argument("--in-process", action="store_true",
+                        help="Serve the simulated vCenter from this process instead of a child process")
+    parser.add_argument("--json", dest="json_path", help="Also write the full report to this JSON file")
+    parser.add_argument("--verbose", "-v", action="store_true", help="Log progress and server warnings")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL,
+                        format="%(asctime)s [%(levelname)s] %(message)s")
+    inventory_options = {key: value for key, value in (("hosts", args.hosts), ("datastores", args.datastores))
+                         if value is not None}
+    benchmark = Benchmark(vms=args.vms, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, task_ms=args.task_ms,
+                          iterations=args.iterations, write_iterations=args.write_iterations, warmup=args.warmup,
+                          concurrency=args.concurrency, in_process=args.in_process, tools=args.tools,
+                          inventory_options=inventory_options, overrides=args.overrides)
+    report = benchmark.run()
+    print(format_report(report))
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""PropertyCollector semantics of the simulated vSphere endpoint."""
+
+import itertools
+from typing import Dict, List, Optional, Tuple
+
+from pyVmomi import vmodl
+
+from .fake_inventory import Entity, Inventory, ViewEntity
+from .soap import any_xml, mo_xml
+
+
+# Object updates per WaitForUpdatesEx answer when the client sets no maxObjectUpdates
+DEFAULT_UPDATE_BATCH = 1000
+
+# Objects per RetrievePropertiesEx page when the client sets no maxObjects
+DEFAULT_RETRIEVE_BATCH = 1000
+
+
+def _selection_specs(select_set, named: Dict[str, object]):
+    """Index the named TraversalSpecs of a select set tree."""
+    for spec in select_set or ():
+        if isinstance(spec, vmodl.query.PropertyCollector.TraversalSpec):
+            if spec.name and spec.name not in named:
+                named[spec.name] = spec
+                _selection_specs(spec.selectSet, named)
+            elif not spec.name:
+                _selection_specs(spec.selectSet, named)
+
+
+def select_objects(inventory: Inventory, spec) -> Tuple[Dict[str, Entity], set]:
+    """
+    Apply the object specs of a FilterSpec.
+
+    Returns the selected entities by moid (in traversal order) and the moids
+    of the views traversed, whose membership changes alter the selection.
+    """
+    named: Dict[str, object] = {}
+    for object_spec in spec.objectSet:
+        _selection_specs(object_spec.selectSet, named)
+    selected: Dict[str, Entity] = {}
+    views = set()
+    visited = set()
+    for object_spec in spec.objectSet:
+        entity = inventory.get(object_spec.obj._moId)
+        if entity is None:
+            raise vmodl.fault.ManagedObjectNotFound(obj=object_spec.obj, msg="The object has already been deleted or has not been completely created")
+        if not object_spec.skip:
+            selected[entity.moid] = entity
+        stack = [(entity, object_spec.selectSet or ())]
+        while stack:
+            current, select_set = stack.pop()
+            for selection in select_set:
+                traversal = selection
+                if not isinstance(traversal, vmodl.query.PropertyCollector.TraversalSpec):
+                    traversal = named.get(selection.name)
+                if traversal is None or not isinstance(current.ref, traversal.type):
+                    continue
+                if isinstance(current, ViewEntity) and traversal.path == "view":
+                    views.add(current.moid)
+                    targets = current.members()
+                else:
+                    value = current.get(traversal.path)
+                    refs = value if isinstance(value, list) else ([value] if value is not None else [])
+                    targets = [inventory.get(ref._moId) for ref in refs if hasattr(ref, "_moId")]
+                for target in targets:
+                    if target is None:
+                        continue
+                    key = (target.moid, id(traversal))
+                    if key in visited:
+                        continue
+                    visited.add(key)
+                    if not traversal.skip:
+                        selected.setdefault(target.moid, target)
+                    if traversal.selectSet:
+                        stack.append((target, traversal.selectSet))
+    return selected, views
+
+
+def property_paths(entity: Entity, prop_specs) -> List[str]:
+    """The property paths a FilterSpec's PropertySpecs request for an entity."""
+    paths: List[str] = []
+    for prop_spec in prop_specs:
+        if not isinstance(entity.ref, prop_spec.type):
+            continue
+        for path in (entity.property_names() if prop_spec.all else prop_spec.pathSet or ()):
+            if path not in paths:
+                paths.append(path)
+    return paths
+
+
+def paths_overlap(filter_path: str, changed_path: str) -> bool:
+    """Whether a change of changed_path alters the value of filter_path."""
+    return (filter_path == changed_path or filter_path.startswith(changed_path + ".")
+            or changed_path.startswith(filter_path + "."))
+
+
+def object_content_xml(entity: Entity, paths: List[str]) -> str:
+    """Serialize an ObjectContent of a RetrieveResult."""
+    parts = ["<objects>", mo_xml("obj", entity.ref)]
+    for path in paths:
+        value = entity.value(path)
+        if value is None or (isinstance(value, list) and not value):
+            continue
+        parts.append(f"<propSet><name>{path}</name>{any_xml('val', value)}</propSet>")
+    parts.append("</objects>")
+    return "".join(parts)
+
+
+class RetrieveCursor:
+    """Objects of a RetrievePropertiesEx result not yet returned, served by ContinueRetrievePropertiesEx."""
+
+    def __init__(self, items: List[Tuple[Entity, List[str]]], page_size: int):
+        self.items = items
+        self.page_size = page_size
+        self.offset = 0
+
+    def page(self, token: Optional[str]) -> str:
+        """Serialize the next page as a RetrieveResult; token is set when more pages follow."""
+        chunk = self.items[self.offset:self.offset + self.page_size]
+        self.offset += len(chunk)
+        parts = ["<returnval>"]
+        if token is not None and self.offset < len(self.items):
+            parts.append(f"<token>{token}</token>")
+        parts.extend(object_content_xml(entity, paths) for entity, paths in chunk)
+        parts.append("</returnval>")
+        return "".join(parts)
+
+    @property
+    def done(self) -> bool:
+        return self.offset >= len(self.items)
+
+
+class PropertyFilter(Entity):
+    """
+    A PropertyFilter and its position in the inventory journal.
+
+    The filter remembers the objects it reported; structural changes (objects
+    entering or leaving, view membership) re-run the object specs and diff the
+    result, property changes are matched against the requested paths.
+    """
+
+    __slots__ = ("collector", "spec", "partial", "selected", "views", "pending", "departed")
+
+    def __init__(self, moid: str, collector: "PropertyCollector", spec, partial: bool):
+        Entity.__init__(self, vmodl.query.PropertyCollector.Filter, moid)
+        self.collector = collector
+        self.spec = spec
+        self.partial = partial
+        self.selected: Dict[str, Entity] = {}
+        self.views: set = set()
+        # moid -> [kind, changed paths or None for all]; kept in report order
+        self.pending: Dict[str, list] = {}
+        # Objects that left the selection, kept until their leave update is sent
+        self.departed: Dict[str, Entity] = {}
+
+    def get(self, prop: str):
+        if prop == "spec":
+            return self.spec
+        if prop == "partialUpdates":
+            return self.partial
+        return Entity.get(self, prop)
+
+    def reset(self, inventory: Inventory):
+        """Queue the whole selection as entering objects (first WaitForUpdatesEx or version reset)."""
+        self.selected, self.views = select_objects(inventory, self.spec)
+        self.pending = {moid: ["enter", None] for moid in self.selected}
+
+    def apply(self, inventory: Inventory, entries: List[tuple]):
+        """Turn journal entries into pending object updates."""
+        structural = any(kind != "modify" or (moid in self.views and "view" in paths)
+                         for _, kind, moid, paths in entries)
+        if structural:
+            try:
+                selected, self.views = select_objects(inventory, self.spec)
+            except vmodl.fault.ManagedObjectNotFound:
+                # The filter's root object is gone; everything it reported leaves
+                selected, self.views = {}, set()
+            for moid in selected:
+                if moid not in self.selected:
+                    self._queue(moid, "enter", None)
+            for moid in [moid for moid in self.selected if moid not in selected]:
+                self.departed[moid] = self.selected[moid]
+                self._queue(moid, "leave", None)
+            self.selected = selected
+        for _, kind, moid, paths in entries:
+            if kind != "modify" or moid not in self.selected:
+                continue
+            entity = self.selected[moid]
+            wanted = [path for path in property_paths(entity, self.spec.propSet)
+                      if any(paths_overlap(path, changed) for changed in paths)]
+            if wanted:
+                self._queue(moid, "modify", wanted)
+
+    def _queue(self, moid: str, kind: str, paths: Optional[List[str]]):
+        update = self.pending.get(moid)
+        if update is None:
+            self.pending[moid] = [kind, paths]
+        elif kind == "leave":
+            if update[0] == "enter":
+                del self.pending[moid]
+            else:
+                self.pending[moid] = ["leave", None]
+        elif kind == "enter":
+            self.pending[moid] = ["enter", None]
+        elif update[0] == "modify":
+            update[1] = update[1] + [path for path in paths if path not in update[1]]
+
+    def drain(self, inventory: Inventory, limit: int) -> Tuple[str, int]:
+        """Serialize up to limit pending updates as a PropertyFilterUpdate; returns (xml, count)."""
+        if not self.pending:
+            return "", 0
+        parts = [f"<filterSet>{mo_xml('filter', self.ref)}"]
+        count = 0
+        for moid in list(itertools.islice(self.pending, limit)):
+            kind, paths = self.pending.pop(moid)
+            count += 1
+            if kind == "leave":
+                departed = self.departed.pop(moid, None)
+                if departed is not None:
+                    parts.append(f"<objectSet><kind>leave</kind>{mo_xml('obj', departed.ref)}</objectSet>")
+                continue
+            entity = self.selected.get(moid) or inventory.get(moid)
+            if entity is None:
+                continue
+            parts.append(f"<objectSet><kind>{kind}</kind>{mo_xml('obj', entity.ref)}")
+            for path in (property_paths(entity, self.spec.propSet) if paths is None else paths):
+                value = entity.value(path)
+                if value is None or (isinstance(value, list) and not value):
+                    if kind == "modify":
+                        parts.append(f"<changeSet><name>{path}</name><op>assign</op></changeSet>")
+                    continue
+                parts.append(f"<changeSet><name>{path}</name><op>assign</op>{any_xml('val', value)}</changeSet>")
+            parts.append("</objectSet>")
+        parts.append("</filterSet>")
+        return "".join(parts), count
+
+
+class PropertyCollector(Entity):
+    """A PropertyCollector: its filters, retrieve cursors and update version."""
+
+    __slots__ = ("session", "filters", "cursors", "version", "mark", "waiting", "cancelled", "_ids")
+
+    def __init__(self, moid: str, session):
+        Entity.__init__(self, vmodl.query.PropertyCollector, moid)
+        self.session = session
+        self.filters: Dict[str, PropertyFilter] = {}
+        self.cursors: Dict[str, RetrieveCursor] = {}
+        self.version = 0
+        self.mark = 0
+        self.waiting = 0
+        self.cancelled = False
+        self._ids = itertools.count(1)
+
+    def get(self, prop: str):
+        if prop == "filter":
+            return vmodl.query.PropertyCollector.Filter.Array([f.ref for f in self.filters.values()])
+        return Entity.get(self, prop)
+
+    def new_token(self) -> str:
+        return f"{self.moid}-{next(self._ids)}"
+
+    def catch_up(self, inventory: Inventory):
+        """Feed journal entries the filters have not seen yet to them."""
+        if self.mark >= inventory.version:
+            return
+        entries = [entry for entry in inventory.journal if entry[0] > self.mark]
+        self.mark = inventory.version
+        for property_filter in self.filters.values():
+            property_filter.apply(inventory, entries)
+
+    def has_updates(self) -> bool:
+        return any(f.pending for f in self.filters.values())
+
+    def update_set(self, inventory: Inventory, limit: int) -> str:
+        """Serialize pending updates as an UpdateSet, truncated after limit object updates."""
+        self.version += 1
+        parts = [f"<returnval><version>{self.version}</version>"]
+        remaining = limit
+        for property_filter in self.filters.values():
+            if remaining <= 0:
+                break
+            xml, count = property_filter.drain(inventory, remaining)
+            parts.append(xml)
+            remaining -= count
+        truncated = self.has_updates()
+        parts.append(f"<truncated>{'true' if truncated else 'false'}</truncated></returnval>")
+        return "".join(parts)
@@ -0,0 +1,940 @@
+"""In-memory vSphere inventory served by the simulated endpoint."""
+
+import copy
+import itertools
+import uuid
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Iterator
+
+from pyVmomi import vim, VmomiSupport
+from pyVmomi.VmomiSupport import DataObject, Enum, F_OPTIONAL, long
+
+from .soap import VERSION_ID
+
+
+# Timestamp used for required date fields nobody reads
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Clock speed of every simulated host CPU core
+HOST_CPU_MHZ = 2600
+
+# Size of every simulated datastore
+DATASTORE_CAPACITY = 16 * 1024 ** 4
+
+# VMs per VM folder; larger inventories are split across several folders like real ones
+VMS_PER_FOLDER = 1000
+
+POWERED_ON = vim.VirtualMachine.PowerState.poweredOn
+POWERED_OFF = vim.VirtualMachine.PowerState.poweredOff
+
+
+def _default(prop_type, depth: int):
+    """A placeholder value for a required field, or None for managed object references."""
+    if issubclass(prop_type, list):
+        item = _default(prop_type.Item, depth)
+        return prop_type([item]) if item is not None else None
+    if prop_type is bool:
+        return False
+    if issubclass(prop_type, Enum):
+        return getattr(prop_type, prop_type.values[0])
+    if issubclass(prop_type, str):
+        return prop_type("")
+    if prop_type is datetime:
+        return EPOCH
+    if issubclass(prop_type, (int, float)):
+        return prop_type(0)
+    if prop_type is VmomiSupport.binary:
+        return VmomiSupport.binary(b"")
+    if issubclass(prop_type, DataObject) and depth < 8:
+        return complete(prop_type(), depth + 1)
+    return None
+
+
+def complete(obj, depth: int = 0):
+    """
+    Fill every unset required field of a data object with a placeholder.
+
+    pyVmomi refuses to serialize objects with unset required fields; the
+    simulated objects only set what the MCP server reads.
+    """
+    for prop in obj._GetPropertyList():
+        if prop.flags & F_OPTIONAL:
+            continue
+        value = getattr(obj, prop.name)
+        if value is None or (isinstance(value, list) and not value):
+            default = _default(prop.type, depth)
+            if default is not None:
+                setattr(obj, prop.name, default)
+    return obj
+
+
+def prototype(cls, **fields):
+    """A completed data object to copy per use with build()."""
+    return complete(cls(**fields))
+
+
+def build(proto, **fields):
+    """A shallow copy of a prototype with some fields replaced; ~10x cheaper than constructing it."""
+    obj = copy.copy(proto)
+    for name, value in fields.items():
+        setattr(obj, name, value)
+    return obj
+
+
+def stable_hash(text: str) -> int:
+    """A hash of text that is the same in every process (unlike hash())."""
+    return zlib.crc32(text.encode())
+
+
+def vm_name(index: int, vms: int) -> str:
+    """Name of the index-th (0-based) VM of an inventory with vms VMs."""
+    return f"vm-{index + 1:0{max(5, len(str(vms)))}d}"
+
+
+def powered_on(index: int) -> bool:
+    """Whether the index-th VM starts powered on (two in three do)."""
+    return index % 3 != 0
+
+
+def host_name(index: int) -> str:
+    return f"esx-{index + 1:04d}.bench.local"
+
+
+def template_name(index: int) -> str:
+    return f"template-{index + 1:02d}"
+
+
+def datastore_name(index: int) -> str:
+    return f"datastore-{index + 1:02d}"
+
+
+def folder_name(index: int) -> str:
+    """Name of the VM folder holding the index-th VM."""
+    return f"bench-{index // VMS_PER_FOLDER:02d}"
+
+
+class Entity:
+    """A managed object of the simulated inventory and its property values."""
+
+    __slots__ = ("moid", "ref", "name", "parent", "children", "props")
+
+    def __init__(self, mo_type, moid: str, name: Optional[str] = None, container: bool = False, **props):
+        self.moid = moid
+        self.ref = mo_type(moid)
+        self.name = name
+        self.parent: Optional[Entity] = None
+        self.children: Optional[Dict[str, Entity]] = {} if container else None
+        self.props = props
+
+    @property
+    def mo_type(self):
+        return type(self.ref)
+
+    def get(self, prop: str):
+        """Return the value of a top-level property."""
+        if prop == "name":
+            return self.name
+        if prop == "parent":
+            return self.parent.ref if self.parent is not None else None
+        if prop == "childEntity" and self.children is not None:
+            return vim.ManagedEntity.Array([child.ref for child in self.children.values()])
+        return self.props.get(prop)
+
+    def value(self, path: str):
+        """Return the value of a property path such as summary.quickStats.overallCpuUsage."""
+        head, _, rest = path.partition(".")
+        value = self.get(head)
+        if rest:
+            for part in rest.split("."):
+                if value is None:
+                    return None
+                value = getattr(value, part, None)
+        return value
+
+    def property_names(self) -> List[str]:
+        """Top-level properties with a value, for PropertySpecs with all=True."""
+        names = [name for name in ("name", "parent") if self.get(name) is not None]
+        if self.children is not None and issubclass(self.mo_type, (vim.Folder, vim.StoragePod)):
+            names.append("childEntity")
+        return names + list(self.props)
+
+    def contents(self) -> Iterator["Entity"]:
+        """Entities directly contained in this one, as a recursive ContainerView sees them."""
+        return iter(self.children.values()) if self.children is not None else iter(())
+
+    def of_type(self, mo_type) -> list:
+        """References of the contained entities of a type, as a typed array."""
+        return mo_type.Array([c.ref for c in self.contents() if isinstance(c.ref, mo_type)])
+
+
+class ComputeEntity(Entity):
+    """A cluster: its hosts and root resource pool are its contents."""
+
+    __slots__ = ()
+
+    def get(self, prop: str):
+        if prop == "host":
+            return self.of_type(vim.HostSystem)
+        if prop == "resourcePool":
+            return next((c.ref for c in self.contents() if isinstance(c.ref, vim.ResourcePool)), None)
+        return Entity.get(self, prop)
+
+    def property_names(self) -> List[str]:
+        return Entity.property_names(self) + ["host", "resourcePool"]
+
+
+class PoolEntity(Entity):
+    """A resource pool: child pools and the VMs running in it are its contents."""
+
+    __slots__ = ()
+
+    def get(self, prop: str):
+        if prop == "resourcePool":
+            return self.of_type(vim.ResourcePool)
+        if prop == "vm":
+            return self.of_type(vim.VirtualMachine)
+        return Entity.get(self, prop)
+
+    def property_names(self) -> List[str]:
+        return Entity.property_names(self) + ["resourcePool", "vm"]
+
+
+class DatastoreEntity(Entity):
+    """A datastore with capacity accounting for the disks of its VMs."""
+
+    __slots__ = ("capacity", "used", "vms", "hosts", "url")
+
+    def __init__(self, moid: str, name: str, capacity: int = DATASTORE_CAPACITY):
+        Entity.__init__(self, vim.Datastore, moid, name, overallStatus=vim.ManagedEntity.Status.green)
+        self.capacity = capacity
+        self.used = 0
+        self.vms: Dict[str, "VirtualMachineEntity"] = {}
+        self.hosts: List["HostEntity"] = []
+        self.url = f"ds:///vmfs/volumes/{uuid.UUID(int=stable_hash(moid)).hex}/"
+
+    @property
+    def free(self) -> int:
+        return max(0, self.capacity - self.used)
+
+    def get(self, prop: str):
+        if prop == "summary":
+            return build(_DATASTORE_SUMMARY, datastore=self.ref, name=self.name, url=self.url,
+                         capacity=long(self.capacity), freeSpace=long(self.free))
+        if prop == "vm":
+            return vim.VirtualMachine.Array([vm.ref for vm in self.vms.values()])
+        if prop == "host":
+            return vim.Datastore.HostMount.Array([build(_DATASTORE_MOUNT, key=host.ref) for host in self.hosts])
+        return Entity.get(self, prop)
+
+    def property_names(self) -> List[str]:
+        return Entity.property_names(self) + ["summary", "vm", "host"]
+
+
+class StoragePodEntity(Entity):
+    """A datastore cluster; its summary adds up the datastores it contains."""
+
+    __slots__ = ()
+
+    def get(self, prop: str):
+        if prop == "summary":
+            datastores = [c for c in self.contents() if isinstance(c, DatastoreEntity)]
+            return vim.StoragePod.Summary(name=self.name, capacity=long(sum(d.capacity for d in datastores)),
+                                          freeSpace=long(sum(d.free for d in datastores)))
+        return Entity.get(self, prop)
+
+    def property_names(self) -> List[str]:
+        return Entity.property_names(self) + ["summary"]
+
+
+class HostEntity(Entity):
+    """An ESXi host; its load is derived from the powered-on VMs placed on it."""
+
+    __slots__ = ("cores", "memory_bytes", "vms", "datastores", "boot_time", "maintenance", "uuid")
+
+    def __init__(self, moid: str, name: str, cores: int, memory_bytes: int, boot_time: datetime):
+        Entity.__init__(self, vim.HostSystem, moid, name, overallStatus=vim.ManagedEntity.Status.green)
+        self.cores = cores
+        self.memory_bytes = memory_bytes
+        self.vms: Dict[str, "VirtualMachineEntity"] = {}
+        self.datastores: List[DatastoreEntity] = []
+        self.boot_time = boot_time
+        self.maintenance = False
+        self.uuid = str(uuid.UUID(int=stable_hash(moid) << 64 | stable_hash(name)))
+
+    def load(self):
+        """Return (CPU MHz, memory MB) used by the powered-on VMs of the host."""
+        cpu = memory = 0
+        for vm in self.vms.values():
+            if vm.power_state == POWERED_ON:
+                cpu += vm.cpu_usage()
+                memory += vm.memory_mb
+        return cpu, memory
+
+    def get(self, prop: str):
+        builder = _HOST_BUILDERS.get(prop)
+        if builder is not None:
+            return builder(self)
+        return Entity.get(self, prop)
+
+    def value(self, path: str):
+        fast = _HOST_FAST_PATHS.get(path)
+        if fast is not None:
+            return fast(self)
+        return Entity.value(self, path)
+
+    def property_names(self) -> List[str]:
+        return Entity.property_names(self) + list(_HOST_BUILDERS)
+
+
+class SnapshotEntity(Entity):
+    """A node of a VM's snapshot tree."""
+
+    __slots__ = ("vm", "description", "create_time", "state", "quiesced", "snapshot_id", "child_snapshots",
+                 "parent_snapshot")
+
+    def __init__(self, moid: str, name: str, vm: "VirtualMachineEntity", description: str, snapshot_id: int,
+                 quiesced: bool = False):
+        Entity.__init__(self, vim.vm.Snapshot, moid, name)
+        self.vm = vm
+        self.description = description
+        self.create_time = datetime.now(timezone.utc)
+        self.state = vm.power_state
+        self.quiesced = quiesced
+        self.snapshot_id = snapshot_id
+        self.child_snapshots: List[SnapshotEntity] = []
+        self.parent_snapshot: Optional[SnapshotEntity] = None
+
+    def tree(self):
+        return build(_SNAPSHOT_TREE, snapshot=self.ref, vm=self.vm.ref, name=self.name,
+                     description=self.description, id=self.snapshot_id, createTime=self.create_time,
+                     state=self.state, quiesced=self.quiesced,
+                     childSnapshotList=[child.tree() for child in self.child_snapshots])
+
+    def get(self, prop: str):
+        if prop == "vm":
+            return self.vm.ref
+        if prop == "childSnapshot":
+            return vim.vm.Snapshot.Array([child.ref for child in self.child_snapshots])
+        return Entity.get(self, prop)
+
+    def property_names(self) -> List[str]:
+        return ["vm", "childSnapshot"]
+
+
+class VirtualMachineEntity(Entity):
+    """
+    A VM kept as a handful of scalar fields.
+
+    Property values are built on request from prototypes, so inventories of
+    tens of thousands of VMs stay small; the paths property collectors ask
+    for most often are answered without building any data object.
+    """
+
+    __slots__ = ("pool", "host", "datastore", "network", "power_state", "template", "num_cpu", "memory_mb",
+                 "disk_gb", "uuid", "instance_uuid", "guest_id", "annotation", "boot_time", "root_snapshots",
+                 "current_snapshot", "index")
+
+    def __init__(self, moid: str, name: str, index: int, host: HostEntity, datastore: DatastoreEntity,
+                 network: Optional[Entity], num_cpu: int = 2, memory_mb: int = 4096, disk_gb: int = 40,
+                 template: bool = False, guest_id: str = "otherGuest64", annotation: str = ""):
+        Entity.__init__(self, vim.VirtualMachine, moid, name)
+        self.index = index
+        self.pool: Optional[PoolEntity] = None
+        self.host = host
+        self.datastore = datastore
+        self.network = network
+        self.power_state = POWERED_OFF
+        self.template = template
+        self.num_cpu = num_cpu
+        self.memory_mb = memory_mb
+        self.disk_gb = disk_gb
+        self.uuid = str(uuid.UUID(int=(stable_hash(moid) << 96) | (index << 32) | stable_hash(name)))
+        self.instance_uuid = str(uuid.UUID(int=(stable_hash(name) << 96) | (index << 32) | stable_hash(moid)))
+        self.guest_id = guest_id
+        self.annotation = annotation
+        self.boot_time: Optional[datetime] = None
+        self.root_snapshots: List[SnapshotEntity] = []
+        self.current_snapshot: Optional[SnapshotEntity] = None
+
+    @property
+    def disk_bytes(self) -> int:
+        return self.disk_gb * 1024 ** 3
+
+    @property
+    def ip_address(self) -> str:
+        return f"10.{(self.index >> 16) & 255}.{(self.index >> 8) & 255}.{self.index & 255 or 1}"
+
+    def cpu_usage(self) -> int:
+        """Simulated CPU demand in MHz; fixed per VM so results are reproducible."""
+        if self.power_state != POWERED_ON:
+            return 0
+        return stable_hash(self.moid) % (self.num_cpu * HOST_CPU_MHZ // 2) + 50
+
+    def get(self, prop: str):
+        builder = _VM_BUILDERS.get(prop)
+        if builder is not None:
+            return builder(self)
+        return Entity.get(self, prop)
+
+    def value(self, path: str):
+        fast = _VM_FAST_PATHS.get(path)
+        if fast is not None:
+            return fast(self)
+        return Entity.value(self, path)
+
+    def property_names(self) -> List[str]:
+        names = Entity.property_names(self) + [name for name in _VM_BUILDERS if name != "snapshot"]
+        if self.root_snapshots:
+            names.append("snapshot")
+        return names
+
+
+class ViewEntity(Entity):
+    """A ContainerView over part of the inventory, or a ListView of explicit objects."""
+
+    __slots__ = ("inventory", "container", "types", "recursive", "listed", "_cache")
+
+    def __init__(self, mo_type, moid: str, inventory: "Inventory", container: Optional[Entity] = None,
+                 types: tuple = (), recursive: bool = False):
+        Entity.__init__(self, mo_type, moid)
+        self.inventory = inventory
+        self.container = container
+        self.types = types
+        self.recursive = recursive
+        self.listed: Optional[Dict[str, Entity]] = None if container is not None else {}
+        self._cache = (None, [])
+
+    def members(self) -> List[Entity]:
+        """The objects in the view; container views are recomputed only after structural changes."""
+        if self.listed is not None:
+            return [entity for entity in self.listed.values() if entity.moid in self.inventory.objects]
+        structure, members = self._cache
+        if structure != self.inventory.structure_version:
+            members = self.inventory.container_members(self.container, self.types, self.recursive)
+            self._cache = (self.inventory.structure_version, members)
+        return members
+
+    def get(self, prop: str):
+        if prop == "view":
+            return VmomiSupport.ManagedObject.Array([entity.ref for entity in self.members()])
+        if prop == "container" and self.container is not None:
+            return self.container.ref
+        if prop == "recursive":
+            return self.recursive
+        return Entity.get(self, prop)
+
+    def property_names(self) -> List[str]:
+        return ["view"] + (["container", "recursive"] if self.container is not None else [])
+
+
+# Product information of the simulated vCenter
+
+ABOUT = prototype(vim.AboutInfo, name="VMware vCenter Server", fullName=f"VMware vCenter Server {VERSION_ID} (simulated)",
+                   vendor="VMware, Inc.", version=VERSION_ID, build="0", localeVersion="INTL", localeBuild="000",
+                   osType="linux-x64", productLineId="vpx", apiType="VirtualCenter", apiVersion=VERSION_ID,
+                   instanceUuid=str(uuid.UUID(int=1)))
+
+# Prototypes of the data objects built per request
+
+_HOST_PRODUCT = prototype(vim.AboutInfo, name="VMware ESXi", fullName=f"VMware ESXi {VERSION_ID} (simulated)",
+                          vendor="VMware, Inc.", version=VERSION_ID, build="0", osType="vmnix-x86",
+                          productLineId="embeddedEsx", apiType="HostAgent", apiVersion=VERSION_ID)
+
+_DATASTORE_SUMMARY = prototype(vim.Datastore.Summary, accessible=True, multipleHostAccess=True, type="VMFS",
+                               maintenanceMode="normal")
+
+_DATASTORE_MOUNT = prototype(vim.Datastore.HostMount, mountInfo=vim.host.MountInfo(
+    accessMode="readWrite", mounted=True, accessible=True))
+
+_SNAPSHOT_TREE = prototype(vim.vm.SnapshotTree)
+
+_VM_RUNTIME = prototype(vim.vm.RuntimeInfo, connectionState=vim.VirtualMachine.ConnectionState.connected,
+                        faultToleranceState=vim.VirtualMachine.FaultToleranceState.notConfigured)
+
+_VM_QUICK_STATS = prototype(vim.vm.Summary.QuickStats, guestHeartbeatStatus=vim.ManagedEntity.Status.green)
+
+_VM_CONFIG_SUMMARY = prototype(vim.vm.Summary.ConfigSummary, numEthernetCards=1, numVirtualDisks=1)
+
+_VM_STORAGE = prototype(vim.vm.Summary.StorageSummary)
+
+_VM_GUEST_SUMMARY = prototype(vim.vm.Summary.GuestSummary)
+
+_VM_SUMMARY = prototype(vim.vm.Summary, overallStatus=vim.ManagedEntity.Status.green)
+
+_VM_GUEST = prototype(vim.vm.GuestInfo, toolsVersion="12352", guestFamily="otherGuestFamily",
+                      guestFullName="Other (64-bit)")
+
+_VM_CONFIG = prototype(vim.vm.ConfigInfo, changeVersion="1", modified=EPOCH, version="vmx-21",
+                       guestFullName="Other (64-bit)", alternateGuestName="")
+
+_VM_HARDWARE = prototype(vim.vm.VirtualHardware, numCoresPerSocket=1)
+
+_VM_FILES = prototype(vim.vm.FileInfo)
+
+_SCSI_CONTROLLER = prototype(vim.vm.device.ParaVirtualSCSIController, key=1000, busNumber=0,
+                             sharedBus=vim.vm.device.VirtualSCSIController.Sharing.noSharing,
+                             deviceInfo=vim.Description(label="SCSI controller 0", summary="VMware paravirtual SCSI"))
+
+_DISK = prototype(vim.vm.device.VirtualDisk, key=2000, controllerKey=1000, unitNumber=0)
+
+_DISK_BACKING = prototype(vim.vm.device.VirtualDisk.FlatVer2BackingInfo, diskMode="persistent", thinProvisioned=True)
+
+_NIC = prototype(vim.vm.device.VirtualVmxnet3, key=4000, addressType="assigned",
+                 connectable=vim.vm.device.VirtualDevice.ConnectInfo(startConnected=True, connected=True,
+                                                                      allowGuestControl=True, status="ok"))
+
+_NIC_BACKING = prototype(vim.vm.device.VirtualEthernetCard.NetworkBackingInfo)
+
+_HOST_RUNTIME = prototype(vim.host.RuntimeInfo, connectionState=vim.HostSystem.ConnectionState.connected,
+                          powerState=vim.HostSystem.PowerState.poweredOn, standbyMode="none")
+
+_HOST_QUICK_STATS = prototype(vim.host.Summary.QuickStats)
+
+_HOST_HARDWARE_SUMMARY = prototype(vim.host.Summary.HardwareSummary, vendor="Simulated", model="Bench Server",
+                                   cpuModel="Simulated CPU @ 2.60GHz", numNics=4, numHBAs=2)
+
+_HOST_HARDWARE = prototype(vim.host.HardwareInfo, cpuPkg=vim.host.CpuPackage.Array([
+    complete(vim.host.CpuPackage(index=i, vendor="intel", hz=long(HOST_CPU_MHZ * 1000000), busHz=long(100000000),
+                                 description="Simulated CPU @ 2.60GHz")) for i in range(2)]))
+
+_HOST_CONFIG = prototype(vim.host.ConfigInfo, product=_HOST_PRODUCT)
+
+_HOST_SUMMARY = prototype(vim.host.Summary, overallStatus=vim.ManagedEntity.Status.green)
+
+_HOST_SENSORS = [
+    vim.host.NumericSensorInfo(name=name, healthState=vim.ElementDescription(label="Green", summary="Sensor is operating under normal conditions", key="green"),
+                               currentReading=reading, unitModifier=unit_modifier, baseUnits=units, sensorType=sensor_type)
+    for name, reading, unit_modifier, units, sensor_type in (
+        ("CPU1 Temp", 4500, -2, "Degrees C", "temperature"),
+        ("System Board Inlet Temp", 2300, -2, "Degrees C", "temperature"),
+        ("FAN1 RPM", 5400, 0, "RPM", "fan"),
+        ("PS1 Voltage", 23000, -2, "Volts", "voltage"),
+    )
+]
+
+
+def _vm_running(vm: VirtualMachineEntity) -> bool:
+    return vm.power_state == POWERED_ON
+
+
+def _vm_runtime(vm: VirtualMachineEntity):
+    return build(_VM_RUNTIME, host=vm.host.ref, powerState=vm.power_state,
+                 bootTime=vm.boot_time if _vm_running(vm) else None,
+                 maxCpuUsage=vm.num_cpu * HOST_CPU_MHZ, maxMemoryUsage=vm.memory_mb)
+
+
+def _vm_quick_stats(vm: VirtualMachineEntity):
+    running = _vm_running(vm)
+    return build(_VM_QUICK_STATS, overallCpuUsage=vm.cpu_usage(), overallCpuDemand=vm.cpu_usage(),
+                 guestMemoryUsage=vm.memory_mb * (stable_hash(vm.name) % 60 + 10) // 100 if running else 0,
+                 hostMemoryUsage=vm.memory_mb * 9 // 10 if running else 0,
+                 uptimeSeconds=int((datetime.now(timezone.utc) - vm.boot_time).total_seconds())
+                 if running and vm.boot_time else 0)
+
+
+def _vm_storage(vm: VirtualMachineEntity):
+    committed = vm.disk_bytes * (stable_hash(vm.moid) % 50 + 20) // 100
+    return build(_VM_STORAGE, committed=long(committed), uncommitted=long(vm.disk_bytes - committed),
+                 unshared=long(committed), timestamp=datetime.now(timezone.utc))
+
+
+def _vm_path(vm: VirtualMachineEntity) -> str:
+    return f"[{vm.datastore.name}] {vm.name}/{vm.name}.vmx"
+
+
+def _vm_summary(vm: VirtualMachineEntity):
+    running = _vm_running(vm)
+    config = build(_VM_CONFIG_SUMMARY, name=vm.name, template=vm.template, vmPathName=_vm_path(vm),
+                   memorySizeMB=vm.memory_mb, numCpu=vm.num_cpu, uuid=vm.uuid, instanceUuid=vm.instance_uuid,
+                   guestId=vm.guest_id, guestFullName="Other (64-bit)", annotation=vm.annotation)
+    guest = build(_VM_GUEST_SUMMARY, guestId=vm.guest_id, guestFullName="Other (64-bit)",
+                  toolsStatus=_vm_tools_status(vm), toolsRunningStatus=_vm_tools_running(vm),
+                  hostName=vm.name if running else None, ipAddress=vm.ip_address if running else None)
+    return build(_VM_SUMMARY, vm=vm.ref, runtime=_vm_runtime(vm), guest=guest, config=config,
+                 storage=_vm_storage(vm), quickStats=_vm_quick_stats(vm))
+
+
+def _vm_tools_status(vm: VirtualMachineEntity):
+    return (vim.vm.GuestInfo.ToolsStatus.toolsOk if _vm_running(vm)
+            else vim.vm.GuestInfo.ToolsStatus.toolsNotRunning)
+
+
+def _vm_tools_running(vm: VirtualMachineEntity) -> str:
+    return "guestToolsRunning" if _vm_running(vm) else "guestToolsNotRunning"
+
+
+def _vm_guest(vm: VirtualMachineEntity):
+    running = _vm_running(vm)
+    return build(_VM_GUEST, toolsStatus=_vm_tools_status(vm), toolsRunningStatus=_vm_tools_running(vm),
+                 guestId=vm.guest_id, guestState="running" if running else "notRunning",
+                 ipAddress=vm.ip_address if running else None, hostName=vm.name if running else None)
+
+
+def _vm_devices(vm: VirtualMachineEntity) -> list:
+    disk_kb = vm.disk_gb * 1024 * 1024
+    disk = build(_DISK, capacityInKB=long(disk_kb), capacityInBytes=long(disk_kb * 1024),
+                 deviceInfo=vim.Description(label="Hard disk 1", summary=f"{disk_kb:,} KB"),
+                 backing=build(_DISK_BACKING, fileName=f"[{vm.datastore.name}] {vm.name}/{vm.name}.vmdk",
+                               datastore=vm.datastore.ref))
+    devices = [_SCSI_CONTROLLER, disk]
+    if vm.network is not None:
+        devices.append(build(_NIC, macAddress=f"00:50:56:{(vm.index >> 16) & 255:02x}:{(vm.index >> 8) & 255:02x}:{vm.index & 255:02x}",
+                             deviceInfo=vim.Description(label="Network adapter 1", summary=vm.network.name),
+                             backing=build(_NIC_BACKING, deviceName=vm.network.name, network=vm.network.ref)))
+    return devices
+
+
+def _vm_config(vm: VirtualMachineEntity):
+    hardware = build(_VM_HARDWARE, numCPU=vm.num_cpu, memoryMB=vm.memory_mb, device=_vm_devices(vm))
+    return build(_VM_CONFIG, name=vm.name, uuid=vm.uuid, instanceUuid=vm.instance_uuid, template=vm.template,
+                 guestId=vm.guest_id, annotation=vm.annotation, hardware=hardware,
+                 files=build(_VM_FILES, vmPathName=_vm_path(vm)))
+
+
+def _vm_snapshot(vm: VirtualMachineEntity):
+    if not vm.root_snapshots:
+        return None
+    return vim.vm.SnapshotInfo(currentSnapshot=vm.current_snapshot.ref if vm.current_snapshot else None,
+                               rootSnapshotList=[snapshot.tree() for snapshot in vm.root_snapshots])
+
+
+# Top-level VM properties built on request
+_VM_BUILDERS = {
+    "runtime": _vm_runtime,
+    "summary": _vm_summary,
+    "config": _vm_config,
+    "guest": _vm_guest,
+    "snapshot": _vm_snapshot,
+    "rootSnapshot": lambda vm: vim.vm.Snapshot.Array([s.ref for s in vm.root_snapshots]),
+    "resourcePool": lambda vm: vm.pool.ref if vm.pool is not None else None,
+    "datastore": lambda vm: vim.Datastore.Array([vm.datastore.ref]),
+    "network": lambda vm: vim.Network.Array([vm.network.ref] if vm.network is not None else []),
+    "overallStatus": lambda vm: vim.ManagedEntity.Status.green,
+}
+
+# Property paths answered straight from the VM's fields
+_VM_FAST_PATHS = {
+    "name": lambda vm: vm.name,
+    "parent": lambda vm: vm.parent.ref if vm.parent is not None else None,
+    "config.name": lambda vm: vm.name,
+    "config.template": lambda vm: vm.template,
+    "config.uuid": lambda vm: vm.uuid,
+    "config.instanceUuid": lambda vm: vm.instance_uuid,
+    "config.guestId": lambda vm: vm.guest_id,
+    "config.hardware.numCPU": lambda vm: vm.num_cpu,
+    "config.hardware.memoryMB": lambda vm: vm.memory_mb,
+    "runtime.powerState": lambda vm: vm.power_state,
+    "runtime.host": lambda vm: vm.host.ref,
+    "summary.config.name": lambda vm: vm.name,
+    "summary.config.template": lambda vm: vm.template,
+    "summary.runtime.powerState": lambda vm: vm.power_state,
+    "summary.quickStats.overallCpuUsage": lambda vm: vm.cpu_usage(),
+    "guest.ipAddress": lambda vm: vm.ip_address if _vm_running(vm) else None,
+    "guest.toolsStatus": _vm_tools_status,
+}
+
+
+def _host_runtime(host: HostEntity):
+    health = vim.host.HealthStatusSystem.Runtime(
+        systemHealthInfo=vim.host.SystemHealthInfo(numericSensorInfo=_HOST_SENSORS))
+    return build(_HOST_RUNTIME, inMaintenanceMode=host.maintenance, bootTime=host.boot_time,
+                 healthSystemRuntime=health)
+
+
+def _host_hardware_summary(host: HostEntity):
+    return build(_HOST_HARDWARE_SUMMARY, uuid=host.uuid, memorySize=long(host.memory_bytes), cpuMhz=HOST_CPU_MHZ,
+                 numCpuPkgs=2, numCpuCores=host.cores, numCpuThreads=host.cores * 2)
+
+
+def _host_quick_stats(host: HostEntity):
+    cpu, memory = host.load()
+    return build(_HOST_QUICK_STATS, overallCpuUsage=cpu, overallMemoryUsage=memory + 4096,
+                 uptime=int((datetime.now(timezone.utc) - host.boot_time).total_seconds()))
+
+
+def _host_summary(host: HostEntity):
+    config = vim.host.Summary.ConfigSummary(name=host.name, port=443, product=_HOST_PRODUCT,
+                                           vmotionEnabled=True, faultToleranceEnabled=False)
+    return build(_HOST_SUMMARY, host=host.ref, hardware=_host_hardware_summary(host), runtime=_host_runtime(host),
+                 config=config, quickStats=_host_quick_stats(host))
+
+
+def _host_hardware(host: HostEntity):
+    return build(_HOST_HARDWARE,
+                 systemInfo=vim.host.SystemInfo(vendor="Simulated", model="Bench Server", uuid=host.uuid),
+                 cpuInfo=vim.host.CpuInfo(numCpuPackages=2, numCpuCores=host.cores, numCpuThreads=host.cores * 2,
+                                          hz=long(HOST_CPU_MHZ * 1000000)),
+                 memorySize=long(host.memory_bytes))
+
+
+# Top-level host properties built on request
+_HOST_BUILDERS = {
+    "runtime": _host_runtime,
+    "summary": _host_summary,
+    "hardware": _host_hardware,
+    "config": lambda host: build(_HOST_CONFIG, host=host.ref),
+    "datastore": lambda host: vim.Datastore.Array([ds.ref for ds in host.datastores]),
+    "vm": lambda host: vim.VirtualMachine.Array([vm.ref for vm in host.vms.values()]),
+}
+
+# Property paths answered straight from the host's fields
+_HOST_FAST_PATHS = {
+    "name": lambda host: host.name,
+    "parent": lambda host: host.parent.ref if host.parent is not None else None,
+    "runtime.connectionState": lambda host: vim.HostSystem.ConnectionState.connected,
+    "runtime.inMaintenanceMode": lambda host: host.maintenance,
+    "summary.hardware.cpuMhz": lambda host: HOST_CPU_MHZ,
+    "summary.hardware.numCpuCores": lambda host: host.cores,
+    "summary.hardware.memorySize": lambda host: long(host.memory_bytes),
+    "summary.quickStats.overallCpuUsage": lambda host: host.load()[0],
+    "summary.quickStats.overallMemoryUsage": lambda host: host.load()[1] + 4096,
+}
+
+
+class Inventory:
+    """
+    The simulated vSphere inventory.
+
+    One datacenter holds clusters of hosts sharing a set of datastores (some
+    of them grouped into a datastore cluster), standard networks and a
+    distributed portgroup. VMs are spread round-robin over hosts and
+    datastores and filed into VM folders of VMS_PER_FOLDER; about two thirds
+    are powered on. Every structural change and property change is appended
+    to a journal, from which property collector filters compute their
+    incremental updates.
+    """
+
+    def __init__(self, vms: int = 1000, templates: Optional[int] = None, hosts: Optional[int] = None,
+                 clusters: Optional[int] = None, datastores: Optional[int] = None, networks: int = 4):
+        self.objects: Dict[str, Entity] = {}
+        self.version = 0
+        self.structure_version = 0
+        self.journal: List[tuple] = []   # (version, kind, moid, paths)
+        self._ids = itertools.count(1)
+        self.started = datetime.now(timezone.utc)
+
+        templates = max(1, vms // 500) if templates is None else templates
+        hosts = hosts or max(2, min(1024, vms // 40))
+        clusters = clusters or max(1, (hosts + 31) // 32)
+        datastores = datastores or max(2, min(64, vms // 250))
+
+        self.root = self._add(Entity(vim.Folder, "group-d1", "Datacenters", container=True))
+        self.datacenter = self._add(Entity(vim.Datacenter, self.new_moid("datacenter"), "dc1", container=True),
+                                    self.root)
+        folders = {}
+        for key, prefix, label in (("vmFolder", "group-v", "vm"), ("hostFolder", "group-h", "host"),
+                                   ("datastoreFolder", "group-s", "datastore"), ("networkFolder", "group-n", "network")):
+            folders[key] = self._add(Entity(vim.Folder, f"{prefix}{next(self._ids)}", label, container=True),
+                                     self.datacenter)
+            self.datacenter.props[key] = folders[key].ref
+        self.vm_folder = folders["vmFolder"]
+
+        # Datastores, the first few of them in a datastore cluster
+        self.datastores: List[DatastoreEntity] = []
+        pod = None
+        if datastores >= 4:
+            pod = self._add(StoragePodEntity(vim.StoragePod, self.new_moid("group-p"), "pod-01", container=True),
+                            folders["datastoreFolder"])
+        for i in range(datastores):
+            parent = pod if pod is not None and i < datastores // 4 else folders["datastoreFolder"]
+            self.datastores.append(self._add(DatastoreEntity(self.new_moid("datastore"), datastore_name(i)), parent))
+
+        # Networks and a distributed portgroup
+        self.networks: List[Entity] = []
+        for i in range(networks):
+            name = "VM Network" if i == 0 else f"net-{i + 1:02d}"
+            network = Entity(vim.Network, self.new_moid("network"), name)
+            network.props["summary"] = vim.Network.Summary(network=network.ref, name=name, accessible=True)
+            self.networks.append(self._add(network, folders["networkFolder"]))
+        dvs = Entity(vim.dvs.VmwareDistributedVirtualSwitch, self.new_moid("dvs"), "dvs-01",
+                     uuid="50 00 00 00 00 00 00 01-00 00 00 00 00 00 00 01")
+        self._add(dvs, folders["networkFolder"])
+        portgroup = Entity(vim.dvs.DistributedVirtualPortgroup, self.new_moid("dvportgroup"), "dvpg-vlan100")
+        vlan = vim.dvs.VmwareDistributedVirtualSwitch.VlanIdSpec(vlanId=100, inherited=False)
+        portgroup.props.update(
+            key=portgroup.moid,
+            config=prototype(vim.dvs.DistributedVirtualPortgroup.ConfigInfo,
+                             key=portgroup.moid, name=portgroup.name, numPorts=128, distributedVirtualSwitch=dvs.ref,
+                             type="earlyBinding",
+                             defaultPortConfig=vim.dvs.VmwareDistributedVirtualSwitch.VmwarePortConfigPolicy(vlan=vlan)),
+            summary=vim.Network.Summary(network=portgroup.ref, name=portgroup.name, accessible=True))
+        self.networks.append(self._add(portgroup, folders["networkFolder"]))
+
+        # Clusters with their root resource pools and hosts
+        self.hosts: List[HostEntity] = []
+        self.pools: List[PoolEntity] = []
+        cluster_entities = []
+        for i in range(clusters):
+            cluster = self._add(ComputeEntity(vim.ClusterComputeResource, self.new_moid("domain-c"),
+                                              f"cluster-{i + 1:02d}", container=True), folders["hostFolder"])
+            cluster.props["datastore"] = vim.Datastore.Array([ds.ref for ds in self.datastores])
+            cluster.props["network"] = vim.Network.Array([n.ref for n in self.networks])
+            pool = self._add(PoolEntity(vim.ResourcePool, self.new_moid("resgroup"), "Resources", container=True,
+                                        owner=cluster.ref), cluster)
+            cluster_entities.append(cluster)
+            self.pools.append(pool)
+        for i in range(hosts):
+            boot_time = self.started - timedelta(days=30, seconds=i * 97)
+            host = HostEntity(self.new_moid("host"), host_name(i), cores=32,
+                              memory_bytes=768 * 1024 ** 3, boot_time=boot_time)
+            host.datastores = list(self.datastores)
+            self._add(host, cluster_entities[i % clusters])
+            self.hosts.append(host)
+        for ds in self.datastores:
+            ds.hosts = list(self.hosts)
+
+        # VMs and templates, filed into folders of VMS_PER_FOLDER
+        template_folder = self._add(Entity(vim.Folder, self.new_moid("group-v"), "templates", container=True),
+                                    self.vm_folder)
+        folder = None
+        for i in range(vms):
+            if i % VMS_PER_FOLDER == 0:
+                folder = self._add(Entity(vim.Folder, self.new_moid("group-v"), folder_name(i),
+                                          container=True), self.vm_folder)
+            vm = self.place_vm(vm_name(i, vms), folder, i)
+            if powered_on(i):
+                self.set_power(vm, POWERED_ON, boot_time=self.started - timedelta(seconds=stable_hash(vm.name) % 864000))
+        for i in range(templates):
+            self.place_vm(template_name(i), template_folder, vms + i, template=True)
+        # The initial inventory is loaded as a whole, not as changes
+        self.journal.clear()
+
+    def new_moid(self, prefix: str) -> str:
+        separator = "" if prefix.endswith("-") or prefix.startswith("group-") or prefix == "domain-c" else "-"
+        return f"{prefix}{separator}{next(self._ids)}"
+
+    def _add(self, entity: Entity, parent: Optional[Entity] = None) -> Entity:
+        self.objects[entity.moid] = entity
+        if parent is not None:
+            entity.parent = parent
+            parent.children[entity.moid] = entity
+        return entity
+
+    def record(self, kind: str, entity: Entity, *paths: str):
+        """Append a change ("enter", "leave" or "modify" of property paths) to the journal."""
+        self.version += 1
+        if kind != "modify":
+            self.structure_version += 1
+        self.journal.append((self.version, kind, entity.moid, paths))
+
+    def prune(self, version: int):
+        """Drop journal entries every filter has already seen."""
+        if self.journal and self.journal[0][0] <= version:
+            keep = next((i for i, entry in enumerate(self.journal) if entry[0] > version), len(self.journal))
+            del self.journal[:keep]
+
+    def register(self, entity: Entity) -> Entity:
+        """Add an object outside the containment tree (task, snapshot, lease, view, ...)."""
+        self.objects[entity.moid] = entity
+        return entity
+
+    def unregister(self, entity: Entity):
+        self.objects.pop(entity.moid, None)
+
+    def get(self, moid: str) -> Optional[Entity]:
+        return self.objects.get(moid)
+
+    def add_entity(self, entity: Entity, parent: Entity) -> Entity:
+        """Add a managed entity to the containment tree and journal it."""
+        self._add(entity, parent)
+        self.record("enter", entity)
+        return entity
+
+    def remove_entity(self, entity: Entity):
+        """Remove a managed entity from the containment tree and journal it."""
+        if entity.parent is not None:
+            entity.parent.children.pop(entity.moid, None)
+            entity.parent = None
+        self.objects.pop(entity.moid, None)
+        self.record("leave", entity)
+
+    # VM lifecycle effects
+
+    def place_vm(self, name: str, folder: Entity, index: Optional[int] = None, template: bool = False,
+                 host: Optional[HostEntity] = None, datastore: Optional[DatastoreEntity] = None,
+                 pool: Optional[PoolEntity] = None, network=None, journal: bool = False, **fields) -> VirtualMachineEntity:
+        """Create a VM in a folder, placing it round-robin unless host/datastore/pool are given."""
+        moid = self.new_moid("vm")
+        if index is None:
+            index = int(moid.split("-")[1])
+        if host is None:
+            candidates = self.hosts
+            if pool is not None and isinstance(pool.parent, ComputeEntity):
+                candidates = [c for c in pool.parent.contents() if isinstance(c, HostEntity)] or self.hosts
+            host = candidates[index % len(candidates)]
+        datastore = datastore or self.datastores[index % len(self.datastores)]
+        if network is None and self.networks:
+            network = self.networks[index % len(self.networks)]
+        vm = VirtualMachineEntity(moid, name, index, host, datastore, network or None, template=template, **fields)
+        if not template:
+            vm.pool = pool or next(c for c in host.parent.contents() if isinstance(c, PoolEntity))
+            vm.pool.children[vm.moid] = vm
+        host.vms[vm.moid] = vm
+        datastore.vms[vm.moid] = vm
+        datastore.used += vm.disk_bytes * (stable_hash(vm.moid) % 50 + 20) // 100
+        if journal:
+            self.add_entity(vm, folder)
+            self.record("modify", host, "vm", "summary.quickStats")
+            self.record("modify", datastore, "vm", "summary")
+        else:
+            self._add(vm, folder)
+        return vm
+
+    def destroy_vm(self, vm: VirtualMachineEntity):
+        vm.host.vms.pop(vm.moid, None)
+        vm.datastore.vms.pop(vm.moid, None)
+        vm.datastore.used -= vm.disk_bytes * (stable_hash(vm.moid) % 50 + 20) // 100
+        if vm.pool is not None:
+            vm.pool.children.pop(vm.moid, None)
+        for snapshot in list(self.walk_snapshots(vm.root_snapshots)):
+            self.unregister(snapshot)
+        self.remove_entity(vm)
+        self.record("modify", vm.host, "vm", "summary.quickStats")
+        self.record("modify", vm.datastore, "vm", "summary")
+
+    def set_power(self, vm: VirtualMachineEntity, state, boot_time: Optional[datetime] = None, journal: bool = False):
+        vm.power_state = state
+        vm.boot_time = (boot_time or datetime.now(timezone.utc)) if state == POWERED_ON else None
+        if journal:
+            self.record("modify", vm, "runtime", "summary.runtime", "summary.quickStats", "summary.guest", "guest")
+            self.record("modify", vm.host, "summary.quickStats")
+
+    @staticmethod
+    def walk_snapshots(snapshots: List[SnapshotEntity]) -> Iterator[SnapshotEntity]:
+        for snapshot in snapshots:
+            yield snapshot
+            yield from Inventory.walk_snapshots(snapshot.child_snapshots)
+
+    # Containment queries
+
+    def container_members(self, container: Entity, types: tuple, recursive: bool) -> List[Entity]:
+        """Entities of the given types inside a container, as a ContainerView lists them."""
+        members = []
+        seen = set()
+        stack = list(container.contents())
+        stack.reverse()
+        while stack:
+            entity = stack.pop()
+            if entity.moid in seen:
+                continue
+            seen.add(entity.moid)
+            if not types or isinstance(entity.ref, types):
+                members.append(entity)
+            if recursive and entity.children is not None:
+                children = list(entity.contents())
+                children.reverse()
+                stack.extend(children)
+        return members
+
+    def find_by_path(self, path: str) -> Optional[Entity]:
+        """Resolve an inventory path such as dc1/host/cluster-01/Resources below the root folder."""
+        entity = self.root
+        for name in [part for part in path.strip("/").split("/") if part]:
+            entity = next((c for c in entity.contents() if c.name == name), None)
+            if entity is None:
+                return None
+        return entity
+
+    def find_child(self, folder: Entity, name: str) -> Optional[Entity]:
+        return next((c for c in folder.contents() if c.name == name), None)
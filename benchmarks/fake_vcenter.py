@@ -0,0 +1,829 @@
+"""vSphere API methods of the simulated endpoint, executed against an in-memory inventory."""
+
+import heapq
+import itertools
+import logging
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from pyVmomi import vim, vmodl
+from pyVmomi import VmomiSupport
+from pyVmomi.VmomiSupport import GetWsdlType, long, Object
+
+from .collector import (DEFAULT_RETRIEVE_BATCH, DEFAULT_UPDATE_BATCH, PropertyCollector, PropertyFilter,
+                        RetrieveCursor, property_paths, select_objects)
+from .fake_inventory import (ABOUT, POWERED_OFF, POWERED_ON, DatastoreEntity, Entity, HostEntity, Inventory,
+                             SnapshotEntity, VirtualMachineEntity, ViewEntity, complete, stable_hash)
+from .soap import VERSION, VIM_NS, SoapRequest, fault_response, result_response, response
+
+# Name of the session cookie, as set by vCenter
+SESSION_COOKIE = "vmware_soap_session"
+
+# Methods callers may invoke without a session
+ANONYMOUS_METHODS = {"RetrieveServiceContent", "Login", "CurrentTime", "Fetch"}
+
+# Journal entries kept before entries every collector has seen are dropped
+JOURNAL_PRUNE_THRESHOLD = 10000
+
+# Performance counters of the simulated PerformanceManager: group, name, rollup, unit, stats type, level
+PERF_COUNTERS = [
+    ("cpu", "usage", "average", "percent", "rate", 1),
+    ("cpu", "usagemhz", "average", "megaHertz", "rate", 1),
+    ("mem", "usage", "average", "percent", "absolute", 1),
+    ("mem", "consumed", "average", "kiloBytes", "absolute", 1),
+    ("net", "usage", "average", "kiloBytesPerSecond", "rate", 1),
+    ("net", "transmitted", "average", "kiloBytesPerSecond", "rate", 2),
+    ("net", "received", "average", "kiloBytesPerSecond", "rate", 2),
+    ("disk", "usage", "average", "kiloBytesPerSecond", "rate", 1),
+    ("disk", "read", "average", "kiloBytesPerSecond", "rate", 2),
+    ("disk", "write", "average", "kiloBytesPerSecond", "rate", 2),
+    ("cpu", "ready", "summation", "millisecond", "delta", 1),
+    ("mem", "active", "average", "kiloBytes", "absolute", 2),
+]
+
+# Real-time statistics: sample interval and samples kept, as on vCenter
+REALTIME_INTERVAL = 20
+REALTIME_SAMPLES = 180
+
+# Matches the disk references of an OVF descriptor
+_OVF_FILE = re.compile(r'<(?:\w+:)?File\b[^>]*?(?:ovf:)?href="([^"]+)"[^>]*?(?:ovf:)?id="([^"]+)"'
+                       r'|<(?:\w+:)?File\b[^>]*?(?:ovf:)?id="([^"]+)"[^>]*?(?:ovf:)?href="([^"]+)"')
+
+# Matches the virtual system name of an OVF descriptor
+_OVF_NAME = re.compile(r"<(?:\w+:)?VirtualSystem\b[^>]*>.*?<(?:\w+:)?Name>([^<]+)</", re.S)
+
+
+class Raw(str):
+    """Return values already serialized as XML by the handler."""
+
+
+class Session:
+    """A logged-in client session and the server-side objects it created."""
+
+    __slots__ = ("key", "user", "created", "last_active", "collector", "owned")
+
+    def __init__(self, key: str, user: str, collector: PropertyCollector):
+        self.key = key
+        self.user = user
+        self.created = datetime.now(timezone.utc)
+        self.last_active = time.monotonic()
+        # The session's view of the shared "propertyCollector" object
+        self.collector = collector
+        self.owned: List[Entity] = [collector]
+
+
+class FakeVCenter:
+    """
+    The part of the vSphere API the MCP server uses, over a simulated Inventory.
+
+    Calls arrive as decoded SoapRequests from the HTTP front end and run one
+    at a time under a single lock; WaitForUpdatesEx releases it while it
+    long-polls. Tasks complete on a scheduler thread after task_seconds, so
+    clients observe the queued -> running -> success sequence of a real
+    vCenter, and apply their effect to the inventory when they finish.
+    """
+
+    def __init__(self, inventory: Inventory, task_seconds: float = 0.05, user: str = "bench",
+                 password: str = "bench", session_timeout: float = 0):
+        self.inventory = inventory
+        self.task_seconds = task_seconds
+        self.user = user
+        self.password = password
+        self.session_timeout = session_timeout
+        # Scheme and host:port clients reach the endpoint at; set by the HTTP server
+        self.base_url = "https://127.0.0.1"
+        self.lock = threading.RLock()
+        self.changed = threading.Condition(self.lock)
+        self.sessions: Dict[str, Session] = {}
+        self.processes: Dict[str, Dict[int, object]] = {}
+        self.transfers: Dict[str, Tuple[str, int]] = {}
+        self.leases: Dict[str, VirtualMachineEntity] = {}
+        self._pids = itertools.count(1000)
+        self._ids = itertools.count(1)
+        self._timers: List[tuple] = []
+        self._timer_wakeup = threading.Condition(self.lock)
+        self._stopped = False
+        self._build_managers()
+        self._scheduler = threading.Thread(target=self._run_scheduler, name="fake-vcenter-tasks", daemon=True)
+        self._scheduler.start()
+
+    def _build_managers(self):
+        inventory = self.inventory
+        perf_counters = vim.PerformanceManager.CounterInfo.Array([
+            vim.PerformanceManager.CounterInfo(
+                key=key, nameInfo=vim.ElementDescription(label=name, summary=f"{group} {name}", key=name),
+                groupInfo=vim.ElementDescription(label=group, summary=group, key=group),
+                unitInfo=vim.ElementDescription(label=unit, summary=unit, key=unit),
+                rollupType=rollup, statsType=stats_type, level=level, perDeviceLevel=3)
+            for key, (group, name, rollup, unit, stats_type, level) in enumerate(PERF_COUNTERS, 1)
+        ])
+        managers = {
+            "PerfMgr": Entity(vim.PerformanceManager, "PerfMgr", perfCounter=perf_counters),
+            "ViewManager": Entity(vim.view.ViewManager, "ViewManager"),
+            "SearchIndex": Entity(vim.SearchIndex, "SearchIndex"),
+            "OvfManager": Entity(vim.OvfManager, "OvfManager"),
+            "SessionManager": Entity(vim.SessionManager, "SessionManager"),
+            "TaskManager": Entity(vim.TaskManager, "TaskManager"),
+            "guestOperationsProcessManager": Entity(vim.vm.guest.ProcessManager, "guestOperationsProcessManager"),
+            "guestOperationsFileManager": Entity(vim.vm.guest.FileManager, "guestOperationsFileManager"),
+            "propertyCollector": Entity(vmodl.query.PropertyCollector, "propertyCollector"),
+        }
+        managers["guestOperationsManager"] = Entity(
+            vim.vm.guest.GuestOperationsManager, "guestOperationsManager",
+            processManager=managers["guestOperationsProcessManager"].ref,
+            fileManager=managers["guestOperationsFileManager"].ref)
+        self.content = complete(vim.ServiceInstanceContent(
+            rootFolder=inventory.root.ref, propertyCollector=managers["propertyCollector"].ref,
+            viewManager=managers["ViewManager"].ref, about=ABOUT, sessionManager=managers["SessionManager"].ref,
+            perfManager=managers["PerfMgr"].ref, searchIndex=managers["SearchIndex"].ref,
+            ovfManager=managers["OvfManager"].ref, taskManager=managers["TaskManager"].ref,
+            guestOperationsManager=managers["guestOperationsManager"].ref))
+        managers["ServiceInstance"] = Entity(vim.ServiceInstance, "ServiceInstance", content=self.content)
+        for entity in managers.values():
+            inventory.register(entity)
+
+    def close(self):
+        with self.lock:
+            self._stopped = True
+            self._timer_wakeup.notify_all()
+            self.changed.notify_all()
+
+    # Request handling
+
+    def session_for(self, cookie: Optional[str]) -> Optional[Session]:
+        """The live session a cookie header refers to."""
+        if not cookie:
+            return None
+        match = re.search(SESSION_COOKIE + r'=\s*"?([^";\s]+)', cookie)
+        session = self.sessions.get(match.group(1)) if match else None
+        if session is not None and self.session_timeout:
+            if time.monotonic() - session.last_active > self.session_timeout:
+                self._logout(session)
+                return None
+        return session
+
+    def handle(self, request: SoapRequest, cookie: Optional[str]) -> Tuple[bytes, Optional[str], bool]:
+        """
+        Execute a decoded call.
+
+        Returns the response body, a Set-Cookie value for new sessions and
+        whether the response is a fault.
+        """
+        with self.lock:
+            version = self.inventory.version
+            session = self.session_for(cookie)
+            set_cookie = None
+            try:
+                if session is None and request.method not in ANONYMOUS_METHODS:
+                    raise vim.fault.NotAuthenticated(object=request.this, privilegeId="System.View",
+                                                     msg="The session is not authenticated.")
+                if session is not None:
+                    session.last_active = time.monotonic()
+                this = self._resolve(session, request.this) if request.this is not None else None
+                if request.method == "Login":
+                    session = self._login(**request.args)
+                    set_cookie = f'{SESSION_COOKIE}="{session.key}"; Path=/; HttpOnly; Secure;'
+                    result = self._user_session(session)
+                else:
+                    handler = getattr(self, "_" + request.method, None)
+                    if handler is None:
+                        raise vmodl.fault.NotImplemented(msg=f"{request.method} is not simulated")
+                    result = handler(session, this, **request.args)
+                if isinstance(result, Raw):
+                    body = response(request.method, result)
+                else:
+                    info = request.info
+                    if request.method == "Fetch":
+                        info = self._fetch_info(this, request.args["prop"])
+                    body = result_response(info, result)
+                return body, set_cookie, False
+            except vmodl.MethodFault as fault:
+                return fault_response(complete(fault)), set_cookie, True
+            except Exception as e:
+                logging.exception(f"Simulated {request.method} failed")
+                return fault_response(complete(vmodl.RuntimeFault(msg=str(e)))), set_cookie, True
+            finally:
+                if self.inventory.version != version:
+                    self.changed.notify_all()
+                    self._prune_journal()
+
+    def _resolve(self, session: Optional[Session], ref) -> Entity:
+        if ref._moId == "propertyCollector" and session is not None:
+            return session.collector
+        entity = self.inventory.get(ref._moId)
+        if entity is None:
+            raise vmodl.fault.ManagedObjectNotFound(obj=ref, msg=f"The object '{ref}' has already been deleted "
+                                                               "or has not been completely created")
+        return entity
+
+    @staticmethod
+    def _fetch_info(this: Entity, prop: str):
+        prop_info = this.mo_type._GetPropertyInfo(prop)
+        return Object(name="fetch", wsdlName="Fetch", version=VERSION, result=prop_info.type)
+
+    def _prune_journal(self):
+        journal = self.inventory.journal
+        if len(journal) < JOURNAL_PRUNE_THRESHOLD:
+            return
+        marks = [s.collector.mark for s in self.sessions.values() if s.collector.filters]
+        marks += [e.mark for s in self.sessions.values() for e in s.owned
+                  if isinstance(e, PropertyCollector) and e.filters]
+        self.inventory.prune(min(marks) if marks else self.inventory.version)
+
+    def new_session_moid(self, session: Session, kind: str) -> str:
+        return f"session[{session.key}]{kind}-{next(self._ids)}"
+
+    def _own(self, session: Session, entity: Entity) -> Entity:
+        session.owned.append(entity)
+        return self.inventory.register(entity)
+
+    def _disown(self, session: Session, entity: Entity):
+        if entity in session.owned:
+            session.owned.remove(entity)
+        self.inventory.unregister(entity)
+
+    # Sessions
+
+    def _login(self, userName=None, password=None, **_):
+        if userName != self.user or password != self.password:
+            raise vim.fault.InvalidLogin(msg="Cannot complete login due to an incorrect user name or password.")
+        key = str(uuid.uuid4())
+        collector = PropertyCollector("propertyCollector", None)
+        session = Session(key, userName, collector)
+        collector.session = session
+        self.sessions[key] = session
+        return session
+
+    def _user_session(self, session: Session):
+        return complete(vim.UserSession(key=session.key, userName=session.user, fullName=session.user,
+                                        loginTime=session.created, lastActiveTime=session.created,
+                                        locale="en", messageLocale="en", ipAddress="127.0.0.1"))
+
+    def _logout(self, session: Session):
+        for entity in session.owned:
+            self.inventory.unregister(entity)
+            if isinstance(entity, PropertyCollector):
+                entity.cancelled = True
+        self.sessions.pop(session.key, None)
+        self.changed.notify_all()
+
+    def _Logout(self, session, this, **_):
+        self._logout(session)
+
+    def _RetrieveServiceContent(self, session, this, **_):
+        return self.content
+
+    def _CurrentTime(self, session, this, **_):
+        return datetime.now(timezone.utc)
+
+    def _Fetch(self, session, this, prop=None, **_):
+        if isinstance(this, PropertyCollector) and prop == "filter":
+            return this.get("filter")
+        return this.get(prop)
+
+    # Property collectors and views
+
+    def _CreatePropertyCollector(self, session, this, **_):
+        collector = PropertyCollector(self.new_session_moid(session, "propertyCollector"), session)
+        return self._own(session, collector).ref
+
+    def _DestroyPropertyCollector(self, session, this, **_):
+        for property_filter in list(this.filters.values()):
+            self._disown(session, property_filter)
+        this.filters.clear()
+        this.cancelled = True
+        if this is not session.collector:
+            self._disown(session, this)
+        self.changed.notify_all()
+
+    def _CreateFilter(self, session, this, spec=None, partialUpdates=False, **_):
+        this.catch_up(self.inventory)
+        property_filter = PropertyFilter(self.new_session_moid(session, "filter"), this, spec, partialUpdates)
+        property_filter.reset(self.inventory)
+        this.filters[property_filter.moid] = property_filter
+        self._own(session, property_filter)
+        self.changed.notify_all()
+        return property_filter.ref
+
+    def _DestroyPropertyFilter(self, session, this, **_):
+        this.collector.filters.pop(this.moid, None)
+        self._disown(session, this)
+
+    def _RetrievePropertiesEx(self, session, this, specSet=None, options=None, **_):
+        items = []
+        for spec in specSet or ():
+            selected, _ = select_objects(self.inventory, spec)
+            for entity in selected.values():
+                if any(isinstance(entity.ref, prop_spec.type) for prop_spec in spec.propSet):
+                    items.append((entity, property_paths(entity, spec.propSet)))
+        if not items:
+            return None
+        cursor = RetrieveCursor(items, (options.maxObjects if options and options.maxObjects else 0)
+                                or DEFAULT_RETRIEVE_BATCH)
+        token = this.new_token()
+        page = cursor.page(token)
+        if not cursor.done:
+            this.cursors[token] = cursor
+        return Raw(page)
+
+    def _ContinueRetrievePropertiesEx(self, session, this, token=None, **_):
+        cursor = this.cursors.pop(token, None)
+        if cursor is None:
+            raise vmodl.fault.InvalidArgument(invalidProperty="token", msg=f"Unknown token {token}")
+        page = cursor.page(token)
+        if not cursor.done:
+            this.cursors[token] = cursor
+        return Raw(page)
+
+    def _CancelRetrievePropertiesEx(self, session, this, token=None, **_):
+        this.cursors.pop(token, None)
+
+    def _WaitForUpdatesEx(self, session, this, version=None, options=None, **_):
+        if not version:
+            this.mark = self.inventory.version
+            for property_filter in this.filters.values():
+                property_filter.reset(self.inventory)
+        elif version != str(this.version):
+            raise vmodl.query.InvalidCollectorVersion(msg=f"Collector version {version} is not current")
+        max_wait = options.maxWaitSeconds if options is not None else None
+        limit = (options.maxObjectUpdates if options is not None and options.maxObjectUpdates else 0) \
+            or DEFAULT_UPDATE_BATCH
+        deadline = None if max_wait is None else time.monotonic() + max_wait
+        this.cancelled = False
+        this.waiting += 1
+        try:
+            while True:
+                this.catch_up(self.inventory)
+                if this.has_updates():
+                    return Raw(this.update_set(self.inventory, limit))
+                if this.cancelled or self._stopped:
+                    raise vmodl.fault.RequestCanceled(msg="The task was canceled by a user.")
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self.changed.wait(remaining)
+        finally:
+            this.waiting -= 1
+            this.cancelled = False
+
+    def _CancelWaitForUpdates(self, session, this, **_):
+        if this.waiting:
+            this.cancelled = True
+            self.changed.notify_all()
+
+    def _CreateContainerView(self, session, this, container=None, type=None, recursive=False, **_):
+        types = tuple(t if not isinstance(t, str) else GetWsdlType(VIM_NS, t) for t in type or ())
+        view = ViewEntity(vim.view.ContainerView, self.new_session_moid(session, "containerView"),
+                          self.inventory, self._resolve(session, container), types, bool(recursive))
+        return self._own(session, view).ref
+
+    def _CreateListView(self, session, this, obj=None, **_):
+        view = ViewEntity(vim.view.ListView, self.new_session_moid(session, "listView"), self.inventory)
+        self._modify_list(view, obj or [], [])
+        self._own(session, view)
+        return view.ref
+
+    def _ModifyListView(self, session, this, add=None, remove=None, **_):
+        return self._modify_list(this, add or [], remove or [])
+
+    def _modify_list(self, view: ViewEntity, add, remove):
+        missing = []
+        for ref in add:
+            entity = self.inventory.get(ref._moId)
+            if entity is None:
+                missing.append(ref)
+            else:
+                view.listed[entity.moid] = entity
+        for ref in remove:
+            view.listed.pop(ref._moId, None)
+        self.inventory.record("modify", view, "view")
+        return VmomiSupport.ManagedObject.Array(missing)
+
+    def _DestroyView(self, session, this, **_):
+        self._disown(session, this)
+
+    # Search
+
+    def _FindByInventoryPath(self, session, this, inventoryPath=None, **_):
+        entity = self.inventory.find_by_path(inventoryPath or "")
+        return entity.ref if entity is not None else None
+
+    def _FindByUuid(self, session, this, uuid=None, vmSearch=None, instanceUuid=None, **_):
+        for entity in self.inventory.objects.values():
+            if isinstance(entity, VirtualMachineEntity) and (
+                    entity.instance_uuid if instanceUuid else entity.uuid) == uuid:
+                return entity.ref
+        return None
+
+    # Tasks
+
+    def _task(self, session, this: Entity, name: str, work, delay: Optional[float] = None):
+        """Create a task running work() after the task delay; work returns the task result."""
+        task = Entity(vim.Task, self.inventory.new_moid("task"))
+        now = datetime.now(timezone.utc)
+        # Snapshot tasks are reported against their VM, which is the managed entity
+        entity = this.vm if isinstance(this, SnapshotEntity) else this
+        task.props["info"] = complete(vim.TaskInfo(
+            key=task.moid, task=task.ref, descriptionId=f"{this.mo_type.__name__}.{name}",
+            entity=entity.ref, entityName=entity.name, state=vim.TaskInfo.State.running, cancelled=False,
+            cancelable=True, queueTime=now, startTime=now, eventChainId=next(self._ids), progress=0))
+        self.inventory.register(task)
+        self._schedule(self.task_seconds if delay is None else delay, lambda: self._finish(task, work))
+        return task.ref
+
+    def _finish(self, task: Entity, work):
+        info = task.props["info"]
+        if info.state != vim.TaskInfo.State.running:
+            return
+        try:
+            result = work()
+            info.result = result
+            info.state = vim.TaskInfo.State.success
+        except vmodl.MethodFault as fault:
+            info.error = complete(fault)
+            info.state = vim.TaskInfo.State.error
+        info.progress = 100
+        info.completeTime = datetime.now(timezone.utc)
+        self.inventory.record("modify", task, "info")
+        self.changed.notify_all()
+
+    def _CancelTask(self, session, this, **_):
+        info = this.props["info"]
+        if info.state == vim.TaskInfo.State.running:
+            info.cancelled = True
+            info.state = vim.TaskInfo.State.error
+            info.error = complete(vmodl.fault.RequestCanceled(msg="The task was canceled by a user."))
+            info.completeTime = datetime.now(timezone.utc)
+            self.inventory.record("modify", this, "info")
+
+    def _schedule(self, delay: float, callback):
+        if delay <= 0:
+            callback()
+            return
+        heapq.heappush(self._timers, (time.monotonic() + delay, next(self._ids), callback))
+        self._timer_wakeup.notify()
+
+    def _run_scheduler(self):
+        with self.lock:
+            while not self._stopped:
+                if not self._timers:
+                    self._timer_wakeup.wait()
+                    continue
+                due = self._timers[0][0] - time.monotonic()
+                if due > 0:
+                    self._timer_wakeup.wait(due)
+                    continue
+                _, _, callback = heapq.heappop(self._timers)
+                version = self.inventory.version
+                try:
+                    callback()
+                except Exception:
+                    logging.exception("Simulated task failed")
+                if self.inventory.version != version:
+                    self.changed.notify_all()
+
+    # Virtual machines
+
+    def _vm_fields(self, config) -> dict:
+        fields = {}
+        if config is None:
+            return fields
+        if config.numCPUs:
+            fields["num_cpu"] = config.numCPUs
+        if config.memoryMB:
+            fields["memory_mb"] = int(config.memoryMB)
+        if config.guestId:
+            fields["guest_id"] = config.guestId
+        if config.annotation:
+            fields["annotation"] = config.annotation
+        return fields
+
+    def _placement(self, config) -> dict:
+        """Datastore, network and disk size of a VM from the device changes of a ConfigSpec."""
+        placement = {}
+        if config is None:
+            return placement
+        if config.files is not None and config.files.vmPathName:
+            match = re.match(r"\[([^\]]+)\]", config.files.vmPathName)
+            if match:
+                placement["datastore"] = self._by_name(DatastoreEntity, match.group(1))
+        for change in config.deviceChange or ():
+            device = change.device
+            if isinstance(device, vim.vm.device.VirtualDisk):
+                if device.capacityInKB:
+                    placement["disk_gb"] = max(1, int(device.capacityInKB) // (1024 * 1024))
+                backing = device.backing
+                if getattr(backing, "datastore", None) is not None:
+                    placement["datastore"] = self.inventory.get(backing.datastore._moId)
+            elif isinstance(device, vim.vm.device.VirtualEthernetCard):
+                backing = device.backing
+                if getattr(backing, "network", None) is not None:
+                    placement["network"] = self.inventory.get(backing.network._moId)
+                elif getattr(backing, "deviceName", None):
+                    placement["network"] = next((n for n in self.inventory.networks
+                                                 if n.name == backing.deviceName), None)
+                elif getattr(backing, "port", None) is not None:
+                    placement["network"] = self.inventory.get(backing.port.portgroupKey)
+        return {k: v for k, v in placement.items() if v is not None}
+
+    def _by_name(self, entity_type, name: str):
+        return next((e for e in self.inventory.objects.values() if isinstance(e, entity_type) and e.name == name),
+                    None)
+
+    def _check_name(self, folder: Entity, name: str):
+        if self.inventory.find_child(folder, name) is not None:
+            raise vim.fault.DuplicateName(name=name, object=folder.ref,
+                                          msg=f"The name '{name}' already exists.")
+
+    def _entity(self, ref):
+        return self.inventory.get(ref._moId) if ref is not None else None
+
+    def _CreateVM_Task(self, session, this, config=None, pool=None, host=None, **_):
+        pool_entity, host_entity = self._entity(pool), self._entity(host)
+
+        def create():
+            self._check_name(this, config.name)
+            vm = self.inventory.place_vm(config.name, this, pool=pool_entity, host=host_entity, journal=True,
+                                         **self._placement(config), **self._vm_fields(config))
+            return vm.ref
+        return self._task(session, this, "CreateVM_Task", create)
+
+    def _CloneVM_Task(self, session, this, folder=None, name=None, spec=None, **_):
+        folder_entity = self._entity(folder)
+        location = spec.location if spec is not None else None
+
+        def clone():
+            self._check_name(folder_entity, name)
+            placement = {
+                "pool": self._entity(location.pool) if location else None,
+                "host": self._entity(location.host) if location else None,
+                "datastore": (self._entity(location.datastore) if location else None) or this.datastore,
+            }
+            if placement["pool"] is None and placement["host"] is None:
+                placement["pool"], placement["host"] = this.pool, this.host
+            vm = self.inventory.place_vm(name, folder_entity, network=this.network, num_cpu=this.num_cpu,
+                                         memory_mb=this.memory_mb, disk_gb=this.disk_gb, guest_id=this.guest_id,
+                                         template=bool(spec.template) if spec else False, journal=True,
+                                         **{k: v for k, v in placement.items() if v is not None})
+            if spec is not None and spec.powerOn and not vm.template:
+                self.inventory.set_power(vm, POWERED_ON, journal=True)
+            return vm.ref
+        return self._task(session, this, "CloneVM_Task", clone)
+
+    def _InstantClone_Task(self, session, this, spec=None, **_):
+        location = spec.location
+
+        def clone():
+            if this.power_state != POWERED_ON:
+                raise vim.fault.InvalidPowerState(requestedState=POWERED_ON, existingState=this.power_state,
+                                                  msg="The source VM must be powered on.")
+            folder = self._entity(location.folder) if location and location.folder else this.parent
+            self._check_name(folder, spec.name)
+            vm = self.inventory.place_vm(spec.name, folder, host=this.host, pool=self._entity(location.pool)
+                                         if location and location.pool else this.pool, datastore=this.datastore,
+                                         network=this.network, num_cpu=this.num_cpu, memory_mb=this.memory_mb,
+                                         disk_gb=this.disk_gb, guest_id=this.guest_id, journal=True)
+            self.inventory.set_power(vm, POWERED_ON, journal=True)
+            return vm.ref
+        return self._task(session, this, "InstantClone_Task", clone)
+
+    def _power(self, vm: VirtualMachineEntity, state):
+        if vm.template:
+            raise vmodl.fault.NotSupported(msg="The operation is not supported on templates.")
+        if vm.power_state == state:
+            raise vim.fault.InvalidPowerState(requestedState=state, existingState=vm.power_state,
+                                              msg="The attempted operation cannot be performed in the current state "
+                                                  f"({vm.power_state}).")
+        self.inventory.set_power(vm, state, journal=True)
+
+    def _PowerOnVM_Task(self, session, this, **_):
+        return self._task(session, this, "PowerOnVM_Task", lambda: self._power(this, POWERED_ON))
+
+    def _PowerOffVM_Task(self, session, this, **_):
+        return self._task(session, this, "PowerOffVM_Task", lambda: self._power(this, POWERED_OFF))
+
+    def _Destroy_Task(self, session, this, **_):
+        def destroy():
+            if isinstance(this, VirtualMachineEntity):
+                if this.power_state == POWERED_ON:
+                    raise vim.fault.InvalidPowerState(requestedState=POWERED_OFF, existingState=this.power_state,
+                                                      msg="The attempted operation cannot be performed in the "
+                                                          "current state (Powered on).")
+                self.inventory.destroy_vm(this)
+            else:
+                self.inventory.remove_entity(this)
+        return self._task(session, this, "Destroy_Task", destroy)
+
+    def _ReconfigVM_Task(self, session, this, spec=None, **_):
+        def reconfigure():
+            for name, value in self._vm_fields(spec).items():
+                setattr(this, name, value)
+            self.inventory.record("modify", this, "config", "summary")
+        return self._task(session, this, "ReconfigVM_Task", reconfigure)
+
+    # Snapshots
+
+    def _CreateSnapshot_Task(self, session, this, name=None, description=None, memory=False, quiesce=False, **_):
+        def create():
+            snapshot_id = sum(1 for _ in self.inventory.walk_snapshots(this.root_snapshots)) + 1
+            snapshot = SnapshotEntity(self.inventory.new_moid("snapshot"), name, this, description or "",
+                                      snapshot_id, bool(quiesce))
+            parent = this.current_snapshot
+            if parent is None:
+                this.root_snapshots.append(snapshot)
+            else:
+                parent.child_snapshots.append(snapshot)
+                snapshot.parent_snapshot = parent
+            this.current_snapshot = snapshot
+            self.inventory.register(snapshot)
+            self.inventory.record("modify", this, "snapshot", "rootSnapshot")
+            return snapshot.ref
+        return self._task(session, this, "CreateSnapshot_Task", create)
+
+    def _RemoveSnapshot_Task(self, session, this, removeChildren=True, **_):
+        vm = this.vm
+
+        def remove():
+            siblings = this.parent_snapshot.child_snapshots if this.parent_snapshot else vm.root_snapshots
+            position = siblings.index(this)
+            siblings.remove(this)
+            removed = [this]
+            if removeChildren:
+                removed = list(self.inventory.walk_snapshots([this]))
+            else:
+                for child in this.child_snapshots:
+                    child.parent_snapshot = this.parent_snapshot
+                siblings[position:position] = this.child_snapshots
+            for snapshot in removed:
+                self.inventory.unregister(snapshot)
+            if vm.current_snapshot in removed:
+                vm.current_snapshot = this.parent_snapshot
+            self.inventory.record("modify", vm, "snapshot", "rootSnapshot")
+        return self._task(session, this, "RemoveSnapshot_Task", remove)
+
+    def _RevertToSnapshot_Task(self, session, this, suppressPowerOn=False, **_):
+        vm = this.vm
+
+        def revert():
+            vm.current_snapshot = this
+            if this.state != vm.power_state and not (suppressPowerOn and this.state == POWERED_ON):
+                self.inventory.set_power(vm, this.state, journal=True)
+            self.inventory.record("modify", vm, "snapshot")
+        return self._task(session, this, "RevertToSnapshot_Task", revert)
+
+    def _RemoveAllSnapshots_Task(self, session, this, **_):
+        def remove_all():
+            for snapshot in list(self.inventory.walk_snapshots(this.root_snapshots)):
+                self.inventory.unregister(snapshot)
+            this.root_snapshots = []
+            this.current_snapshot = None
+            self.inventory.record("modify", this, "snapshot", "rootSnapshot")
+        return self._task(session, this, "RemoveAllSnapshots_Task", remove_all)
+
+    # Performance
+
+    def _QueryAvailablePerfMetric(self, session, this, entity=None, **_):
+        return [vim.PerformanceManager.MetricId(counterId=key, instance="") for key in range(1, len(PERF_COUNTERS) + 1)]
+
+    def _QueryPerfCounter(self, session, this, counterId=None, **_):
+        counters = {c.key: c for c in this.props["perfCounter"]}
+        return [counters[key] for key in counterId or () if key in counters]
+
+    def _QueryPerf(self, session, this, querySpec=None, **_):
+        results = []
+        now = int(time.time()) // REALTIME_INTERVAL * REALTIME_INTERVAL
+        for spec in querySpec or ():
+            entity = self._entity(spec.entity)
+            if not isinstance(entity, (HostEntity, VirtualMachineEntity)):
+                continue
+            if isinstance(entity, VirtualMachineEntity) and entity.power_state != POWERED_ON:
+                continue
+            interval = spec.intervalId or REALTIME_INTERVAL
+            samples = min(spec.maxSample or REALTIME_SAMPLES, REALTIME_SAMPLES)
+            slots = [now - interval * i for i in range(samples - 1, -1, -1)]
+            metric_ids = spec.metricId or self._QueryAvailablePerfMetric(session, this)
+            series = []
+            for metric_id in metric_ids:
+                if not 1 <= metric_id.counterId <= len(PERF_COUNTERS):
+                    continue
+                instances = [""] if metric_id.instance != "*" else ["", "4000"]
+                for instance in instances:
+                    values = [long(stable_hash(f"{entity.moid}:{metric_id.counterId}:{instance}:{slot}") % 10000)
+                              for slot in slots]
+                    series.append(vim.PerformanceManager.IntSeries(
+                        id=vim.PerformanceManager.MetricId(counterId=metric_id.counterId, instance=instance),
+                        value=values))
+            results.append(vim.PerformanceManager.EntityMetric(
+                entity=entity.ref, value=series,
+                sampleInfo=[vim.PerformanceManager.SampleInfo(
+                    timestamp=datetime.fromtimestamp(slot, timezone.utc), interval=interval) for slot in slots]))
+        return results
+
+    # Guest operations
+
+    def _guest_vm(self, vm) -> VirtualMachineEntity:
+        entity = self._entity(vm)
+        if not isinstance(entity, VirtualMachineEntity):
+            raise vmodl.fault.ManagedObjectNotFound(obj=vm, msg="The virtual machine was not found.")
+        if entity.power_state != POWERED_ON:
+            raise vim.fault.GuestOperationsUnavailable(msg="The guest operations agent could not be contacted.")
+        return entity
+
+    def _StartProgramInGuest(self, session, this, vm=None, auth=None, spec=None, **_):
+        entity = self._guest_vm(vm)
+        pid = next(self._pids)
+        now = datetime.now(timezone.utc)
+        self.processes.setdefault(entity.moid, {})[pid] = vim.vm.guest.ProcessManager.ProcessInfo(
+            name=spec.programPath.rsplit("/", 1)[-1], pid=long(pid), owner=auth.username if auth else "root",
+            cmdLine=f"{spec.programPath} {spec.arguments or ''}".strip(), startTime=now, endTime=now, exitCode=0)
+        return long(pid)
+
+    def _ListProcessesInGuest(self, session, this, vm=None, auth=None, pids=None, **_):
+        processes = self.processes.get(self._guest_vm(vm).moid, {})
+        return [p for pid, p in processes.items() if not pids or pid in pids]
+
+    def _TerminateProcessInGuest(self, session, this, vm=None, auth=None, pid=None, **_):
+        self.processes.get(self._guest_vm(vm).moid, {}).pop(int(pid), None)
+
+    def _InitiateFileTransferToGuest(self, session, this, vm=None, auth=None, guestFilePath=None,
+                                     fileSize=0, **_):
+        entity = self._guest_vm(vm)
+        token = uuid.uuid4().hex
+        self.transfers[token] = (entity.moid, int(fileSize))
+        return f"{self.base_url}/guestFile?id={token}&token={token}"
+
+    def accept_guest_file(self, token: str, size: int) -> bool:
+        """Whether an upload to a guest transfer URL is expected; each URL is used once."""
+        with self.lock:
+            transfer = self.transfers.pop(token, None)
+        return transfer is not None and transfer[1] == size
+
+    # OVF import
+
+    def _CreateImportSpec(self, session, this, ovfDescriptor=None, resourcePool=None, datastore=None,
+                          cisp=None, **_):
+        datastore_entity = self._entity(datastore)
+        name_match = _OVF_NAME.search(ovfDescriptor or "")
+        name = (cisp.entityName if cisp is not None and cisp.entityName else None) or \
+            (name_match.group(1).strip() if name_match else "imported-vm")
+        # Each disk file becomes a disk of the import spec; its device ID links lease URLs to files
+        files, disks = [], []
+        for i, match in enumerate(_OVF_FILE.finditer(ovfDescriptor or "")):
+            href = match.group(1) or match.group(4)
+            files.append(vim.OvfManager.FileItem(deviceId=f"/{name}/VirtualDisk{i}", path=href, create=True,
+                                                 size=long(0)))
+            disks.append(vim.vm.device.VirtualDeviceSpec(
+                operation=vim.vm.device.VirtualDeviceSpec.Operation.add,
+                fileOperation=vim.vm.device.VirtualDeviceSpec.FileOperation.create,
+                device=vim.vm.device.VirtualDisk(key=-(i + 1), capacityInKB=long(10 * 1024 * 1024), backing=vim.vm.device.VirtualDisk.FlatVer2BackingInfo(
+                    fileName="", diskMode="persistent", datastore=datastore_entity.ref))))
+        config = vim.vm.ConfigSpec(name=name, numCPUs=1, memoryMB=1024, deviceChange=disks,
+                                   files=vim.vm.FileInfo(vmPathName=f"[{datastore_entity.name}]"))
+        return vim.OvfManager.CreateImportSpecResult(
+            importSpec=vim.VirtualMachineImportSpec(configSpec=config), fileItem=files)
+
+    def _ImportVApp(self, session, this, spec=None, folder=None, host=None, **_):
+        lease = Entity(vim.HttpNfcLease, self.inventory.new_moid("lease"))
+        config = spec.configSpec
+        folder_entity = self._entity(folder) or self.inventory.vm_folder
+        self._check_name(folder_entity, config.name)
+        disks = [change for change in config.deviceChange or ()
+                 if isinstance(change.device, vim.vm.device.VirtualDisk)]
+        device_urls = [vim.HttpNfcLease.DeviceUrl(key=f"/{config.name}/VirtualDisk{i}",
+                                                  importKey=f"/{config.name}/VirtualDisk{i}",
+                                                  url=f"https://*/nfc/{lease.moid}/disk-{i}.vmdk",
+                                                  sslThumbprint="", disk=True, targetId=f"disk-{i}.vmdk")
+                       for i in range(len(disks))]
+        # vCenter creates the VM when the lease is issued and removes it again if the import is aborted
+        vm = self.inventory.place_vm(config.name, folder_entity, pool=this, host=self._entity(host), journal=True,
+                                     **self._placement(config), **self._vm_fields(config))
+        lease.props.update(
+            state=vim.HttpNfcLease.State.ready, initializeProgress=100, transferProgress=0,
+            info=complete(vim.HttpNfcLease.Info(lease=lease.ref, entity=vm.ref, deviceUrl=device_urls,
+                                                leaseTimeout=300, totalDiskCapacityInKB=long(0))))
+        self.inventory.register(lease)
+        self.leases[lease.moid] = vm
+        return lease.ref
+
+    def _HttpNfcLeaseProgress(self, session, this, percent=0, **_):
+        this.props["transferProgress"] = percent
+
+    def _HttpNfcLeaseComplete(self, session, this, **_):
+        if self.leases.pop(this.moid, None) is None:
+            raise vim.fault.InvalidState(msg="The lease is not ready.")
+        this.props["state"] = vim.HttpNfcLease.State.done
+
+    def _HttpNfcLeaseAbort(self, session, this, **_):
+        vm = self.leases.pop(this.moid, None)
+        if vm is not None and vm.moid in self.inventory.objects:
+            self.inventory.destroy_vm(vm)
+        this.props["state"] = vim.HttpNfcLease.State.error
+
+    def accept_disk(self, lease_moid: str) -> bool:
+        """Whether a disk upload targets an open lease."""
+        with self.lock:
+            return lease_moid in self.leases
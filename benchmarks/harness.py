@@ -0,0 +1,453 @@
+"""Benchmark runner: drives every MCP tool against the simulated vSphere endpoint."""
+
+import asyncio
+import dataclasses
+import json
+import logging
+import math
+import os
+import resource
+import shutil
+import sys
+import tarfile
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import requests
+from mcp.shared.memory import create_connected_server_and_client_session
+
+from esxi_mcp_server import Config, ManagerRegistry, ToolHandlers, create_mcp_server, register_handlers
+
+from .fake_inventory import datastore_name, folder_name, host_name, template_name, vm_name
+from .server import EndpointProcess, start_endpoint
+
+
+# vSphere methods issued by background threads rather than tool calls (inventory cache long poll)
+BACKGROUND_METHODS = {"WaitForUpdatesEx"}
+
+# Size of the file uploaded by the guest and datastore upload tools
+UPLOAD_SIZE = 1024 * 1024
+
+# Size of the disk of the generated OVF/OVA packages
+DISK_SIZE = 4 * 1024 * 1024
+
+_OVF_TEMPLATE = """<?xml version="1.0" encoding="UTF-8"?>
+<Envelope xmlns="http://schemas.dmtf.org/ovf/envelope/1" xmlns:ovf="http://schemas.dmtf.org/ovf/envelope/1">
+  <References><File ovf:href="{disk}" ovf:id="file1" ovf:size="{size}"/></References>
+  <VirtualSystem ovf:id="bench-appliance"><Name>bench-appliance</Name></VirtualSystem>
+</Envelope>
+"""
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of values, None when there are none."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100.0 * len(ordered)) - 1)]
+
+
+def max_rss_bytes() -> int:
+    """Peak resident set size of this process (ru_maxrss is KiB on Linux, bytes on macOS)."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def config_overrides(config: Config, assignments: List[str]) -> Config:
+    """Apply key=value settings to a Config, converting values to the type of the field's default."""
+    names = {f.name for f in dataclasses.fields(Config)}
+    for assignment in assignments:
+        key, _, value = assignment.partition("=")
+        key = key.strip()
+        if key not in names:
+            raise ValueError(f"Unknown configuration item: {key}")
+        current = getattr(config, key)
+        if isinstance(current, bool):
+            converted: Any = value.lower() in ("1", "true", "yes")
+        elif isinstance(current, int):
+            converted = int(value)
+        elif isinstance(current, dict) or value.lstrip().startswith(("[", "{")):
+            converted = json.loads(value)
+        elif isinstance(current, list):
+            converted = [item.strip() for item in value.split(",") if item.strip()]
+        else:
+            converted = value
+        setattr(config, key, converted)
+    return config
+
+
+class ToolCase:
+    """
+    One benchmarked tool call.
+
+    arguments(i) builds the arguments of the i-th call; write cases change
+    the inventory, so every call gets fresh names and no warm-up runs.
+    prepare(i), if given, runs before the i-th call outside the timing and
+    returns extra arguments (e.g. the ID of a job to cancel).
+    """
+
+    __slots__ = ("tool", "arguments", "write", "prepare")
+
+    def __init__(self, tool: str, arguments: Callable[[int], Dict[str, Any]], write: bool = False,
+                 prepare: Optional[Callable[[int], Awaitable[Dict[str, Any]]]] = None):
+        self.tool = tool
+        self.arguments = arguments
+        self.write = write
+        self.prepare = prepare
+
+
+class ToolResult:
+    """Latencies, SOAP round trips, bytes and allocations measured for one tool."""
+
+    def __init__(self, tool: str):
+        self.tool = tool
+        self.latencies: List[float] = []
+        self.errors = 0
+        self.error_sample: Optional[str] = None
+        self.methods: Counter = Counter()
+        self.background = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.response_bytes = 0
+        self.alloc_peak: Optional[int] = None
+
+    def add_traffic(self, delta: Dict[str, Dict[str, float]], include_background: bool):
+        for method, entry in delta.items():
+            if method in BACKGROUND_METHODS and not include_background:
+                self.background += int(entry["calls"])
+                continue
+            self.methods[method] += int(entry["calls"])
+            self.bytes_sent += int(entry["bytes_in"])
+            self.bytes_received += int(entry["bytes_out"])
+
+    def summary(self) -> Dict[str, Any]:
+        calls = len(self.latencies)
+        per_call = max(calls, 1)
+        ms = [latency * 1000.0 for latency in self.latencies]
+        return {
+            "tool": self.tool,
+            "calls": calls,
+            "errors": self.errors,
+            "error": self.error_sample,
+            "p50_ms": percentile(ms, 50),
+            "p99_ms": percentile(ms, 99),
+            "mean_ms": sum(ms) / calls if calls else None,
+            "round_trips": sum(self.methods.values()) / per_call,
+            "methods": {method: count / per_call for method, count in self.methods.most_common()},
+            "background_round_trips": self.background,
+            "request_bytes": self.bytes_sent // per_call,
+            "response_bytes": self.bytes_received // per_call,
+            "result_bytes": self.response_bytes // per_call,
+            "alloc_peak_bytes": self.alloc_peak,
+        }
+
+
+class Benchmark:
+    """
+    Serves a simulated inventory, connects the MCP server to it and calls
+    every registered tool through an in-memory MCP client session.
+
+    Read tools are called iterations times (after warmup untimed calls),
+    write tools write_iterations times. Every tool gets one more call with
+    tracemalloc running, whose peak allocation is reported and whose
+    latency is not. Round trips are the endpoint's request counts between
+    the start and end of each call.
+    """
+
+    def __init__(self, vms: int = 1000, latency_ms: float = 1.0, jitter_ms: float = 0.0, task_ms: float = 50.0,
+                 iterations: int = 20, write_iterations: int = 3, warmup: int = 2, concurrency: int = 1,
+                 in_process: bool = False, tools: Optional[List[str]] = None,
+                 inventory_options: Optional[Dict[str, Any]] = None, overrides: Optional[List[str]] = None):
+        self.vms = vms
+        self.latency = latency_ms / 1000.0
+        self.jitter = jitter_ms / 1000.0
+        self.task_seconds = task_ms / 1000.0
+        self.iterations = iterations
+        self.write_iterations = write_iterations
+        self.warmup = warmup
+        self.concurrency = max(1, concurrency)
+        self.in_process = in_process
+        self.tools = set(tools) if tools else None
+        self.inventory_options = dict(inventory_options or {}, vms=vms)
+        self.overrides = overrides or []
+        self.results: Dict[str, ToolResult] = {}
+        self.report: Dict[str, Any] = {}
+        self._endpoint = None
+        self._http = requests.Session()
+        self._client = None
+        self._workdir = None
+
+    # Endpoint
+
+    def _start_endpoint(self) -> int:
+        if self.in_process:
+            self._endpoint = start_endpoint(self.inventory_options, self.latency, self.jitter, self.task_seconds)
+        else:
+            self._endpoint = EndpointProcess(self.inventory_options, self.latency, self.jitter, self.task_seconds)
+        return self._endpoint.port
+
+    def _stop_endpoint(self):
+        if self._endpoint is None:
+            return
+        if self.in_process:
+            self._endpoint.shutdown()
+            self._endpoint.server_close()
+        else:
+            self._endpoint.stop()
+        self._endpoint = None
+
+    def endpoint_stats(self) -> Dict[str, Dict[str, float]]:
+        """Request counters of the endpoint by vSphere method."""
+        if self.in_process:
+            return self._endpoint.stats.snapshot()
+        resp = self._http.get(f"https://127.0.0.1:{self._endpoint.port}/_bench/stats", verify=False, timeout=30)
+        return resp.json()["methods"]
+
+    @staticmethod
+    def _delta(before: Dict[str, Dict[str, float]], after: Dict[str, Dict[str, float]]):
+        delta = {}
+        for method, entry in after.items():
+            prior = before.get(method)
+            changed = {key: value - (prior[key] if prior else 0) for key, value in entry.items()}
+            if changed["calls"]:
+                delta[method] = changed
+        return delta
+
+    # Inputs
+
+    def _write_inputs(self) -> Dict[str, str]:
+        """Create the local files the upload and deploy tools send."""
+        self._workdir = tempfile.mkdtemp(prefix="esxi-mcp-bench-")
+        paths = {name: os.path.join(self._workdir, name)
+                 for name in ("upload.bin", "disk1.vmdk", "appliance.ovf", "appliance.ova")}
+        with open(paths["upload.bin"], "wb") as f:
+            f.write(os.urandom(UPLOAD_SIZE))
+        with open(paths["disk1.vmdk"], "wb") as f:
+            f.write(os.urandom(DISK_SIZE))
+        with open(paths["appliance.ovf"], "w") as f:
+            f.write(_OVF_TEMPLATE.format(disk="disk1.vmdk", size=DISK_SIZE))
+        with tarfile.open(paths["appliance.ova"], "w") as tar:
+            tar.add(paths["appliance.ovf"], arcname="appliance.ovf")
+            tar.add(paths["disk1.vmdk"], arcname="disk1.vmdk")
+        return paths
+
+    def cases(self, files: Dict[str, str]) -> List[ToolCase]:
+        """All tool calls, in an order where each write finds the objects it needs."""
+        vm = vm_name(1, self.vms)
+        snapshot_vm = vm_name(2, self.vms)
+        host = host_name(0)
+        creds = {"username": "bench", "password": "bench"}
+        writes = self.write_iterations + 1
+        return [
+            ToolCase("list_vms", lambda i: {}),
+            ToolCase("get_vm_details", lambda i: {"vm_name": vm}),
+            ToolCase("get_vm_performance", lambda i: {"vm_name": vm}),
+            ToolCase("get_vm_summary_stats", lambda i: {"vm_name": vm}),
+            ToolCase("list_templates", lambda i: {}),
+            ToolCase("list_datastores", lambda i: {}),
+            ToolCase("list_datastore_clusters", lambda i: {}),
+            ToolCase("list_networks", lambda i: {}),
+            ToolCase("list_hosts", lambda i: {}),
+            ToolCase("get_host_details", lambda i: {"host_name": host}),
+            ToolCase("get_host_performance_metrics", lambda i: {"host_name": host}),
+            ToolCase("get_host_hardware_health", lambda i: {"host_name": host}),
+            ToolCase("get_host_performance", lambda i: {"host_name": host}),
+            ToolCase("list_performance_counters", lambda i: {}),
+            ToolCase("get_performance_bulk", lambda i: {
+                "entity_type": "vm", "container": folder_name(0),
+                "counters": ["cpu.usage.average", "mem.usage.average"]}),
+            ToolCase("get_metric_history", lambda i: {"entity_type": "vm", "name": vm}),
+            ToolCase("wait_for_updates", lambda i: {
+                "object_type": "HostSystem", "properties": ["runtime.powerState"], "max_wait_seconds": 1}),
+            ToolCase("create_vm", lambda i: {"name": f"bench-new-{i}", "cpu": 1, "memory": 512}, write=True),
+            ToolCase("create_vm_custom", lambda i: {
+                "name": f"bench-custom-{i}", "cpu": 2, "memory": 2048, "disk_size_gb": 16}, write=True),
+            ToolCase("clone_vm", lambda i: {"template_name": template_name(0), "new_name": f"bench-clone-{i}"},
+                     write=True),
+            ToolCase("power_on_vm", lambda i: {"name": f"bench-clone-{i}"}, write=True),
+            ToolCase("power_off_vm", lambda i: {"name": f"bench-clone-{i}"}, write=True),
+            ToolCase("bulk_power_on", lambda i: {"pattern": "bench-clone-*"}, write=True),
+            ToolCase("bulk_create_snapshot", lambda i: {"snapshot_name": f"bulk-{i}", "pattern": "bench-clone-*"},
+                     write=True),
+            ToolCase("bulk_power_off", lambda i: {"pattern": "bench-clone-*"}, write=True),
+            ToolCase("create_snapshot", lambda i: {"vm_name": snapshot_vm, "snapshot_name": f"snap-{i}"},
+                     write=True),
+            ToolCase("list_snapshots", lambda i: {"vm_name": snapshot_vm}),
+            ToolCase("revert_snapshot", lambda i: {"vm_name": snapshot_vm, "snapshot_name": f"snap-{i}"},
+                     write=True),
+            # Newest first, so every snapshot still exists when its turn comes
+            ToolCase("remove_snapshot", lambda i: {"vm_name": snapshot_vm,
+                                                   "snapshot_name": f"snap-{writes - 1 - i}"}, write=True),
+            ToolCase("remove_all_snapshots", lambda i: {"vm_name": f"bench-clone-{i}"}, write=True),
+            ToolCase("execute_program_in_vm", lambda i: dict(creds, vm_name=vm, program_path="/usr/bin/true"),
+                     write=True),
+            ToolCase("upload_file_to_vm", lambda i: dict(creds, vm_name=vm, local_file_path=files["upload.bin"],
+                                                         remote_file_path=f"/tmp/bench-{i}.bin"), write=True),
+            ToolCase("upload_file_to_datastore", lambda i: {
+                "datastore_name": datastore_name(0), "local_file_path": files["upload.bin"],
+                "remote_file_path": f"bench/upload-{i}.bin"}, write=True),
+            ToolCase("deploy_ovf", lambda i: {"ovf_path": files["appliance.ovf"], "vmdk_path": files["disk1.vmdk"],
+                                              "vm_name": f"bench-ovf-{i}"}, write=True),
+            ToolCase("deploy_ova", lambda i: {"ova_path": files["appliance.ova"], "vm_name": f"bench-ova-{i}"},
+                     write=True),
+            ToolCase("list_jobs", lambda i: {}),
+            ToolCase("get_job", lambda i: {}, prepare=self._finished_job),
+            ToolCase("cancel_job", lambda i: {}, write=True, prepare=self._running_job),
+            ToolCase("delete_vm", lambda i: {"name": f"bench-new-{i}"}, write=True),
+            # Everything the write cases created for call i (bench-clone-i, bench-ovf-i, ...)
+            ToolCase("bulk_delete", lambda i: {"pattern": f"bench-*-{i}"}, write=True),
+        ]
+
+    async def _finished_job(self, i: int) -> Dict[str, Any]:
+        jobs = await self._call_json("list_jobs", {})
+        return {"job_id": jobs[0]["job_id"]}
+
+    async def _running_job(self, i: int) -> Dict[str, Any]:
+        job = await self._call_json("clone_vm", {"template_name": template_name(0), "new_name": f"bench-job-{i}",
+                                                 "run_async": True})
+        return {"job_id": job["job_id"]}
+
+    async def _call_json(self, tool: str, arguments: Dict[str, Any]):
+        result = await self._client.call_tool(tool, arguments)
+        text = result.content[0].text if result.content else ""
+        if result.isError:
+            raise Exception(f"{tool} failed during setup: {text}")
+        return json.loads(text)
+
+    # Measurement
+
+    async def _arguments(self, case: ToolCase, i: int) -> Dict[str, Any]:
+        arguments = case.arguments(i)
+        if case.prepare is not None:
+            arguments.update(await case.prepare(i))
+        return arguments
+
+    async def _timed_call(self, tool: str, arguments: Dict[str, Any]):
+        started = time.perf_counter()
+        response = await self._client.call_tool(tool, arguments)
+        elapsed = time.perf_counter() - started
+        text = "".join(getattr(item, "text", "") for item in response.content)
+        return elapsed, response.isError, text
+
+    async def _measure(self, case: ToolCase) -> ToolResult:
+        result = ToolResult(case.tool)
+        include_background = case.tool == "wait_for_updates"
+        if case.write:
+            rounds, width, warmup = self.write_iterations, 1, 0
+        else:
+            rounds, width, warmup = self.iterations, self.concurrency, self.warmup
+        for i in range(warmup):
+            await self._timed_call(case.tool, await self._arguments(case, i))
+        for round_index in range(rounds):
+            arguments = [await self._arguments(case, round_index * width + n) for n in range(width)]
+            before = await asyncio.to_thread(self.endpoint_stats)
+            outcomes = await asyncio.gather(*(self._timed_call(case.tool, args) for args in arguments))
+            after = await asyncio.to_thread(self.endpoint_stats)
+            result.add_traffic(self._delta(before, after), include_background)
+            for elapsed, failed, text in outcomes:
+                result.latencies.append(elapsed)
+                result.response_bytes += len(text)
+                if failed:
+                    result.errors += 1
+                    result.error_sample = result.error_sample or text[:200]
+        # One more call, traced, for the allocation peak
+        arguments = await self._arguments(case, rounds * width)
+        tracemalloc.start()
+        try:
+            baseline = tracemalloc.get_traced_memory()[0]
+            await self._timed_call(case.tool, arguments)
+            result.alloc_peak = tracemalloc.get_traced_memory()[1] - baseline
+        finally:
+            tracemalloc.stop()
+        return result
+
+    async def _run_cases(self, mcp_server):
+        async with create_connected_server_and_client_session(
+                mcp_server, read_timeout_seconds=timedelta(seconds=600)) as client:
+            self._client = client
+            registered = {tool.name for tool in (await client.list_tools()).tools}
+            cases = self.cases(self._write_inputs())
+            covered = {case.tool for case in cases}
+            self.report["uncovered_tools"] = sorted(registered - covered)
+            for case in cases:
+                if case.tool not in registered or (self.tools is not None and case.tool not in self.tools):
+                    continue
+                logging.info(f"Benchmarking {case.tool}")
+                self.results[case.tool] = await self._measure(case)
+            self._client = None
+
+    def run(self) -> Dict[str, Any]:
+        """Run the benchmark and return the report."""
+        requests.packages.urllib3.disable_warnings()
+        started = time.perf_counter()
+        port = self._start_endpoint()
+        self.report["endpoint_start_seconds"] = time.perf_counter() - started
+        managers = None
+        try:
+            config = Config(vcenter_host=f"127.0.0.1:{port}", vcenter_user="bench", vcenter_password="bench",
+                            insecure=True, keepalive_interval=0, stats_collector=True,
+                            stats_vms=[vm_name(1, self.vms)], stats_hosts=[host_name(0)], stats_interval=3600,
+                            log_level="WARNING")
+            config = config_overrides(config, self.overrides)
+            rss_before = max_rss_bytes()
+            started = time.perf_counter()
+            managers = ManagerRegistry.from_config(config)
+            self.report["connect_seconds"] = time.perf_counter() - started
+            self.report["connect_rss_growth_bytes"] = max_rss_bytes() - rss_before
+            connect_stats = self.endpoint_stats()
+            self.report["connect_round_trips"] = {method: int(entry["calls"])
+                                                  for method, entry in connect_stats.items()}
+            mcp_server = create_mcp_server()
+            register_handlers(mcp_server, ToolHandlers(managers, config))
+            asyncio.run(self._run_cases(mcp_server))
+        finally:
+            if managers is not None:
+                managers.close()
+            self._stop_endpoint()
+            if self._workdir:
+                shutil.rmtree(self._workdir, ignore_errors=True)
+        self.report.update({
+            "vms": self.vms,
+            "latency_ms": self.latency * 1000.0,
+            "jitter_ms": self.jitter * 1000.0,
+            "task_ms": self.task_seconds * 1000.0,
+            "concurrency": self.concurrency,
+            "max_rss_bytes": max_rss_bytes(),
+            "tools": [result.summary() for result in self.results.values()],
+        })
+        return self.report
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Render a report as a text table."""
+    def number(value, digits=1):
+        return "-" if value is None else f"{value:.{digits}f}"
+
+    lines = [
+        f"inventory: {report['vms']} VMs; latency {report['latency_ms']:.1f} ms (+{report['jitter_ms']:.1f} jitter); "
+        f"tasks {report['task_ms']:.0f} ms; concurrency {report['concurrency']}",
+        f"connect: {report['connect_seconds']:.2f} s, {sum(report['connect_round_trips'].values())} round trips, "
+        f"RSS +{report['connect_rss_growth_bytes'] / 1048576:.1f} MiB; peak RSS "
+        f"{report['max_rss_bytes'] / 1048576:.1f} MiB",
+        "",
+        f"{'tool':<30} {'calls':>5} {'err':>4} {'p50 ms':>9} {'p99 ms':>9} {'trips':>7} {'req kB':>7} "
+        f"{'resp kB':>8} {'alloc kB':>9}  top methods",
+    ]
+    for tool in report["tools"]:
+        methods = ", ".join(f"{method} {count:.3g}" for method, count in list(tool["methods"].items())[:3])
+        alloc = tool["alloc_peak_bytes"]
+        lines.append(
+            f"{tool['tool']:<30} {tool['calls']:>5} {tool['errors']:>4} {number(tool['p50_ms']):>9} "
+            f"{number(tool['p99_ms']):>9} {tool['round_trips']:>7.1f} {tool['request_bytes'] / 1024:>7.1f} "
+            f"{tool['response_bytes'] / 1024:>8.1f} {number(alloc / 1024 if alloc is not None else None, 0):>9}  "
+            f"{methods}")
+    for tool in report["tools"]:
+        if tool["errors"]:
+            lines.append(f"! {tool['tool']}: {tool['error']}")
+    if report.get("uncovered_tools"):
+        lines.append(f"! tools without a benchmark case: {', '.join(report['uncovered_tools'])}")
+    return "\n".join(lines)
@@ -0,0 +1,266 @@
+"""HTTPS front end of the simulated vSphere endpoint."""
+
+import json
+import logging
+import multiprocessing
+import os
+import random
+import shutil
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+from .fake_inventory import Inventory
+from .fake_vcenter import FakeVCenter
+from .soap import SERVICE_VERSIONS_XML, parse_request
+
+
+class EndpointStats:
+    """Request counts, bytes and handling time per vSphere method or HTTP transfer endpoint."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._methods: Dict[str, Dict[str, float]] = {}
+
+    def record(self, method: str, bytes_in: int, bytes_out: int, seconds: float, fault: bool = False):
+        with self._lock:
+            entry = self._methods.get(method)
+            if entry is None:
+                entry = self._methods[method] = {"calls": 0, "faults": 0, "bytes_in": 0, "bytes_out": 0,
+                                                 "seconds": 0.0}
+            entry["calls"] += 1
+            entry["faults"] += int(fault)
+            entry["bytes_in"] += bytes_in
+            entry["bytes_out"] += bytes_out
+            entry["seconds"] += seconds
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {method: dict(entry) for method, entry in self._methods.items()}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Serves SOAP calls on /sdk and the HTTP file transfer endpoints vSphere clients use."""
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; without TCP_NODELAY delayed ACKs stall every response
+    disable_nagle_algorithm = True
+    server: "EndpointServer"
+
+    def log_message(self, format, *args):
+        logging.debug("%s - %s", self.address_string(), format % args)
+
+    def _read_body(self) -> bytes:
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            parts = []
+            while True:
+                size = int(self.rfile.readline().split(b";", 1)[0].strip() or b"0", 16)
+                if size == 0:
+                    # Trailer section ends with an empty line
+                    while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+                        pass
+                    return b"".join(parts)
+                parts.append(self.rfile.read(size))
+                self.rfile.readline()
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send(self, status: int, body: bytes, content_type: str = "text/xml; charset=utf-8",
+              headers: Optional[Dict[str, str]] = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _delay(self):
+        delay = self.server.latency
+        if delay > 0:
+            time.sleep(delay + random.uniform(0, self.server.jitter))
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/sdk/vimServiceVersions.xml":
+            self._send(200, SERVICE_VERSIONS_XML.encode())
+        elif path == "/_bench/stats":
+            stats = {"methods": self.server.stats.snapshot(), "objects": len(self.server.vcenter.inventory.objects),
+                     "sessions": len(self.server.vcenter.sessions)}
+            self._send(200, json.dumps(stats).encode(), "application/json")
+        else:
+            self._send(404, b"Not found", "text/plain")
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        body = self._read_body()
+        self._delay()
+        started = time.perf_counter()
+        if url.path.startswith("/sdk"):
+            vcenter = self.server.vcenter
+            try:
+                request = parse_request(body)
+            except Exception as e:
+                self._send(500, f"Malformed SOAP request: {e}".encode(), "text/plain")
+                return
+            payload, set_cookie, fault = vcenter.handle(request, self.headers.get("Cookie"))
+            self._send(500 if fault else 200, payload, headers={"Set-Cookie": set_cookie} if set_cookie else None)
+            self.server.stats.record(request.method, len(body), len(payload), time.perf_counter() - started, fault)
+        elif url.path.startswith("/nfc/"):
+            lease = url.path.split("/")[2]
+            accepted = self.server.vcenter.accept_disk(lease)
+            self._send(200 if accepted else 404, b"" if accepted else b"Unknown lease", "text/plain")
+            self.server.stats.record("POST /nfc", len(body), 0, time.perf_counter() - started, not accepted)
+        else:
+            self._send(404, b"Not found", "text/plain")
+
+    def do_PUT(self):
+        url = urlparse(self.path)
+        body = self._read_body()
+        self._delay()
+        started = time.perf_counter()
+        if url.path == "/guestFile":
+            token = parse_qs(url.query).get("id", [""])[0]
+            accepted = self.server.vcenter.accept_guest_file(token, len(body))
+            self._send(200 if accepted else 404, b"", "text/plain")
+            self.server.stats.record("PUT /guestFile", len(body), 0, time.perf_counter() - started, not accepted)
+        elif url.path.startswith("/folder/"):
+            accepted = self.server.vcenter.session_for(self.headers.get("Cookie")) is not None
+            self._send(201 if accepted else 401, b"", "text/plain")
+            self.server.stats.record("PUT /folder", len(body), 0, time.perf_counter() - started, not accepted)
+        else:
+            self._send(404, b"Not found", "text/plain")
+
+
+class EndpointServer(ThreadingHTTPServer):
+    """Threaded HTTPS server around a FakeVCenter, with injected per-request latency."""
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, vcenter: FakeVCenter, host: str = "127.0.0.1", port: int = 0,
+                 latency: float = 0.0, jitter: float = 0.0, certfile: Optional[str] = None,
+                 keyfile: Optional[str] = None):
+        ThreadingHTTPServer.__init__(self, (host, port), _Handler)
+        self.vcenter = vcenter
+        self.latency = latency
+        self.jitter = jitter
+        self.stats = EndpointStats()
+        self._cert_dir = None
+        if certfile is None:
+            self._cert_dir = tempfile.mkdtemp(prefix="fake-vcenter-")
+            certfile, keyfile = self_signed_certificate(self._cert_dir)
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(certfile, keyfile)
+        self.socket = context.wrap_socket(self.socket, server_side=True, do_handshake_on_connect=False)
+        vcenter.base_url = f"https://{host}:{self.port}"
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def serve_in_background(self) -> threading.Thread:
+        thread = threading.Thread(target=self.serve_forever, name="fake-vcenter-http", daemon=True)
+        thread.start()
+        return thread
+
+    def server_close(self):
+        ThreadingHTTPServer.server_close(self)
+        self.vcenter.close()
+        if self._cert_dir:
+            shutil.rmtree(self._cert_dir, ignore_errors=True)
+
+
+def self_signed_certificate(directory: str):
+    """
+    Write a self-signed certificate for 127.0.0.1 and return (certfile, keyfile).
+
+    Uses the cryptography package when it is installed and the openssl
+    command otherwise.
+    """
+    certfile = os.path.join(directory, "cert.pem")
+    keyfile = os.path.join(directory, "key.pem")
+    try:
+        from cryptography import x509
+        from cryptography.hazmat.primitives import hashes, serialization
+        from cryptography.hazmat.primitives.asymmetric import ec
+        from cryptography.x509.oid import NameOID
+    except ImportError:
+        subprocess.run(["openssl", "req", "-x509", "-newkey", "ec", "-pkeyopt", "ec_paramgen_curve:prime256v1",
+                        "-nodes", "-days", "1", "-subj", "/CN=127.0.0.1", "-keyout", keyfile, "-out", certfile],
+                       check=True, capture_output=True)
+        return certfile, keyfile
+    import datetime
+    import ipaddress
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "127.0.0.1")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(key.public_key())
+            .serial_number(x509.random_serial_number()).not_valid_before(now - datetime.timedelta(minutes=5))
+            .not_valid_after(now + datetime.timedelta(days=1))
+            .add_extension(x509.SubjectAlternativeName([x509.IPAddress(ipaddress.ip_address("127.0.0.1"))]),
+                           critical=False)
+            .sign(key, hashes.SHA256()))
+    with open(keyfile, "wb") as f:
+        f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                  serialization.NoEncryption()))
+    with open(certfile, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    return certfile, keyfile
+
+
+def start_endpoint(inventory_options: Dict[str, Any], latency: float = 0.0, jitter: float = 0.0,
+                   task_seconds: float = 0.05, user: str = "bench", password: str = "bench") -> EndpointServer:
+    """Build an inventory and serve it from a background thread of this process."""
+    vcenter = FakeVCenter(Inventory(**inventory_options), task_seconds=task_seconds, user=user, password=password)
+    server = EndpointServer(vcenter, latency=latency, jitter=jitter)
+    server.serve_in_background()
+    return server
+
+
+def _serve(conn, inventory_options, latency, jitter, task_seconds, user, password):
+    server = start_endpoint(inventory_options, latency, jitter, task_seconds, user, password)
+    conn.send(server.port)
+    # Serve until the parent asks to stop or goes away
+    try:
+        conn.recv()
+    except EOFError:
+        pass
+    server.shutdown()
+    server.server_close()
+
+
+class EndpointProcess:
+    """
+    The simulated endpoint running in a child process.
+
+    Keeping it out of the benchmarked process means its CPU time does not
+    compete with the MCP server's for the GIL, as with a real vCenter.
+    """
+
+    def __init__(self, inventory_options: Dict[str, Any], latency: float = 0.0, jitter: float = 0.0,
+                 task_seconds: float = 0.05, user: str = "bench", password: str = "bench"):
+        context = multiprocessing.get_context("spawn")
+        self._conn, child_conn = context.Pipe()
+        self._process = context.Process(target=_serve, name="fake-vcenter", daemon=True,
+                                        args=(child_conn, inventory_options, latency, jitter, task_seconds,
+                                              user, password))
+        self._process.start()
+        if not self._conn.poll(600):
+            self._process.kill()
+            raise Exception("Simulated vCenter did not start")
+        self.port = self._conn.recv()
+
+    def stop(self):
+        try:
+            self._conn.send("stop")
+        except (BrokenPipeError, OSError):
+            pass
+        self._process.join(timeout=10)
+        if self._process.is_alive():
+            self._process.kill()
@@ -0,0 +1,200 @@
+"""SOAP request decoding and response encoding for the simulated vSphere endpoint."""
+
+from datetime import datetime
+from xml.parsers.expat import ParserCreate
+from xml.sax.saxutils import escape
+
+from pyVmomi import VmomiSupport, SoapAdapter
+from pyVmomi.VmomiSupport import (GetWsdlMethod, GetWsdlName, GetWsdlNamespace, ManagedObject,
+                                  Enum, Object, long)
+
+
+# Internal name of the API version the endpoint speaks: the newest one of the installed pyVmomi
+VERSION = VmomiSupport.GetServiceVersions("vim25")[0]
+
+# SOAPAction / version string clients announce, e.g. "9.1.1.0"
+VERSION_ID = VmomiSupport.versionIdMap[VERSION]
+
+# XML namespace of the vim25 API
+VIM_NS = GetWsdlNamespace(VERSION)
+
+# Namespace -> prefix map of the envelope, with vim25 as default namespace
+NS_MAP = dict(SoapAdapter.SOAP_NSMAP, **{VIM_NS: ""})
+
+# Answer to GET /sdk/vimServiceVersions.xml, which pyVmomi uses to negotiate the version
+SERVICE_VERSIONS_XML = (
+    '<?xml version="1.0" encoding="UTF-8" ?>\n'
+    '<namespaces version="1.0"><namespace><name>urn:vim25</name>'
+    f'<version>{VERSION_ID}</version><priorVersions>'
+    + "".join(f"<version>{v}</version>" for v in ("8.0.3.0", "8.0.2.0", "8.0.1.0", "8.0.0.0", "7.0.3.0"))
+    + "</priorVersions></namespace></namespaces>\n"
+)
+
+# Separator between namespace and local name in expat tags (same as pyVmomi)
+_NS_SEP = " "
+
+_ENVELOPE_START = "".join([SoapAdapter.XML_HEADER, "\n", SoapAdapter.SOAP_ENVELOPE_START,
+                           SoapAdapter.SOAP_BODY_START])
+_ENVELOPE_END = SoapAdapter.SOAP_BODY_END + SoapAdapter.SOAP_ENVELOPE_END
+
+# Signature of the property accessor call pyVmomi sends for every property read
+FETCH_INFO = Object(name="fetch", wsdlName="Fetch", version=VERSION, result=object,
+                    params=(Object(name="prop", type=str, version=VERSION, flags=0),))
+
+# xsi:type of plain Python values inside anyType fields
+_PRIMITIVE_TYPES = {str: "xsd:string", int: "xsd:int", long: "xsd:long", float: "xsd:float"}
+
+
+class SoapRequest:
+    """A decoded SOAP call: method info, the object it was invoked on and its arguments by name."""
+
+    __slots__ = ("info", "this", "args")
+
+    def __init__(self, info, this, args):
+        self.info = info
+        self.this = this
+        self.args = args
+
+    @property
+    def method(self) -> str:
+        return self.info.wsdlName
+
+
+class _RequestParser(SoapAdapter.ExpatDeserializerNSHandlers):
+    """
+    Expat handler that finds the method element of a request body and hands
+    each of its children to a pyVmomi SoapDeserializer typed by the method's
+    parameter list. Array parameters arrive as repeated elements; each item
+    gets its own deserializer and is appended to the argument.
+    """
+
+    def __init__(self):
+        SoapAdapter.ExpatDeserializerNSHandlers.__init__(self)
+        self.parser = ParserCreate(namespace_separator=_NS_SEP)
+        self.parser.buffer_text = True
+        self.info = None
+        self.params = {}
+        self.this = None
+        self.args = {}
+        self._depth = 0
+        self._pending = None   # (name, deserializer, is_array)
+
+    def parse(self, body: bytes) -> SoapRequest:
+        SoapAdapter.SetHandlers(self.parser, SoapAdapter.GetHandlers(self))
+        self.parser.Parse(body, True)
+        self._harvest()
+        if self.info is None:
+            raise ValueError("SOAP body holds no method call")
+        return SoapRequest(self.info, self.this, self.args)
+
+    def _harvest(self):
+        if self._pending is None:
+            return
+        name, deserializer, is_array = self._pending
+        self._pending = None
+        value = deserializer.GetResult()
+        if name == "_this":
+            self.this = value
+        elif is_array:
+            self.args[name].append(value)
+        else:
+            self.args[name] = value
+
+    def StartElementHandler(self, tag, attr):
+        self._harvest()
+        self._depth += 1
+        ns, name = tag.split(_NS_SEP, 1) if _NS_SEP in tag else ("", tag)
+        if self.info is None:
+            if self._depth == 3:
+                # Envelope > Body > method
+                self.info = FETCH_INFO if name == "Fetch" else GetWsdlMethod(ns, name).info
+                self.params = {p.name: p for p in self.info.params}
+                self.args = {p.name: (p.type() if issubclass(p.type, list) else None) for p in self.info.params}
+            return
+        if name == "_this":
+            param_type, is_array = ManagedObject, False
+        else:
+            param = self.params[name]
+            is_array = issubclass(param.type, list)
+            param_type = param.type.Item if is_array else param.type
+        deserializer = SoapAdapter.SoapDeserializer(version=VERSION)
+        deserializer.Deserialize(self.parser, param_type, False, self.nsMap)
+        self._pending = (name, deserializer, is_array)
+        # The deserializer only sees elements after this one; replay the start tag to it
+        deserializer.StartElementHandler(tag, attr)
+        # It restores our handlers once the element closes, without calling our end handler
+        self._depth -= 1
+
+    def EndElementHandler(self, tag):
+        self._depth -= 1
+
+    def CharacterDataHandler(self, data):
+        pass
+
+
+def parse_request(body: bytes) -> SoapRequest:
+    """Decode the method call of a SOAP request body."""
+    return _RequestParser().parse(body)
+
+
+def _serialize(value, name: str, value_type) -> str:
+    return SoapAdapter.SerializeToStr(value, Object(name=name, type=value_type, version=VERSION, flags=0),
+                                      VERSION, NS_MAP)
+
+
+def any_xml(name: str, value) -> str:
+    """
+    Serialize a value into an anyType element (e.g. a property value).
+
+    Strings, numbers, booleans, enums and object references are written
+    directly, which is what nearly all property values are; everything else
+    goes through pyVmomi's serializer.
+    """
+    value_type = type(value)
+    xsd = _PRIMITIVE_TYPES.get(value_type)
+    if xsd is not None:
+        return f'<{name} xsi:type="{xsd}">{escape(value) if value_type is str else value}</{name}>'
+    if value_type is bool:
+        return f'<{name} xsi:type="xsd:boolean">{"true" if value else "false"}</{name}>'
+    if isinstance(value, ManagedObject):
+        return f'<{name} xsi:type="ManagedObjectReference" type="{GetWsdlName(value_type)}">{value._moId}</{name}>'
+    if isinstance(value, Enum):
+        return f'<{name} xsi:type="{GetWsdlName(value_type)}">{value}</{name}>'
+    return _serialize(value, name, object)
+
+
+def mo_xml(name: str, obj) -> str:
+    """Serialize a managed object reference element."""
+    return f'<{name} type="{GetWsdlName(type(obj))}">{obj._moId}</{name}>'
+
+
+def response(method: str, body: str) -> bytes:
+    """Wrap serialized return values into the response envelope of a method."""
+    return "".join([_ENVELOPE_START, f'<{method}Response xmlns="{VIM_NS}">', body,
+                    f"</{method}Response>", _ENVELOPE_END]).encode("utf-8")
+
+
+def result_response(info, value) -> bytes:
+    """Serialize the return value of a method call, typed by its signature."""
+    if value is None or (isinstance(value, list) and not value):
+        return response(info.wsdlName, "")
+    return response(info.wsdlName, _serialize(value, "returnval", info.result))
+
+
+def fault_response(fault) -> bytes:
+    """Serialize a vmodl fault into a SOAP fault envelope."""
+    name = GetWsdlName(type(fault))
+    detail = SoapAdapter.SerializeFaultDetail(
+        fault, Object(name=f"{name}Fault", type=object, version=VERSION, flags=0), VERSION, NS_MAP)
+    # The fault detail element must declare the vim25 namespace itself
+    detail = detail.replace(f"<{name}Fault ", f'<{name}Fault xmlns="{VIM_NS}" ', 1)
+    message = escape(fault.msg or name)
+    return "".join([
+        _ENVELOPE_START, "<soapenv:Fault><faultcode>ServerFaultCode</faultcode>",
+        f"<faultstring>{message}</faultstring><detail>{detail}</detail></soapenv:Fault>", _ENVELOPE_END,
+    ]).encode("utf-8")
+
+
+def iso_time(value: datetime) -> str:
+    """Format a timestamp the way the vSphere API does."""
+    return value.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
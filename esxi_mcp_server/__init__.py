@@ -13,6 +13,9 @@ def __getattr__(name):
     elif name == "VMwareManager":
         from .vmware_manager import VMwareManager
         return VMwareManager
+    elif name == "ManagerRegistry":
+        from .federation import ManagerRegistry
+        return ManagerRegistry
     elif name == "ToolHandlers":
         from .tools import ToolHandlers
         return ToolHandlers
@@ -28,6 +31,7 @@ __all__ = [
     "Config",
     "load_config",
     "VMwareManager",
+    "ManagerRegistry",
     "ToolHandlers",
     "create_mcp_server",
     "register_handlers",
@@ -4,25 +4,26 @@ import os
 import argparse
 import logging
 import anyio
-import uvicorn
 
 from mcp.server import stdio
 
-from . import load_config, VMwareManager, ToolHandlers, create_mcp_server, register_handlers
-from .transport import create_asgi_app
+from . import load_config
+from .config import setup_logging
+from .mcp_server import ServerResources
+from .transport import serve_http
 
 
-def setup_logging(config):
-    """Configure logging based on configuration."""
-    log_level = getattr(logging, config.log_level.upper(), logging.INFO)
-    logging.basicConfig(
-        level=log_level,
-        format="%(asctime)s [%(levelname)s] %(message)s",
-        filename=config.log_file if config.log_file else None
-    )
-    if not config.log_file:
-        # If no log file is specified, output logs to the console
-        logging.getLogger().addHandler(logging.StreamHandler())
+# Command-line options overriding the HTTP server settings of the configuration
+HTTP_OPTIONS = {
+    "host": "http_host",
+    "port": "http_port",
+    "workers": "workers",
+    "loop": "http_loop",
+    "http": "http_protocol",
+    "keep_alive": "http_keep_alive",
+    "backlog": "http_backlog",
+    "drain_timeout": "drain_timeout",
+}
 
 
 def main():
@@ -32,48 +33,59 @@ def main():
     parser.add_argument("--config", "-c", help="Configuration file path (JSON or YAML)", default=None)
     parser.add_argument("--transport", "-t", choices=["stdio", "http"], default="http",
                         help="Transport mode: 'stdio' for stdin/stdout communication (default: http)")
+    parser.add_argument("--host", help="Address to listen on (default: 0.0.0.0)")
+    parser.add_argument("--port", type=int, help="Port to listen on (default: 8080)")
+    parser.add_argument("--workers", type=int, help="Worker processes sharing the port (default: 1)")
+    parser.add_argument("--loop", choices=["auto", "asyncio", "uvloop"],
+                        help="Event loop; auto uses uvloop when installed (default: auto)")
+    parser.add_argument("--http", choices=["auto", "h11", "httptools"],
+                        help="HTTP parser; auto uses httptools when installed (default: auto)")
+    parser.add_argument("--keep-alive", type=int, help="Seconds an idle keep-alive connection stays open (default: 5)")
+    parser.add_argument("--backlog", type=int, help="Pending connections queued by the listening socket (default: 2048)")
+    parser.add_argument("--drain-timeout", type=int,
+                        help="Seconds shutdown waits for running vSphere tasks and jobs (default: 300)")
     args = parser.parse_args()
     
     # Load configuration
     config_path = args.config or os.environ.get("MCP_CONFIG_FILE")
     config = load_config(config_path)
+    for option, key in HTTP_OPTIONS.items():
+        value = getattr(args, option)
+        if value is not None:
+            setattr(config, key, value)
     
     # Initialize logging
     setup_logging(config)
     
     logging.info("Starting VMware ESXi Management MCP Server...")
     
-    # Create VMware Manager instance and connect
-    manager = VMwareManager(config)
-    
     # If an API key is configured, prompt that authentication is required before invoking sensitive operations
     if config.api_key:
         logging.info("API key authentication is enabled. Clients must call the authenticate tool to verify the key before invoking sensitive operations")
     
-    # Create tool handlers and MCP server
-    tool_handlers = ToolHandlers(manager, config)
-    mcp_server = create_mcp_server()
-    register_handlers(mcp_server, tool_handlers)
-    
     # Start MCP server with the selected transport
     if args.transport == "stdio":
         # Run with stdio transport (stdin/stdout communication)
         logging.info("Starting MCP server with stdio transport")
+        resources = ServerResources(config)
         
         async def run_stdio():
             async with stdio.stdio_server() as (read_stream, write_stream):
-                init_opts = mcp_server.create_initialization_options()
-                await mcp_server.run(read_stream, write_stream, init_opts)
+                init_opts = resources.mcp_server.create_initialization_options()
+                await resources.mcp_server.run(read_stream, write_stream, init_opts)
         
-        anyio.run(run_stdio)
+        try:
+            anyio.run(run_stdio)
+        finally:
+            resources.close()
     else:
-        # Run with HTTP transport (default)
-        logging.info("Starting MCP server with HTTP transport on 0.0.0.0:8080")
-        
-        # Create ASGI app
-        import asyncio
-        app = asyncio.run(create_asgi_app(mcp_server, config))
-        uvicorn.run(app, host="0.0.0.0", port=8080)
+        # Run with HTTP transport (default); vCenter is connected inside each worker's event loop
+        if config.workers > 1 and not config.http_stateless:
+            logging.warning("MCP sessions live in the worker that opened them; route clients by MCP-Session-Id "
+                            "or enable http_stateless when running several workers")
+        logging.info(f"Starting MCP server with HTTP transport on {config.http_host}:{config.http_port} "
+                     f"({config.workers} worker{'s' if config.workers > 1 else ''})")
+        serve_http(config, ServerResources)
 
 
 if __name__ == "__main__":
@@ -2,8 +2,9 @@
 
 import os
 import json
-from dataclasses import dataclass
-from typing import Optional
+import logging
+from dataclasses import dataclass, field
+from typing import Optional, Dict, List, Any
 
 
 @dataclass
@@ -20,6 +21,53 @@ class Config:
     api_key: Optional[str] = None      # API access key for authentication
     log_file: Optional[str] = None     # Log file path (if not specified, output to console)
     log_level: str = "INFO"            # Log level
+    inventory_cache: bool = True       # Keep an in-memory VM/host index updated via PropertyCollector
+    task_timeout: int = 3600           # Maximum seconds to wait for a vSphere task to finish
+    read_pool_size: int = 16           # Worker threads for read-only and job status tools
+    write_pool_size: int = 8           # Worker threads for mutating and long-running tools
+    pool_queue_depth: int = 32         # Calls allowed to wait for a worker before tools report busy
+    tool_concurrency: Dict[str, int] = field(default_factory=dict)  # Per-tool concurrent call limits
+    session_pool_size: int = 4         # Extra vCenter sessions for concurrent tool calls (0 = share one session)
+    session_idle_timeout: int = 300    # Seconds before an idle pooled session is logged out
+    keepalive_interval: int = 300      # Seconds between background session keepalives (0 = disabled)
+    stats_collector: bool = False      # Sample performance counters in the background for get_metric_history
+    stats_vms: List[str] = field(default_factory=list)    # VM names sampled by the stats collector
+    stats_hosts: List[str] = field(default_factory=list)  # Host names sampled by the stats collector
+    stats_counters: List[str] = field(default_factory=lambda: [
+        "cpu.usage.average", "mem.usage.average", "net.usage.average", "disk.usage.average"])
+    stats_interval: int = 20           # Seconds between collector samples
+    stats_retention: int = 180         # Samples kept per entity and counter
+    transfer_chunk_size: int = 1048576  # Read size in bytes for streamed file uploads
+    transfer_retries: int = 3          # Upload retries with a fresh transfer URL after expiry or disconnect
+    deploy_parallelism: int = 4        # Disks uploaded concurrently during OVA/OVF deployment
+    deploy_bandwidth_limit: int = 0    # Combined OVA/OVF upload cap in MB/s (0 = unlimited)
+    bulk_concurrency: int = 16         # Maximum vSphere tasks in flight per bulk operation
+    response_format: str = "compact"   # Tool result JSON: compact or pretty
+    page_size: int = 100               # Default limit of paged list calls
+    cursor_ttl: int = 300              # Seconds an idle list cursor snapshot is kept
+    cursor_max: int = 256              # Maximum list cursor snapshots kept
+    async_jobs: bool = False           # Long-running tools return a job ID unless called with run_async=false
+    job_workers: int = 8               # Threads running asynchronous jobs
+    job_ttl: int = 3600                # Seconds a finished job's outcome is kept
+    vcenters: List[Dict[str, Any]] = field(default_factory=list)  # vCenter endpoints served together (name, host, user, password, overrides)
+    default_vcenter: Optional[str] = None  # Endpoint for tool calls that neither select nor imply a vCenter
+    placement_engine: bool = False     # Choose host and datastore of new VMs by current load
+    placement_datastore_reserve: int = 10  # Percent of datastore capacity placement keeps free
+    placement_cpu_headroom: int = 10   # Percent of host CPU capacity placement keeps free
+    placement_memory_headroom: int = 10  # Percent of host memory placement keeps free
+    soap_trace: bool = False           # Count SOAP requests, bytes and time per tool call and log them
+    metrics_endpoint: bool = False     # Serve metrics at /metrics on the HTTP transport
+    http_max_sessions: int = 100       # Concurrent MCP sessions per HTTP worker (0 = unlimited)
+    http_session_idle_timeout: int = 1800  # Seconds before an MCP session without requests is closed (0 = never)
+    http_stateless: bool = False       # Serve every HTTP request with a fresh transport instead of MCP sessions
+    workers: int = 1                   # HTTP worker processes sharing the port, each with its own vCenter sessions
+    http_host: str = "0.0.0.0"         # Address the HTTP transport listens on
+    http_port: int = 8080              # Port the HTTP transport listens on
+    http_loop: str = "auto"            # Event loop: auto (uvloop when installed), asyncio or uvloop
+    http_protocol: str = "auto"        # HTTP parser: auto (httptools when installed), h11 or httptools
+    http_keep_alive: int = 5           # Seconds an idle keep-alive connection stays open
+    http_backlog: int = 2048           # Connections the listening socket queues before accepting
+    drain_timeout: int = 300           # Seconds shutdown waits in total for running tasks, jobs and connections
 
 
 def load_config(config_path: Optional[str] = None) -> Config:
@@ -62,18 +110,92 @@ def load_config(config_path: Optional[str] = None) -> Config:
         "VCENTER_INSECURE": "insecure",
         "MCP_API_KEY": "api_key",
         "MCP_LOG_FILE": "log_file",
-        "MCP_LOG_LEVEL": "log_level"
+        "MCP_LOG_LEVEL": "log_level",
+        "MCP_INVENTORY_CACHE": "inventory_cache",
+        "MCP_TASK_TIMEOUT": "task_timeout",
+        "MCP_READ_POOL_SIZE": "read_pool_size",
+        "MCP_WRITE_POOL_SIZE": "write_pool_size",
+        "MCP_POOL_QUEUE_DEPTH": "pool_queue_depth",
+        "MCP_SESSION_POOL_SIZE": "session_pool_size",
+        "MCP_SESSION_IDLE_TIMEOUT": "session_idle_timeout",
+        "MCP_KEEPALIVE_INTERVAL": "keepalive_interval",
+        "MCP_STATS_COLLECTOR": "stats_collector",
+        "MCP_STATS_VMS": "stats_vms",
+        "MCP_STATS_HOSTS": "stats_hosts",
+        "MCP_STATS_COUNTERS": "stats_counters",
+        "MCP_STATS_INTERVAL": "stats_interval",
+        "MCP_STATS_RETENTION": "stats_retention",
+        "MCP_TRANSFER_CHUNK_SIZE": "transfer_chunk_size",
+        "MCP_TRANSFER_RETRIES": "transfer_retries",
+        "MCP_DEPLOY_PARALLELISM": "deploy_parallelism",
+        "MCP_DEPLOY_BANDWIDTH_LIMIT": "deploy_bandwidth_limit",
+        "MCP_BULK_CONCURRENCY": "bulk_concurrency",
+        "MCP_RESPONSE_FORMAT": "response_format",
+        "MCP_PAGE_SIZE": "page_size",
+        "MCP_CURSOR_TTL": "cursor_ttl",
+        "MCP_CURSOR_MAX": "cursor_max",
+        "MCP_ASYNC_JOBS": "async_jobs",
+        "MCP_JOB_WORKERS": "job_workers",
+        "MCP_JOB_TTL": "job_ttl",
+        "MCP_VCENTERS": "vcenters",
+        "MCP_DEFAULT_VCENTER": "default_vcenter",
+        "MCP_PLACEMENT_ENGINE": "placement_engine",
+        "MCP_PLACEMENT_DATASTORE_RESERVE": "placement_datastore_reserve",
+        "MCP_PLACEMENT_CPU_HEADROOM": "placement_cpu_headroom",
+        "MCP_PLACEMENT_MEMORY_HEADROOM": "placement_memory_headroom",
+        "MCP_SOAP_TRACE": "soap_trace",
+        "MCP_METRICS_ENDPOINT": "metrics_endpoint",
+        "MCP_HTTP_MAX_SESSIONS": "http_max_sessions",
+        "MCP_HTTP_SESSION_IDLE_TIMEOUT": "http_session_idle_timeout",
+        "MCP_HTTP_STATELESS": "http_stateless",
+        "MCP_WORKERS": "workers",
+        "MCP_HTTP_HOST": "http_host",
+        "MCP_HTTP_PORT": "http_port",
+        "MCP_HTTP_LOOP": "http_loop",
+        "MCP_HTTP_PROTOCOL": "http_protocol",
+        "MCP_HTTP_KEEP_ALIVE": "http_keep_alive",
+        "MCP_HTTP_BACKLOG": "http_backlog",
+        "MCP_DRAIN_TIMEOUT": "drain_timeout"
     }
+    bool_keys = {"insecure", "inventory_cache", "stats_collector", "async_jobs", "placement_engine",
+                 "soap_trace", "metrics_endpoint", "http_stateless"}
+    int_keys = {"task_timeout", "read_pool_size", "write_pool_size", "pool_queue_depth",
+                "session_pool_size", "session_idle_timeout", "keepalive_interval",
+                "stats_interval", "stats_retention", "transfer_chunk_size", "transfer_retries",
+                "deploy_parallelism", "deploy_bandwidth_limit", "job_workers", "job_ttl",
+                "bulk_concurrency", "page_size", "cursor_ttl", "cursor_max", "placement_datastore_reserve",
+                "placement_cpu_headroom", "placement_memory_headroom", "http_max_sessions",
+                "http_session_idle_timeout", "workers", "http_port", "http_keep_alive", "http_backlog",
+                "drain_timeout"}
+    list_keys = {"stats_vms", "stats_hosts", "stats_counters"}
+    json_keys = {"vcenters"}
     
     for env_key, cfg_key in env_map.items():
         if env_key in os.environ:
             val = os.environ[env_key]
             # Boolean type conversion
-            if cfg_key == "insecure":
+            if cfg_key in bool_keys:
                 config_data[cfg_key] = val.lower() in ("1", "true", "yes")
+            elif cfg_key in int_keys:
+                config_data[cfg_key] = int(val)
+            # Comma-separated list conversion
+            elif cfg_key in list_keys:
+                config_data[cfg_key] = [item.strip() for item in val.split(",") if item.strip()]
+            # JSON value conversion
+            elif cfg_key in json_keys:
+                config_data[cfg_key] = json.loads(val)
             else:
                 config_data[cfg_key] = val
     
+    # With several endpoints the top-level connection settings only provide defaults;
+    # the first endpoint stands in for them when they are not set
+    vcenters = config_data.get("vcenters") or []
+    if vcenters:
+        first = vcenters[0]
+        for key, alias in (("vcenter_host", "host"), ("vcenter_user", "user"), ("vcenter_password", "password")):
+            if not config_data.get(key):
+                config_data[key] = first.get(key) or first.get(alias)
+    
     # Validate required keys
     required_keys = ["vcenter_host", "vcenter_user", "vcenter_password"]
     for k in required_keys:
@@ -81,3 +203,16 @@ def load_config(config_path: Optional[str] = None) -> Config:
             raise Exception(f"Missing required configuration item: {k}")
     
     return Config(**config_data)
+
+
+def setup_logging(config: Config):
+    """Configure logging based on configuration."""
+    log_level = getattr(logging, config.log_level.upper(), logging.INFO)
+    logging.basicConfig(
+        level=log_level,
+        format="%(asctime)s [%(levelname)s] %(message)s",
+        filename=config.log_file if config.log_file else None
+    )
+    if not config.log_file:
+        # If no log file is specified, output logs to the console
+        logging.getLogger().addHandler(logging.StreamHandler())
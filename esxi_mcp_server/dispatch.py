@@ -0,0 +1,158 @@
+"""Bounded worker pools for running synchronous tool handlers off the event loop."""
+
+import asyncio
+import contextvars
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+from .config import Config
+from .metrics import registry, MetricFamily
+
+
+# Tools that return quickly and run on the read pool: inventory and statistics reads plus job
+# bookkeeping. cancel_job changes job state but only sets a flag, and it has to stay available
+# while the long-running pool drains. Everything else runs on the long-running pool.
+READ_POOL_TOOLS = {
+    "list_vms",
+    "get_vm_details",
+    "get_vm_performance",
+    "get_vm_summary_stats",
+    "list_templates",
+    "list_datastores",
+    "list_datastore_clusters",
+    "list_networks",
+    "list_hosts",
+    "get_host_details",
+    "get_host_performance_metrics",
+    "get_host_hardware_health",
+    "get_host_performance",
+    "list_performance_counters",
+    "get_performance_bulk",
+    "get_metric_history",
+    "list_snapshots",
+    "get_job",
+    "list_jobs",
+    "cancel_job",
+}
+
+# Tools that can block for minutes; they run as jobs and accept a run_async argument
+LONG_RUNNING_TOOLS = {
+    "create_vm",
+    "create_vm_custom",
+    "clone_vm",
+    "delete_vm",
+    "create_snapshot",
+    "remove_snapshot",
+    "revert_snapshot",
+    "remove_all_snapshots",
+    "execute_program_in_vm",
+    "upload_file_to_vm",
+    "upload_file_to_datastore",
+    "deploy_ovf",
+    "deploy_ova",
+    "bulk_power_on",
+    "bulk_power_off",
+    "bulk_create_snapshot",
+    "bulk_delete",
+}
+
+
+class ToolBusyError(Exception):
+    """Raised when a tool call is rejected because its pool or tool limit is saturated."""
+
+
+class _Pool:
+    """A thread pool plus an admission limit covering running and queued calls."""
+
+    def __init__(self, name: str, workers: int, queue_depth: int):
+        self.name = name
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"mcp-{name}")
+        self.capacity = workers + queue_depth
+        self.in_flight = 0
+
+
+class ToolDispatcher:
+    """
+    Run tool handlers on separate read and long-running thread pools.
+
+    Admission is decided on the event loop thread, so the counters need no
+    locking. A call is rejected immediately with ToolBusyError when its pool
+    already holds workers + queue_depth calls, or when its tool has reached
+    its configured concurrency limit. A slot is released when the worker
+    thread finishes, not when the caller stops waiting, so a cancelled call
+    keeps counting against the limits while its handler still runs.
+    """
+
+    def __init__(self, config: Config):
+        self._pools = {
+            "read": _Pool("read", config.read_pool_size, config.pool_queue_depth),
+            "write": _Pool("write", config.write_pool_size, config.pool_queue_depth),
+        }
+        self._tool_limits: Dict[str, int] = dict(config.tool_concurrency or {})
+        self._tool_in_flight: Dict[str, int] = {}
+        self._draining = False
+        registry.add_collector(self.collect_metrics)
+
+    def _pool_for(self, tool_name: str) -> _Pool:
+        return self._pools["read" if tool_name in READ_POOL_TOOLS else "write"]
+
+    async def run(self, tool_name: str, func: Callable, *args):
+        """Run func(*args) for the named tool on its pool and return the result."""
+        pool = self._pool_for(tool_name)
+        if self._draining and pool.name == "write":
+            raise ToolBusyError(f"Server is shutting down: {tool_name} is not accepted, retry later")
+        if pool.in_flight >= pool.capacity:
+            logging.warning(f"Rejecting {tool_name}: {pool.name} pool is saturated ({pool.in_flight} calls)")
+            raise ToolBusyError(f"Server busy: too many concurrent {pool.name} operations, retry later")
+        limit = self._tool_limits.get(tool_name)
+        tool_in_flight = self._tool_in_flight.get(tool_name, 0)
+        if limit is not None and tool_in_flight >= limit:
+            logging.warning(f"Rejecting {tool_name}: concurrency limit of {limit} reached")
+            raise ToolBusyError(f"Server busy: {tool_name} is limited to {limit} concurrent calls, retry later")
+
+        loop = asyncio.get_running_loop()
+        # Propagate context variables (e.g. the MCP request context) into the worker thread
+        ctx = contextvars.copy_context()
+        future = pool.executor.submit(ctx.run, func, *args)
+        pool.in_flight += 1
+        self._tool_in_flight[tool_name] = tool_in_flight + 1
+
+        def release():
+            pool.in_flight -= 1
+            self._tool_in_flight[tool_name] -= 1
+
+        def on_done(_):
+            # Runs on the worker thread; hand the release back to the event loop thread
+            try:
+                loop.call_soon_threadsafe(release)
+            except RuntimeError:
+                pass  # Event loop already closed
+
+        # Registered before wrap_future's callback, so the slot is free when the caller resumes
+        future.add_done_callback(on_done)
+        return await asyncio.wrap_future(future)
+
+    def drain(self):
+        """Refuse new calls on the long-running pool; running calls and read-only tools continue."""
+        self._draining = True
+
+    def running_writes(self) -> int:
+        """Calls running or queued on the long-running pool."""
+        return self._pools["write"].in_flight
+
+    def collect_metrics(self) -> List[MetricFamily]:
+        """Calls admitted to each pool and the pools' admission limits, for /metrics."""
+        in_flight = MetricFamily("esxi_mcp_pool_calls_in_flight", "gauge",
+                                 "Tool calls running or queued on each worker pool", ("pool",))
+        capacity = MetricFamily("esxi_mcp_pool_capacity", "gauge",
+                                "Calls each worker pool admits (workers plus queue depth)", ("pool",))
+        for pool in self._pools.values():
+            in_flight.add((pool.name,), pool.in_flight)
+            capacity.add((pool.name,), pool.capacity)
+        return [in_flight, capacity]
+
+    def shutdown(self, wait: bool = True):
+        """Stop accepting work and optionally wait for running calls to finish."""
+        for pool in self._pools.values():
+            pool.executor.shutdown(wait=wait)
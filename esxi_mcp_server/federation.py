@@ -0,0 +1,277 @@
+"""Several vCenter endpoints served by one MCP server, with per-call selection and concurrent fan-out."""
+
+import logging
+import contextvars
+import dataclasses
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Callable, Tuple
+
+from .config import Config
+from .metrics import registry, MetricFamily
+
+
+# vCenter the current tool call runs against; None lets list tools fan out to every vCenter
+selected_vcenter: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("selected_vcenter", default=None)
+
+# Tools that query every vCenter concurrently and merge the results unless a vcenter is selected
+FAN_OUT_TOOLS = {
+    "list_vms",
+    "list_templates",
+    "list_hosts",
+    "list_datastores",
+    "list_datastore_clusters",
+    "list_networks",
+}
+
+# Tools that are routed to the vCenter holding the VM named by one of their arguments
+VM_TARGET_ARGS = {
+    "clone_vm": "template_name",
+    "delete_vm": "name",
+    "power_on_vm": "name",
+    "power_off_vm": "name",
+    "get_vm_details": "vm_name",
+    "get_vm_performance": "vm_name",
+    "get_vm_summary_stats": "vm_name",
+    "create_snapshot": "vm_name",
+    "remove_snapshot": "vm_name",
+    "revert_snapshot": "vm_name",
+    "list_snapshots": "vm_name",
+    "remove_all_snapshots": "vm_name",
+    "execute_program_in_vm": "vm_name",
+    "upload_file_to_vm": "vm_name",
+}
+
+# Tools that are routed to the vCenter managing the host named by one of their arguments
+HOST_TARGET_ARGS = {
+    "get_host_details": "host_name",
+    "get_host_performance_metrics": "host_name",
+    "get_host_hardware_health": "host_name",
+    "get_host_performance": "host_name",
+}
+
+# Tools that do not talk to a vCenter and take no vcenter selector
+UNROUTED_TOOLS = {"get_job", "list_jobs", "cancel_job"}
+
+# Endpoint keys that are shorthands for Config fields
+ENDPOINT_KEY_ALIASES = {"host": "vcenter_host", "user": "vcenter_user", "password": "vcenter_password"}
+
+
+def endpoint_configs(config: Config) -> Dict[str, Config]:
+    """
+    Build one Config per vCenter endpoint, keyed by endpoint name.
+
+    Each entry of config.vcenters holds a host, user and password (or the
+    full vcenter_* names) plus any other Config field to override for that
+    endpoint, e.g. datacenter or session_pool_size; unset fields are taken
+    from the top-level configuration. Entries are named by their "name" key,
+    defaulting to the host. Without vcenters the top-level endpoint is the
+    only one.
+    """
+    if not config.vcenters:
+        return {config.vcenter_host: config}
+    field_names = {f.name for f in dataclasses.fields(Config)} - {"vcenters", "default_vcenter"}
+    configs = {}
+    for entry in config.vcenters:
+        overrides = {}
+        for key, value in entry.items():
+            if key == "name":
+                continue
+            key = ENDPOINT_KEY_ALIASES.get(key, key)
+            if key not in field_names:
+                raise ValueError(f"Unknown vCenter endpoint setting: {key}")
+            overrides[key] = value
+        if not overrides.get("vcenter_host"):
+            raise ValueError("Every vCenter endpoint needs a host")
+        name = entry.get("name") or overrides["vcenter_host"]
+        if name in configs:
+            raise ValueError(f"Duplicate vCenter endpoint name: {name}")
+        configs[name] = dataclasses.replace(config, vcenters=[], default_vcenter=None, **overrides)
+    return configs
+
+
+class ManagerRegistry:
+    """
+    One VMwareManager per vCenter, each with its own sessions, session pool and caches.
+
+    Tool calls run against the selected vCenter, the one holding the object
+    they target, or the default endpoint. List tools can run on every vCenter
+    at once through a shared pool sized to the endpoints' combined sessions,
+    so a global listing takes about as long as the slowest vCenter. Results
+    from several vCenters are tagged with a "vcenter" field.
+    """
+
+    def __init__(self, managers: Dict[str, Any], default: Optional[str] = None):
+        if not managers:
+            raise Exception("No vCenter endpoint is available")
+        self._managers = dict(managers)
+        if default is not None and default not in self._managers:
+            logging.warning(f"Default vCenter {default} is not available, using {next(iter(self._managers))}")
+            default = None
+        self.default_name = default or next(iter(self._managers))
+        sessions = sum(max(1, m.config.session_pool_size) for m in self._managers.values())
+        self.executor = ThreadPoolExecutor(max_workers=sessions, thread_name_prefix="vcenter-fanout")
+        registry.add_collector(self.collect_metrics)
+
+    @classmethod
+    def from_config(cls, config: Config, factory: Optional[Callable[[Config], Any]] = None) -> "ManagerRegistry":
+        """
+        Connect to every configured vCenter concurrently.
+
+        Endpoints that fail to connect are logged and left out, so one
+        unreachable vCenter does not keep the others from being served.
+
+        Raises:
+            Exception: If no endpoint could be connected
+        """
+        if factory is None:
+            from .vmware_manager import VMwareManager
+            factory = VMwareManager
+        configs = endpoint_configs(config)
+        managers = {}
+        with ThreadPoolExecutor(max_workers=len(configs), thread_name_prefix="vcenter-connect") as executor:
+            futures = {name: executor.submit(factory, cfg) for name, cfg in configs.items()}
+            for name, future in futures.items():
+                try:
+                    managers[name] = future.result()
+                except Exception as e:
+                    logging.error(f"Failed to connect to vCenter {name}: {e}")
+        if not managers:
+            raise Exception("Failed to connect to any vCenter endpoint")
+        if len(configs) > 1:
+            logging.info(f"Connected to {len(managers)} of {len(configs)} vCenter endpoints: {', '.join(managers)}")
+        return cls(managers, config.default_vcenter)
+
+    def __len__(self):
+        return len(self._managers)
+
+    def names(self) -> List[str]:
+        return list(self._managers)
+
+    def get(self, name: Optional[str] = None):
+        """Return the manager of the named vCenter, or of the default one."""
+        if name is None:
+            name = self.default_name
+        manager = self._managers.get(name)
+        if manager is None:
+            raise Exception(f"Unknown vCenter: {name}. Available: {', '.join(self._managers)}")
+        return manager
+
+    def fan_out(self, func: Callable, names: Optional[List[str]] = None) -> Tuple[Dict[str, Any], Dict[str, str]]:
+        """
+        Run func(manager) on a pooled session of each named vCenter (all by default) concurrently.
+
+        Returns:
+            Results and error messages, each keyed by vCenter name
+        """
+        names = names or self.names()
+        futures = {}
+        for name in names:
+            manager = self.get(name)
+            # Copy the caller's context so the calls are attributed to its tool call
+            futures[name] = self.executor.submit(contextvars.copy_context().run, manager.call, func, manager,
+                                                 retry=True)
+        results, errors = {}, {}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                logging.warning(f"vCenter {name} failed: {e}")
+                errors[name] = str(e)
+        return results, errors
+
+    def gather(self, func: Callable, name: Optional[str] = None) -> Any:
+        """
+        Run a list function on the named vCenter, or on every vCenter with the lists concatenated.
+
+        Dict items are tagged with their vCenter when more than one endpoint is
+        configured. A failing vCenter is left out of a merged result; the call
+        fails only when every vCenter failed.
+        """
+        results, errors = self.fan_out(func, [name] if name is not None else None)
+        if not results:
+            raise Exception("; ".join(f"{n}: {e}" for n, e in errors.items()))
+        merged = []
+        for vcenter, items in results.items():
+            if len(self._managers) > 1:
+                items = [dict(item, vcenter=vcenter) if isinstance(item, dict) else item for item in items]
+            merged.extend(items)
+        return merged
+
+    def locate(self, kind: str, object_name: str) -> List[str]:
+        """
+        Return the names of the vCenters whose inventory cache holds a VM ("vm") or host ("host") of that name.
+
+        Only ready inventory caches are consulted, so locating an object costs
+        no vCenter round trip. A vCenter without a ready cache is never
+        reported; its objects are found by the tool call itself once it runs
+        there.
+        """
+        found = []
+        for name, manager in self._managers.items():
+            inventory = getattr(manager, "inventory", None)
+            if inventory is None or not inventory.ready:
+                continue
+            lookup = inventory.find_vm if kind == "vm" else inventory.find_host
+            if lookup(object_name) is not None:
+                found.append(name)
+        return found
+
+    def route(self, tool_name: str, arguments: Dict[str, Any], vcenter: Optional[str] = None) -> Optional[str]:
+        """
+        Pick the vCenter a tool call runs against.
+
+        An explicit vcenter wins. Otherwise list tools fan out (None), tools
+        naming a VM or host go to the vCenter whose inventory cache holds it,
+        and everything else goes to the default vCenter. A target no cache
+        knows also goes to the default vCenter, where the tool's own lookup
+        falls back to a server-side search; other vCenters are not searched.
+
+        Raises:
+            Exception: If vcenter is unknown or the named object exists in several vCenters
+        """
+        if vcenter is not None:
+            self.get(vcenter)
+            return vcenter
+        if len(self._managers) == 1:
+            return self.default_name
+        if tool_name in FAN_OUT_TOOLS:
+            return None
+        for kind, target_args in (("vm", VM_TARGET_ARGS), ("host", HOST_TARGET_ARGS)):
+            arg = target_args.get(tool_name)
+            if arg is None or not arguments.get(arg):
+                continue
+            found = self.locate(kind, arguments[arg])
+            if len(found) > 1:
+                raise Exception(f"{arguments[arg]} exists in several vCenters ({', '.join(found)}); "
+                                f"pass vcenter to choose one")
+            if found:
+                return found[0]
+        return self.default_name
+
+    def collect_metrics(self) -> List[MetricFamily]:
+        """Reconnects, session age and session pool occupancy of each vCenter, for /metrics."""
+        reconnects = MetricFamily("esxi_mcp_vcenter_reconnects_total", "counter",
+                                  "Times the primary vCenter session was re-established", ("vcenter",))
+        age = MetricFamily("esxi_mcp_vcenter_session_age_seconds", "gauge",
+                           "Seconds since the primary vCenter session was established", ("vcenter",))
+        pool = MetricFamily("esxi_mcp_vcenter_pool_sessions", "gauge",
+                            "Pooled vCenter sessions by state (open, idle) and the pool size", ("vcenter", "state"))
+        for name, manager in self._managers.items():
+            reconnects.add((name,), getattr(manager, "reconnect_count", 0))
+            session_age = manager.session_age() if hasattr(manager, "session_age") else None
+            if session_age is not None:
+                age.add((name,), round(session_age, 3))
+            if getattr(manager, "pool", None) is not None:
+                for state, value in manager.pool.stats().items():
+                    pool.add((name, state), value)
+        return [reconnects, age, pool]
+
+    def close(self):
+        """Close every manager's sessions and background collectors."""
+        registry.remove_collector(self.collect_metrics)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        for manager in self._managers.values():
+            try:
+                manager.close()
+            except Exception as e:
+                logging.debug(f"Failed to close vCenter manager: {e}")
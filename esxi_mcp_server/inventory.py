@@ -0,0 +1,351 @@
+"""In-memory vSphere inventory index maintained by a PropertyCollector."""
+
+import logging
+import threading
+from typing import Optional, Dict, Any, List
+
+from pyVmomi import vim, vmodl
+
+
+# Properties mirrored into the index for each tracked managed object type. Subclasses
+# (clusters, vApps, storage pods, portgroups) are indexed under their base type.
+TRACKED_PROPERTIES = {
+    vim.VirtualMachine: ["name", "config.template", "config.instanceUuid", "config.uuid",
+                         "runtime.powerState", "runtime.host"],
+    vim.HostSystem: ["name", "parent", "datastore", "runtime.connectionState", "runtime.inMaintenanceMode",
+                     "summary.hardware.cpuMhz", "summary.hardware.numCpuCores", "summary.hardware.memorySize",
+                     "summary.quickStats.overallCpuUsage", "summary.quickStats.overallMemoryUsage"],
+    vim.Datacenter: ["name", "parent"],
+    vim.Folder: ["name", "parent"],
+    vim.ComputeResource: ["name", "parent", "resourcePool"],
+    vim.ResourcePool: ["name", "parent"],
+    vim.Datastore: ["name", "parent", "summary.accessible", "summary.capacity", "summary.freeSpace"],
+    vim.Network: ["name", "parent"],
+}
+
+# Types addressable by inventory path (e.g. /dc1/host/cluster1/Resources/pool1)
+PATH_TYPES = [t for t in TRACKED_PROPERTIES if t is not vim.VirtualMachine]
+
+# Property changes that move an object to a different inventory path
+PATH_PROPERTIES = {"name", "parent"}
+
+
+def normalize_path(path: str) -> str:
+    """Return an inventory path with a leading and without a trailing slash."""
+    return "/" + path.strip("/")
+
+
+def build_view_filter_spec(view, properties: Dict[type, List[str]]):
+    """Build a FilterSpec selecting the given property paths of every object in a view."""
+    traversal = vmodl.query.PropertyCollector.TraversalSpec(
+        name="traverseView", type=type(view), path="view", skip=False)
+    obj_spec = vmodl.query.PropertyCollector.ObjectSpec(
+        obj=view, skip=True, selectSet=[traversal])
+    prop_specs = [vmodl.query.PropertyCollector.PropertySpec(type=t, all=False, pathSet=paths)
+                  for t, paths in properties.items()]
+    return vmodl.query.PropertyCollector.FilterSpec(objectSet=[obj_spec], propSet=prop_specs)
+
+
+class InventoryEntry:
+    """A cached managed object reference together with its mirrored properties."""
+
+    __slots__ = ("obj", "props")
+
+    def __init__(self, obj):
+        self.obj = obj
+        self.props: Dict[str, Any] = {}
+
+    @property
+    def name(self) -> Optional[str]:
+        return self.props.get("name")
+
+
+class InventoryCache:
+    """
+    Index of virtual machines and hosts keyed by name, moref and instance UUID,
+    and of the placement objects (datacenters, folders, clusters and hosts,
+    resource pools, datastores and networks) keyed by name and inventory path.
+
+    The initial contents are loaded with a single WaitForUpdatesEx pass over a
+    ContainerView, after which a background thread keeps applying incremental
+    updates. Lookups never touch the network. The path table is rebuilt from
+    the cached parent links on the first lookup after an object was added,
+    removed, renamed or moved, so frequent updates such as datastore free
+    space or VM power state leave it untouched.
+    """
+
+    def __init__(self, si, content, max_wait_seconds: int = 60):
+        self.si = si
+        self.content = content
+        self.max_wait_seconds = max_wait_seconds
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._ready = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._collector = None
+        self._view = None
+        self._version = ""
+        self._entries: Dict[type, Dict[str, InventoryEntry]] = {t: {} for t in TRACKED_PROPERTIES}
+        self._by_name: Dict[type, Dict[str, set]] = {t: {} for t in TRACKED_PROPERTIES}
+        self._vm_by_instance_uuid: Dict[str, str] = {}
+        self._by_path: Dict[str, InventoryEntry] = {}
+        self._path_by_moid: Dict[str, str] = {}
+        self._paths_stale = True
+
+    @property
+    def ready(self) -> bool:
+        """Whether the index reflects the current inventory."""
+        return self._ready.is_set()
+
+    def start(self):
+        """Create the collector, load the initial inventory and start the update thread."""
+        # A private collector keeps our filter and version separate from other users of the session
+        self._collector = self.content.propertyCollector.CreatePropertyCollector()
+        self._view = self.content.viewManager.CreateContainerView(
+            self.content.rootFolder, list(TRACKED_PROPERTIES), True)
+        self._collector.CreateFilter(build_view_filter_spec(self._view, TRACKED_PROPERTIES), True)
+
+        # Drain the initial (possibly truncated) update sets synchronously
+        self._sync(self.max_wait_seconds)
+        self._ready.set()
+        placement = sum(len(self._entries[t]) for t in PATH_TYPES if t is not vim.HostSystem)
+        logging.info(f"Inventory cache loaded: {len(self._entries[vim.VirtualMachine])} VMs, "
+                     f"{len(self._entries[vim.HostSystem])} hosts, {placement} placement objects")
+
+        self._thread = threading.Thread(target=self._run, name="inventory-cache", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the update thread and release the server-side collector and view."""
+        self._stop_event.set()
+        self._ready.clear()
+        try:
+            if self._collector is not None:
+                self._collector.CancelWaitForUpdates()
+        except Exception:
+            pass
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        for mo in (self._collector, self._view):
+            try:
+                if mo is not None:
+                    mo.Destroy()
+            except Exception:
+                pass
+        self._collector = None
+        self._view = None
+
+    def _sync(self, max_wait_seconds: int):
+        """Apply update sets until the collector reports no pending changes."""
+        wait_opts = vmodl.query.PropertyCollector.WaitOptions(maxWaitSeconds=max_wait_seconds)
+        while True:
+            update_set = self._collector.WaitForUpdatesEx(self._version, wait_opts)
+            if update_set is None:
+                return
+            self._apply(update_set)
+            if not update_set.truncated:
+                return
+            # Truncated results are continued immediately without waiting
+            wait_opts = vmodl.query.PropertyCollector.WaitOptions(maxWaitSeconds=0)
+
+    def _run(self):
+        """Background loop applying incremental updates until stopped."""
+        backoff = 1
+        while not self._stop_event.is_set():
+            try:
+                self._sync(self.max_wait_seconds)
+                if not self._ready.is_set():
+                    logging.info("Inventory cache resynchronized")
+                self._ready.set()
+                backoff = 1
+            except vmodl.fault.RequestCanceled:
+                return
+            except vmodl.query.InvalidCollectorVersion:
+                logging.warning("Inventory cache version invalidated, reloading")
+                # Lookups fall back to the server until the reload has finished
+                self._ready.clear()
+                with self._lock:
+                    self._clear()
+                self._version = ""
+            except Exception as e:
+                if self._stop_event.is_set():
+                    return
+                self._ready.clear()
+                if isinstance(e, (vim.fault.NotAuthenticated, vmodl.fault.ManagedObjectNotFound)):
+                    logging.warning(f"Inventory cache stopped, session is no longer valid: {e}")
+                    return
+                logging.warning(f"Inventory cache update failed, retrying in {backoff}s: {e}")
+                self._stop_event.wait(backoff)
+                backoff = min(backoff * 2, 60)
+
+    def _clear(self):
+        for t in TRACKED_PROPERTIES:
+            self._entries[t].clear()
+            self._by_name[t].clear()
+        self._vm_by_instance_uuid.clear()
+        self._by_path.clear()
+        self._path_by_moid.clear()
+        self._paths_stale = True
+
+    def _apply(self, update_set):
+        """Fold a PropertyCollector UpdateSet into the index."""
+        with self._lock:
+            for filter_set in update_set.filterSet:
+                for object_set in filter_set.objectSet:
+                    obj = object_set.obj
+                    mo_type = next((t for t in TRACKED_PROPERTIES if isinstance(obj, t)), None)
+                    if mo_type is None:
+                        continue
+                    moid = obj._moId
+                    if object_set.kind == "leave":
+                        entry = self._entries[mo_type].pop(moid, None)
+                        if entry:
+                            self._unindex(mo_type, moid, entry)
+                            self._paths_stale = self._paths_stale or mo_type is not vim.VirtualMachine
+                        continue
+                    entry = self._entries[mo_type].get(moid)
+                    if entry is None:
+                        entry = InventoryEntry(obj)
+                        self._entries[mo_type][moid] = entry
+                    self._unindex(mo_type, moid, entry)
+                    for change in object_set.changeSet:
+                        if change.op in ("remove", "indirectRemove"):
+                            entry.props.pop(change.name, None)
+                        else:
+                            entry.props[change.name] = change.val
+                        if change.name in PATH_PROPERTIES and mo_type is not vim.VirtualMachine:
+                            self._paths_stale = True
+                    self._index(mo_type, moid, entry)
+            self._version = update_set.version
+
+    def _index(self, mo_type, moid: str, entry: InventoryEntry):
+        if entry.name is not None:
+            self._by_name[mo_type].setdefault(entry.name, set()).add(moid)
+        instance_uuid = entry.props.get("config.instanceUuid")
+        if mo_type is vim.VirtualMachine and instance_uuid:
+            self._vm_by_instance_uuid[instance_uuid] = moid
+
+    def _unindex(self, mo_type, moid: str, entry: InventoryEntry):
+        if entry.name is not None:
+            ids = self._by_name[mo_type].get(entry.name)
+            if ids is not None:
+                ids.discard(moid)
+                if not ids:
+                    del self._by_name[mo_type][entry.name]
+        instance_uuid = entry.props.get("config.instanceUuid")
+        if mo_type is vim.VirtualMachine and instance_uuid:
+            if self._vm_by_instance_uuid.get(instance_uuid) == moid:
+                del self._vm_by_instance_uuid[instance_uuid]
+
+    def _entry(self, moid: str) -> Optional[InventoryEntry]:
+        for t in PATH_TYPES:
+            entry = self._entries[t].get(moid)
+            if entry is not None:
+                return entry
+        return None
+
+    def _rebuild_paths(self):
+        """Recompute the inventory path of every placement object from the cached parent links."""
+        paths: Dict[str, Optional[str]] = {}
+
+        def path_of(entry: InventoryEntry) -> Optional[str]:
+            moid = entry.obj._moId
+            if moid not in paths:
+                paths[moid] = None  # Guards against parent cycles while the cache is settling
+                parent = entry.props.get("parent")
+                parent_entry = self._entry(parent._moId) if parent is not None else None
+                if entry.name is None:
+                    path = None
+                elif parent_entry is None:
+                    # Children of the (unindexed) root folder
+                    path = "/" + entry.name
+                else:
+                    parent_path = path_of(parent_entry)
+                    path = f"{parent_path}/{entry.name}" if parent_path else None
+                paths[moid] = path
+            return paths[moid]
+
+        self._by_path = {}
+        for t in PATH_TYPES:
+            for entry in self._entries[t].values():
+                path = path_of(entry)
+                if path is not None:
+                    self._by_path[path] = entry
+        self._path_by_moid = {moid: path for moid, path in paths.items() if path is not None}
+        self._paths_stale = False
+
+    def resolve(self, path: str, mo_type=None):
+        """
+        Return the object at an inventory path, e.g. /dc1/datastore/ds1, or None.
+
+        Args:
+            path: Inventory path of a datacenter, folder, cluster, host, resource
+                pool, datastore or network
+            mo_type: Only return an object of this type
+        """
+        with self._lock:
+            if self._paths_stale:
+                self._rebuild_paths()
+            entry = self._by_path.get(normalize_path(path))
+        if entry is None or (mo_type is not None and not isinstance(entry.obj, mo_type)):
+            return None
+        return entry.obj
+
+    def path(self, obj) -> Optional[str]:
+        """Return the inventory path of a cached placement object, or None."""
+        with self._lock:
+            if self._paths_stale:
+                self._rebuild_paths()
+            return self._path_by_moid.get(obj._moId)
+
+    def parent(self, obj):
+        """Return the cached parent of a placement object, or None."""
+        with self._lock:
+            entry = self._entry(obj._moId)
+            return entry.props.get("parent") if entry is not None else None
+
+    def find(self, mo_type, name: str):
+        """Return the managed object of the given type with the given name, or None."""
+        with self._lock:
+            ids = self._by_name[mo_type].get(name)
+            if not ids:
+                return None
+            return self._entries[mo_type][next(iter(ids))].obj
+
+    def get(self, mo_type, moid: str):
+        """Return the managed object of the given type with the given moref ID, or None."""
+        with self._lock:
+            entry = self._entries[mo_type].get(moid)
+            return entry.obj if entry else None
+
+    def entries(self, mo_type) -> List[InventoryEntry]:
+        """Return a snapshot of all cached entries of the given type."""
+        with self._lock:
+            return list(self._entries[mo_type].values())
+
+    def find_vm(self, identifier: str) -> Optional[vim.VirtualMachine]:
+        """Return the VM with the given name, or else with that moref ID or instance UUID, or None."""
+        return (self.find(vim.VirtualMachine, identifier)
+                or self.find_vm_by_moref(identifier)
+                or self.find_vm_by_instance_uuid(identifier))
+
+    def find_vm_by_moref(self, moid: str) -> Optional[vim.VirtualMachine]:
+        return self.get(vim.VirtualMachine, moid)
+
+    def find_vm_by_instance_uuid(self, instance_uuid: str) -> Optional[vim.VirtualMachine]:
+        with self._lock:
+            moid = self._vm_by_instance_uuid.get(instance_uuid)
+        return self.get(vim.VirtualMachine, moid) if moid else None
+
+    def find_host(self, name: str) -> Optional[vim.HostSystem]:
+        return self.find(vim.HostSystem, name)
+
+    def vm_names(self) -> List[str]:
+        return [e.name for e in self.entries(vim.VirtualMachine) if e.name is not None]
+
+    def template_names(self) -> List[str]:
+        return [e.name for e in self.entries(vim.VirtualMachine)
+                if e.name is not None and e.props.get("config.template")]
+
+    def host_names(self) -> List[str]:
+        return [e.name for e in self.entries(vim.HostSystem) if e.name is not None]
@@ -0,0 +1,275 @@
+"""In-memory job table for long-running tool calls, with progress, cancellation and expiry."""
+
+import time
+import uuid
+import logging
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Callable
+
+from .dispatch import ToolBusyError
+
+
+# Job states
+PENDING = "pending"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELED = "canceled"
+
+FINISHED_STATES = {SUCCEEDED, FAILED, CANCELED}
+
+# Job whose function is running on the current thread
+_current_job: contextvars.ContextVar[Optional["Job"]] = contextvars.ContextVar("current_job", default=None)
+
+# Set by the MCP layer to a callable receiving job updates while a synchronous call is in progress
+progress_listener: contextvars.ContextVar[Optional[Callable[["Job"], None]]] = \
+    contextvars.ContextVar("progress_listener", default=None)
+
+
+class JobCanceledError(Exception):
+    """Raised inside a job's function when cancellation was requested."""
+
+
+class Job:
+    """Status, progress and outcome of one tool call."""
+
+    def __init__(self, tool: str):
+        self.id = uuid.uuid4().hex
+        self.tool = tool
+        self.status = PENDING
+        self.progress: Optional[int] = None
+        self.message: Optional[str] = None
+        self.result = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.cancel_requested = False
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._listeners: List[Callable[["Job"], None]] = []
+        self._cancel_callbacks: List[Callable[[], None]] = []
+
+    def update(self, progress: Optional[int] = None, message: Optional[str] = None):
+        """Record progress (0-100) and/or a status message and notify listeners of changes."""
+        with self._lock:
+            changed = False
+            # Progress never goes backwards, e.g. when an upload is retried
+            if progress is not None and (self.progress is None or progress > self.progress):
+                self.progress = min(100, int(progress))
+                changed = True
+            if message is not None and message != self.message:
+                self.message = message
+                changed = True
+            listeners = list(self._listeners) if changed else []
+        for listener in listeners:
+            try:
+                listener(self)
+            except Exception as e:
+                logging.debug(f"Job progress listener failed: {e}")
+
+    def add_listener(self, listener: Callable[["Job"], None]):
+        with self._lock:
+            self._listeners.append(listener)
+
+    def on_cancel(self, callback: Callable[[], None]):
+        """Register a callback that stops the job's work when cancellation is requested."""
+        with self._lock:
+            if not self.cancel_requested:
+                self._cancel_callbacks.append(callback)
+                return
+        callback()
+
+    def cancel(self) -> bool:
+        """Request cancellation; returns False if the job already finished."""
+        with self._lock:
+            if self.status in FINISHED_STATES:
+                return False
+            self.cancel_requested = True
+            callbacks, self._cancel_callbacks = self._cancel_callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logging.warning(f"Failed to cancel work of job {self.id}: {e}")
+        return True
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def _start(self) -> bool:
+        with self._lock:
+            if self.cancel_requested:
+                self._set_finished(CANCELED, error="Canceled before start")
+                return False
+            self.status = RUNNING
+            self.started_at = time.time()
+            return True
+
+    def _finish(self, status: str, result=None, error: Optional[str] = None):
+        # Under the lock, so cancel() never sees a half-finished job
+        with self._lock:
+            self._set_finished(status, result, error)
+
+    def _set_finished(self, status: str, result=None, error: Optional[str] = None):
+        """Record the outcome and wake waiters (lock must be held)."""
+        self.status = status
+        self.result = result
+        self.error = error
+        self.finished_at = time.time()
+        if status == SUCCEEDED:
+            self.progress = 100
+        self._done.set()
+
+    def to_dict(self, include_result: bool = True) -> Dict[str, Any]:
+        info = {
+            "job_id": self.id,
+            "tool": self.tool,
+            "status": self.status,
+            "progress": self.progress,
+            "message": self.message,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if self.status == FAILED or self.status == CANCELED:
+            info["error"] = self.error
+        if include_result and self.status == SUCCEEDED:
+            info["result"] = self.result
+        return info
+
+
+class JobManager:
+    """
+    Run tool calls as jobs and keep their outcome for ttl seconds after they finish.
+
+    Jobs either run inline on the caller's thread (synchronous calls, which
+    still appear in the table and can be canceled) or on a dedicated pool.
+    At most max_active jobs may be pending or running at once, and at most
+    tool_limits[tool] of them for one tool; jobs on the pool outlive their
+    dispatcher slot, so this is where their per-tool limit is enforced.
+    """
+
+    def __init__(self, workers: int = 8, max_active: int = 40, ttl: int = 3600,
+                 tool_limits: Optional[Dict[str, int]] = None):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="mcp-job")
+        self.max_active = max_active
+        self.ttl = ttl
+        self.tool_limits: Dict[str, int] = dict(tool_limits or {})
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def create(self, tool: str) -> Job:
+        """Register a new pending job, rejecting it when too many jobs, or jobs of its tool, are active."""
+        self._purge()
+        with self._lock:
+            active = [j for j in self._jobs.values() if j.status not in FINISHED_STATES]
+            if len(active) >= self.max_active:
+                raise ToolBusyError(f"Server busy: {len(active)} jobs are already active, retry later")
+            limit = self.tool_limits.get(tool)
+            if limit is not None and sum(1 for j in active if j.tool == tool) >= limit:
+                logging.warning(f"Rejecting {tool}: concurrency limit of {limit} reached")
+                raise ToolBusyError(f"Server busy: {tool} is limited to {limit} concurrent calls, retry later")
+            job = Job(tool)
+            self._jobs[job.id] = job
+        return job
+
+    def run(self, job: Job, func: Callable, *args):
+        """Run func(*args) as the job on the current thread and return its result."""
+        if not job._start():
+            raise JobCanceledError(f"Job {job.id} was canceled")
+        token = _current_job.set(job)
+        try:
+            result = func(*args)
+        except Exception as e:
+            job._finish(CANCELED if job.cancel_requested else FAILED, error=str(e))
+            raise
+        finally:
+            _current_job.reset(token)
+        job._finish(SUCCEEDED, result=result)
+        return result
+
+    def start(self, job: Job, func: Callable, *args):
+        """Run func(*args) as the job on the job pool; the outcome is recorded on the job."""
+        ctx = contextvars.copy_context()
+        self.executor.submit(ctx.run, self._run_logged, job, func, *args)
+
+    def _run_logged(self, job: Job, func: Callable, *args):
+        try:
+            self.run(job, func, *args)
+            logging.info(f"Job {job.id} ({job.tool}) succeeded")
+        except Exception as e:
+            logging.warning(f"Job {job.id} ({job.tool}) {job.status}: {e}")
+
+    def get(self, job_id: str) -> Job:
+        self._purge()
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            raise Exception(f"Job {job_id} not found")
+        return job
+
+    def list(self, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Describe known jobs, newest first, without their results."""
+        self._purge()
+        with self._lock:
+            jobs = sorted(self._jobs.values(), key=lambda j: j.created_at, reverse=True)
+        return [j.to_dict(include_result=False) for j in jobs if status is None or j.status == status]
+
+    def cancel(self, job_id: str) -> Dict[str, Any]:
+        job = self.get(job_id)
+        if not job.cancel():
+            raise Exception(f"Job {job_id} already {job.status}")
+        logging.info(f"Cancellation requested for job {job_id} ({job.tool})")
+        return job.to_dict()
+
+    def active(self) -> int:
+        """Number of pending or running jobs."""
+        with self._lock:
+            return sum(1 for j in self._jobs.values() if j.status not in FINISHED_STATES)
+
+    def shutdown(self):
+        for job in list(self._jobs.values()):
+            job.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _purge(self):
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            expired = [job_id for job_id, j in self._jobs.items()
+                       if j.finished_at is not None and j.finished_at < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+
+def current_job() -> Optional[Job]:
+    """Return the job running on the current thread, if any."""
+    return _current_job.get()
+
+
+def check_canceled():
+    """Raise JobCanceledError if the current job has been asked to stop."""
+    job = _current_job.get()
+    if job is not None and job.cancel_requested:
+        raise JobCanceledError(f"Job {job.id} was canceled")
+
+
+def transfer_callback() -> Optional[Callable[[int, int], None]]:
+    """
+    Return a (bytes_sent, total_bytes) callback reporting to the current job, or None outside a job.
+
+    The callback is bound to the job so it also works on upload threads, and
+    raises JobCanceledError to stop the transfer once cancellation is requested.
+    """
+    job = _current_job.get()
+    if job is None:
+        return None
+
+    def report(sent: int, total: int):
+        if job.cancel_requested:
+            raise JobCanceledError(f"Job {job.id} was canceled")
+        job.update(sent * 100 // total if total else 100)
+
+    return report
@@ -0,0 +1,144 @@
+"""Parallel disk uploads to an HttpNfcLease with byte-level lease progress."""
+
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional, List, Callable
+
+import requests
+from pyVmomi import vim
+
+from .transfer import DEFAULT_CHUNK_SIZE, FileChunks, RateLimiter, TransferProgress, stream_upload
+
+
+# How often to check whether a new lease has finished initializing
+LEASE_READY_POLL_SECONDS = 1
+
+# How often to report progress to the lease; this also keeps it from timing out
+LEASE_PROGRESS_INTERVAL = 5
+
+# Content type of stream-optimized VMDKs posted to a lease device URL
+DISK_CONTENT_TYPE = "application/x-vnd.vmware-streamVmdk"
+
+
+class DiskUpload:
+    """A byte range of a local file to send to one lease device URL."""
+
+    __slots__ = ("url", "path", "offset", "length")
+
+    def __init__(self, url: str, path: str, offset: int = 0, length: Optional[int] = None):
+        self.url = url
+        self.path = path
+        self.offset = offset
+        self.length = length
+
+
+class LeaseUploader:
+    """
+    Upload the disks of an import lease concurrently and keep the lease alive.
+
+    Up to parallelism disks are streamed at once, each from its own file
+    handle, so deployment time follows the largest disk rather than the sum
+    of all disks. A background thread reports the share of bytes sent
+    through HttpNfcLeaseProgress every LEASE_PROGRESS_INTERVAL seconds.
+    Each worker thread keeps one HTTP session, so connections to the host
+    are reused across disks, and an optional rate limit caps the combined
+    upload bandwidth of all workers.
+    """
+
+    def __init__(self, lease: vim.HttpNfcLease, host: str, parallelism: int = 4,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE, label: str = "Import",
+                 bytes_per_second: Optional[float] = None):
+        self.lease = lease
+        self.host = host
+        self.parallelism = max(1, parallelism)
+        self.chunk_size = chunk_size
+        self.label = label
+        self.limiter = RateLimiter(bytes_per_second) if bytes_per_second else None
+        self.progress: Optional[TransferProgress] = None
+        self._stop_event = threading.Event()
+        self._local = threading.local()
+        self._sessions: List[requests.Session] = []
+        self._sessions_lock = threading.Lock()
+
+    def wait_ready(self):
+        """Block until the lease has initialized; raise if it failed."""
+        while self.lease.state == vim.HttpNfcLease.State.initializing:
+            time.sleep(LEASE_READY_POLL_SECONDS)
+        if self.lease.state == vim.HttpNfcLease.State.error:
+            raise Exception(f"Lease error: {self.lease.error}")
+        if self.lease.state != vim.HttpNfcLease.State.ready:
+            raise Exception("Lease did not become ready")
+
+    def device_url(self, import_key: str) -> str:
+        """Return the upload URL of the lease device with the given import key."""
+        for device_url in self.lease.info.deviceUrl:
+            if device_url.importKey == import_key:
+                # The server reports '*' when it does not know the name clients use to reach it
+                return device_url.url.replace('*', self.host)
+        raise Exception(f"No lease device URL for import key {import_key}")
+
+    def upload(self, disks: List[DiskUpload], on_progress: Optional[Callable[[int, int], None]] = None):
+        """
+        Send all disks, then complete the lease; abort the lease if any upload fails.
+
+        Args:
+            disks: The files or file ranges to upload
+            on_progress: Optional callback receiving (bytes_sent, total_bytes); an
+                exception it raises fails the upload
+        """
+        chunks = [FileChunks(d.path, self.chunk_size, d.offset, d.length, limiter=self.limiter) for d in disks]
+        self.progress = TransferProgress(sum(len(c) for c in chunks), self.label, on_progress)
+        for c in chunks:
+            c.progress = self.progress
+        reporter = threading.Thread(target=self._report_progress, name="lease-progress", daemon=True)
+        reporter.start()
+        executor = ThreadPoolExecutor(max_workers=min(self.parallelism, len(disks)) or 1,
+                                      thread_name_prefix="lease-upload")
+        try:
+            futures = [executor.submit(self._upload_disk, disk.url, c) for disk, c in zip(disks, chunks)]
+            for future in as_completed(futures):
+                future.result()
+            self._stop_event.set()
+            self.lease.HttpNfcLeaseProgress(100)
+            self.lease.HttpNfcLeaseComplete()
+        except Exception:
+            self._stop_event.set()
+            # Aborting the lease also drops the connections of uploads still running
+            try:
+                self.lease.HttpNfcLeaseAbort()
+            except Exception as e:
+                logging.debug(f"Failed to abort lease: {e}")
+            raise
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            reporter.join()
+            for session in self._sessions:
+                session.close()
+        stats = self.progress.summary()
+        logging.info(f"{self.label}: uploaded {len(disks)} disk(s), {stats['bytes']} bytes "
+                     f"in {stats['seconds']}s ({stats['mb_per_second']} MB/s)")
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+            session.verify = False
+            with self._sessions_lock:
+                self._sessions.append(session)
+        return session
+
+    def _upload_disk(self, url: str, chunks: FileChunks):
+        headers = {"Content-Type": DISK_CONTENT_TYPE}
+        # verify is passed per request: requests lets REQUESTS_CA_BUNDLE override a session's verify=False
+        stream_upload(url, chunks, method="POST", headers=headers, session=self._session(), verify=False)
+
+    def _report_progress(self):
+        while not self._stop_event.wait(LEASE_PROGRESS_INTERVAL):
+            try:
+                # 100% is only reported once every byte has been accepted
+                self.lease.HttpNfcLeaseProgress(min(99, self.progress.percent()))
+            except Exception as e:
+                logging.warning(f"Failed to update lease progress: {e}")
+                return
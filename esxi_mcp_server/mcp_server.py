@@ -1,10 +1,23 @@
 """MCP server initialization and handler registration."""
 
-import json
+import asyncio
+import logging
+from contextlib import nullcontext
+from functools import partial
+from typing import Optional, Tuple
+
 from mcp.server.lowlevel import Server
 from mcp import types
 
+from .config import Config
 from .tools import ToolHandlers
+from .dispatch import ToolDispatcher, LONG_RUNNING_TOOLS
+from .jobs import Job, progress_listener
+from .serialization import PROJECTABLE_TOOLS, ResponseSerializer, project
+from .pagination import PAGED_TOOLS
+from .federation import ManagerRegistry, UNROUTED_TOOLS
+from .soap_trace import trace_tool_call
+from .metrics import track_tool_call
 
 
 def create_mcp_server() -> Server:
@@ -12,14 +25,53 @@ def create_mcp_server() -> Server:
     return Server(name="VMware-MCP-Server", version="0.0.1")
 
 
-def register_handlers(mcp_server: Server, tool_handlers: ToolHandlers):
+class ServerResources:
+    """
+    The MCP server of one process and the vCenter sessions, worker pools and jobs behind it.
+
+    Created once per process (per worker with several HTTP workers) and
+    closed when the process shuts down, after running work has drained.
+    """
+
+    def __init__(self, config: Config):
+        self.config = config
+        # Create a VMware Manager per configured vCenter and connect them
+        self.managers = ManagerRegistry.from_config(config)
+        self.tool_handlers = ToolHandlers(self.managers, config)
+        self.dispatcher = ToolDispatcher(config)
+        self.mcp_server = create_mcp_server()
+        register_handlers(self.mcp_server, self.tool_handlers, self.dispatcher)
+
+    def drain(self):
+        """Stop accepting long-running tool calls; running calls, jobs and reads continue."""
+        self.dispatcher.drain()
+
+    def busy(self) -> Tuple[int, int]:
+        """Long-running tool calls and jobs (synchronous or asynchronous) still in progress."""
+        return self.dispatcher.running_writes(), self.tool_handlers.jobs.active()
+
+    def close(self):
+        """Cancel leftover jobs, stop the worker pools and log out of every vCenter."""
+        self.tool_handlers.jobs.shutdown()
+        self.dispatcher.shutdown(wait=False)
+        self.managers.close()
+
+
+def register_handlers(mcp_server: Server, tool_handlers: ToolHandlers,
+                      dispatcher: Optional[ToolDispatcher] = None):
     """
     Register all MCP tool and resource handlers.
     
     Args:
         mcp_server: The MCP Server instance
         tool_handlers: The ToolHandlers instance containing handler methods
+        dispatcher: Worker pools that run the synchronous handlers (created from
+            the handlers' configuration if omitted)
     """
+    if dispatcher is None:
+        dispatcher = ToolDispatcher(tool_handlers.config)
+    serializer = ResponseSerializer(tool_handlers.config.response_format)
+    
     # Define tools with proper MCP Tool schema (name, description, inputSchema only)
     tools = {
         "create_vm": types.Tool(
@@ -31,20 +83,31 @@ def register_handlers(mcp_server: Server, tool_handlers: ToolHandlers):
                     "name": {"type": "string", "description": "VM name"},
                     "cpu": {"type": "integer", "description": "Number of CPUs"},
                     "memory": {"type": "integer", "description": "Memory in MB"},
-                    "datastore": {"type": "string", "description": "Datastore name (optional)"},
-                    "network": {"type": "string", "description": "Network name (optional)"}
+                    "datastore": {"type": "string", "description": "Datastore name or inventory path (optional)"},
+                    "network": {"type": "string", "description": "Network name or inventory path (optional)"},
+                    "folder": {"type": "string", "description": "VM folder name or inventory path, e.g. /dc1/vm/web (optional)"},
+                    "resource_pool": {"type": "string", "description": "Resource pool or cluster name or inventory path, e.g. /dc1/host/cluster1/Resources/pool1 (optional)"},
+                    "anti_affinity": {"type": "string", "description": "Glob pattern of VM names the new VM must not share a host with, e.g. web-* (optional)"}
                 },
                 "required": ["name", "cpu", "memory"]
             }
         ),
         "clone_vm": types.Tool(
             name="clone_vm",
-            description="Clone a virtual machine from a template or existing VM",
+            description="Clone a virtual machine from a template or existing VM (full, linked or instant clone, optionally several at once)",
             inputSchema={
                 "type": "object",
                 "properties": {
                     "template_name": {"type": "string", "description": "Name of the template or VM to clone"},
-                    "new_name": {"type": "string", "description": "Name for the new VM"}
+                    "new_name": {"type": "string", "description": "Name for the new VM (name prefix when count > 1)"},
+                    "mode": {"type": "string", "enum": ["full", "linked", "instant"], "description": "full copies all disks; linked uses delta disks on a source snapshot; instant forks a powered-on source", "default": "full"},
+                    "snapshot_name": {"type": "string", "description": "Source snapshot for linked clones (optional, defaults to the current snapshot, created if missing)"},
+                    "count": {"type": "integer", "description": "Number of clones, named new_name-1 ... new_name-N", "default": 1},
+                    "concurrency": {"type": "integer", "description": "Maximum clone tasks in flight when count > 1 (optional)"},
+                    "datastore": {"type": "string", "description": "Datastore name or inventory path for full clones (optional)"},
+                    "folder": {"type": "string", "description": "VM folder name or inventory path (optional, defaults to the source's folder)"},
+                    "resource_pool": {"type": "string", "description": "Resource pool or cluster name or inventory path (optional, defaults to the source's pool)"},
+                    "anti_affinity": {"type": "string", "description": "Glob pattern of VM names no clone may share a host with; a batch whose names match it is spread one clone per host (optional)"}
                 },
                 "required": ["template_name", "new_name"]
             }
@@ -125,10 +188,13 @@ def register_handlers(mcp_server: Server, tool_handlers: ToolHandlers):
                     "memory": {"type": "integer", "description": "Memory in MB"},
                     "disk_size_gb": {"type": "integer", "description": "Disk size in GB", "default": 10},
                     "guest_id": {"type": "string", "description": "Guest OS identifier", "default": "otherGuest"},
-                    "datastore": {"type": "string", "description": "Datastore name (optional)"},
-                    "network": {"type": "string", "description": "Network name (optional)"},
+                    "datastore": {"type": "string", "description": "Datastore name or inventory path (optional)"},
+                    "network": {"type": "string", "description": "Network name or inventory path (optional)"},
                     "thin_provisioned": {"type": "boolean", "description": "Use thin provisioning", "default": True},
-                    "annotation": {"type": "string", "description": "VM annotation/description"}
+                    "annotation": {"type": "string", "description": "VM annotation/description"},
+                    "folder": {"type": "string", "description": "VM folder name or inventory path, e.g. /dc1/vm/web (optional)"},
+                    "resource_pool": {"type": "string", "description": "Resource pool or cluster name or inventory path, e.g. /dc1/host/cluster1/Resources/pool1 (optional)"},
+                    "anti_affinity": {"type": "string", "description": "Glob pattern of VM names the new VM must not share a host with, e.g. web-* (optional)"}
                 },
                 "required": ["name", "cpu", "memory"]
             }
@@ -205,7 +271,43 @@ def register_handlers(mcp_server: Server, tool_handlers: ToolHandlers):
         "list_performance_counters": types.Tool(
             name="list_performance_counters",
             description="List all available performance counters",
-            inputSchema={"type": "object", "properties": {}}
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "level": {"type": "integer", "description": "Only counters collected at or below this statistics level (1-4, optional)"}
+                }
+            }
+        ),
+        "get_performance_bulk": types.Tool(
+            name="get_performance_bulk",
+            description="Get performance counters for many VMs or hosts using batched multi-entity queries",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "entity_type": {"type": "string", "enum": ["vm", "host"], "description": "Type of entities to query"},
+                    "counters": {"type": "array", "items": {"type": "string"}, "description": "Counter names in group.name.rollup form (e.g. cpu.usage.average)"},
+                    "names": {"type": "array", "items": {"type": "string"}, "description": "Entity names to query"},
+                    "container": {"type": "string", "description": "Folder, datacenter, cluster or resource pool whose entities are queried (used when names is omitted)"},
+                    "interval_id": {"type": "integer", "description": "Sampling interval in seconds (20 = real-time)", "default": 20},
+                    "max_samples": {"type": "integer", "description": "Number of most recent samples per entity", "default": 1},
+                    "instance": {"type": "string", "description": "Counter instance: empty for the aggregate, '*' to sum all instances", "default": ""}
+                },
+                "required": ["entity_type", "counters"]
+            }
+        ),
+        "get_metric_history": types.Tool(
+            name="get_metric_history",
+            description="Get min/max/avg/p95 of performance counters collected in the background for a VM or host over a time window",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "entity_type": {"type": "string", "enum": ["vm", "host"], "description": "Type of entity"},
+                    "name": {"type": "string", "description": "VM or host name (must be configured for collection)"},
+                    "counters": {"type": "array", "items": {"type": "string"}, "description": "Counter names (optional, defaults to all collected counters)"},
+                    "window_seconds": {"type": "integer", "description": "Length of the trailing window in seconds", "default": 300}
+                },
+                "required": ["entity_type", "name"]
+            }
         ),
         "create_snapshot": types.Tool(
             name="create_snapshot",
@@ -305,7 +407,7 @@ def register_handlers(mcp_server: Server, tool_handlers: ToolHandlers):
             inputSchema={
                 "type": "object",
                 "properties": {
-                    "datastore_name": {"type": "string", "description": "Name of the datastore"},
+                    "datastore_name": {"type": "string", "description": "Datastore name or inventory path"},
                     "local_file_path": {"type": "string", "description": "Local file path to upload"},
                     "remote_file_path": {"type": "string", "description": "Destination path on datastore"}
                 },
@@ -314,17 +416,18 @@ def register_handlers(mcp_server: Server, tool_handlers: ToolHandlers):
         ),
         "deploy_ovf": types.Tool(
             name="deploy_ovf",
-            description="Deploy a VM from OVF and VMDK files",
+            description="Deploy a VM from OVF and VMDK files, uploading all disks in parallel",
             inputSchema={
                 "type": "object",
                 "properties": {
                     "ovf_path": {"type": "string", "description": "Path to OVF file"},
-                    "vmdk_path": {"type": "string", "description": "Path to VMDK file"},
+                    "vmdk_path": {"type": "string", "description": "Path to VMDK file (optional, defaults to the disk files next to the OVF)"},
                     "vm_name": {"type": "string", "description": "Name for the new VM (optional)"},
-                    "datastore_name": {"type": "string", "description": "Target datastore (optional)"},
-                    "resource_pool_name": {"type": "string", "description": "Target resource pool (optional)"}
+                    "datastore_name": {"type": "string", "description": "Target datastore name or inventory path (optional)"},
+                    "resource_pool_name": {"type": "string", "description": "Target resource pool or cluster name or inventory path (optional)"},
+                    "folder": {"type": "string", "description": "VM folder name or inventory path (optional)"}
                 },
-                "required": ["ovf_path", "vmdk_path"]
+                "required": ["ovf_path"]
             }
         ),
         "deploy_ova": types.Tool(
@@ -335,8 +438,9 @@ def register_handlers(mcp_server: Server, tool_handlers: ToolHandlers):
                 "properties": {
                     "ova_path": {"type": "string", "description": "Path to OVA file"},
                     "vm_name": {"type": "string", "description": "Name for the new VM (optional)"},
-                    "datastore_name": {"type": "string", "description": "Target datastore (optional)"},
-                    "resource_pool_name": {"type": "string", "description": "Target resource pool (optional)"}
+                    "datastore_name": {"type": "string", "description": "Target datastore name or inventory path (optional)"},
+                    "resource_pool_name": {"type": "string", "description": "Target resource pool or cluster name or inventory path (optional)"},
+                    "folder": {"type": "string", "description": "VM folder name or inventory path (optional)"}
                 },
                 "required": ["ova_path"]
             }
@@ -354,9 +458,130 @@ def register_handlers(mcp_server: Server, tool_handlers: ToolHandlers):
                 },
                 "required": ["object_type", "properties"]
             }
+        ),
+        "bulk_power_on": types.Tool(
+            name="bulk_power_on",
+            description="Power on many VMs selected by names, glob pattern or regex, with per-VM results",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "names": {"type": "array", "items": {"type": "string"}, "description": "Exact VM names (optional)"},
+                    "pattern": {"type": "string", "description": "Glob pattern matched against VM names, e.g. 'web-*' (optional)"},
+                    "regex": {"type": "string", "description": "Regular expression searched in VM names (optional)"},
+                    "concurrency": {"type": "integer", "description": "Maximum tasks in flight (optional, capped by server configuration)"}
+                }
+            }
+        ),
+        "bulk_power_off": types.Tool(
+            name="bulk_power_off",
+            description="Power off many VMs selected by names, glob pattern or regex, with per-VM results",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "names": {"type": "array", "items": {"type": "string"}, "description": "Exact VM names (optional)"},
+                    "pattern": {"type": "string", "description": "Glob pattern matched against VM names, e.g. 'web-*' (optional)"},
+                    "regex": {"type": "string", "description": "Regular expression searched in VM names (optional)"},
+                    "concurrency": {"type": "integer", "description": "Maximum tasks in flight (optional, capped by server configuration)"}
+                }
+            }
+        ),
+        "bulk_create_snapshot": types.Tool(
+            name="bulk_create_snapshot",
+            description="Create a snapshot on many VMs selected by names, glob pattern or regex, with per-VM results",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "snapshot_name": {"type": "string", "description": "Name of the snapshot"},
+                    "description": {"type": "string", "description": "Description of the snapshot", "default": ""},
+                    "memory": {"type": "boolean", "description": "Include memory in snapshot", "default": False},
+                    "quiesce": {"type": "boolean", "description": "Quiesce guest file system", "default": False},
+                    "names": {"type": "array", "items": {"type": "string"}, "description": "Exact VM names (optional)"},
+                    "pattern": {"type": "string", "description": "Glob pattern matched against VM names, e.g. 'web-*' (optional)"},
+                    "regex": {"type": "string", "description": "Regular expression searched in VM names (optional)"},
+                    "concurrency": {"type": "integer", "description": "Maximum tasks in flight (optional, capped by server configuration)"}
+                },
+                "required": ["snapshot_name"]
+            }
+        ),
+        "bulk_delete": types.Tool(
+            name="bulk_delete",
+            description="Delete many VMs selected by names, glob pattern or regex, with per-VM results (powered-on VMs fail)",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "names": {"type": "array", "items": {"type": "string"}, "description": "Exact VM names (optional)"},
+                    "pattern": {"type": "string", "description": "Glob pattern matched against VM names, e.g. 'web-*' (optional)"},
+                    "regex": {"type": "string", "description": "Regular expression searched in VM names (optional)"},
+                    "concurrency": {"type": "integer", "description": "Maximum tasks in flight (optional, capped by server configuration)"}
+                }
+            }
+        ),
+        "get_job": types.Tool(
+            name="get_job",
+            description="Get the status, progress and result of a job started by a long-running tool",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "job_id": {"type": "string", "description": "Job ID"}
+                },
+                "required": ["job_id"]
+            }
+        ),
+        "list_jobs": types.Tool(
+            name="list_jobs",
+            description="List jobs, newest first",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "status": {"type": "string", "enum": ["pending", "running", "succeeded", "failed", "canceled"], "description": "Only list jobs in this state (optional)"}
+                }
+            }
+        ),
+        "cancel_job": types.Tool(
+            name="cancel_job",
+            description="Cancel a pending or running job",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "job_id": {"type": "string", "description": "Job ID"}
+                },
+                "required": ["job_id"]
+            }
         )
     }
     
+    # List tools page through a server-side snapshot of their results
+    for name in PAGED_TOOLS:
+        tools[name].inputSchema["properties"].update({
+            "limit": {"type": "integer", "description": "Maximum items per page (optional; paging returns {items, total, next_cursor})"},
+            "cursor": {"type": "string", "description": "next_cursor of the previous page (optional)"},
+            "filter": {"type": "object", "description": "Field values to match; strings are glob patterns, arrays match any value, e.g. {\"power_state\": \"poweredOn\", \"name\": \"web-*\"} (optional)"},
+            "sort": {"type": "string", "description": "Field to sort by, prefixed with '-' for descending (optional)"}
+        })
+    
+    # Structured results can be narrowed to the fields a client needs
+    for name in PROJECTABLE_TOOLS:
+        tools[name].inputSchema["properties"]["fields"] = {
+            "type": "array", "items": {"type": "string"},
+            "description": "Only return these fields of each result object; dotted names select nested values (optional)"
+        }
+    
+    # Long-running tools can return a job ID instead of blocking
+    for name in LONG_RUNNING_TOOLS:
+        tools[name].inputSchema["properties"]["run_async"] = {
+            "type": "boolean",
+            "description": "Return a job ID immediately and run in the background (poll with get_job)"
+        }
+    
+    # With several vCenters, tools can be pointed at one of them
+    if len(tool_handlers.managers) > 1:
+        for name, tool in tools.items():
+            if name not in UNROUTED_TOOLS:
+                tool.inputSchema["properties"]["vcenter"] = {
+                    "type": "string", "enum": tool_handlers.managers.names(),
+                    "description": "vCenter to run against (optional; list tools query all vCenters by default)"
+                }
+    
     # Map tool names to their handler functions
     tool_handler_map = {
         "create_vm": lambda args: tool_handlers.create_vm(**args),
@@ -364,21 +589,23 @@ def register_handlers(mcp_server: Server, tool_handlers: ToolHandlers):
         "delete_vm": lambda args: tool_handlers.delete_vm(**args),
         "power_on_vm": lambda args: tool_handlers.power_on_vm(**args),
         "power_off_vm": lambda args: tool_handlers.power_off_vm(**args),
-        "list_vms": lambda args: tool_handlers.list_vms(),
+        "list_vms": lambda args: tool_handlers.list_vms(**args),
         "get_vm_details": lambda args: tool_handlers.get_vm_details(**args),
         "get_vm_performance": lambda args: tool_handlers.get_vm_performance(**args),
         "get_vm_summary_stats": lambda args: tool_handlers.get_vm_summary_stats(**args),
         "create_vm_custom": lambda args: tool_handlers.create_vm_custom(**args),
-        "list_templates": lambda args: tool_handlers.list_templates(),
-        "list_datastores": lambda args: tool_handlers.list_datastores(),
+        "list_templates": lambda args: tool_handlers.list_templates(**args),
+        "list_datastores": lambda args: tool_handlers.list_datastores(**args),
         "list_datastore_clusters": lambda args: tool_handlers.list_datastore_clusters(),
-        "list_networks": lambda args: tool_handlers.list_networks(),
-        "list_hosts": lambda args: tool_handlers.list_hosts(),
+        "list_networks": lambda args: tool_handlers.list_networks(**args),
+        "list_hosts": lambda args: tool_handlers.list_hosts(**args),
         "get_host_details": lambda args: tool_handlers.get_host_details(**args),
         "get_host_performance_metrics": lambda args: tool_handlers.get_host_performance_metrics(**args),
         "get_host_hardware_health": lambda args: tool_handlers.get_host_hardware_health(**args),
         "get_host_performance": lambda args: tool_handlers.get_host_performance(**args),
-        "list_performance_counters": lambda args: tool_handlers.list_performance_counters(),
+        "list_performance_counters": lambda args: tool_handlers.list_performance_counters(**args),
+        "get_performance_bulk": lambda args: tool_handlers.get_performance_bulk(**args),
+        "get_metric_history": lambda args: tool_handlers.get_metric_history(**args),
         "create_snapshot": lambda args: tool_handlers.create_snapshot(**args),
         "remove_snapshot": lambda args: tool_handlers.remove_snapshot(**args),
         "revert_snapshot": lambda args: tool_handlers.revert_snapshot(**args),
@@ -390,6 +617,13 @@ def register_handlers(mcp_server: Server, tool_handlers: ToolHandlers):
         "deploy_ovf": lambda args: tool_handlers.deploy_ovf(**args),
         "deploy_ova": lambda args: tool_handlers.deploy_ova(**args),
         "wait_for_updates": lambda args: tool_handlers.wait_for_updates(**args),
+        "bulk_power_on": lambda args: tool_handlers.bulk_power_on(**args),
+        "bulk_power_off": lambda args: tool_handlers.bulk_power_off(**args),
+        "bulk_create_snapshot": lambda args: tool_handlers.bulk_create_snapshot(**args),
+        "bulk_delete": lambda args: tool_handlers.bulk_delete(**args),
+        "get_job": lambda args: tool_handlers.get_job(**args),
+        "list_jobs": lambda args: tool_handlers.list_jobs(**args),
+        "cancel_job": lambda args: tool_handlers.cancel_job(**args),
     }
     
     resources = {
@@ -413,13 +647,23 @@ def register_handlers(mcp_server: Server, tool_handlers: ToolHandlers):
         if name not in tool_handler_map:
             raise ValueError(f"Unknown tool: {name}")
         
-        # Call the handler function
+        # Run the handler on a worker pool so slow vSphere calls don't block the event loop
+        arguments = dict(arguments or {})
         handler = tool_handler_map[name]
-        result = handler(arguments)
+        if name not in UNROUTED_TOOLS:
+            handler = partial(tool_handlers.run_routed, name, handler, vcenter=arguments.pop("vcenter", None))
+        fields = arguments.pop("fields", None) if name in PROJECTABLE_TOOLS else None
+        with track_tool_call(name), trace_tool_call(name) if tool_handlers.config.soap_trace else nullcontext():
+            if name in LONG_RUNNING_TOOLS:
+                progress_listener.set(_progress_notifier(mcp_server))
+                run_async = arguments.pop("run_async", None)
+                result = await dispatcher.run(name, tool_handlers.run_job, name, handler, arguments, run_async)
+            else:
+                result = await dispatcher.run(name, handler, arguments)
         
         # Return result as text content
         if isinstance(result, (dict, list)):
-            text = json.dumps(result, indent=2)
+            text = serializer.dumps(project(result, fields))
         else:
             text = str(result)
         
@@ -441,11 +685,38 @@ def register_handlers(mcp_server: Server, tool_handlers: ToolHandlers):
                 # For vmstats://{vm_name}, extract vm_name
                 if resource_name == "vmStats":
                     vm_name = uri.replace("vmstats://", "")
-                    result = tool_handlers.vm_performance_resource(vm_name)
+                    result = await dispatcher.run(
+                        "get_vm_performance", tool_handlers.run_routed, "get_vm_performance",
+                        lambda args: tool_handlers.vm_performance_resource(args["vm_name"]), {"vm_name": vm_name})
                     # Return resource content
                     return [types.TextContent(
                         type="text",
-                        text=json.dumps(result, indent=2)
+                        text=serializer.dumps(result)
                     )]
         
         raise ValueError(f"Unknown resource: {uri}")
+
+
+def _progress_notifier(mcp_server: Server):
+    """
+    Return a job listener sending MCP progress notifications for the current request.
+
+    Returns None when the client did not ask for progress (no progressToken).
+    The listener runs on worker threads, so notifications are scheduled on the
+    event loop serving the request.
+    """
+    ctx = mcp_server.request_context
+    token = ctx.meta.progressToken if ctx.meta else None
+    if token is None:
+        return None
+    loop = asyncio.get_running_loop()
+
+    def notify(job: Job):
+        future = asyncio.run_coroutine_threadsafe(
+            ctx.session.send_progress_notification(token, job.progress or 0, 100, job.message,
+                                                   related_request_id=str(ctx.request_id)),
+            loop)
+        future.add_done_callback(
+            lambda f: f.exception() and logging.debug(f"Progress notification failed: {f.exception()}"))
+
+    return notify
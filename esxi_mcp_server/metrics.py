@@ -0,0 +1,275 @@
+"""In-process metrics registry rendered in the Prometheus text format at /metrics."""
+
+import abc
+import time
+import bisect
+import weakref
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, List, Tuple, Callable, Iterable
+
+
+# Upper bounds in seconds of the tool latency histogram buckets
+TOOL_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+# Content type of the text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return f"{value:g}" if isinstance(value, float) else str(value)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[Any, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Sharded(abc.ABC):
+    """
+    Values kept in one dict per writing thread.
+
+    A thread only ever writes its own shard, so updates take no lock; the
+    lock is taken once per thread to register its shard and on collection.
+    Collection folds the shards of threads that have exited into a retired
+    total so short-lived worker threads do not accumulate.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards: List[Tuple[threading.Thread, Dict]] = []
+        self._retired: Dict = {}
+
+    def _shard(self) -> Dict:
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = {}
+            with self._lock:
+                self._shards.append((threading.current_thread(), values))
+            return values
+
+    @abc.abstractmethod
+    def _merge(self, total: Dict, values: Dict):
+        """Add the values of one shard into total."""
+
+    def _collect(self) -> Dict:
+        """Sum of all shards, keyed by label values."""
+        with self._lock:
+            live = []
+            for thread, values in self._shards:
+                if thread.is_alive():
+                    live.append((thread, values))
+                else:
+                    self._merge(self._retired, values)
+            self._shards = live
+            total: Dict = {}
+            self._merge(total, self._retired)
+            for _, values in live:
+                # dict() copies atomically under the GIL while the owner keeps writing
+                self._merge(total, dict(values))
+        return total
+
+
+class Counter(_Sharded):
+    """A monotonically increasing value per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        _Sharded.__init__(self)
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def inc(self, labels: Tuple = (), amount: float = 1):
+        values = self._shard()
+        values[labels] = values.get(labels, 0) + amount
+
+    def _merge(self, total: Dict, values: Dict):
+        for labels, value in values.items():
+            total[labels] = total.get(labels, 0) + value
+
+    def render(self) -> List[str]:
+        lines = []
+        for labels, value in sorted(self._collect().items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    """A value per label set that goes up and down (e.g. calls in flight)."""
+
+    kind = "gauge"
+
+    def dec(self, labels: Tuple = (), amount: float = 1):
+        self.inc(labels, -amount)
+
+
+class Histogram(_Sharded):
+    """Observations counted into cumulative buckets per label set, with their sum and count."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = TOOL_LATENCY_BUCKETS):
+        _Sharded.__init__(self)
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, labels: Tuple = ()):
+        values = self._shard()
+        # [count per bucket (+Inf last)..., sum]
+        counts = values.get(labels)
+        if counts is None:
+            counts = values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def _merge(self, total: Dict, values: Dict):
+        for labels, counts in values.items():
+            # The owner may be mid-update; copy its list before adding
+            counts = list(counts)
+            merged = total.get(labels)
+            if merged is None:
+                total[labels] = counts
+            else:
+                for i, count in enumerate(counts):
+                    merged[i] += count
+
+    def render(self) -> List[str]:
+        lines = []
+        for labels, counts in sorted(self._collect().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(float(bound))}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(counts[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class MetricFamily:
+    """Samples produced at collection time by a collector callback (e.g. session ages)."""
+
+    def __init__(self, name: str, kind: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.kind = kind
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.samples: List[Tuple[Tuple, float]] = []
+
+    def add(self, labels: Tuple, value: float) -> "MetricFamily":
+        self.samples.append((labels, value))
+        return self
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+                for labels, value in self.samples]
+
+
+class MetricsRegistry:
+    """
+    Instruments updated on the request path plus collectors sampled on scrape.
+
+    Collectors are held by weak reference, so an object registering a bound
+    method (a dispatcher, a vCenter registry) stops being reported once it
+    is garbage collected.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Any] = {}
+        self._collectors: List[weakref.WeakMethod] = []
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = TOOL_LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], Iterable[MetricFamily]]):
+        """Register a bound method returning MetricFamily objects on every scrape."""
+        with self._lock:
+            self._collectors.append(weakref.WeakMethod(collector))
+
+    def remove_collector(self, collector: Callable[[], Iterable[MetricFamily]]):
+        with self._lock:
+            self._collectors = [ref for ref in self._collectors if ref() not in (None, collector)]
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+            self._collectors = [ref for ref in self._collectors if ref() is not None]
+            collectors = [ref() for ref in self._collectors]
+        families = list(metrics)
+        for collector in collectors:
+            if collector is None:
+                continue
+            families.extend(collector())
+        # Families of the same name from several collectors are written under one header
+        lines = []
+        seen = {}
+        for family in families:
+            body = family.render()
+            if family.name in seen:
+                seen[family.name].extend(body)
+                continue
+            block = [f"# HELP {family.name} {family.documentation}", f"# TYPE {family.name} {family.kind}"]
+            block.extend(body)
+            seen[family.name] = block
+            lines.append(block)
+        return "\n".join(line for block in lines for line in block) + "\n"
+
+
+# Metrics of this process
+registry = MetricsRegistry()
+
+TOOL_CALLS = registry.counter("esxi_mcp_tool_calls_total", "Tool calls by tool", ("tool",))
+TOOL_ERRORS = registry.counter("esxi_mcp_tool_errors_total", "Tool calls that failed, by tool", ("tool",))
+TOOL_IN_FLIGHT = registry.gauge("esxi_mcp_tool_calls_in_flight", "Tool calls currently running, by tool", ("tool",))
+TOOL_LATENCY = registry.histogram("esxi_mcp_tool_duration_seconds", "Tool call latency in seconds, by tool",
+                                  ("tool",))
+
+
+@contextmanager
+def track_tool_call(tool: str):
+    """Count a tool call, its outcome and duration, and hold it in the in-flight gauge while it runs."""
+    labels = (tool,)
+    TOOL_CALLS.inc(labels)
+    TOOL_IN_FLIGHT.inc(labels)
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        TOOL_ERRORS.inc(labels)
+        raise
+    finally:
+        TOOL_LATENCY.observe(time.perf_counter() - started, labels)
+        TOOL_IN_FLIGHT.dec(labels)
+
@@ -0,0 +1,138 @@
+"""Filtering, sorting and cursor-based paging of list tool results."""
+
+import time
+import uuid
+import fnmatch
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List
+
+
+# List tools that accept limit, cursor, filter and sort
+PAGED_TOOLS = {
+    "list_vms",
+    "list_templates",
+    "list_hosts",
+    "list_datastores",
+    "list_networks",
+    "list_performance_counters",
+}
+
+
+def _matches(value: Any, expected: Any) -> bool:
+    if isinstance(expected, list):
+        return any(_matches(value, e) for e in expected)
+    if isinstance(expected, str):
+        return value is not None and fnmatch.fnmatchcase(str(value), expected)
+    return value == expected
+
+
+def filter_rows(rows: List[Dict[str, Any]], filters: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Keep the rows matching every field of filters.
+
+    String values are glob patterns matched against the field's string
+    form, lists match any of their values and other values must be equal.
+    """
+    if not filters:
+        return rows
+    return [row for row in rows if all(_matches(row.get(k), v) for k, v in filters.items())]
+
+
+def sort_rows(rows: List[Dict[str, Any]], sort: Optional[str]) -> List[Dict[str, Any]]:
+    """Sort rows by a field name, descending when prefixed with '-'; missing values sort last."""
+    if not sort:
+        return rows
+    descending = sort.startswith("-")
+    key = sort.lstrip("-")
+    present = [row for row in rows if row.get(key) is not None]
+    missing = [row for row in rows if row.get(key) is None]
+    try:
+        present.sort(key=lambda row: row[key], reverse=descending)
+    except TypeError:
+        # Mixed value types; fall back to comparing string forms
+        present.sort(key=lambda row: str(row[key]), reverse=descending)
+    return present + missing
+
+
+class _Snapshot:
+    __slots__ = ("tool", "rows", "limit", "expires")
+
+    def __init__(self, tool: str, rows: List[Dict[str, Any]], limit: int, expires: float):
+        self.tool = tool
+        self.rows = rows
+        self.limit = limit
+        self.expires = expires
+
+
+class CursorStore:
+    """
+    Server-side snapshots of filtered and sorted result sets.
+
+    The first request for a list computes the full result once; later pages
+    are sliced from the stored snapshot, so paging neither re-walks the
+    inventory nor shifts when objects change in between. Cursors encode
+    their offset, so repeating a request returns the same page. Snapshots
+    expire ttl seconds after their last use; at most max_cursors are kept.
+    """
+
+    def __init__(self, ttl: int = 300, max_cursors: int = 256):
+        self.ttl = ttl
+        self.max_cursors = max_cursors
+        self._snapshots: "OrderedDict[str, _Snapshot]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def page(self, tool: str, rows: List[Dict[str, Any]], limit: int,
+             filters: Optional[Dict[str, Any]] = None, sort: Optional[str] = None) -> Dict[str, Any]:
+        """Filter and sort rows and return the first page, storing the rest behind a cursor."""
+        if limit < 1:
+            raise Exception("limit must be at least 1")
+        rows = sort_rows(filter_rows(rows, filters), sort)
+        snapshot_id = None
+        if len(rows) > limit:
+            snapshot_id = uuid.uuid4().hex
+            with self._lock:
+                self._purge()
+                self._snapshots[snapshot_id] = _Snapshot(tool, rows, limit, time.monotonic() + self.ttl)
+                while len(self._snapshots) > self.max_cursors:
+                    self._snapshots.popitem(last=False)
+        return self._slice(snapshot_id, rows, 0, limit)
+
+    def next(self, tool: str, cursor: str, limit: Optional[int] = None) -> Dict[str, Any]:
+        """Return the page a cursor of the given tool points at."""
+        if limit is not None and limit < 1:
+            raise Exception("limit must be at least 1")
+        try:
+            snapshot_id, offset = cursor.rsplit(".", 1)
+            offset = int(offset)
+        except ValueError:
+            raise Exception(f"Invalid cursor: {cursor}")
+        if offset < 0:
+            raise Exception(f"Invalid cursor: {cursor}")
+        with self._lock:
+            self._purge()
+            snapshot = self._snapshots.get(snapshot_id)
+            if snapshot is None:
+                raise Exception("Cursor expired or unknown; repeat the request without a cursor")
+            if snapshot.tool != tool:
+                raise Exception(f"Cursor belongs to {snapshot.tool}, not {tool}")
+            if offset > len(snapshot.rows):
+                raise Exception(f"Invalid cursor: {cursor}")
+            snapshot.expires = time.monotonic() + self.ttl
+            self._snapshots.move_to_end(snapshot_id)
+        return self._slice(snapshot_id, snapshot.rows, offset, limit or snapshot.limit)
+
+    def _slice(self, snapshot_id: Optional[str], rows: List[Dict[str, Any]], offset: int, limit: int) -> Dict[str, Any]:
+        end = offset + limit
+        has_more = snapshot_id is not None and end < len(rows)
+        return {
+            "items": rows[offset:end],
+            "total": len(rows),
+            "next_cursor": f"{snapshot_id}.{end}" if has_more else None,
+        }
+
+    def _purge(self):
+        now = time.monotonic()
+        expired = [sid for sid, s in self._snapshots.items() if s.expires < now]
+        for sid in expired:
+            del self._snapshots[sid]
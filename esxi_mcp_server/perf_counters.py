@@ -0,0 +1,102 @@
+"""Cached, indexed catalog of vSphere performance counters."""
+
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Iterable
+
+
+# Number of entities whose available-metric lists are cached
+AVAILABILITY_CACHE_SIZE = 1024
+
+
+def counter_full_name(counter) -> str:
+    """Return the group.name.rollup identifier of a PerfCounterInfo."""
+    return f"{counter.groupInfo.key}.{counter.nameInfo.key}.{counter.rollupType}"
+
+
+class PerfCounterCatalog:
+    """
+    Performance counters of one session, indexed by group.name.rollup and by key.
+
+    The PerformanceManager's counter list is read once on first use; the
+    manager replaces the catalog when it reconnects.
+    """
+
+    def __init__(self, perf_manager):
+        self.perf_manager = perf_manager
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._by_name: Dict[str, Any] = {}
+        self._by_key: Dict[int, Any] = {}
+        self._info: List[Dict[str, Any]] = []
+        self._availability: "OrderedDict[tuple, frozenset]" = OrderedDict()
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            counters = self.perf_manager.perfCounter
+            for counter in counters:
+                self._by_key[counter.key] = counter
+                self._by_name[counter_full_name(counter)] = counter
+                self._info.append({
+                    "key": counter.key,
+                    "group": counter.groupInfo.key,
+                    "name": counter.nameInfo.key,
+                    "rollup_type": str(counter.rollupType),
+                    "stats_type": str(counter.statsType),
+                    "unit": counter.unitInfo.key,
+                    "description": counter.nameInfo.summary if counter.nameInfo else "",
+                    "level": counter.level,
+                    "per_device_level": counter.perDeviceLevel,
+                })
+            self._loaded = True
+            logging.info(f"Loaded {len(self._info)} performance counters")
+
+    def key(self, name: str) -> Optional[int]:
+        """Return the counter key for a group.name.rollup name, or None if unknown."""
+        self._ensure_loaded()
+        counter = self._by_name.get(name)
+        return counter.key if counter else None
+
+    def keys(self, names: Iterable[str]) -> Dict[str, int]:
+        """Map each known group.name.rollup name to its counter key, skipping unknown names."""
+        self._ensure_loaded()
+        return {name: self._by_name[name].key for name in names if name in self._by_name}
+
+    def name(self, key: int) -> Optional[str]:
+        """Return the group.name.rollup name of a counter key, or None if unknown."""
+        self._ensure_loaded()
+        counter = self._by_key.get(key)
+        return counter_full_name(counter) if counter else None
+
+    def counter(self, key: int):
+        """Return the PerfCounterInfo for a counter key, or None if unknown."""
+        self._ensure_loaded()
+        return self._by_key.get(key)
+
+    def counters(self, level: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Describe all counters, optionally only those collected at or below a statistics level."""
+        self._ensure_loaded()
+        if level is None:
+            return list(self._info)
+        return [info for info in self._info if info["level"] is not None and info["level"] <= level]
+
+    def available(self, entity, interval_id: Optional[int] = None) -> frozenset:
+        """Return the counter keys the server collects for an entity, cached per entity and interval."""
+        cache_key = (entity._moId, interval_id)
+        with self._lock:
+            keys = self._availability.get(cache_key)
+            if keys is not None:
+                self._availability.move_to_end(cache_key)
+                return keys
+        metrics = self.perf_manager.QueryAvailablePerfMetric(entity=entity, intervalId=interval_id)
+        keys = frozenset(m.counterId for m in metrics)
+        with self._lock:
+            self._availability[cache_key] = keys
+            if len(self._availability) > AVAILABILITY_CACHE_SIZE:
+                self._availability.popitem(last=False)
+        return keys
@@ -0,0 +1,211 @@
+"""Load-aware choice of host and datastore for new VMs, with reservations for creations in flight."""
+
+import logging
+import threading
+from typing import Optional, Dict, List, Set
+
+from pyVmomi import vim
+
+from .inventory import InventoryEntry, TRACKED_PROPERTIES
+
+
+# Properties the engine scores on; the inventory cache mirrors the same ones
+HOST_PROPERTIES = TRACKED_PROPERTIES[vim.HostSystem]
+DATASTORE_PROPERTIES = TRACKED_PROPERTIES[vim.Datastore]
+
+
+class Reservation:
+    """
+    Capacity held on a host and datastore until the creation it was made for finishes.
+
+    A reservation without an engine only carries a fixed placement and holds nothing.
+    """
+
+    __slots__ = ("engine", "host", "datastore", "memory_mb", "disk_bytes", "group", "released")
+
+    def __init__(self, engine: "PlacementEngine", host, datastore, memory_mb: int, disk_bytes: int,
+                 group: Optional[str]):
+        self.engine = engine
+        self.host = host
+        self.datastore = datastore
+        self.memory_mb = memory_mb
+        self.disk_bytes = disk_bytes
+        self.group = group
+        self.released = False
+
+    def release(self):
+        if self.engine is not None:
+            self.engine._release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class PlacementEngine:
+    """
+    Score candidate hosts and datastores and reserve capacity for the winner.
+
+    Hosts must be connected and out of maintenance mode and keep
+    cpu_headroom and memory_headroom percent of their capacity free after
+    counting the new VM's memory and the memory reserved by creations still
+    in flight; the host with the lowest resulting CPU or memory utilization
+    wins. Datastores must be accessible from the chosen host and keep
+    datastore_reserve percent free after the new disks and pending
+    reservations; the one with the most free space left wins. Hosts running
+    a VM of the same anti-affinity group, or holding an in-flight
+    reservation for it, are skipped. Reservations are made under a lock
+    together with the choice, so concurrent creations spread out instead of
+    all picking the same "best" host from the same stale statistics.
+    """
+
+    def __init__(self, datastore_reserve: int = 10, cpu_headroom: int = 10, memory_headroom: int = 10):
+        self.datastore_reserve = datastore_reserve / 100
+        self.cpu_headroom = cpu_headroom / 100
+        self.memory_headroom = memory_headroom / 100
+        self._lock = threading.Lock()
+        self._reserved_memory: Dict[str, int] = {}    # Host moid -> MB
+        self._reserved_disk: Dict[str, int] = {}      # Datastore moid -> bytes
+        self._reserved_groups: Dict[str, Dict[str, int]] = {}  # Host moid -> group -> count
+
+    def place(self, hosts: List[InventoryEntry], datastores: List[InventoryEntry], memory_mb: int = 0,
+              disk_bytes: int = 0, group: Optional[str] = None, group_hosts: Optional[Set[str]] = None,
+              datastore=None) -> Reservation:
+        """
+        Choose a host and datastore and reserve capacity on them.
+
+        Args:
+            hosts: Candidate hosts with HOST_PROPERTIES
+            datastores: Candidate datastores with DATASTORE_PROPERTIES
+            memory_mb: Memory of the new VM
+            disk_bytes: Disk space the new VM will use
+            group: Anti-affinity group of the new VM
+            group_hosts: Moids of hosts already running a VM of the group
+            datastore: Fixed datastore; only hosts that mount it are considered
+
+        Returns:
+            A Reservation to release once the creation has finished
+
+        Raises:
+            Exception: If no host or datastore satisfies the constraints
+        """
+        datastore_entries = {e.obj._moId: e for e in datastores}
+        with self._lock:
+            host_scores = []
+            rejected: Dict[str, str] = {}
+            for entry in hosts:
+                reason = self._host_rejection(entry, memory_mb, group, group_hosts or set())
+                if reason:
+                    rejected[entry.name or entry.obj._moId] = reason
+                    continue
+                host_scores.append((self._host_score(entry, memory_mb), entry))
+            if not host_scores:
+                details = "; ".join(f"{name}: {reason}" for name, reason in rejected.items())
+                raise Exception(f"No host satisfies the placement constraints ({details or 'no candidate hosts'})")
+            host_scores.sort(key=lambda item: item[0], reverse=True)
+
+            for _, host in host_scores:
+                mounted = {ds._moId for ds in host.props.get("datastore") or []}
+                if datastore is not None:
+                    if datastore._moId not in mounted:
+                        continue
+                    chosen = datastore
+                else:
+                    candidates = [datastore_entries[moid] for moid in mounted if moid in datastore_entries]
+                    best = self._best_datastore(candidates, disk_bytes)
+                    if best is None:
+                        continue
+                    chosen = best.obj
+                reservation = Reservation(self, host.obj, chosen, memory_mb, disk_bytes, group)
+                self._hold(reservation)
+                chosen_entry = datastore_entries.get(chosen._moId)
+                logging.info(f"Placing new VM on host {host.name} and datastore "
+                             f"{chosen_entry.name if chosen_entry else chosen._moId}")
+                return reservation
+        if datastore is not None:
+            raise Exception("No eligible host mounts the requested datastore")
+        raise Exception(f"No datastore keeps {self.datastore_reserve:.0%} free after "
+                        f"{disk_bytes / 1073741824:.1f} GB on any eligible host")
+
+    def _host_rejection(self, entry: InventoryEntry, memory_mb: int, group: Optional[str],
+                        group_hosts: Set[str]) -> Optional[str]:
+        props = entry.props
+        moid = entry.obj._moId
+        if str(props.get("runtime.connectionState")) != "connected":
+            return "not connected"
+        if props.get("runtime.inMaintenanceMode"):
+            return "in maintenance mode"
+        if group is not None and (moid in group_hosts or self._reserved_groups.get(moid, {}).get(group)):
+            return f"already runs a VM of anti-affinity group {group}"
+        cpu_used, cpu_capacity, memory_used, memory_capacity = self._host_load(entry, memory_mb)
+        # Hosts that have not reported their hardware yet stay eligible with the lowest score
+        if cpu_capacity and cpu_used / cpu_capacity > 1 - self.cpu_headroom:
+            return f"CPU {cpu_used / cpu_capacity:.0%} used"
+        if memory_capacity and memory_used / memory_capacity > 1 - self.memory_headroom:
+            return f"memory {memory_used / memory_capacity:.0%} used after placement"
+        return None
+
+    def _host_load(self, entry: InventoryEntry, memory_mb: int):
+        """Return (cpu used MHz, cpu capacity MHz, memory used MB incl. reservations, memory capacity MB)."""
+        props = entry.props
+        cpu_capacity = (props.get("summary.hardware.cpuMhz") or 0) * (props.get("summary.hardware.numCpuCores") or 0)
+        cpu_used = props.get("summary.quickStats.overallCpuUsage") or 0
+        memory_capacity = (props.get("summary.hardware.memorySize") or 0) // 1048576
+        memory_used = ((props.get("summary.quickStats.overallMemoryUsage") or 0)
+                       + self._reserved_memory.get(entry.obj._moId, 0) + memory_mb)
+        return cpu_used, cpu_capacity, memory_used, memory_capacity
+
+    def _host_score(self, entry: InventoryEntry, memory_mb: int) -> float:
+        cpu_used, cpu_capacity, memory_used, memory_capacity = self._host_load(entry, memory_mb)
+        if not cpu_capacity or not memory_capacity:
+            return 0.0
+        return 1 - max(cpu_used / cpu_capacity, memory_used / memory_capacity)
+
+    def _best_datastore(self, entries: List[InventoryEntry], disk_bytes: int) -> Optional[InventoryEntry]:
+        best, best_free = None, None
+        for entry in entries:
+            props = entry.props
+            capacity = props.get("summary.capacity") or 0
+            if not props.get("summary.accessible") or not capacity:
+                continue
+            free = (props.get("summary.freeSpace") or 0) - self._reserved_disk.get(entry.obj._moId, 0) - disk_bytes
+            if free < capacity * self.datastore_reserve:
+                continue
+            if best is None or free / capacity > best_free:
+                best, best_free = entry, free / capacity
+        return best
+
+    @staticmethod
+    def _adjust(counters: Dict[str, int], key: str, amount: int):
+        """Add amount to a reservation counter, dropping the key once nothing is held."""
+        if not amount:
+            return
+        total = counters.get(key, 0) + amount
+        if total > 0:
+            counters[key] = total
+        else:
+            counters.pop(key, None)
+
+    def _hold(self, reservation: Reservation):
+        host_id, datastore_id = reservation.host._moId, reservation.datastore._moId
+        self._adjust(self._reserved_memory, host_id, reservation.memory_mb)
+        self._adjust(self._reserved_disk, datastore_id, reservation.disk_bytes)
+        if reservation.group is not None:
+            groups = self._reserved_groups.setdefault(host_id, {})
+            self._adjust(groups, reservation.group, 1)
+
+    def _release(self, reservation: Reservation):
+        with self._lock:
+            if reservation.released:
+                return
+            reservation.released = True
+            host_id, datastore_id = reservation.host._moId, reservation.datastore._moId
+            self._adjust(self._reserved_memory, host_id, -reservation.memory_mb)
+            self._adjust(self._reserved_disk, datastore_id, -reservation.disk_bytes)
+            if reservation.group is not None:
+                groups = self._reserved_groups.get(host_id, {})
+                self._adjust(groups, reservation.group, -1)
+                if not groups:
+                    self._reserved_groups.pop(host_id, None)
@@ -0,0 +1,101 @@
+"""Serialization of tool results into MCP text content."""
+
+import json
+import logging
+from typing import Any, List, Optional
+
+try:
+    import orjson
+except ImportError:  # Optional faster backend
+    orjson = None
+
+
+# Supported values of the response_format setting
+RESPONSE_FORMATS = ("compact", "pretty")
+
+# Tools whose dict or list-of-dict results can be narrowed with a fields argument
+PROJECTABLE_TOOLS = {
+    "list_vms",
+    "list_templates",
+    "list_hosts",
+    "get_vm_details",
+    "get_vm_performance",
+    "get_vm_summary_stats",
+    "list_datastores",
+    "list_datastore_clusters",
+    "list_networks",
+    "get_host_details",
+    "get_host_performance_metrics",
+    "get_host_hardware_health",
+    "get_host_performance",
+    "list_performance_counters",
+    "get_performance_bulk",
+    "get_metric_history",
+    "list_snapshots",
+    "list_jobs",
+}
+
+
+class ResponseSerializer:
+    """
+    Encode tool results as JSON text.
+
+    "compact" output has no indentation or separator padding; "pretty"
+    indents by two spaces. orjson is used when it is installed, falling
+    back to the standard library for values it cannot encode.
+    """
+
+    def __init__(self, response_format: str = "compact"):
+        if response_format not in RESPONSE_FORMATS:
+            raise ValueError(f"Invalid response_format: {response_format}. "
+                             f"Use one of: {', '.join(RESPONSE_FORMATS)}")
+        self.pretty = response_format == "pretty"
+        self.backend = "orjson" if orjson is not None else "json"
+        if orjson is not None:
+            self._orjson_options = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if self.pretty else 0)
+        logging.info(f"Serializing responses as {response_format} JSON with {self.backend}")
+
+    def dumps(self, obj: Any) -> str:
+        if orjson is not None:
+            try:
+                return orjson.dumps(obj, default=str, option=self._orjson_options).decode()
+            except TypeError:
+                # e.g. integers beyond 64 bits
+                pass
+        if self.pretty:
+            return json.dumps(obj, indent=2, default=str)
+        return json.dumps(obj, separators=(",", ":"), default=str)
+
+
+def _pick(value: Any, path: List[str]) -> Any:
+    for key in path:
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+
+def project(result: Any, fields: Optional[List[str]]) -> Any:
+    """
+    Keep only the named fields of a dict, or of each dict in a list.
+
+    Dotted names select nested values ("summary.capacity") and are returned
+    under the dotted name. Missing fields are returned as None; values that
+    are not dicts pass through unchanged.
+    """
+    if not fields:
+        return result
+    if isinstance(result, dict) and "items" in result and "next_cursor" in result:
+        # A page of a list tool; project its items
+        return dict(result, items=project(result["items"], fields))
+    if isinstance(result, list):
+        return [project(item, fields) for item in result]
+    if not isinstance(result, dict):
+        return result
+    projected = {}
+    for field in fields:
+        if field in result:
+            projected[field] = result[field]
+        else:
+            projected[field] = _pick(result, field.split("."))
+    return projected
@@ -0,0 +1,163 @@
+"""Pool of authenticated vCenter/ESXi sessions for concurrent tool calls."""
+
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Callable, List, Optional
+
+from pyVim import connect
+from pyVmomi import vim
+
+
+class PooledSession:
+    """An authenticated ServiceInstance owned by the pool."""
+
+    __slots__ = ("si", "content", "created_at", "last_used")
+
+    def __init__(self, si):
+        self.si = si
+        self.content = si.RetrieveContent()
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class SessionPool:
+    """
+    Fixed-size pool of ServiceInstance sessions with checkout/checkin.
+
+    Sessions are opened lazily up to the configured size and handed out
+    without a liveness round-trip; a session whose call fails with a
+    connection error or NotAuthenticated is discarded on checkin. Health
+    checks of idle sessions and eviction of sessions idle longer than
+    idle_timeout happen in keepalive(), which is meant to run off the
+    request path.
+    """
+
+    def __init__(self, connect_fn: Callable[[], object], size: int, idle_timeout: float = 300):
+        self._connect = connect_fn
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self._cond = threading.Condition()
+        self._idle: List[PooledSession] = []
+        self._total = 0
+        self._closed = False
+
+    def checkout(self, timeout: Optional[float] = None) -> PooledSession:
+        """Take a session from the pool, opening one if below the size limit."""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._cond:
+            while not self._idle and self._total >= self.size:
+                if self._closed:
+                    raise Exception("Session pool is closed")
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError("Timed out waiting for a vCenter session")
+                self._cond.wait(remaining)
+            if self._closed:
+                raise Exception("Session pool is closed")
+            # Most recently used sessions are reused first so surplus ones can go idle
+            if self._idle:
+                return self._idle.pop()
+            self._total += 1
+        return self._open()
+
+    def checkin(self, session: PooledSession, discard: bool = False):
+        """Return a session to the pool, or log it out when it is known to be broken."""
+        if discard:
+            self._discard(session)
+            return
+        session.last_used = time.monotonic()
+        with self._cond:
+            if self._closed:
+                self._total -= 1
+            else:
+                self._idle.append(session)
+                self._cond.notify()
+                return
+        self._logout(session)
+
+    @contextmanager
+    def session(self, timeout: Optional[float] = None):
+        """Check out a session for the duration of a with-block."""
+        session = self.checkout(timeout)
+        try:
+            yield session
+        except (vim.fault.NotAuthenticated, ConnectionError, OSError):
+            self.checkin(session, discard=True)
+            raise
+        except BaseException:
+            self.checkin(session)
+            raise
+        else:
+            self.checkin(session)
+
+    def evict_idle(self):
+        """Log out sessions that have been idle for longer than idle_timeout."""
+        cutoff = time.monotonic() - self.idle_timeout
+        with self._cond:
+            expired = [s for s in self._idle if s.last_used < cutoff]
+            self._idle = [s for s in self._idle if s.last_used >= cutoff]
+            self._total -= len(expired)
+            if expired:
+                self._cond.notify_all()
+        for session in expired:
+            self._logout(session)
+        if expired:
+            logging.info(f"Evicted {len(expired)} idle vCenter session(s)")
+
+    def keepalive(self):
+        """Evict idle sessions and drop any remaining idle session that fails a CurrentTime() check."""
+        self.evict_idle()
+        with self._cond:
+            idle = list(self._idle)
+        for session in idle:
+            try:
+                session.si.CurrentTime()
+            except Exception as e:
+                logging.warning(f"Pooled vCenter session failed health check: {e}")
+                with self._cond:
+                    if session not in self._idle:
+                        # Checked out meanwhile; its user will discard it on failure
+                        continue
+                    self._idle.remove(session)
+                self._discard(session)
+
+    def close(self):
+        """Log out all idle sessions; sessions still checked out are logged out on checkin."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._total -= len(idle)
+            self._cond.notify_all()
+        for session in idle:
+            self._logout(session)
+
+    def stats(self) -> dict:
+        """Return the number of open and idle sessions."""
+        with self._cond:
+            return {"size": self.size, "open": self._total, "idle": len(self._idle)}
+
+    def _open(self) -> PooledSession:
+        try:
+            session = PooledSession(self._connect())
+        except Exception:
+            with self._cond:
+                self._total -= 1
+                self._cond.notify()
+            raise
+        logging.info("Opened pooled vCenter session")
+        return session
+
+    def _discard(self, session: PooledSession):
+        with self._cond:
+            self._total -= 1
+            self._cond.notify()
+        self._logout(session)
+
+    @staticmethod
+    def _logout(session: PooledSession):
+        try:
+            connect.Disconnect(session.si)
+        except Exception:
+            pass
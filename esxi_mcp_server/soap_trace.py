@@ -0,0 +1,220 @@
+"""Accounting of vSphere SOAP requests, bytes and time per MCP tool call and vSphere method."""
+
+import json
+import time
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from http.client import HTTPResponse
+from typing import Optional, Dict, Any, List
+
+from .metrics import registry
+
+
+# Tool label of SOAP requests made outside any tool call (keepalives, inventory cache, task waiter, collectors)
+BACKGROUND_TOOL = "background"
+
+# Positions in the per-method counter lists
+REQUESTS, ERRORS, BYTES_SENT, BYTES_RECEIVED, SECONDS = range(5)
+
+
+def _new_counters() -> List[float]:
+    return [0, 0, 0, 0, 0.0]
+
+
+class CallTrace:
+    """SOAP traffic of one tool call, by vSphere method."""
+
+    __slots__ = ("tool", "started", "methods", "_lock")
+
+    def __init__(self, tool: str):
+        self.tool = tool
+        self.started = time.perf_counter()
+        self.methods: Dict[str, List[float]] = {}
+        # Bulk tools issue requests from several threads at once
+        self._lock = threading.Lock()
+
+    def add(self, method: str, failed: bool, sent: int, received: int, seconds: float):
+        with self._lock:
+            counters = self.methods.get(method)
+            if counters is None:
+                counters = self.methods[method] = _new_counters()
+            counters[REQUESTS] += 1
+            counters[ERRORS] += failed
+            counters[BYTES_SENT] += sent
+            counters[BYTES_RECEIVED] += received
+            counters[SECONDS] += seconds
+
+    def summary(self) -> Dict[str, Any]:
+        """Totals and per-method counts of the call, for the structured log."""
+        with self._lock:
+            methods = {method: list(counters) for method, counters in self.methods.items()}
+        totals = [sum(counters[i] for counters in methods.values()) for i in range(SECONDS + 1)]
+        return {
+            "tool": self.tool,
+            "elapsed_ms": round((time.perf_counter() - self.started) * 1000, 1),
+            "soap_requests": totals[REQUESTS],
+            "soap_errors": totals[ERRORS],
+            "soap_bytes_sent": totals[BYTES_SENT],
+            "soap_bytes_received": totals[BYTES_RECEIVED],
+            "soap_ms": round(totals[SECONDS] * 1000, 1),
+            "methods": {method: counters[REQUESTS] for method, counters in
+                        sorted(methods.items(), key=lambda item: -item[1][REQUESTS])},
+        }
+
+
+# Process-wide SOAP totals by (tool, vSphere method), updated without a lock on the request path
+_LABELS = ("tool", "method")
+SOAP_REQUESTS = registry.counter("esxi_mcp_soap_requests_total",
+                                 "vSphere SOAP requests by tool and vSphere method", _LABELS)
+SOAP_ERRORS = registry.counter("esxi_mcp_soap_request_errors_total",
+                               "vSphere SOAP requests that failed by tool and vSphere method", _LABELS)
+SOAP_BYTES_SENT = registry.counter("esxi_mcp_soap_sent_bytes_total",
+                                   "Bytes of SOAP request bodies by tool and vSphere method", _LABELS)
+SOAP_BYTES_RECEIVED = registry.counter("esxi_mcp_soap_received_bytes_total",
+                                       "Bytes of SOAP response bodies by tool and vSphere method", _LABELS)
+SOAP_SECONDS = registry.counter("esxi_mcp_soap_request_seconds_total",
+                                "Time spent in SOAP requests by tool and vSphere method", _LABELS)
+
+
+def _record(tool: str, method: str, failed: bool, sent: int, received: int, seconds: float):
+    labels = (tool, method)
+    SOAP_REQUESTS.inc(labels)
+    if failed:
+        SOAP_ERRORS.inc(labels)
+    SOAP_BYTES_SENT.inc(labels, sent)
+    SOAP_BYTES_RECEIVED.inc(labels, received)
+    SOAP_SECONDS.inc(labels, seconds)
+
+
+# Trace of the tool call running in the current context
+_current_trace: contextvars.ContextVar[Optional[CallTrace]] = contextvars.ContextVar("soap_trace", default=None)
+
+# Byte counts of the SOAP request in progress on this thread: [sent, received]
+_in_flight = threading.local()
+
+
+@contextmanager
+def trace_tool_call(tool: str):
+    """
+    Attribute SOAP requests made while the block runs to a tool call, then log them.
+
+    The trace is held in a context variable, so requests made on worker
+    threads that copy the caller's context (dispatcher pools, jobs, bulk
+    operations) are counted too. One JSON log line is written per call.
+    """
+    trace = CallTrace(tool)
+    token = _current_trace.set(trace)
+    status = "error"
+    try:
+        yield trace
+        status = "ok"
+    finally:
+        _current_trace.reset(token)
+        summary = trace.summary()
+        summary["status"] = status
+        logging.info(f"tool_call {json.dumps(summary, separators=(',', ':'))}")
+
+
+class _CountingReader:
+    """File object wrapper adding the bytes read to the SOAP request in progress."""
+
+    def __init__(self, fp):
+        self._fp = fp
+
+    def _count(self, size: int):
+        counts = getattr(_in_flight, "counts", None)
+        if counts is not None:
+            counts[1] += size
+
+    def read(self, *args):
+        data = self._fp.read(*args)
+        self._count(len(data))
+        return data
+
+    def read1(self, *args):
+        data = self._fp.read1(*args)
+        self._count(len(data))
+        return data
+
+    def readline(self, *args):
+        data = self._fp.readline(*args)
+        self._count(len(data))
+        return data
+
+    def readinto(self, buffer):
+        size = self._fp.readinto(buffer)
+        self._count(size or 0)
+        return size
+
+    def __getattr__(self, name):
+        return getattr(self._fp, name)
+
+
+class _CountingResponse(HTTPResponse):
+    """HTTPResponse whose body reads (after the headers) are counted."""
+
+    def begin(self):
+        HTTPResponse.begin(self)
+        if self.fp is not None:
+            self.fp = _CountingReader(self.fp)
+
+
+def _method_label(mo, info, args) -> str:
+    """vSphere method name; property reads are labelled with the property, e.g. Fetch:VirtualMachine.summary."""
+    if info.wsdlName == "Fetch" and args:
+        return f"Fetch:{getattr(mo, '_wsdlName', type(mo).__name__)}.{args[0]}"
+    return info.wsdlName
+
+
+def instrument_stub(stub):
+    """
+    Count the SOAP requests of a pyVmomi SoapStubAdapter.
+
+    Every method call and property read goes through stub.InvokeMethod; it is
+    wrapped on the instance to time the request and attribute it to the
+    current tool call. Request bytes are taken from the serialized body
+    (a request modifier), response bytes from the body read off the
+    connection. Stubs that are already instrumented are left alone.
+    """
+    if getattr(stub, "_soap_trace", False):
+        return stub
+    invoke = stub.InvokeMethod
+    get_connection = stub.GetConnection
+
+    def count_request(body):
+        counts = getattr(_in_flight, "counts", None)
+        if counts is not None:
+            counts[0] += len(body)
+        return body
+
+    def counting_connection():
+        conn = get_connection()
+        if getattr(conn, "response_class", None) is HTTPResponse:
+            conn.response_class = _CountingResponse
+        return conn
+
+    def invoke_method(mo, info, args, outerStub=None):
+        counts = _in_flight.counts = [0, 0]
+        failed = True
+        started = time.perf_counter()
+        try:
+            result = invoke(mo, info, args, outerStub)
+            failed = False
+            return result
+        finally:
+            seconds = time.perf_counter() - started
+            _in_flight.counts = None
+            method = _method_label(mo, info, args)
+            trace = _current_trace.get()
+            tool = trace.tool if trace is not None else BACKGROUND_TOOL
+            _record(tool, method, failed, counts[0], counts[1], seconds)
+            if trace is not None:
+                trace.add(method, failed, counts[0], counts[1], seconds)
+
+    stub.requestModifierList.append(count_request)
+    stub.GetConnection = counting_connection
+    stub.InvokeMethod = invoke_method
+    stub._soap_trace = True
+    return stub
@@ -0,0 +1,156 @@
+"""Background collection of performance counters into in-memory ring buffers."""
+
+import math
+import time
+import logging
+import threading
+from array import array
+from typing import Optional, Dict, Any, List, Tuple
+
+from pyVmomi import vim
+
+
+class RingBuffer:
+    """Fixed-capacity time series of (timestamp, value) pairs backed by two float arrays."""
+
+    __slots__ = ("capacity", "_times", "_values", "_next", "_count")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._times = array("d", bytes(8 * capacity))
+        self._values = array("d", bytes(8 * capacity))
+        self._next = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def last_timestamp(self) -> Optional[float]:
+        if not self._count:
+            return None
+        return self._times[(self._next - 1) % self.capacity]
+
+    def append(self, timestamp: float, value: float):
+        self._times[self._next] = timestamp
+        self._values[self._next] = value
+        self._next = (self._next + 1) % self.capacity
+        if self._count < self.capacity:
+            self._count += 1
+
+    def since(self, start: float) -> Tuple[List[float], Optional[float]]:
+        """Return the values with timestamp >= start (oldest first) and the newest value."""
+        values = []
+        latest = None
+        for i in range(self._count):
+            idx = (self._next - self._count + i) % self.capacity
+            latest = self._values[idx]
+            if self._times[idx] >= start:
+                values.append(latest)
+        return values, latest
+
+
+def summarize(values: List[float]) -> Dict[str, Any]:
+    """Return count, min, max, avg and p95 (nearest-rank) of a list of samples."""
+    if not values:
+        return {"count": 0, "min": None, "max": None, "avg": None, "p95": None}
+    ordered = sorted(values)
+    rank = max(1, math.ceil(0.95 * len(ordered)))
+    return {
+        "count": len(ordered),
+        "min": ordered[0],
+        "max": ordered[-1],
+        "avg": round(sum(ordered) / len(ordered), 2),
+        "p95": ordered[rank - 1],
+    }
+
+
+class StatsCollector:
+    """
+    Sample configured counters for selected VMs and hosts on an interval.
+
+    Each tick issues one batched QueryStats pass per entity type for the
+    latest real-time sample and appends new samples to a RingBuffer per
+    (entity type, entity name, counter). Window queries are answered from
+    memory without contacting vCenter.
+    """
+
+    def __init__(self, manager, vms: List[str], hosts: List[str], counters: List[str],
+                 interval: int = 20, retention: int = 180):
+        self.manager = manager
+        self.targets = {"vm": list(vms), "host": list(hosts)}
+        self.counters = list(counters)
+        self.interval = interval
+        self.retention = retention
+        self._buffers: Dict[Tuple[str, str, str], RingBuffer] = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="stats-collector", daemon=True)
+        self._thread.start()
+        logging.info(f"Stats collector started: {len(self.targets['vm'])} VMs, "
+                     f"{len(self.targets['host'])} hosts, {len(self.counters)} counters")
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            started = time.monotonic()
+            for entity_type, names in self.targets.items():
+                if not names:
+                    continue
+                try:
+                    self.manager.call(self.collect, entity_type, names, retry=True)
+                except Exception as e:
+                    logging.warning(f"Stats collection for {entity_type} entities failed: {e}")
+            self._stop_event.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def collect(self, entity_type: str, names: List[str]):
+        """Fetch the latest sample of every counter for the named entities and record it."""
+        mo_type = vim.VirtualMachine if entity_type == "vm" else vim.HostSystem
+        entities, _ = self.manager._find_entities(mo_type, names)
+        counter_ids = self.manager.perf_counters.keys(self.counters)
+        if not entities or not counter_ids:
+            return
+        results = list(self.manager._query_stats(entities, counter_ids, interval_id=20, max_samples=1))
+        with self._lock:
+            for name, timestamps, totals in results:
+                for counter, samples in totals.items():
+                    if counter is None:
+                        continue
+                    key = (entity_type, name, counter)
+                    buffer = self._buffers.get(key)
+                    if buffer is None:
+                        buffer = self._buffers[key] = RingBuffer(self.retention)
+                    for ts, value in zip(timestamps, samples):
+                        ts = ts.timestamp()
+                        last = buffer.last_timestamp()
+                        # Skip samples already recorded on a previous tick
+                        if last is None or ts > last:
+                            buffer.append(ts, value)
+
+    def query(self, entity_type: str, name: str, counters: Optional[List[str]] = None,
+              window_seconds: int = 300) -> Dict[str, Any]:
+        """Summarize the buffered samples of an entity over the trailing window."""
+        if entity_type not in self.targets:
+            raise Exception(f"Invalid entity type: {entity_type}. Use one of: {', '.join(self.targets)}")
+        if name not in self.targets[entity_type]:
+            raise Exception(f"{entity_type} {name} is not configured for stats collection")
+        counters = counters or self.counters
+        start = time.time() - window_seconds
+        summary = {}
+        with self._lock:
+            for counter in counters:
+                buffer = self._buffers.get((entity_type, name, counter))
+                values, latest = buffer.since(start) if buffer is not None else ([], None)
+                summary[counter] = dict(summarize(values), latest=latest)
+        return {
+            "entity_type": entity_type,
+            "name": name,
+            "window_seconds": window_seconds,
+            "counters": summary,
+        }
@@ -0,0 +1,257 @@
+"""Event-driven completion tracking for vSphere tasks."""
+
+import time
+import logging
+import threading
+from typing import Optional, Dict, Callable
+
+from pyVmomi import vim, vmodl
+
+from .inventory import build_view_filter_spec
+
+
+# Task properties reported by the collector
+TASK_PROPERTIES = ["info.state", "info.progress", "info.error", "info.result"]
+
+# How often to poll task.info when the collector is unavailable
+POLL_INTERVAL_SECONDS = 1
+
+
+class _PendingTask:
+    """Completion state of a single tracked task."""
+
+    __slots__ = ("task", "done", "state", "progress", "error", "result", "callbacks", "lost", "waiters")
+
+    def __init__(self, task: vim.Task):
+        self.task = task
+        self.done = threading.Event()
+        self.state = None
+        self.progress = None
+        self.error = None
+        self.result = None
+        self.callbacks = []
+        self.lost = False  # Set when the collector can no longer report on this task
+        self.waiters = 0
+
+
+class TaskWaiter:
+    """
+    Follow many vim.Task objects through a single PropertyCollector filter.
+
+    Tasks are added to a ListView that one filter traverses, so a single
+    WaitForUpdatesEx loop reports state and progress changes for every task
+    in flight. Waiting threads block on an event instead of reading task.info.
+    If the collector fails, waiters fall back to polling task.info.
+    """
+
+    def __init__(self, content, max_wait_seconds: int = 30):
+        self.content = content
+        self.max_wait_seconds = max_wait_seconds
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._pending: Dict[str, _PendingTask] = {}
+        self._collector = None
+        self._view = None
+        self._thread: Optional[threading.Thread] = None
+        self._failed = False
+
+    def _ensure_started(self):
+        """Create the collector, list view and update thread on first use (lock must be held)."""
+        if self._thread is not None:
+            return
+        # A private collector keeps our filter and version separate from other users of the session
+        self._collector = self.content.propertyCollector.CreatePropertyCollector()
+        self._view = self.content.viewManager.CreateListView([])
+        self._collector.CreateFilter(build_view_filter_spec(self._view, {vim.Task: TASK_PROPERTIES}), True)
+        self._thread = threading.Thread(target=self._run, name="task-waiter", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the update thread and release waiters, which fall back to polling."""
+        self._stop_event.set()
+        try:
+            if self._collector is not None:
+                self._collector.CancelWaitForUpdates()
+        except Exception:
+            pass
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._release_all()
+        for mo in (self._collector, self._view):
+            try:
+                if mo is not None:
+                    mo.Destroy()
+            except Exception:
+                pass
+        self._collector = None
+        self._view = None
+
+    def _release_all(self):
+        with self._lock:
+            self._failed = True
+            pending = list(self._pending.values())
+            self._pending.clear()
+        for p in pending:
+            p.lost = True
+            p.done.set()
+
+    def _run(self):
+        """Background loop dispatching task updates to waiters."""
+        version = ""
+        wait_opts = vmodl.query.PropertyCollector.WaitOptions(maxWaitSeconds=self.max_wait_seconds)
+        while not self._stop_event.is_set():
+            try:
+                update_set = self._collector.WaitForUpdatesEx(version, wait_opts)
+            except Exception as e:
+                if not self._stop_event.is_set():
+                    logging.warning(f"Task waiter stopped, falling back to polling: {e}")
+                    self._release_all()
+                return
+            if update_set is None:
+                continue
+            version = update_set.version
+            finished = self._apply(update_set)
+            if finished:
+                try:
+                    self._view.ModifyListView(remove=finished)
+                except Exception as e:
+                    logging.debug(f"Failed to remove finished tasks from list view: {e}")
+
+    def _apply(self, update_set) -> list:
+        """Record task changes, wake waiters of finished tasks and return those tasks."""
+        finished = []
+        notify = []
+        with self._lock:
+            for filter_set in update_set.filterSet:
+                for object_set in filter_set.objectSet:
+                    pending = self._pending.get(object_set.obj._moId)
+                    if pending is None or object_set.kind == "leave":
+                        continue
+                    for change in object_set.changeSet:
+                        if change.name == "info.state":
+                            pending.state = change.val
+                        elif change.name == "info.progress":
+                            pending.progress = change.val
+                            if pending.callbacks and change.val is not None:
+                                notify.append((pending.callbacks, change.val))
+                        elif change.name == "info.error":
+                            pending.error = change.val
+                        elif change.name == "info.result":
+                            pending.result = change.val
+                    if pending.state in (vim.TaskInfo.State.success, vim.TaskInfo.State.error):
+                        del self._pending[object_set.obj._moId]
+                        finished.append(pending.task)
+                        pending.done.set()
+        for callbacks, progress in notify:
+            for callback in callbacks:
+                try:
+                    callback(progress)
+                except Exception as e:
+                    logging.debug(f"Task progress callback failed: {e}")
+        return finished
+
+    def track(self, task: vim.Task, on_progress: Optional[Callable[[int], None]] = None) -> _PendingTask:
+        """Start following a task; repeated calls for the same task share one entry."""
+        with self._lock:
+            if not self._failed:
+                try:
+                    self._ensure_started()
+                except Exception as e:
+                    logging.warning(f"Failed to start task waiter, falling back to polling: {e}")
+                    self._failed = True
+            if self._failed:
+                pending = _PendingTask(task)
+                pending.lost = True
+                pending.done.set()
+                return pending
+            pending = self._pending.get(task._moId)
+            is_new = pending is None
+            if is_new:
+                pending = _PendingTask(task)
+                self._pending[task._moId] = pending
+            pending.waiters += 1
+            if on_progress:
+                pending.callbacks.append(on_progress)
+        if not is_new:
+            return pending
+        try:
+            # The filter reports the task's current state as soon as it enters the view
+            not_added = self._view.ModifyListView(add=[task])
+        except Exception as e:
+            logging.warning(f"Failed to track task {task._moId}, falling back to polling: {e}")
+            not_added = [task]
+        if not_added:
+            with self._lock:
+                self._pending.pop(task._moId, None)
+            pending.lost = True
+            pending.done.set()
+        return pending
+
+    def wait(self, task: vim.Task, timeout: Optional[float] = None,
+             on_progress: Optional[Callable[[int], None]] = None):
+        """
+        Block until a task finishes.
+
+        Args:
+            task: The task to wait for
+            timeout: Maximum seconds to wait (None waits indefinitely)
+            on_progress: Optional callback receiving the task's percentage progress
+
+        Returns:
+            The task's result
+
+        Raises:
+            TimeoutError: If the task is still running after timeout seconds
+            vmodl.MethodFault: The task's fault if it finished with an error
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        pending = self.track(task, on_progress)
+        if not pending.done.wait(timeout):
+            self._untrack(pending, on_progress)
+            raise TimeoutError(f"Task timed out after {timeout} seconds")
+        if pending.lost:
+            return self._poll(task, deadline, on_progress)
+        if pending.state == vim.TaskInfo.State.error:
+            raise pending.error
+        return pending.result
+
+    def _untrack(self, pending: _PendingTask, on_progress: Optional[Callable[[int], None]]):
+        """Detach a waiter that gave up; stop following the task once nobody is waiting for it."""
+        with self._lock:
+            if on_progress in pending.callbacks:
+                pending.callbacks.remove(on_progress)
+            pending.waiters -= 1
+            if pending.waiters > 0 or self._pending.get(pending.task._moId) is not pending:
+                return
+            del self._pending[pending.task._moId]
+            view = self._view
+        try:
+            if view is not None:
+                view.ModifyListView(remove=[pending.task])
+        except Exception as e:
+            logging.debug(f"Failed to remove task {pending.task._moId} from list view: {e}")
+
+    def _poll(self, task: vim.Task, deadline: Optional[float],
+              on_progress: Optional[Callable[[int], None]] = None):
+        """Wait for a task by reading task.info at a fixed interval."""
+        while True:
+            info = task.info
+            if info.state == vim.TaskInfo.State.success:
+                return info.result
+            if info.state == vim.TaskInfo.State.error:
+                raise info.error
+            if on_progress and info.progress is not None:
+                on_progress(info.progress)
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError("Task timed out")
+            time.sleep(POLL_INTERVAL_SECONDS)
+
+    def progress(self, task: vim.Task) -> Optional[int]:
+        """Return the last reported progress of a tracked task, if any."""
+        with self._lock:
+            pending = self._pending.get(task._moId)
+            return pending.progress if pending else None
+
+    def cancel(self, task: vim.Task):
+        """Request cancellation of a running task; its waiters receive a RequestCanceled fault."""
+        task.CancelTask()
@@ -1,199 +1,341 @@
 """MCP tool handler functions."""
 
 import logging
-from typing import Optional
+from functools import partial
+from typing import Optional, Union
 
 from .vmware_manager import VMwareManager
 from .config import Config
+from .jobs import JobManager, progress_listener
+from .pagination import CursorStore
+from .federation import ManagerRegistry, selected_vcenter
 
 
 class ToolHandlers:
     """Container for MCP tool handler functions."""
     
-    def __init__(self, manager: VMwareManager, config: Config):
-        self.manager = manager
+    def __init__(self, manager: Union[VMwareManager, ManagerRegistry], config: Config):
+        # A single manager is served as a registry with one endpoint
+        if isinstance(manager, ManagerRegistry):
+            self.managers = manager
+        else:
+            self.managers = ManagerRegistry({config.vcenter_host: manager})
         self.config = config
+        self.jobs = JobManager(config.job_workers, config.job_workers + config.pool_queue_depth, config.job_ttl,
+                               config.tool_concurrency)
+        self.cursors = CursorStore(config.cursor_ttl, config.cursor_max)
+    
+    @property
+    def manager(self) -> VMwareManager:
+        """Manager of the vCenter selected for the current tool call, or of the default vCenter."""
+        return self.managers.get(selected_vcenter.get())
     
     def _check_auth(self):
-        """Internal helper: Ensure connection is alive and check API access permissions."""
-        self.manager._ensure_connected()
+        """Internal helper: Check API access permissions."""
         if self.config.api_key:
             # If an API key is configured, require that manager.authenticated is True
             if not self.manager.authenticated:
                 raise Exception("Unauthorized: API key required.")
     
-    def create_vm(self, name: str, cpu: int, memory: int, datastore: Optional[str] = None, network: Optional[str] = None) -> str:
-        """Create a new virtual machine."""
+    def _call(self, func, *args, **kwargs):
+        """Internal helper: Check access, then run a manager method on a pooled vCenter session."""
+        self._check_auth()
+        return self.manager.call(func, *args, **kwargs)
+    
+    def _query(self, func, *args, **kwargs):
+        """Internal helper: Like _call, for read-only methods that are retried once if the session expired."""
         self._check_auth()
-        return self.manager.create_vm(name, cpu, memory, datastore, network)
+        return self.manager.call(func, *args, retry=True, **kwargs)
     
-    def clone_vm(self, template_name: str, new_name: str) -> str:
-        """Clone a virtual machine from a template."""
+    def _gather(self, func, federated: bool = True):
+        """
+        Internal helper: Run func(manager) on the selected vCenter, or on every vCenter when
+        none is selected and federated is True, merging the resulting lists.
+        """
         self._check_auth()
-        return self.manager.clone_vm(template_name, new_name)
+        if not federated:
+            manager = self.manager
+            return manager.call(func, manager, retry=True)
+        return self.managers.gather(func, selected_vcenter.get())
+    
+    def _list(self, tool_name: str, plain, rows, limit: Optional[int], cursor: Optional[str],
+              filter: Optional[dict], sort: Optional[str], federated: bool = True):
+        """
+        Internal helper: Return plain(manager) as before, or a page of rows(manager) when any paging argument is given.
+
+        Follow-up pages are served from the cursor's snapshot without contacting vCenter.
+        """
+        if limit is None and cursor is None and filter is None and sort is None:
+            return self._gather(plain, federated)
+        self._check_auth()
+        if limit is not None and limit < 1:
+            raise Exception("limit must be at least 1")
+        if cursor:
+            return self.cursors.next(tool_name, cursor, limit)
+        return self.cursors.page(tool_name, self._gather(rows, federated), limit or self.config.page_size,
+                                 filter, sort)
+    
+    def create_vm(self, name: str, cpu: int, memory: int, datastore: Optional[str] = None, network: Optional[str] = None,
+                  folder: Optional[str] = None, resource_pool: Optional[str] = None,
+                  anti_affinity: Optional[str] = None) -> str:
+        """Create a new virtual machine."""
+        return self._call(self.manager.create_vm, name, cpu, memory, datastore, network, folder, resource_pool,
+                          anti_affinity)
+    
+    def clone_vm(self, template_name: str, new_name: str, mode: str = "full",
+                 snapshot_name: Optional[str] = None, count: int = 1, concurrency: Optional[int] = None,
+                 datastore: Optional[str] = None, folder: Optional[str] = None,
+                 resource_pool: Optional[str] = None, anti_affinity: Optional[str] = None):
+        """Clone a virtual machine from a template (full, linked or instant clone, optionally in batches)."""
+        return self._call(self.manager.clone_vm, template_name, new_name, mode, snapshot_name,
+                          count, concurrency, datastore, folder, resource_pool, anti_affinity)
     
     def delete_vm(self, name: str) -> str:
         """Delete the specified virtual machine."""
-        self._check_auth()
-        return self.manager.delete_vm(name)
+        return self._call(self.manager.delete_vm, name)
     
     def power_on_vm(self, name: str) -> str:
         """Power on the specified virtual machine."""
-        self._check_auth()
-        return self.manager.power_on_vm(name)
+        return self._call(self.manager.power_on_vm, name)
     
     def power_off_vm(self, name: str) -> str:
         """Power off the specified virtual machine."""
-        self._check_auth()
-        return self.manager.power_off_vm(name)
+        return self._call(self.manager.power_off_vm, name)
     
-    def list_vms(self) -> list:
-        """Return a list of all virtual machine names."""
-        self._check_auth()
-        return self.manager.list_vms()
+    def list_vms(self, limit: Optional[int] = None, cursor: Optional[str] = None,
+                 filter: Optional[dict] = None, sort: Optional[str] = None):
+        """Return a list of all virtual machine names, or a page of VM rows when paging."""
+        return self._list("list_vms", VMwareManager.list_vms, VMwareManager.list_vm_rows,
+                          limit, cursor, filter, sort)
     
     def get_vm_details(self, vm_name: str) -> dict:
         """Get detailed information about a virtual machine."""
-        self._check_auth()
-        return self.manager.get_vm_details(vm_name)
+        return self._query(self.manager.get_vm_details, vm_name)
     
     def get_vm_performance(self, vm_name: str) -> dict:
         """Get performance data for a virtual machine."""
-        self._check_auth()
-        return self.manager.get_vm_performance(vm_name)
+        return self._query(self.manager.get_vm_performance, vm_name)
     
     def get_vm_summary_stats(self, vm_name: str) -> dict:
         """Get summary statistics for a virtual machine."""
-        self._check_auth()
-        return self.manager.get_vm_summary_stats(vm_name)
+        return self._query(self.manager.get_vm_summary_stats, vm_name)
     
     def create_vm_custom(self, name: str, cpu: int, memory: int, disk_size_gb: int = 10,
                         guest_id: str = "otherGuest", datastore: Optional[str] = None,
                         network: Optional[str] = None, thin_provisioned: bool = True,
-                        annotation: Optional[str] = None) -> str:
+                        annotation: Optional[str] = None, folder: Optional[str] = None,
+                        resource_pool: Optional[str] = None, anti_affinity: Optional[str] = None) -> str:
         """Create a custom virtual machine with advanced options."""
-        self._check_auth()
-        return self.manager.create_vm_custom(name, cpu, memory, disk_size_gb, guest_id,
-                                            datastore, network, thin_provisioned, annotation)
+        return self._call(self.manager.create_vm_custom, name, cpu, memory, disk_size_gb, guest_id,
+                          datastore, network, thin_provisioned, annotation, folder, resource_pool,
+                          anti_affinity)
     
-    def list_templates(self) -> list:
+    def list_templates(self, limit: Optional[int] = None, cursor: Optional[str] = None,
+                       filter: Optional[dict] = None, sort: Optional[str] = None):
         """List all virtual machine templates."""
-        self._check_auth()
-        return self.manager.list_templates()
+        return self._list("list_templates", VMwareManager.list_templates,
+                          lambda manager: [row for row in manager.list_vm_rows() if row["template"]],
+                          limit, cursor, filter, sort)
     
-    def list_datastores(self) -> list:
+    def list_datastores(self, limit: Optional[int] = None, cursor: Optional[str] = None,
+                        filter: Optional[dict] = None, sort: Optional[str] = None):
         """List all datastores."""
-        self._check_auth()
-        return self.manager.list_datastores()
+        return self._list("list_datastores", VMwareManager.list_datastores, VMwareManager.list_datastores,
+                          limit, cursor, filter, sort)
     
     def list_datastore_clusters(self) -> list:
         """List all datastore clusters (StoragePods)."""
-        self._check_auth()
-        return self.manager.list_datastore_clusters()
+        return self._gather(VMwareManager.list_datastore_clusters)
     
-    def list_networks(self) -> list:
+    def list_networks(self, limit: Optional[int] = None, cursor: Optional[str] = None,
+                      filter: Optional[dict] = None, sort: Optional[str] = None):
         """List all networks."""
-        self._check_auth()
-        return self.manager.list_networks()
+        return self._list("list_networks", VMwareManager.list_networks, VMwareManager.list_networks,
+                          limit, cursor, filter, sort)
     
-    def list_hosts(self) -> list:
-        """List all ESXi hosts."""
-        self._check_auth()
-        return self.manager.list_hosts()
+    def list_hosts(self, limit: Optional[int] = None, cursor: Optional[str] = None,
+                   filter: Optional[dict] = None, sort: Optional[str] = None):
+        """List all ESXi hosts, or a page of host rows when paging."""
+        return self._list("list_hosts", VMwareManager.list_hosts, VMwareManager.list_host_rows,
+                          limit, cursor, filter, sort)
     
     def get_host_details(self, host_name: str) -> dict:
         """Get detailed information about a host."""
-        self._check_auth()
-        return self.manager.get_host_details(host_name)
+        return self._query(self.manager.get_host_details, host_name)
     
     def get_host_performance_metrics(self, host_name: str) -> dict:
         """Get performance metrics for a host."""
-        self._check_auth()
-        return self.manager.get_host_performance_metrics(host_name)
+        return self._query(self.manager.get_host_performance_metrics, host_name)
     
     def get_host_hardware_health(self, host_name: str) -> dict:
         """Get hardware health information for a host."""
-        self._check_auth()
-        return self.manager.get_host_hardware_health(host_name)
+        return self._query(self.manager.get_host_hardware_health, host_name)
     
     def get_host_performance(self, host_name: str) -> dict:
         """Get detailed performance data for a host."""
-        self._check_auth()
-        return self.manager.get_host_performance(host_name)
-    
-    def list_performance_counters(self) -> list:
+        return self._query(self.manager.get_host_performance, host_name)
+    
+    def get_performance_bulk(self, entity_type: str, counters: list, names: Optional[list] = None,
+                             container: Optional[str] = None, interval_id: int = 20,
+                             max_samples: int = 1, instance: str = "") -> dict:
+        """Get performance counters for many VMs or hosts in batched queries."""
+        return self._query(self.manager.get_performance_bulk, entity_type, counters, names, container,
+                           interval_id, max_samples, instance)
+    
+    def get_metric_history(self, entity_type: str, name: str, counters: Optional[list] = None,
+                           window_seconds: int = 300) -> dict:
+        """Summarize collected samples for an entity over a trailing window."""
+        self._check_auth()
+        if self.manager.stats is None:
+            raise Exception("Stats collector is not enabled. Set stats_collector in the configuration.")
+        return self.manager.stats.query(entity_type, name, counters, window_seconds)
+    
+    def list_performance_counters(self, level: Optional[int] = None, limit: Optional[int] = None,
+                                  cursor: Optional[str] = None, filter: Optional[dict] = None,
+                                  sort: Optional[str] = None):
         """List all available performance counters."""
-        self._check_auth()
-        return self.manager.list_performance_counters()
+        counters = partial(VMwareManager.list_performance_counters, level=level)
+        # Counter catalogs are per vCenter and would repeat when merged
+        return self._list("list_performance_counters", counters, counters, limit, cursor, filter, sort,
+                          federated=False)
     
     def create_snapshot(self, vm_name: str, snapshot_name: str, description: str = "",
                        memory: bool = False, quiesce: bool = False) -> str:
         """Create a snapshot of a virtual machine."""
-        self._check_auth()
-        return self.manager.create_snapshot(vm_name, snapshot_name, description, memory, quiesce)
+        return self._call(self.manager.create_snapshot, vm_name, snapshot_name, description, memory, quiesce)
     
     def remove_snapshot(self, vm_name: str, snapshot_name: str, remove_children: bool = True) -> str:
         """Remove a snapshot from a virtual machine."""
-        self._check_auth()
-        return self.manager.remove_snapshot(vm_name, snapshot_name, remove_children)
+        return self._call(self.manager.remove_snapshot, vm_name, snapshot_name, remove_children)
     
     def revert_snapshot(self, vm_name: str, snapshot_name: str) -> str:
         """Revert a virtual machine to a specific snapshot."""
-        self._check_auth()
-        return self.manager.revert_snapshot(vm_name, snapshot_name)
+        return self._call(self.manager.revert_snapshot, vm_name, snapshot_name)
     
     def list_snapshots(self, vm_name: str) -> list:
         """List all snapshots for a virtual machine."""
-        self._check_auth()
-        return self.manager.list_snapshots(vm_name)
+        return self._query(self.manager.list_snapshots, vm_name)
     
     def remove_all_snapshots(self, vm_name: str) -> str:
         """Remove all snapshots from a virtual machine."""
-        self._check_auth()
-        return self.manager.remove_all_snapshots(vm_name)
+        return self._call(self.manager.remove_all_snapshots, vm_name)
     
     def execute_program_in_vm(self, vm_name: str, username: str, password: str,
                              program_path: str, program_arguments: str = "") -> dict:
         """Execute a program inside a VM."""
-        self._check_auth()
-        return self.manager.execute_program_in_vm(vm_name, username, password,
-                                                 program_path, program_arguments)
+        return self._call(self.manager.execute_program_in_vm, vm_name, username, password,
+                          program_path, program_arguments)
     
     def upload_file_to_vm(self, vm_name: str, username: str, password: str,
                          local_file_path: str, remote_file_path: str) -> str:
         """Upload a file to a VM."""
-        self._check_auth()
-        return self.manager.upload_file_to_vm(vm_name, username, password,
-                                             local_file_path, remote_file_path)
+        return self._call(self.manager.upload_file_to_vm, vm_name, username, password,
+                          local_file_path, remote_file_path)
     
     def upload_file_to_datastore(self, datastore_name: str, local_file_path: str,
                                  remote_file_path: str) -> str:
         """Upload a file to a datastore."""
-        self._check_auth()
-        return self.manager.upload_file_to_datastore(datastore_name, local_file_path,
-                                                     remote_file_path)
+        return self._call(self.manager.upload_file_to_datastore, datastore_name, local_file_path,
+                          remote_file_path)
     
-    def deploy_ovf(self, ovf_path: str, vmdk_path: str, vm_name: str = None,
-                   datastore_name: str = None, resource_pool_name: str = None) -> str:
+    def deploy_ovf(self, ovf_path: str, vmdk_path: str = None, vm_name: str = None,
+                   datastore_name: str = None, resource_pool_name: str = None, folder: str = None) -> str:
         """Deploy a VM from OVF and VMDK files."""
-        self._check_auth()
-        return self.manager.deploy_ovf(ovf_path, vmdk_path, vm_name,
-                                      datastore_name, resource_pool_name)
+        return self._call(self.manager.deploy_ovf, ovf_path, vmdk_path, vm_name,
+                          datastore_name, resource_pool_name, folder)
     
     def deploy_ova(self, ova_path: str, vm_name: str = None,
-                   datastore_name: str = None, resource_pool_name: str = None) -> str:
+                   datastore_name: str = None, resource_pool_name: str = None, folder: str = None) -> str:
         """Deploy a VM from an OVA file."""
-        self._check_auth()
-        return self.manager.deploy_ova(ova_path, vm_name, datastore_name, resource_pool_name)
+        return self._call(self.manager.deploy_ova, ova_path, vm_name, datastore_name, resource_pool_name,
+                          folder)
     
     def wait_for_updates(self, object_type: str, properties: list,
                         max_wait_seconds: int = 30, max_iterations: int = 1) -> dict:
         """Wait for property updates on vSphere objects."""
+        return self._query(self.manager.wait_for_updates, object_type, properties,
+                           max_wait_seconds, max_iterations)
+    
+    def bulk_power_on(self, names: Optional[list] = None, pattern: Optional[str] = None,
+                      regex: Optional[str] = None, concurrency: Optional[int] = None) -> dict:
+        """Power on many virtual machines."""
+        return self._call(self.manager.bulk_power_on, names, pattern, regex, concurrency)
+    
+    def bulk_power_off(self, names: Optional[list] = None, pattern: Optional[str] = None,
+                       regex: Optional[str] = None, concurrency: Optional[int] = None) -> dict:
+        """Power off many virtual machines."""
+        return self._call(self.manager.bulk_power_off, names, pattern, regex, concurrency)
+    
+    def bulk_create_snapshot(self, snapshot_name: str, names: Optional[list] = None,
+                             pattern: Optional[str] = None, regex: Optional[str] = None,
+                             description: str = "", memory: bool = False, quiesce: bool = False,
+                             concurrency: Optional[int] = None) -> dict:
+        """Create a snapshot on many virtual machines."""
+        return self._call(self.manager.bulk_create_snapshot, snapshot_name, names, pattern, regex,
+                          description, memory, quiesce, concurrency)
+    
+    def bulk_delete(self, names: Optional[list] = None, pattern: Optional[str] = None,
+                    regex: Optional[str] = None, concurrency: Optional[int] = None) -> dict:
+        """Delete many virtual machines."""
+        return self._call(self.manager.bulk_delete, names, pattern, regex, concurrency)
+    
+    def run_routed(self, tool_name: str, handler, arguments: dict, vcenter: Optional[str] = None):
+        """
+        Run a tool handler against the vCenter it is routed to.
+
+        Args:
+            tool_name: Name of the tool being called
+            handler: Callable taking the tool arguments
+            arguments: The tool arguments
+            vcenter: Explicitly selected vCenter (optional)
+        """
+        token = selected_vcenter.set(self.managers.route(tool_name, arguments, vcenter))
+        try:
+            return handler(arguments)
+        finally:
+            selected_vcenter.reset(token)
+    
+    def run_job(self, tool_name: str, handler, arguments: dict, run_async: Optional[bool] = None):
+        """
+        Run a long-running tool handler as a job.
+
+        Args:
+            tool_name: Name of the tool being called
+            handler: Callable taking the tool arguments
+            arguments: The tool arguments
+            run_async: Return the job description immediately instead of the result
+                (defaults to config.async_jobs)
+
+        Returns:
+            The handler's result, or the job description when run asynchronously
+        """
+        self._check_auth()
+        if run_async is None:
+            run_async = self.config.async_jobs
+        job = self.jobs.create(tool_name)
+        if run_async:
+            self.jobs.start(job, handler, arguments)
+            return job.to_dict()
+        listener = progress_listener.get()
+        if listener is not None:
+            job.add_listener(listener)
+        return self.jobs.run(job, handler, arguments)
+    
+    def get_job(self, job_id: str) -> dict:
+        """Get the status, progress and result of a job."""
         self._check_auth()
-        return self.manager.wait_for_updates(object_type, properties,
-                                            max_wait_seconds, max_iterations)
+        return self.jobs.get(job_id).to_dict()
+    
+    def list_jobs(self, status: Optional[str] = None) -> list:
+        """List known jobs, optionally filtered by status."""
+        self._check_auth()
+        return self.jobs.list(status)
+    
+    def cancel_job(self, job_id: str) -> dict:
+        """Request cancellation of a pending or running job."""
+        self._check_auth()
+        return self.jobs.cancel(job_id)
     
     def vm_performance_resource(self, vm_name: str) -> dict:
         """Retrieve CPU, memory, storage, and network usage for the specified virtual machine."""
-        self._check_auth()
-        return self.manager.get_vm_performance(vm_name)
+        return self._query(self.manager.get_vm_performance, vm_name)
@@ -0,0 +1,196 @@
+"""Streaming HTTP uploads with constant memory use, progress reporting and retries."""
+
+import os
+import time
+import logging
+import threading
+from typing import Optional, Callable, Dict, Any
+
+import requests
+
+
+# Default read size for streamed uploads
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+# HTTP statuses returned when a transfer URL or ticket is no longer valid
+EXPIRED_URL_STATUSES = {401, 403, 404, 410}
+
+
+class TransferExpiredError(Exception):
+    """Raised when the server rejects a transfer URL that has expired."""
+
+
+class TransferProgress:
+    """
+    Thread-safe byte counter for one or more concurrent streams.
+
+    Progress is logged every log_step percent and forwarded to an optional
+    callback receiving (bytes_sent, total_bytes).
+    """
+
+    def __init__(self, total: int, label: str = "upload",
+                 on_progress: Optional[Callable[[int, int], None]] = None, log_step: int = 10):
+        self.total = total
+        self.label = label
+        self.sent = 0
+        self.started = time.monotonic()
+        self._on_progress = on_progress
+        self._log_step = log_step
+        self._next_log = log_step
+        self._lock = threading.Lock()
+
+    def update(self, count: int):
+        with self._lock:
+            self.sent += count
+            sent = self.sent
+            percent = self.percent()
+            should_log = percent >= self._next_log
+            if should_log:
+                self._next_log = (percent // self._log_step + 1) * self._log_step
+        if should_log:
+            logging.info(f"{self.label}: {percent}% ({sent}/{self.total} bytes, "
+                         f"{self.throughput() / 1048576:.1f} MB/s)")
+        if self._on_progress:
+            self._on_progress(sent, self.total)
+
+    def rewind(self, count: int):
+        """Forget bytes that have to be sent again after a failed attempt."""
+        with self._lock:
+            self.sent = max(0, self.sent - count)
+            self._next_log = (self.percent() // self._log_step + 1) * self._log_step
+
+    def percent(self) -> int:
+        if not self.total:
+            return 100
+        return min(100, self.sent * 100 // self.total)
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def throughput(self) -> float:
+        """Average bytes per second since the transfer started."""
+        elapsed = self.elapsed()
+        return self.sent / elapsed if elapsed > 0 else 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "bytes": self.sent,
+            "total_bytes": self.total,
+            "seconds": round(self.elapsed(), 2),
+            "mb_per_second": round(self.throughput() / 1048576, 2),
+        }
+
+
+class RateLimiter:
+    """
+    Token bucket shared by concurrent streams to cap their combined rate.
+
+    consume() may run the bucket into debt, so chunks larger than one
+    second's allowance are still paced correctly.
+    """
+
+    def __init__(self, bytes_per_second: float):
+        self.rate = bytes_per_second
+        self._tokens = bytes_per_second
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, count: int):
+        """Account for count bytes, sleeping as long as needed to stay under the rate."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.rate, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= count
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0
+        if delay > 0:
+            time.sleep(delay)
+
+
+class FileChunks:
+    """
+    Iterable over a byte range of a file in fixed-size chunks.
+
+    Defining __len__ lets requests send a Content-Length header instead of
+    chunked transfer encoding, which the ESXi/vCenter transfer endpoints
+    do not accept. Only one chunk is held in memory at a time.
+    """
+
+    def __init__(self, path: str, chunk_size: int = DEFAULT_CHUNK_SIZE, offset: int = 0,
+                 length: Optional[int] = None, progress: Optional[TransferProgress] = None,
+                 limiter: Optional[RateLimiter] = None):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.offset = offset
+        self.length = os.path.getsize(path) - offset if length is None else length
+        self.progress = progress
+        self.limiter = limiter
+        self.sent = 0
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        self.sent = 0
+        remaining = self.length
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            while remaining > 0:
+                chunk = f.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    raise IOError(f"{self.path} is shorter than expected")
+                if self.limiter is not None:
+                    self.limiter.consume(len(chunk))
+                remaining -= len(chunk)
+                self.sent += len(chunk)
+                if self.progress is not None:
+                    self.progress.update(len(chunk))
+                yield chunk
+
+
+def stream_upload(url: str, chunks: FileChunks, method: str = "PUT",
+                  headers: Optional[Dict[str, str]] = None, session: Optional[requests.Session] = None,
+                  **kwargs) -> requests.Response:
+    """
+    Send a file range to url without reading it into memory.
+
+    Raises:
+        TransferExpiredError: If the server rejects the URL as expired or unauthorized
+        Exception: For any other non-2xx response
+    """
+    headers = dict(headers or {})
+    headers.setdefault("Content-Type", "application/octet-stream")
+    sender = session or requests
+    resp = sender.request(method, url, data=chunks, headers=headers, **kwargs)
+    if resp.status_code in EXPIRED_URL_STATUSES:
+        raise TransferExpiredError(f"Transfer URL rejected with HTTP {resp.status_code}")
+    if not 200 <= resp.status_code < 300:
+        raise Exception(f"Failed to upload file. HTTP status: {resp.status_code}")
+    return resp
+
+
+def upload_with_retry(get_url: Callable[[], str], chunks: FileChunks, retries: int = 3,
+                      **kwargs) -> requests.Response:
+    """
+    Stream a file range, requesting a fresh URL and restarting after expiry or a dropped connection.
+
+    Args:
+        get_url: Returns a (new) transfer URL; called before every attempt
+        chunks: The data to send
+        retries: Number of additional attempts after the first failure
+        **kwargs: Passed to stream_upload
+    """
+    attempt = 0
+    while True:
+        url = get_url()
+        try:
+            return stream_upload(url, chunks, **kwargs)
+        except (TransferExpiredError, requests.ConnectionError, requests.Timeout) as e:
+            if attempt >= retries:
+                raise
+            attempt += 1
+            if chunks.progress is not None:
+                chunks.progress.rewind(chunks.sent)
+            logging.warning(f"Upload of {chunks.path} interrupted after {chunks.sent} bytes ({e}), "
+                            f"retrying with a new transfer URL ({attempt}/{retries})")
+            time.sleep(min(2 ** attempt, 30))
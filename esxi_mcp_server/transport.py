@@ -1,25 +1,38 @@
 """Transport layer for MCP server (HTTP and stdio)."""
 
+import os
+import sys
+import time
+import signal
+import threading
+import multiprocessing
+import uuid
 import asyncio
 import logging
-from typing import Optional
+from typing import Optional, Dict, List, Any, Callable
 
+import uvicorn
+from uvicorn.config import STARTUP_FAILURE
 from mcp.server.streamable_http import StreamableHTTPServerTransport
 
-from .config import Config
+try:
+    from sse_starlette.sse import AppStatus
+except ImportError:
+    AppStatus = None
 
+from .config import Config, setup_logging
+from . import metrics
 
-# Maintain a global StreamableHTTP transport instance
-streamable_http_transport: Optional[StreamableHTTPServerTransport] = None
-streamable_http_task: Optional[asyncio.Task] = None
-streamable_http_lock = asyncio.Lock()
 
+# Seconds between checks that HTTP worker processes are still running
+WORKER_CHECK_INTERVAL = 1.0
 
-async def streamable_http_endpoint(scope, receive, send, mcp_server, config: Config):
-    """Handle streamable-http MCP requests."""
-    global streamable_http_transport, streamable_http_task
-    
-    # Verify API key if configured
+# Request header carrying the MCP session ID (lower-case, as in ASGI scopes)
+MCP_SESSION_ID_HEADER = b"mcp-session-id"
+
+
+def _provided_api_key(scope) -> Optional[str]:
+    """Return the API key sent with a request (Authorization or X-API-Key header), if any."""
     headers_dict = {k.lower().decode(): v.decode() for (k, v) in scope.get("headers", [])}
     provided_key = None
     # Check if authorization or x-api-key headers are present in the decoded headers_dict
@@ -33,7 +46,224 @@ async def streamable_http_endpoint(scope, receive, send, mcp_server, config: Con
             provided_key = auth_header
     elif "x-api-key" in headers_dict:
         provided_key = headers_dict.get("x-api-key", "").strip()
-    
+    return provided_key
+
+
+async def _send_text(send, status: int, body: bytes, content_type: bytes = b"text/plain"):
+    await send({"type": "http.response.start", "status": status, "headers": [(b"content-type", content_type)]})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def metrics_endpoint(scope, receive, send, config: Config):
+    """Serve the process's metrics in the Prometheus text format."""
+    if config.api_key and _provided_api_key(scope) != config.api_key:
+        await _send_text(send, 401, b"Unauthorized")
+        return
+    await _send_text(send, 200, metrics.registry.render().encode(), metrics.CONTENT_TYPE.encode())
+
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope.get("headers", []):
+        if key.lower() == name:
+            return value.decode()
+    return None
+
+
+class _Session:
+    """One MCP session: its transport, the server task reading from it and its request activity."""
+
+    def __init__(self, session_id: Optional[str]):
+        self.id = session_id
+        self.transport = StreamableHTTPServerTransport(mcp_session_id=session_id, is_json_response_enabled=False)
+        self.task: Optional[asyncio.Task] = None
+        self.ready = asyncio.Event()
+        self.requests = 0                 # HTTP requests in progress, including open GET streams
+        self.last_active = time.monotonic()
+
+
+class SessionManager:
+    """
+    One StreamableHTTPServerTransport and MCP server task per MCP-Session-Id.
+
+    A request without a session ID opens a new session (only an initialize
+    request succeeds; anything else is discarded again), requests naming an
+    unknown or expired session get 404 so the client re-initializes, and a
+    DELETE ends the session. Sessions with no request in progress for
+    http_session_idle_timeout seconds are closed, and no more than
+    http_max_sessions are open at once; further clients get 503.
+
+    With http_stateless every request is served by a fresh transport and
+    server run, so no state is kept between requests and any worker
+    process can answer any request.
+    """
+
+    def __init__(self, mcp_server, config: Config):
+        self._mcp_server = mcp_server
+        self._max_sessions = config.http_max_sessions
+        self._idle_timeout = config.http_session_idle_timeout
+        self._stateless = config.http_stateless
+        self._sessions: Dict[str, _Session] = {}
+        self._reaper: Optional[asyncio.Task] = None
+        self.accepting = True             # False while the server drains for shutdown
+        self.requests = 0                 # Requests in progress other than GET streams, e.g. tool calls
+        self.rejected = 0                 # Sessions refused because the limit was reached
+        self.expired = 0                  # Sessions closed for being idle
+        metrics.registry.add_collector(self.collect_metrics)
+
+    def __len__(self):
+        return len(self._sessions)
+
+    async def handle_request(self, scope, receive, send):
+        """Serve one HTTP request on /message."""
+        if scope.get("method") == "GET":
+            await self._handle(scope, receive, send)
+            return
+        # A POST stays in progress until its response (e.g. a tool result) has been sent
+        self.requests += 1
+        try:
+            await self._handle(scope, receive, send)
+        finally:
+            self.requests -= 1
+
+    async def _handle(self, scope, receive, send):
+        if not self.accepting and (self._stateless or _header(scope, MCP_SESSION_ID_HEADER) is None):
+            await _send_text(send, 503, b"Server is shutting down")
+            return
+        if self._stateless:
+            await self._handle_stateless(scope, receive, send)
+            return
+        if self._reaper is None and self._idle_timeout > 0:
+            self._reaper = asyncio.create_task(self._reap_idle())
+        session_id = _header(scope, MCP_SESSION_ID_HEADER)
+        if session_id is None:
+            await self._handle_opening(scope, receive, send)
+            return
+        session = self._sessions.get(session_id)
+        if session is None:
+            await _send_text(send, 404, b"Session not found")
+            return
+        await self._serve(session, scope, receive, send)
+        if session.transport.is_terminated:
+            # The client ended the session with DELETE
+            await self._discard(session)
+
+    async def _handle_opening(self, scope, receive, send):
+        if self._max_sessions and len(self._sessions) >= self._max_sessions:
+            self.rejected += 1
+            logging.warning(f"Refusing a new MCP session: {len(self._sessions)} sessions are open")
+            await _send_text(send, 503, b"Too many open sessions")
+            return
+        session = _Session(uuid.uuid4().hex)
+        self._sessions[session.id] = session
+        status = None
+
+        async def watch_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self._start(session, stateless=False)
+            await self._serve(session, scope, receive, watch_status)
+        finally:
+            # Without a session ID only an initialize request establishes a session
+            if status is None or status >= 400:
+                await self._discard(session)
+            else:
+                logging.info(f"Opened MCP session {session.id} ({len(self._sessions)} open)")
+
+    async def _handle_stateless(self, scope, receive, send):
+        session = _Session(None)
+        try:
+            await self._start(session, stateless=True)
+            await session.transport.handle_request(scope, receive, send)
+        finally:
+            await self._discard(session)
+
+    async def _start(self, session: _Session, stateless: bool):
+        """Start the session's MCP server task and wait until it reads from the transport."""
+        async def run_server():
+            try:
+                async with session.transport.connect() as (read_stream, write_stream):
+                    session.ready.set()
+                    init_opts = self._mcp_server.create_initialization_options()
+                    await self._mcp_server.run(read_stream, write_stream, init_opts, stateless=stateless)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"MCP session {session.id} failed: {type(e).__name__}: {e}", exc_info=True)
+            finally:
+                session.ready.set()
+                if session.id is not None and self._sessions.get(session.id) is session:
+                    del self._sessions[session.id]
+
+        session.task = asyncio.create_task(run_server())
+        await session.ready.wait()
+
+    async def _serve(self, session: _Session, scope, receive, send):
+        session.requests += 1
+        try:
+            await session.transport.handle_request(scope, receive, send)
+        finally:
+            session.requests -= 1
+            session.last_active = time.monotonic()
+
+    async def _discard(self, session: _Session):
+        """Forget the session, terminate its transport and wait for its server task to end."""
+        if session.id is not None and self._sessions.get(session.id) is session:
+            del self._sessions[session.id]
+        if not session.transport.is_terminated:
+            try:
+                await session.transport.terminate()
+            except Exception as e:
+                logging.debug(f"Failed to terminate MCP session {session.id}: {e}")
+        task = session.task
+        if task is not None and not task.done():
+            try:
+                await asyncio.wait_for(asyncio.shield(task), timeout=5)
+            except asyncio.TimeoutError:
+                task.cancel()
+
+    async def _reap_idle(self):
+        """Close sessions that have had no request in progress for the idle timeout."""
+        interval = min(60.0, max(1.0, self._idle_timeout / 4))
+        while True:
+            await asyncio.sleep(interval)
+            deadline = time.monotonic() - self._idle_timeout
+            idle = [session for session in self._sessions.values()
+                    if session.requests == 0 and session.last_active < deadline]
+            for session in idle:
+                logging.info(f"Closing MCP session {session.id} after {self._idle_timeout} s without requests")
+                self.expired += 1
+                await self._discard(session)
+
+    async def close(self):
+        """Close every session and stop the idle reaper."""
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+        sessions = list(self._sessions.values())
+        await asyncio.gather(*(self._discard(session) for session in sessions), return_exceptions=True)
+        metrics.registry.remove_collector(self.collect_metrics)
+
+    def collect_metrics(self) -> List[metrics.MetricFamily]:
+        """Open, refused and expired MCP sessions, for /metrics."""
+        return [
+            metrics.MetricFamily("esxi_mcp_http_sessions", "gauge", "Open MCP sessions").add(
+                (), len(self._sessions)),
+            metrics.MetricFamily("esxi_mcp_http_sessions_rejected_total", "counter",
+                                 "MCP sessions refused because the session limit was reached").add(
+                (), self.rejected),
+            metrics.MetricFamily("esxi_mcp_http_sessions_expired_total", "counter",
+                                 "MCP sessions closed after the idle timeout").add((), self.expired),
+        ]
+
+
+async def streamable_http_endpoint(scope, receive, send, sessions: SessionManager, config: Config):
+    """Handle streamable-http MCP requests."""
+    # Verify API key if configured
+    provided_key = _provided_api_key(scope)
     if config.api_key and provided_key != config.api_key:
         # If the correct API key is not provided, return 401
         await send({"type": "http.response.start", "status": 401, "headers": [(b"content-type", b"text/plain")]})
@@ -41,37 +271,8 @@ async def streamable_http_endpoint(scope, receive, send, mcp_server, config: Con
         logging.warning("Invalid API key provided, rejecting streamable-http connection")
         return
     
-    # Create transport instance if it doesn't exist (with proper locking to avoid race conditions)
-    async with streamable_http_lock:
-        if streamable_http_transport is None:
-            # Initialize the StreamableHTTPServerTransport
-            # - mcp_session_id=None: No specific session ID, letting the transport manage session state
-            # - is_json_response_enabled=False: Use SSE streaming for responses (MCP standard)
-            streamable_http_transport = StreamableHTTPServerTransport(
-                mcp_session_id=None,
-                is_json_response_enabled=False
-            )
-            logging.info("Created new StreamableHTTPServerTransport instance")
-            
-            # Start the MCP server with the transport in the background
-            async def run_mcp_server():
-                try:
-                    async with streamable_http_transport.connect() as (read_stream, write_stream):
-                        init_opts = mcp_server.create_initialization_options()
-                        logging.info("Starting MCP server with streamable-http transport")
-                        await mcp_server.run(read_stream, write_stream, init_opts)
-                except asyncio.CancelledError:
-                    logging.info("MCP server task cancelled, shutting down gracefully")
-                    raise
-                except Exception as e:
-                    logging.error(f"MCP server runtime error: {type(e).__name__}: {e}", exc_info=True)
-            
-            # Start the MCP server task and keep a reference to prevent garbage collection
-            streamable_http_task = asyncio.create_task(run_mcp_server())
-    
-    # Handle the request through the StreamableHTTPServerTransport
     try:
-        await streamable_http_transport.handle_request(scope, receive, send)
+        await sessions.handle_request(scope, receive, send)
     except Exception as e:
         logging.error(f"Error handling streamable-http request: {type(e).__name__}: {e}")
         # Only attempt to send error response if we haven't started sending a response yet
@@ -85,36 +286,239 @@ async def streamable_http_endpoint(scope, receive, send, mcp_server, config: Con
             pass
 
 
-async def create_asgi_app(mcp_server, config: Config):
+class HttpApp:
     """
-    Create ASGI application routing.
-    
-    Dispatch requests to the appropriate handler based on the path and method.
+    ASGI application routing /message and /metrics.
+
+    The MCP server and the vCenter sessions behind it are built by
+    factory(config) on lifespan startup, inside the serving event loop of
+    each worker process, and closed on lifespan shutdown. Shutdown first
+    drains: new sessions and long-running tool calls are refused while
+    running vSphere tasks and jobs get up to drain_timeout seconds to
+    finish, then the MCP sessions are closed.
     """
-    async def app(scope, receive, send):
+
+    def __init__(self, config: Config, factory: Callable[[Config], Any]):
+        self.config = config
+        self._factory = factory
+        self.resources = None
+        self.sessions: Optional[SessionManager] = None
+        self._drained = False
+
+    async def __call__(self, scope, receive, send):
         if scope["type"] == "http":
-            path = scope.get("path", "")
-            method = scope.get("method", "").upper()
-            if path == "/message" and method in ("GET", "POST", "OPTIONS"):
-                # Streamable HTTP endpoint for MCP
-                if method == "OPTIONS":
-                    # Return allowed methods for CORS
-                    headers = [
-                        (b"access-control-allow-methods", b"GET, POST, OPTIONS"),
-                        (b"access-control-allow-headers", b"Content-Type, Authorization, X-API-Key, MCP-Session-Id"),
-                        (b"access-control-allow-origin", b"*")
-                    ]
-                    await send({"type": "http.response.start", "status": 204, "headers": headers})
-                    await send({"type": "http.response.body", "body": b""})
-                else:
-                    await streamable_http_endpoint(scope, receive, send, mcp_server, config)
+            await self._handle_http(scope, receive, send)
+        elif scope["type"] == "lifespan":
+            await self._handle_lifespan(receive, send)
+        # Other events (websocket) are not served
+
+    async def _handle_http(self, scope, receive, send):
+        path = scope.get("path", "")
+        method = scope.get("method", "").upper()
+        if path == "/message" and method in ("GET", "POST", "DELETE", "OPTIONS"):
+            # Streamable HTTP endpoint for MCP
+            if method == "OPTIONS":
+                # Return allowed methods for CORS
+                headers = [
+                    (b"access-control-allow-methods", b"GET, POST, DELETE, OPTIONS"),
+                    (b"access-control-allow-headers", b"Content-Type, Authorization, X-API-Key, MCP-Session-Id"),
+                    (b"access-control-expose-headers", b"MCP-Session-Id"),
+                    (b"access-control-allow-origin", b"*")
+                ]
+                await send({"type": "http.response.start", "status": 204, "headers": headers})
+                await send({"type": "http.response.body", "body": b""})
+            elif self.sessions is None:
+                await _send_text(send, 503, b"Server is starting")
             else:
-                # Route not found
-                await send({"type": "http.response.start", "status": 404,
-                            "headers": [(b"content-type", b"text/plain")]})
-                await send({"type": "http.response.body", "body": b"Not Found"})
+                await streamable_http_endpoint(scope, receive, send, self.sessions, self.config)
+        elif path == "/metrics" and method == "GET" and self.config.metrics_endpoint:
+            await metrics_endpoint(scope, receive, send, self.config)
         else:
-            # Non-HTTP event, do not process
+            # Route not found
+            await send({"type": "http.response.start", "status": 404,
+                        "headers": [(b"content-type", b"text/plain")]})
+            await send({"type": "http.response.body", "body": b"Not Found"})
+
+    async def _handle_lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await self.startup()
+                except Exception as e:
+                    logging.error(f"Failed to start MCP server: {e}")
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.shutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def startup(self):
+        """Connect to vCenter and build the MCP server without blocking the event loop."""
+        if not logging.getLogger().handlers:
+            # Worker processes start without the parent's logging configuration
+            setup_logging(self.config)
+        loop = asyncio.get_running_loop()
+        self.resources = await loop.run_in_executor(None, self._factory, self.config)
+        self.sessions = SessionManager(self.resources.mcp_server, self.config)
+        logging.info(f"MCP server ready in process {os.getpid()}")
+
+    async def drain(self, should_stop: Callable[[], bool] = lambda: False):
+        """
+        Refuse new work and wait for running vSphere tasks and jobs, then close the MCP sessions.
+
+        Waits at most drain_timeout seconds, or until should_stop() returns
+        True (e.g. a second interrupt).
+        """
+        if self._drained or self.resources is None:
             return
-    
-    return app
+        self._drained = True
+        self.sessions.accepting = False
+        self.resources.drain()
+        deadline = time.monotonic() + self.config.drain_timeout
+        calls, jobs = self.resources.busy()
+        if calls or jobs:
+            logging.info(f"Waiting up to {self.config.drain_timeout} s for {calls} long-running tool calls "
+                         f"and {jobs} jobs")
+        while (calls or jobs) and time.monotonic() < deadline and not should_stop():
+            await asyncio.sleep(0.5)
+            calls, jobs = self.resources.busy()
+        if calls or jobs:
+            logging.warning(f"Shutting down with {calls} long-running tool calls and {jobs} jobs still running")
+        # A call that just finished may not have sent its result yet
+        while self.sessions.requests and time.monotonic() < deadline and not should_stop():
+            await asyncio.sleep(0.05)
+        await self.sessions.close()
+
+    async def shutdown(self):
+        """Drain, then log out of vCenter and stop the worker pools."""
+        if self.resources is None:
+            return
+        await self.drain()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.resources.close)
+        self.resources = None
+        logging.info(f"MCP server stopped in process {os.getpid()}")
+
+
+class DrainingServer(uvicorn.Server):
+    """
+    uvicorn server that drains the app before closing client connections.
+
+    sse-starlette, which streams the MCP responses, ends every stream as
+    soon as uvicorn is asked to exit; that is held back until the drain is
+    done so running tool calls can still send their results. uvicorn's
+    graceful shutdown timeout only gets what the drain left of it, so the
+    whole shutdown stays within drain_timeout.
+    """
+
+    async def serve(self, sockets=None):
+        if AppStatus is not None and hasattr(AppStatus, "disable_automatic_graceful_drain"):
+            AppStatus.disable_automatic_graceful_drain()
+        await super().serve(sockets=sockets)
+
+    async def shutdown(self, sockets=None):
+        started = time.monotonic()
+        if isinstance(self.config.app, HttpApp):
+            await self.config.app.drain(lambda: self.force_exit)
+        if AppStatus is not None:
+            AppStatus.should_exit = True
+        # The drain and uvicorn's wait for open connections share one timeout
+        timeout = self.config.timeout_graceful_shutdown
+        if timeout is not None:
+            self.config.timeout_graceful_shutdown = max(0.0, timeout - (time.monotonic() - started))
+        try:
+            await super().shutdown(sockets=sockets)
+        finally:
+            self.config.timeout_graceful_shutdown = timeout
+
+
+def serve_http(config: Config, factory: Callable[[Config], Any]):
+    """
+    Serve the MCP server over HTTP with the configured uvicorn settings.
+
+    With several workers the listening socket is shared by that many
+    processes; each builds its own MCP server and vCenter sessions.
+    """
+    uvicorn_config = uvicorn.Config(
+        HttpApp(config, factory),
+        host=config.http_host,
+        port=config.http_port,
+        loop=config.http_loop,
+        http=config.http_protocol,
+        lifespan="on",
+        backlog=config.http_backlog,
+        timeout_keep_alive=config.http_keep_alive,
+        timeout_graceful_shutdown=config.drain_timeout or None,
+    )
+    if config.workers > 1:
+        _run_workers(uvicorn_config, config.workers)
+    else:
+        _serve(uvicorn_config)
+
+
+def _serve(uvicorn_config: uvicorn.Config, sockets=None):
+    try:
+        DrainingServer(uvicorn_config).run(sockets=sockets)
+    except KeyboardInterrupt:
+        # uvicorn re-raises the interrupt once it has shut down
+        pass
+
+
+def _serve_worker(uvicorn_config: uvicorn.Config, sockets):
+    """Entry point of a worker process: serve the shared socket until told to stop."""
+    uvicorn_config.configure_logging()
+    _serve(uvicorn_config, sockets)
+
+
+def _run_workers(uvicorn_config: uvicorn.Config, workers: int):
+    """
+    Run worker processes on one listening socket until SIGINT/SIGTERM, passing the signal on.
+
+    A worker that exits while the server is running is replaced. A worker
+    that fails its startup (e.g. vCenter is unreachable) stops all of them,
+    since every replacement would fail the same way.
+    """
+    sock = uvicorn_config.bind_socket()
+    context = multiprocessing.get_context("spawn")
+    stopping = threading.Event()
+
+    def spawn(index: int):
+        process = context.Process(target=_serve_worker, args=(uvicorn_config, [sock]), name=f"mcp-worker-{index}")
+        process.start()
+        return process
+
+    processes = [spawn(i) for i in range(workers)]
+    failed = False
+
+    def stop(signum=None, frame=None):
+        # Each worker drains on SIGTERM; a second Ctrl+C reaches the workers directly and forces them out
+        stopping.set()
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    while not stopping.wait(WORKER_CHECK_INTERVAL):
+        for index, process in enumerate(processes):
+            if process.is_alive() or stopping.is_set():
+                continue
+            if process.exitcode == STARTUP_FAILURE:
+                logging.error(f"Worker {process.name} (pid {process.pid}) failed to start, stopping the server")
+                failed = True
+                stop()
+                break
+            logging.warning(f"Worker {process.name} (pid {process.pid}) exited with code {process.exitcode}, "
+                            f"restarting it")
+            processes[index] = spawn(index)
+            if stopping.is_set():
+                # A signal arrived while the replacement was starting
+                processes[index].terminate()
+    for process in processes:
+        process.join()
+    sock.close()
+    if failed:
+        sys.exit(STARTUP_FAILURE)
@@ -1,96 +1,313 @@
 """VMware vSphere management using pyVmomi."""
 
+import re
 import ssl
+import time
+import fnmatch
 import logging
-from typing import Optional, Dict, Any
+import threading
+import contextvars
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Callable, Tuple
 
 from pyVim import connect
 from pyVmomi import vim, vmodl
 
 from .config import Config
+from .inventory import InventoryCache, InventoryEntry, build_view_filter_spec, normalize_path
+from .tasks import TaskWaiter
+from .session_pool import SessionPool
+from .perf_counters import PerfCounterCatalog
+from .stats_collector import StatsCollector
+from .jobs import check_canceled, current_job, transfer_callback
+from .lease import DiskUpload, LeaseUploader
+from .transfer import FileChunks, TransferProgress, stream_upload, upload_with_retry
+from .placement import DATASTORE_PROPERTIES, HOST_PROPERTIES, PlacementEngine, Reservation
+from .soap_trace import instrument_stub
+
+# Maximum number of objects returned per RetrievePropertiesEx page
+RETRIEVE_PAGE_SIZE = 1000
+
+# Maximum entity/counter combinations per QueryStats call (vCenter's default
+# config.vpxd.stats.maxQueryMetrics for historical intervals)
+PERF_QUERY_MAX_METRICS = 64
+
+# Entity types accepted by the bulk performance query
+PERF_ENTITY_TYPES = {"vm": vim.VirtualMachine, "host": vim.HostSystem}
+
+# Supported clone_vm modes
+CLONE_MODES = ("full", "linked", "instant")
+
+# Snapshot created on a source VM without snapshots for linked clones
+LINKED_CLONE_SNAPSHOT = "linked-clone-base"
+
+# Inventory containers that can scope a bulk query
+CONTAINER_TYPES = [vim.Folder, vim.Datacenter, vim.ComputeResource, vim.ResourcePool]
+
+# VM instance UUIDs, accepted wherever a VM name is
+UUID_PATTERN = re.compile(r"^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$")
+
+# Port of the vSphere API when vcenter_host does not include one
+DEFAULT_PORT = 443
+
+
+def split_host_port(address: str) -> Tuple[str, int]:
+    """Split a vcenter_host value ("host", "host:port" or "[IPv6 address]:port") into host and port."""
+    try:
+        if address.startswith("["):
+            host, _, rest = address[1:].partition("]")
+            return host, int(rest[1:]) if rest.startswith(":") else DEFAULT_PORT
+        # More than one colon is a bare IPv6 address
+        if address.count(":") == 1:
+            host, port = address.split(":")
+            return host, int(port)
+    except ValueError:
+        raise ValueError(f"Invalid vcenter_host: {address}. Use host, host:port or [IPv6 address]:port")
+    return address, DEFAULT_PORT
+
+
+def join_host_port(host: str, port: Optional[int] = None) -> str:
+    """Format a host, and optionally a port, for a URL, bracketing IPv6 addresses."""
+    if ":" in host:
+        host = f"[{host}]"
+    return host if port is None else f"{host}:{port}"
+
+
+class _SessionBound:
+    """Attribute holding a managed object of the primary session, rebound to the caller's pooled session on access."""
+
+    def __set_name__(self, owner, name):
+        self.attr = "_" + name
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        return obj._bind(getattr(obj, self.attr, None))
+
+    def __set__(self, obj, value):
+        setattr(obj, self.attr, value)
 
 
 class VMwareManager:
     """VMware management class, encapsulating pyVmomi operations for vSphere."""
     
+    datacenter_obj = _SessionBound()
+    resource_pool = _SessionBound()
+    datastore_obj = _SessionBound()
+    network_obj = _SessionBound()
+
     def __init__(self, config: Config):
         self.config = config
-        self.si = None               # Service instance (ServiceInstance)
-        self.content = None          # vSphere content root
+        self._si = None              # Primary service instance (ServiceInstance)
+        self._content = None         # Primary vSphere content root
         self.datacenter_obj = None
         self.resource_pool = None
         self.datastore_obj = None
         self.network_obj = None
         self.authenticated = False   # Authentication flag for API key verification
+        self.inventory = None        # InventoryCache (when enabled)
+        self.tasks = None            # TaskWaiter for the current session
+        self.perf_counters = None    # PerfCounterCatalog for the current session
+        self._local = threading.local()  # Pooled session checked out by the current thread
+        self.placement = None        # PlacementEngine choosing hosts/datastores for new VMs (when enabled)
+        if config.placement_engine:
+            self.placement = PlacementEngine(config.placement_datastore_reserve, config.placement_cpu_headroom,
+                                             config.placement_memory_headroom)
+        self.pool = None
+        if config.session_pool_size > 0:
+            self.pool = SessionPool(self._open_session, config.session_pool_size,
+                                    idle_timeout=config.session_idle_timeout)
+        self.session_started = None  # Wall-clock time the primary session was established
+        self.last_keepalive = None   # Wall-clock time of the last successful keepalive
+        self.reconnect_count = 0     # Number of times the primary session was re-established
+        self._reconnect_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._keepalive_thread = None
         self._connect_vcenter()
+        if config.keepalive_interval > 0:
+            self._keepalive_thread = threading.Thread(target=self._keepalive_loop,
+                                                      name="vcenter-keepalive", daemon=True)
+            self._keepalive_thread.start()
+        self.stats = None            # StatsCollector (when enabled)
+        if config.stats_collector:
+            self.stats = StatsCollector(self, config.stats_vms, config.stats_hosts, config.stats_counters,
+                                        interval=config.stats_interval, retention=config.stats_retention)
+            self.stats.start()
+
+    @property
+    def si(self):
+        """Service instance of the session checked out by this thread, or the primary one."""
+        session = getattr(self._local, "session", None)
+        return session.si if session is not None else self._si
+
+    @si.setter
+    def si(self, value):
+        self._si = value
+
+    @property
+    def content(self):
+        """Content root of the session checked out by this thread, or the primary one."""
+        session = getattr(self._local, "session", None)
+        return session.content if session is not None else self._content
+
+    @content.setter
+    def content(self, value):
+        self._content = value
+
+    def _bind(self, mo):
+        """Return a managed object reference that issues calls through this thread's session."""
+        session = getattr(self._local, "session", None)
+        if mo is None or session is None:
+            return mo
+        stub = session.si._stub
+        if mo._stub is stub:
+            return mo
+        return mo.__class__(mo._moId, stub=stub)
+
+    @contextmanager
+    def session(self):
+        """
+        Run the enclosed calls on a pooled session.
+
+        Managed objects obtained inside the block (find_vm, find_host and the
+        default placement objects) are bound to that session, so concurrent
+        callers do not share one connection. Without a pool, or when the
+        thread already holds a session, the block runs on the current session.
+        """
+        if self.pool is None or getattr(self._local, "session", None) is not None:
+            yield
+            return
+        with self.pool.session() as pooled:
+            self._local.session = pooled
+            try:
+                yield
+            finally:
+                self._local.session = None
+
+    def call(self, func, *args, retry: bool = False, **kwargs):
+        """
+        Run a manager method on a pooled session without a liveness check.
 
-    def _ensure_connected(self):
-        """Check if the vCenter session is still active and reconnect if needed."""
+        If the call fails with NotAuthenticated, the expired session is
+        replaced. Read-only methods (retry=True) are then run once more;
+        any other method may already have started vSphere tasks before the
+        session expired, so the fault is raised rather than repeating them.
+        """
+        si = None
         try:
-            if self.si is None:
-                raise Exception("No service instance")
-            # Lightweight call to verify the session is alive
-            self.si.CurrentTime()
-        except Exception:
-            logging.warning("vCenter/ESXi session expired or lost, reconnecting...")
+            with self.session():
+                si = self.si
+                return func(*args, **kwargs)
+        except vim.fault.NotAuthenticated:
+            logging.warning("vCenter/ESXi session is no longer authenticated, reconnecting"
+                            + (" and retrying" if retry else ""))
+            # Pooled sessions are discarded by the pool; the primary one is re-established here
+            if si is None or si is self._si:
+                self._reconnect(si)
+            if not retry:
+                raise
+        with self.session():
+            return func(*args, **kwargs)
+
+    def _reconnect(self, stale_si=None):
+        """Re-establish the primary session unless another thread already replaced stale_si."""
+        with self._reconnect_lock:
+            if stale_si is not None and self._si is not stale_si:
+                return
             self._connect_vcenter()
+            self.reconnect_count += 1
+
+    def _keepalive_loop(self):
+        """Refresh the primary session and maintain the session pool on an interval."""
+        interval = self.config.keepalive_interval
+        while not self._stop_event.wait(interval):
+            si = self._si
+            try:
+                si.CurrentTime()
+                self.last_keepalive = time.time()
+            except Exception as e:
+                logging.warning(f"vCenter/ESXi keepalive failed, reconnecting: {e}")
+                try:
+                    self._reconnect(si)
+                except Exception as e:
+                    logging.error(f"Failed to reconnect to vCenter/ESXi: {e}")
+            if self.pool is not None:
+                self.pool.keepalive()
+
+    def session_age(self) -> Optional[float]:
+        """Seconds since the primary session was established."""
+        return time.time() - self.session_started if self.session_started else None
+
+    def _api_address(self) -> str:
+        """vCenter host and port as written in a URL."""
+        return join_host_port(*split_host_port(self.config.vcenter_host))
+
+    def _open_session(self):
+        """Log in to vCenter/ESXi and return a new service instance."""
+        host, port = split_host_port(self.config.vcenter_host)
+        if self.config.insecure:
+            # Connection method without SSL certificate verification
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+            context.check_hostname = False  # Disable hostname checking
+            context.verify_mode = ssl.CERT_NONE
+            si = connect.SmartConnect(
+                host=host,
+                port=port,
+                user=self.config.vcenter_user,
+                pwd=self.config.vcenter_password,
+                sslContext=context)
+        else:
+            # Standard SSL verification connection
+            si = connect.SmartConnect(
+                host=host,
+                port=port,
+                user=self.config.vcenter_user,
+                pwd=self.config.vcenter_password)
+        if self.config.soap_trace:
+            instrument_stub(si._stub)
+        return si
 
     def _connect_vcenter(self):
-        """Connect to vCenter/ESXi and retrieve main resource object references."""
+        """Connect the primary session to vCenter/ESXi and retrieve main resource object references."""
         try:
-            if self.config.insecure:
-                # Connection method without SSL certificate verification
-                context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
-                context.check_hostname = False  # Disable hostname checking
-                context.verify_mode = ssl.CERT_NONE
-                self.si = connect.SmartConnect(
-                    host=self.config.vcenter_host,
-                    user=self.config.vcenter_user,
-                    pwd=self.config.vcenter_password,
-                    sslContext=context)
-            else:
-                # Standard SSL verification connection
-                self.si = connect.SmartConnect(
-                    host=self.config.vcenter_host,
-                    user=self.config.vcenter_user,
-                    pwd=self.config.vcenter_password)
+            self.si = self._open_session()
         except Exception as e:
             logging.error(f"Failed to connect to vCenter/ESXi: {e}")
             raise
+        self.session_started = time.time()
+        self.last_keepalive = self.session_started
         # Retrieve content root object
         self.content = self.si.RetrieveContent()
+        self.perf_counters = PerfCounterCatalog(self.content.perfManager)
         logging.info("Successfully connected to VMware vCenter/ESXi API")
 
-        # Retrieve target datacenter object
+        # The placement index resolves the configured targets below without walking folders
+        self._start_inventory()
+
+        # Retrieve target datacenter object (by name or inventory path; default: the first one)
         if self.config.datacenter:
-            # Find specified datacenter by name
-            self.datacenter_obj = next((dc for dc in self.content.rootFolder.childEntity
-                                        if isinstance(dc, vim.Datacenter) and dc.name == self.config.datacenter), None)
+            self.datacenter_obj = self._lookup(vim.Datacenter, self.config.datacenter)
             if not self.datacenter_obj:
                 logging.error(f"Datacenter named {self.config.datacenter} not found")
                 raise Exception(f"Datacenter {self.config.datacenter} not found")
         else:
-            # Default to the first available datacenter
-            self.datacenter_obj = next((dc for dc in self.content.rootFolder.childEntity
-                                        if isinstance(dc, vim.Datacenter)), None)
+            self.datacenter_obj = next((e.obj for e in self._retrieve_properties({vim.Datacenter: ["name"]})), None)
         if not self.datacenter_obj:
             raise Exception("No datacenter object found")
 
         # Retrieve resource pool (if a cluster is configured, use the cluster's resource pool; otherwise, use the host resource pool)
         compute_resource = None
         if self.config.cluster:
-            # Find specified cluster
-            for folder in self.datacenter_obj.hostFolder.childEntity:
-                if isinstance(folder, vim.ClusterComputeResource) and folder.name == self.config.cluster:
-                    compute_resource = folder
-                    break
+            # Find specified cluster in the datacenter, including clusters in host sub-folders
+            compute_resource = self._lookup(vim.ComputeResource, self.config.cluster, root=self.datacenter_obj)
             if not compute_resource:
                 logging.error(f"Cluster named {self.config.cluster} not found")
                 raise Exception(f"Cluster {self.config.cluster} not found")
         else:
             # Default to the first ComputeResource (cluster or standalone host)
-            compute_resource = next((cr for cr in self.datacenter_obj.hostFolder.childEntity
-                                      if isinstance(cr, vim.ComputeResource)), None)
+            compute_resource = next((e.obj for e in self._retrieve_properties(
+                {vim.ComputeResource: ["name"]}, root=self.datacenter_obj)), None)
         if not compute_resource:
             raise Exception("No compute resource (cluster or host) found")
         self.resource_pool = compute_resource.resourcePool
@@ -98,26 +315,26 @@ class VMwareManager:
 
         # Retrieve datastore object
         if self.config.datastore:
-            # Find specified datastore in the datacenter
-            self.datastore_obj = next((ds for ds in self.datacenter_obj.datastoreFolder.childEntity
-                                       if isinstance(ds, vim.Datastore) and ds.name == self.config.datastore), None)
+            # Find specified datastore in the datacenter, including datastore folders and clusters
+            self.datastore_obj = self._lookup(vim.Datastore, self.config.datastore, root=self.datacenter_obj)
             if not self.datastore_obj:
                 logging.error(f"Datastore named {self.config.datastore} not found")
                 raise Exception(f"Datastore {self.config.datastore} not found")
         else:
-            # Default to the datastore with the largest available capacity
-            datastores = [ds for ds in self.datacenter_obj.datastoreFolder.childEntity if isinstance(ds, vim.Datastore)]
+            # Default to the accessible datastore with the largest available capacity
+            datastores = [e for e in self._retrieve_properties(
+                {vim.Datastore: ["name", "summary.freeSpace", "summary.accessible"]}, root=self.datacenter_obj)
+                if e.props.get("summary.accessible")]
             if not datastores:
                 raise Exception("No available datastore found in the datacenter")
             # Select the one with the maximum free space
-            self.datastore_obj = max(datastores, key=lambda ds: ds.summary.freeSpace)
+            self.datastore_obj = max(datastores, key=lambda e: e.props.get("summary.freeSpace", 0)).obj
         logging.info(f"Using datastore: {self.datastore_obj.name}")
 
         # Retrieve network object (network or distributed virtual portgroup)
         if self.config.network:
-            # Find specified network in the datacenter network list
-            networks = self.datacenter_obj.networkFolder.childEntity
-            self.network_obj = next((net for net in networks if net.name == self.config.network), None)
+            # Find specified network in the datacenter
+            self.network_obj = self._lookup(vim.Network, self.config.network, root=self.datacenter_obj)
             if not self.network_obj:
                 logging.error(f"Network {self.config.network} not found")
                 raise Exception(f"Network {self.config.network} not found")
@@ -125,26 +342,148 @@ class VMwareManager:
         else:
             self.network_obj = None  # If no network is specified, VM creation can choose to not connect to a network
 
+        if self.tasks is not None:
+            self.tasks.stop()
+        self.tasks = TaskWaiter(self.content)
+
+    def close(self):
+        """Stop background collectors and log out of all sessions."""
+        self._stop_event.set()
+        if self._keepalive_thread is not None:
+            self._keepalive_thread.join(timeout=5)
+        if self.stats is not None:
+            self.stats.stop()
+        if self.inventory is not None:
+            self.inventory.stop()
+            self.inventory = None
+        if self.tasks is not None:
+            self.tasks.stop()
+        if self.pool is not None:
+            self.pool.close()
+        try:
+            if self._si is not None:
+                connect.Disconnect(self._si)
+        except Exception:
+            pass
+
+    def _start_inventory(self):
+        """(Re)build the inventory cache for the current session."""
+        if self.inventory is not None:
+            self.inventory.stop()
+            self.inventory = None
+        if not self.config.inventory_cache:
+            return
+        inventory = InventoryCache(self.si, self.content)
+        try:
+            inventory.start()
+        except Exception as e:
+            # Lookups fall back to scanning the inventory directly
+            logging.warning(f"Failed to start inventory cache: {e}")
+            inventory.stop()
+            return
+        self.inventory = inventory
+
+    def _inventory_ready(self) -> bool:
+        return self.inventory is not None and self.inventory.ready
+
+    def _wait_for_task(self, task: vim.Task, on_progress=None):
+        """
+        Block until a task finishes, raising its fault if it failed.
+
+        When called from a job, the task's progress is reported to the job and
+        canceling the job cancels the task.
+        """
+        job = current_job()
+        if job is not None:
+            job.on_cancel(lambda: self.tasks.cancel(task))
+            if on_progress is None:
+                on_progress = job.update
+        return self.tasks.wait(task, timeout=self.config.task_timeout, on_progress=on_progress)
+
+    def _retrieve_properties(self, properties: Dict[type, List[str]], root=None) -> List[InventoryEntry]:
+        """
+        Fetch property paths for every object of the given types in one paged pass.
+
+        Args:
+            properties: Mapping of managed object type to the property paths to fetch
+            root: Container to search (defaults to the root folder)
+
+        Returns:
+            List of entries holding each object and its fetched properties. Unset
+            properties are absent from the entry's props.
+        """
+        view = self.content.viewManager.CreateContainerView(
+            root or self.content.rootFolder, list(properties), True)
+        try:
+            collector = self.content.propertyCollector
+            options = vmodl.query.PropertyCollector.RetrieveOptions(maxObjects=RETRIEVE_PAGE_SIZE)
+            result = collector.RetrievePropertiesEx([build_view_filter_spec(view, properties)], options)
+            entries = []
+            while result:
+                for obj_content in result.objects:
+                    entry = InventoryEntry(obj_content.obj)
+                    for prop in obj_content.propSet:
+                        entry.props[prop.name] = prop.val
+                    entries.append(entry)
+                if not result.token:
+                    break
+                result = collector.ContinueRetrievePropertiesEx(result.token)
+            return entries
+        finally:
+            view.Destroy()
+
     def list_vms(self) -> list:
         """List all virtual machine names."""
-        vm_list = []
-        # Create a view to iterate over all virtual machines
-        container = self.content.viewManager.CreateContainerView(self.content.rootFolder, [vim.VirtualMachine], True)
-        for vm in container.view:
-            vm_list.append(vm.name)
-        container.Destroy()
-        return vm_list
+        if self._inventory_ready():
+            return self.inventory.vm_names()
+        return [e.name for e in self._retrieve_properties({vim.VirtualMachine: ["name"]})]
+
+    def list_vm_rows(self) -> List[Dict[str, Any]]:
+        """Describe every VM with the fields paged list_vms/list_templates calls filter and sort on."""
+        if self._inventory_ready():
+            vm_entries = self.inventory.entries(vim.VirtualMachine)
+            host_entries = self.inventory.entries(vim.HostSystem)
+        else:
+            entries = self._retrieve_properties({
+                vim.VirtualMachine: ["name", "config.template", "runtime.powerState", "runtime.host"],
+                vim.HostSystem: ["name"],
+            })
+            vm_entries = [e for e in entries if isinstance(e.obj, vim.VirtualMachine)]
+            host_entries = [e for e in entries if isinstance(e.obj, vim.HostSystem)]
+        host_names = {e.obj._moId: e.name for e in host_entries}
+        rows = []
+        for entry in vm_entries:
+            if entry.name is None:
+                continue
+            host = entry.props.get("runtime.host")
+            power_state = entry.props.get("runtime.powerState")
+            rows.append({
+                "name": entry.name,
+                "power_state": str(power_state) if power_state is not None else None,
+                "host": host_names.get(host._moId) if host is not None else None,
+                "template": bool(entry.props.get("config.template")),
+            })
+        return rows
+
+    def list_host_rows(self) -> List[Dict[str, Any]]:
+        """Describe every host with the fields paged list_hosts calls filter and sort on."""
+        if self._inventory_ready():
+            entries = self.inventory.entries(vim.HostSystem)
+        else:
+            entries = self._retrieve_properties({vim.HostSystem: ["name", "runtime.connectionState"]})
+        return [{"name": e.name, "connection_state": str(e.props.get("runtime.connectionState"))}
+                for e in entries if e.name is not None]
 
     def find_vm(self, name: str) -> Optional[vim.VirtualMachine]:
-        """Find virtual machine object by name."""
-        container = self.content.viewManager.CreateContainerView(self.content.rootFolder, [vim.VirtualMachine], True)
-        vm_obj = None
-        for vm in container.view:
-            if vm.name == name:
-                vm_obj = vm
-                break
-        container.Destroy()
-        return vm_obj
+        """Find virtual machine object by name, or else by moref ID (vm-42) or instance UUID."""
+        if self._inventory_ready():
+            # The cache follows the inventory within one update; a miss means there is no such VM
+            return self._bind(self.inventory.find_vm(name))
+        vm = next((e.obj for e in self._retrieve_properties({vim.VirtualMachine: ["name"]})
+                   if e.name == name), None)
+        if vm is None and UUID_PATTERN.match(name):
+            vm = self.content.searchIndex.FindByUuid(None, name, True, True)
+        return vm
 
     def get_vm_performance(self, vm_name: str) -> Dict[str, Any]:
         """Retrieve performance data (CPU, memory, storage, and network) for the specified virtual machine."""
@@ -165,21 +504,17 @@ class VMwareManager:
         net_bytes_received = 0
         try:
             pm = self.content.perfManager
-            # Define performance counter IDs to query: network transmitted and received bytes
-            counter_ids = []
-            for c in pm.perfCounter:
-                counter_full_name = f"{c.groupInfo.key}.{c.nameInfo.key}.{c.rollupType}"
-                if counter_full_name in ("net.transmitted.average", "net.received.average"):
-                    counter_ids.append(c.key)
+            # Resolve performance counter IDs to query: network transmitted and received bytes
+            counter_ids = self.perf_counters.keys(["net.transmitted.average", "net.received.average"])
             if counter_ids:
-                query = vim.PerformanceManager.QuerySpec(maxSample=1, entity=vm, metricId=[vim.PerformanceManager.MetricId(counterId=cid, instance="*") for cid in counter_ids])
+                query = vim.PerformanceManager.QuerySpec(maxSample=1, entity=vm, metricId=[vim.PerformanceManager.MetricId(counterId=cid, instance="*") for cid in counter_ids.values()])
                 stats_res = pm.QueryStats(querySpec=[query])
                 for series in stats_res[0].value:
                     # Sum data from each network interface
-                    if series.id.counterId == counter_ids[0]:
-                        net_bytes_transmitted = sum(series.value)
-                    elif series.id.counterId == counter_ids[1]:
-                        net_bytes_received = sum(series.value)
+                    if series.id.counterId == counter_ids.get("net.transmitted.average"):
+                        net_bytes_transmitted += sum(series.value)
+                    elif series.id.counterId == counter_ids.get("net.received.average"):
+                        net_bytes_received += sum(series.value)
             stats["network_transmit_KBps"] = net_bytes_transmitted
             stats["network_receive_KBps"] = net_bytes_received
         except Exception as e:
@@ -243,69 +578,62 @@ class VMwareManager:
 
     def list_templates(self) -> list:
         """List all virtual machine templates."""
-        templates = []
-        container = self.content.viewManager.CreateContainerView(self.content.rootFolder, [vim.VirtualMachine], True)
-        for vm in container.view:
-            if vm.config and vm.config.template:
-                templates.append(vm.name)
-        container.Destroy()
-        return templates
+        if self._inventory_ready():
+            return self.inventory.template_names()
+        entries = self._retrieve_properties({vim.VirtualMachine: ["name", "config.template"]})
+        return [e.name for e in entries if e.props.get("config.template")]
 
     def list_datastores(self) -> list:
         """List all datastores with their details."""
         datastores = []
-        container = self.content.viewManager.CreateContainerView(self.content.rootFolder, [vim.Datastore], True)
-        for ds in container.view:
+        for entry in self._retrieve_properties({vim.Datastore: ["summary"]}):
+            summary = entry.props["summary"]
             ds_info = {
-                "name": ds.name,
-                "type": ds.summary.type,
-                "capacity_gb": round(ds.summary.capacity / (1024**3), 2),
-                "free_space_gb": round(ds.summary.freeSpace / (1024**3), 2),
-                "accessible": ds.summary.accessible,
-                "maintenance_mode": ds.summary.maintenanceMode if hasattr(ds.summary, 'maintenanceMode') else "normal",
+                "name": summary.name,
+                "type": summary.type,
+                "capacity_gb": round(summary.capacity / (1024**3), 2),
+                "free_space_gb": round(summary.freeSpace / (1024**3), 2),
+                "accessible": summary.accessible,
+                "maintenance_mode": summary.maintenanceMode if summary.maintenanceMode else "normal",
             }
             datastores.append(ds_info)
-        container.Destroy()
         return datastores
 
     def list_networks(self) -> list:
         """List all networks."""
         networks = []
-        container = self.content.viewManager.CreateContainerView(self.content.rootFolder, [vim.Network], True)
-        for net in container.view:
+        entries = self._retrieve_properties({
+            vim.Network: ["name", "summary.accessible"],
+            vim.dvs.DistributedVirtualPortgroup: ["config.defaultPortConfig"],
+        })
+        for entry in entries:
+            accessible = entry.props.get("summary.accessible")
             net_info = {
-                "name": net.name,
-                "accessible": net.summary.accessible if hasattr(net.summary, 'accessible') else True,
+                "name": entry.name,
+                "accessible": accessible if accessible is not None else True,
             }
             # Check if it's a distributed virtual portgroup
-            if isinstance(net, vim.dvs.DistributedVirtualPortgroup):
+            if isinstance(entry.obj, vim.dvs.DistributedVirtualPortgroup):
+                port_config = entry.props.get("config.defaultPortConfig")
                 net_info["type"] = "DistributedVirtualPortgroup"
-                net_info["vlan"] = net.config.defaultPortConfig.vlan.vlanId if hasattr(net.config.defaultPortConfig, 'vlan') else None
+                net_info["vlan"] = port_config.vlan.vlanId if hasattr(port_config, 'vlan') and port_config.vlan else None
             else:
                 net_info["type"] = "Network"
             networks.append(net_info)
-        container.Destroy()
         return networks
 
     def list_hosts(self) -> list:
         """List all ESXi hosts."""
-        hosts = []
-        container = self.content.viewManager.CreateContainerView(self.content.rootFolder, [vim.HostSystem], True)
-        for host in container.view:
-            hosts.append(host.name)
-        container.Destroy()
-        return hosts
+        if self._inventory_ready():
+            return self.inventory.host_names()
+        return [e.name for e in self._retrieve_properties({vim.HostSystem: ["name"]})]
 
     def find_host(self, name: str) -> Optional[vim.HostSystem]:
         """Find host object by name."""
-        container = self.content.viewManager.CreateContainerView(self.content.rootFolder, [vim.HostSystem], True)
-        host_obj = None
-        for host in container.view:
-            if host.name == name:
-                host_obj = host
-                break
-        container.Destroy()
-        return host_obj
+        if self._inventory_ready():
+            return self._bind(self.inventory.find_host(name))
+        return next((e.obj for e in self._retrieve_properties({vim.HostSystem: ["name"]})
+                     if e.name == name), None)
 
     def get_host_details(self, host_name: str) -> Dict[str, Any]:
         """Get detailed information about a specific host."""
@@ -322,7 +650,7 @@ class VMwareManager:
             "vendor": host.hardware.systemInfo.vendor if host.hardware else None,
             "model": host.hardware.systemInfo.model if host.hardware else None,
             "uuid": host.hardware.systemInfo.uuid if host.hardware else None,
-            "cpu_model": host.hardware.cpuInfo.model if host.hardware and host.hardware.cpuInfo else None,
+            "cpu_model": host.hardware.cpuPkg[0].description if host.hardware and host.hardware.cpuPkg else None,
             "cpu_cores": host.hardware.cpuInfo.numCpuCores if host.hardware and host.hardware.cpuInfo else 0,
             "cpu_threads": host.hardware.cpuInfo.numCpuThreads if host.hardware and host.hardware.cpuInfo else 0,
             "cpu_mhz": host.hardware.cpuInfo.hz // 1000000 if host.hardware and host.hardware.cpuInfo else 0,
@@ -402,24 +730,251 @@ class VMwareManager:
         
         return stats
 
-    def list_performance_counters(self) -> list:
-        """List available performance counters."""
-        counters = []
+    def _find_entities(self, mo_type, names: List[str]):
+        """Resolve names to managed objects, returning (name, object) pairs and the names not found."""
+        found = []
+        unresolved = []
+        if self._inventory_ready() and mo_type in (vim.VirtualMachine, vim.HostSystem):
+            for name in names:
+                obj = self.inventory.find(mo_type, name)
+                if obj is not None:
+                    found.append((name, self._bind(obj)))
+                else:
+                    unresolved.append(name)
+        else:
+            unresolved = list(names)
+        if unresolved:
+            # One paged pass resolves all remaining names
+            by_name = {e.name: e.obj for e in self._retrieve_properties({mo_type: ["name"]})}
+            found.extend((name, by_name[name]) for name in unresolved if name in by_name)
+            unresolved = [name for name in unresolved if name not in by_name]
+        return found, unresolved
+
+    def _find_container(self, name: str):
+        """Find a folder, datacenter, cluster/compute resource or resource pool by name."""
+        entries = self._retrieve_properties({t: ["name"] for t in CONTAINER_TYPES})
+        return next((e.obj for e in entries if e.name == name), None)
+
+    def _lookup(self, mo_type, target: str, root=None):
+        """
+        Find a placement object by inventory path or name, or return None.
+
+        Targets containing '/' are inventory paths such as
+        /dc1/host/cluster1/Resources/pool1 or /dc1/datastore/ds1; others are
+        names. Both are answered from the inventory cache when it is ready.
+        Names are otherwise searched in one pass over root (default: the
+        whole inventory), including nested folders.
+        """
+        if "/" in target:
+            if self._inventory_ready():
+                obj = self.inventory.resolve(target, mo_type)
+                if obj is not None:
+                    return self._bind(obj)
+            # Not cached (yet); ask the server
+            obj = self.content.searchIndex.FindByInventoryPath(normalize_path(target).lstrip("/"))
+            return obj if isinstance(obj, mo_type) else None
+        if root is None and self._inventory_ready():
+            obj = self.inventory.find(mo_type, target)
+            if obj is not None:
+                return self._bind(obj)
+        return next((e.obj for e in self._retrieve_properties({mo_type: ["name"]}, root=root)
+                     if e.name == target), None)
+
+    def _resolve(self, mo_type, target: str, label: str):
+        """Like _lookup, but raise '<label> <target> not found' when nothing matches."""
+        obj = self._lookup(mo_type, target)
+        if obj is None:
+            raise Exception(f"{label} {target} not found")
+        return obj
+
+    def _resolve_pool(self, target: str) -> vim.ResourcePool:
+        """Resolve a resource pool, or a cluster/host whose root resource pool is used, by path or name."""
+        obj = self._lookup(vim.ResourcePool, target) or self._lookup(vim.ComputeResource, target)
+        if obj is None:
+            raise Exception(f"Resource pool {target} not found")
+        return obj.resourcePool if isinstance(obj, vim.ComputeResource) else obj
+
+    def _ancestor(self, obj, mo_type):
+        """Return the nearest ancestor of the given type, following cached parent links when possible."""
+        while obj is not None and not isinstance(obj, mo_type):
+            parent = self.inventory.parent(obj) if self._inventory_ready() else None
+            obj = parent if parent is not None else obj.parent
+        return self._bind(obj)
+
+    def _datacenter_of(self, obj) -> vim.Datacenter:
+        """Return the datacenter containing a placement object."""
+        return self._ancestor(obj, vim.Datacenter) or self.datacenter_obj
+
+    def _placement(self, datastore: Optional[str] = None, network: Optional[str] = None,
+                   folder: Optional[str] = None, resource_pool: Optional[str] = None):
+        """
+        Resolve the targets of a new VM, falling back to the configured defaults.
+
+        Returns:
+            (datastore, network or None, folder, resource pool) managed objects. The
+            datastore is None when the placement engine should choose one.
+        """
+        datastore_obj = self._target_datastore(datastore)
+        network_obj = self._resolve(vim.Network, network, "Specified network") if network else self.network_obj
+        pool = self._resolve_pool(resource_pool) if resource_pool else self.resource_pool
+        if folder:
+            vm_folder = self._resolve(vim.Folder, folder, "Specified folder")
+        else:
+            # Default to the VM folder of the datacenter that owns the resource pool
+            vm_folder = (self._datacenter_of(pool) if resource_pool else self.datacenter_obj).vmFolder
+        return datastore_obj, network_obj, vm_folder, pool
+
+    def _target_datastore(self, datastore: Optional[str] = None):
+        """
+        Resolve the datastore requested for a new VM.
+
+        Returns None when the placement engine should choose one, i.e. when it
+        is enabled and neither the call nor the configuration names a datastore.
+        """
+        if datastore:
+            return self._resolve(vim.Datastore, datastore, "Specified datastore")
+        if self.placement is None or self.config.datastore:
+            return self.datastore_obj
+        return None
+
+    def _reserve(self, pool: vim.ResourcePool, datastore=None, memory_mb: int = 0, disk_bytes: int = 0,
+                 anti_affinity: Optional[str] = None) -> Reservation:
+        """
+        Pick the host and datastore for a new VM in pool and hold capacity for it.
+
+        Candidates are the hosts of the pool's cluster or standalone host and
+        the datastores they mount, scored from the inventory cache (or one
+        property retrieval when the cache is off). Release the reservation
+        when the creation task has finished.
+
+        Args:
+            pool: Resource pool the VM is created in
+            datastore: Fixed datastore, or None to let the engine choose
+            memory_mb: Memory of the new VM
+            disk_bytes: Disk space the new VM will use
+            anti_affinity: Glob pattern of VM names the new VM must not share a host with
+
+        Returns:
+            The reservation; without the placement engine it holds nothing and
+            only names the datastore (host None)
+        """
+        if self.placement is None:
+            return Reservation(None, None, datastore or self.datastore_obj, memory_mb, disk_bytes, None)
+        compute = self._ancestor(pool, vim.ComputeResource)
+        if self._inventory_ready():
+            hosts = self.inventory.entries(vim.HostSystem)
+            datastores = self.inventory.entries(vim.Datastore)
+            vms = self.inventory.entries(vim.VirtualMachine) if anti_affinity else []
+        else:
+            properties = {vim.HostSystem: HOST_PROPERTIES, vim.Datastore: DATASTORE_PROPERTIES}
+            if anti_affinity:
+                properties[vim.VirtualMachine] = ["name", "runtime.host"]
+            entries = self._retrieve_properties(properties, root=self._datacenter_of(compute))
+            hosts = [e for e in entries if isinstance(e.obj, vim.HostSystem)]
+            datastores = [e for e in entries if isinstance(e.obj, vim.Datastore)]
+            vms = [e for e in entries if isinstance(e.obj, vim.VirtualMachine)]
+        hosts = [e for e in hosts if e.props.get("parent") is not None and e.props["parent"]._moId == compute._moId]
+        group_hosts = {e.props["runtime.host"]._moId for e in vms
+                       if e.name is not None and e.props.get("runtime.host") is not None
+                       and fnmatch.fnmatchcase(e.name, anti_affinity)}
+        reservation = self.placement.place(hosts, datastores, memory_mb, disk_bytes, anti_affinity,
+                                           group_hosts, datastore)
+        reservation.host = self._bind(reservation.host)
+        reservation.datastore = self._bind(reservation.datastore)
+        return reservation
+
+    def get_performance_bulk(self, entity_type: str, counters: List[str], names: Optional[List[str]] = None,
+                             container: Optional[str] = None, interval_id: int = 20,
+                             max_samples: int = 1, instance: str = "") -> Dict[str, Any]:
+        """
+        Query performance counters for many VMs or hosts with batched QueryStats calls.
+
+        Args:
+            entity_type: 'vm' or 'host'
+            counters: Counter names in group.name.rollup form (e.g. cpu.usage.average)
+            names: Entity names to query
+            container: Name of a folder, datacenter, cluster or resource pool whose
+                entities are queried (used when names is not given)
+            interval_id: Sampling interval in seconds (20 = real-time)
+            max_samples: Number of most recent samples per entity
+            instance: Counter instance; "" for the aggregate, "*" to sum all instances
+
+        Returns:
+            Columnar result: entity names, per-entity sample timestamps and, per
+            counter, one list of samples for each entity (None if not reported)
+        """
+        mo_type = PERF_ENTITY_TYPES.get(entity_type)
+        if mo_type is None:
+            raise Exception(f"Invalid entity type: {entity_type}. Use one of: {', '.join(PERF_ENTITY_TYPES)}")
+        if not counters:
+            raise Exception("At least one performance counter is required")
+        counter_ids = self.perf_counters.keys(counters)
+        unknown = [c for c in counters if c not in counter_ids]
+        if unknown:
+            raise Exception(f"Unknown performance counters: {', '.join(unknown)}")
+
+        if names:
+            entities, missing = self._find_entities(mo_type, names)
+        elif container:
+            container_obj = self._find_container(container)
+            if not container_obj:
+                raise Exception(f"Container {container} not found")
+            entities = [(e.name, e.obj) for e in self._retrieve_properties({mo_type: ["name"]}, root=container_obj)]
+            missing = []
+        else:
+            raise Exception("Either names or container must be specified")
+
+        result = {
+            "entity_type": entity_type,
+            "interval_id": interval_id,
+            "counters": list(counter_ids),
+            "entities": [],
+            "timestamps": [],
+            "values": {name: [] for name in counter_ids},
+            "missing": missing,
+        }
+        for name, timestamps, totals in self._query_stats(entities, counter_ids, interval_id,
+                                                           max_samples, instance):
+            result["entities"].append(name)
+            result["timestamps"].append([str(ts) for ts in timestamps])
+            for counter in counter_ids:
+                result["values"][counter].append(totals.get(counter))
+
+        reported = set(result["entities"])
+        result["no_data"] = [name for name, _ in entities if name not in reported]
+        return result
+
+    def _query_stats(self, entities, counter_ids: Dict[str, int], interval_id: int,
+                     max_samples: int, instance: str = ""):
+        """
+        Run chunked multi-entity QueryStats calls.
+
+        Yields (entity name, sample timestamps, {counter name: samples}) for each
+        entity the server reported on, summing each counter across instances.
+        """
+        counter_names = {cid: name for name, cid in counter_ids.items()}
+        names_by_id = {obj._moId: name for name, obj in entities}
+        metric_ids = [vim.PerformanceManager.MetricId(counterId=cid, instance=instance)
+                      for cid in counter_ids.values()]
         pm = self.content.perfManager
-        
-        for counter in pm.perfCounter:
-            counter_info = {
-                "key": counter.key,
-                "group": counter.groupInfo.key,
-                "name": counter.nameInfo.key,
-                "rollup_type": str(counter.rollupType),
-                "stats_type": str(counter.statsType),
-                "unit": counter.unitInfo.key,
-                "description": counter.nameInfo.summary if counter.nameInfo else "",
-            }
-            counters.append(counter_info)
-        
-        return counters
+        chunk_size = max(1, PERF_QUERY_MAX_METRICS // len(metric_ids))
+        for start in range(0, len(entities), chunk_size):
+            query = [vim.PerformanceManager.QuerySpec(entity=obj, metricId=metric_ids, intervalId=interval_id,
+                                                      maxSample=max_samples)
+                     for _, obj in entities[start:start + chunk_size]]
+            for entity_metric in pm.QueryStats(querySpec=query) or []:
+                totals = {}
+                for series in entity_metric.value:
+                    name = counter_names.get(series.id.counterId)
+                    samples = totals.setdefault(name, [0] * len(series.value))
+                    for i, value in enumerate(series.value):
+                        samples[i] += value
+                yield (names_by_id.get(entity_metric.entity._moId, entity_metric.entity._moId),
+                       [info.timestamp for info in entity_metric.sampleInfo], totals)
+
+    def list_performance_counters(self, level: Optional[int] = None) -> list:
+        """List available performance counters, optionally only those collected at or below a statistics level."""
+        return self.perf_counters.counters(level)
 
     def get_vm_summary_stats(self, vm_name: str) -> Dict[str, Any]:
         """Get summary statistics for a virtual machine."""
@@ -441,21 +996,12 @@ class VMwareManager:
         
         return stats
 
-    def create_vm(self, name: str, cpus: int, memory_mb: int, datastore: Optional[str] = None, network: Optional[str] = None) -> str:
+    def create_vm(self, name: str, cpus: int, memory_mb: int, datastore: Optional[str] = None, network: Optional[str] = None,
+                  folder: Optional[str] = None, resource_pool: Optional[str] = None,
+                  anti_affinity: Optional[str] = None) -> str:
         """Create a new virtual machine (from scratch, with an empty disk and optional network)."""
-        # If a specific datastore or network is provided, update the corresponding object accordingly
-        datastore_obj = self.datastore_obj
-        network_obj = self.network_obj
-        if datastore:
-            datastore_obj = next((ds for ds in self.datacenter_obj.datastoreFolder.childEntity
-                                   if isinstance(ds, vim.Datastore) and ds.name == datastore), None)
-            if not datastore_obj:
-                raise Exception(f"Specified datastore {datastore} not found")
-        if network:
-            networks = self.datacenter_obj.networkFolder.childEntity
-            network_obj = next((net for net in networks if net.name == network), None)
-            if not network_obj:
-                raise Exception(f"Specified network {network} not found")
+        # Resolve the requested targets (names or inventory paths), defaulting to the configured ones
+        datastore_obj, network_obj, vm_folder, pool = self._placement(datastore, network, folder, resource_pool)
 
         # Build VM configuration specification
         vm_spec = vim.vm.ConfigSpec(name=name, memoryMB=memory_mb, numCPUs=cpus, guestId="otherGuest")  # guestId can be adjusted as needed
@@ -482,7 +1028,6 @@ class VMwareManager:
         disk_spec.device.backing = vim.vm.device.VirtualDisk.FlatVer2BackingInfo()
         disk_spec.device.backing.diskMode = "persistent"
         disk_spec.device.backing.thinProvisioned = True  # Thin provisioning
-        disk_spec.device.backing.datastore = datastore_obj
         # Attach the disk to the previously created controller
         disk_spec.device.controllerKey = controller_spec.device.key
         disk_spec.device.unitNumber = 0
@@ -508,64 +1053,141 @@ class VMwareManager:
 
         vm_spec.deviceChange = device_specs
 
-        # Get the folder in which to place the VM (default is the datacenter's vmFolder)
-        vm_folder = self.datacenter_obj.vmFolder
-        # Create the VM in the specified resource pool
-        try:
-            task = vm_folder.CreateVM_Task(config=vm_spec, pool=self.resource_pool)
-            # Wait for the task to complete
-            while task.info.state not in [vim.TaskInfo.State.success, vim.TaskInfo.State.error]:
-                continue
-            if task.info.state == vim.TaskInfo.State.error:
-                raise task.info.error
-        except Exception as e:
-            logging.error(f"Failed to create virtual machine: {e}")
-            raise
+        # Create the VM in the resolved folder and resource pool, on the host and datastore picked for it
+        with self._reserve(pool, datastore_obj, memory_mb, disk_spec.device.capacityInKB * 1024, anti_affinity) as placed:
+            disk_spec.device.backing.datastore = placed.datastore
+            try:
+                task = vm_folder.CreateVM_Task(config=vm_spec, pool=pool, host=placed.host)
+                # Wait for the task to complete
+                self._wait_for_task(task)
+            except Exception as e:
+                logging.error(f"Failed to create virtual machine: {e}")
+                raise
         logging.info(f"Virtual machine created: {name}")
         return f"VM '{name}' created."
 
-    def clone_vm(self, template_name: str, new_name: str) -> str:
-        """Clone a new virtual machine from an existing template or VM."""
+    def clone_vm(self, template_name: str, new_name: str, mode: str = "full",
+                 snapshot_name: Optional[str] = None, count: int = 1,
+                 concurrency: Optional[int] = None, datastore: Optional[str] = None,
+                 folder: Optional[str] = None, resource_pool: Optional[str] = None,
+                 anti_affinity: Optional[str] = None):
+        """
+        Clone a new virtual machine from an existing template or VM.
+
+        Args:
+            template_name: Source template or VM
+            new_name: Name of the clone; with count > 1, the prefix of the clone
+                names (new_name-1 ... new_name-N)
+            mode: "full" copies all disks; "linked" creates delta disks on top of
+                a source snapshot; "instant" forks the memory and disk state of a
+                powered-on source with InstantClone
+            snapshot_name: Snapshot used by linked clones (default: the current
+                snapshot, created if the source has none)
+            count: Number of clones to create in parallel
+            concurrency: Maximum clone tasks in flight for count > 1
+            datastore: Datastore name or path for full clones (default: the configured one)
+            folder: VM folder name or path (default: the source's folder)
+            resource_pool: Resource pool or cluster name or path (default: the source's pool)
+            anti_affinity: Glob pattern of VM names no clone may share a host with;
+                clones of one batch matching it are also spread across hosts
+
+        Returns:
+            A message for a single clone, or per-clone results for a batch
+        """
+        if mode not in CLONE_MODES:
+            raise Exception(f"Invalid clone mode: {mode}. Use one of: {', '.join(CLONE_MODES)}")
+        if count < 1:
+            raise Exception("count must be at least 1")
         template_vm = self.find_vm(template_name)
         if not template_vm:
             raise Exception(f"Template virtual machine {template_name} not found")
-        vm_folder = template_vm.parent  # Place the new VM in the same folder as the template
-        if not isinstance(vm_folder, vim.Folder):
-            vm_folder = self.datacenter_obj.vmFolder
-        # Use the resource pool of the host/cluster where the template is located
-        resource_pool = template_vm.resourcePool or self.resource_pool
-        relocate_spec = vim.vm.RelocateSpec(pool=resource_pool, datastore=self.datastore_obj)
-        clone_spec = vim.vm.CloneSpec(powerOn=False, template=False, location=relocate_spec)
+        if folder:
+            vm_folder = self._resolve(vim.Folder, folder, "Specified folder")
+        else:
+            vm_folder = template_vm.parent  # Place the new VM in the same folder as the template
+            if not isinstance(vm_folder, vim.Folder):
+                vm_folder = self.datacenter_obj.vmFolder
+        if resource_pool:
+            resource_pool = self._resolve_pool(resource_pool)
+        else:
+            # Use the resource pool of the host/cluster where the template is located
+            resource_pool = template_vm.resourcePool or self.resource_pool
+        datastore_obj = self._target_datastore(datastore)
+
+        if mode == "instant":
+            if template_vm.runtime.powerState != vim.VirtualMachine.PowerState.poweredOn:
+                raise Exception(f"Instant clone requires the source VM {template_name} to be powered on")
+
+            def clone(name, on_progress=None):
+                spec = vim.vm.InstantCloneSpec(
+                    name=name, location=vim.vm.RelocateSpec(pool=resource_pool, folder=vm_folder))
+                self._wait_for_task(template_vm.InstantClone_Task(spec=spec), on_progress)
+        else:
+            memory_mb = disk_bytes = 0
+            if mode == "linked":
+                # Child disks stay on the parent's datastore next to the base disks, so only
+                # hosts mounting it qualify
+                snapshot = self._linked_clone_snapshot(template_vm, template_name, snapshot_name)
+                if self.placement is not None:
+                    datastore_obj = template_vm.datastore[0]
+            else:
+                snapshot = None
+            if self.placement is not None:
+                memory_mb = template_vm.config.hardware.memoryMB
+                if mode == "full":
+                    disk_bytes = template_vm.summary.storage.committed
+
+            def clone(name, on_progress=None):
+                # Each clone is placed separately, so a batch spreads across hosts and datastores
+                with self._reserve(resource_pool, datastore_obj, memory_mb, disk_bytes, anti_affinity) as placed:
+                    relocate_spec = vim.vm.RelocateSpec(pool=resource_pool, host=placed.host)
+                    if mode == "linked":
+                        relocate_spec.diskMoveType = "createNewChildDiskBacking"
+                    else:
+                        relocate_spec.datastore = placed.datastore
+                    clone_spec = vim.vm.CloneSpec(powerOn=False, template=False, location=relocate_spec,
+                                                  snapshot=snapshot)
+                    self._wait_for_task(template_vm.Clone(folder=vm_folder, name=name, spec=clone_spec),
+                                        on_progress)
+
+        if count > 1:
+            names = [f"{new_name}-{i}" for i in range(1, count + 1)]
+            results = self._fan_out(f"{mode}_clone", [(name, name) for name in names], clone, concurrency)
+            return self._bulk_result(f"{mode}_clone", names, results)
+
         try:
-            task = template_vm.Clone(folder=vm_folder, name=new_name, spec=clone_spec)
-            while task.info.state not in [vim.TaskInfo.State.success, vim.TaskInfo.State.error]:
-                continue
-            if task.info.state == vim.TaskInfo.State.error:
-                raise task.info.error
+            clone(new_name)
         except Exception as e:
             logging.error(f"Failed to clone virtual machine: {e}")
             raise
-        logging.info(f"Cloned virtual machine {template_name} to new VM: {new_name}")
+        logging.info(f"Cloned virtual machine {template_name} to new VM: {new_name} ({mode} clone)")
         return f"VM '{new_name}' cloned from '{template_name}'."
 
+    def _linked_clone_snapshot(self, vm: vim.VirtualMachine, vm_name: str,
+                               snapshot_name: Optional[str] = None) -> vim.vm.Snapshot:
+        """Return the snapshot a linked clone is based on, creating one if the VM has none."""
+        if snapshot_name:
+            tree = self._find_snapshot_by_name(vm.snapshot.rootSnapshotList, snapshot_name) if vm.snapshot else None
+            if not tree:
+                raise Exception(f"Snapshot '{snapshot_name}' not found for VM {vm_name}")
+            return tree.snapshot
+        if vm.snapshot and vm.snapshot.currentSnapshot:
+            return vm.snapshot.currentSnapshot
+        if vm.config.template:
+            raise Exception(f"Template {vm_name} has no snapshot to base linked clones on; "
+                            "snapshot it while it is a VM or use mode 'full'")
+        logging.info(f"Creating snapshot '{LINKED_CLONE_SNAPSHOT}' on {vm_name} for linked clones")
+        self._snapshot(vm, LINKED_CLONE_SNAPSHOT, "Base for linked clones")
+        return vm.snapshot.currentSnapshot
+
     def create_vm_custom(self, name: str, cpus: int, memory_mb: int, disk_size_gb: int = 10,
                         guest_id: str = "otherGuest", datastore: Optional[str] = None,
                         network: Optional[str] = None, thin_provisioned: bool = True,
-                        annotation: Optional[str] = None) -> str:
+                        annotation: Optional[str] = None, folder: Optional[str] = None,
+                        resource_pool: Optional[str] = None, anti_affinity: Optional[str] = None) -> str:
         """Create a custom virtual machine with more configuration options."""
-        # If a specific datastore or network is provided, update the corresponding object accordingly
-        datastore_obj = self.datastore_obj
-        network_obj = self.network_obj
-        if datastore:
-            datastore_obj = next((ds for ds in self.datacenter_obj.datastoreFolder.childEntity
-                                   if isinstance(ds, vim.Datastore) and ds.name == datastore), None)
-            if not datastore_obj:
-                raise Exception(f"Specified datastore {datastore} not found")
-        if network:
-            networks = self.datacenter_obj.networkFolder.childEntity
-            network_obj = next((net for net in networks if net.name == network), None)
-            if not network_obj:
-                raise Exception(f"Specified network {network} not found")
+        # Resolve the requested targets (names or inventory paths), defaulting to the configured ones
+        datastore_obj, network_obj, vm_folder, pool = self._placement(datastore, network, folder, resource_pool)
 
         # Build VM configuration specification
         vm_spec = vim.vm.ConfigSpec(name=name, memoryMB=memory_mb, numCPUs=cpus, guestId=guest_id)
@@ -594,7 +1216,6 @@ class VMwareManager:
         disk_spec.device.backing = vim.vm.device.VirtualDisk.FlatVer2BackingInfo()
         disk_spec.device.backing.diskMode = "persistent"
         disk_spec.device.backing.thinProvisioned = thin_provisioned
-        disk_spec.device.backing.datastore = datastore_obj
         disk_spec.device.controllerKey = controller_spec.device.key
         disk_spec.device.unitNumber = 0
         device_specs.append(disk_spec)
@@ -618,17 +1239,14 @@ class VMwareManager:
 
         vm_spec.deviceChange = device_specs
 
-        # Get the folder in which to place the VM
-        vm_folder = self.datacenter_obj.vmFolder
-        try:
-            task = vm_folder.CreateVM_Task(config=vm_spec, pool=self.resource_pool)
-            while task.info.state not in [vim.TaskInfo.State.success, vim.TaskInfo.State.error]:
-                continue
-            if task.info.state == vim.TaskInfo.State.error:
-                raise task.info.error
-        except Exception as e:
-            logging.error(f"Failed to create custom virtual machine: {e}")
-            raise
+        with self._reserve(pool, datastore_obj, memory_mb, disk_size_gb * 1073741824, anti_affinity) as placed:
+            disk_spec.device.backing.datastore = placed.datastore
+            try:
+                task = vm_folder.CreateVM_Task(config=vm_spec, pool=pool, host=placed.host)
+                self._wait_for_task(task)
+            except Exception as e:
+                logging.error(f"Failed to create custom virtual machine: {e}")
+                raise
         logging.info(f"Custom virtual machine created: {name}")
         return f"Custom VM '{name}' created with {cpus} CPUs, {memory_mb}MB RAM, and {disk_size_gb}GB disk."
 
@@ -638,11 +1256,7 @@ class VMwareManager:
         if not vm:
             raise Exception(f"Virtual machine {name} not found")
         try:
-            task = vm.Destroy_Task()
-            while task.info.state not in [vim.TaskInfo.State.success, vim.TaskInfo.State.error]:
-                continue
-            if task.info.state == vim.TaskInfo.State.error:
-                raise task.info.error
+            self._destroy(vm)
         except Exception as e:
             logging.error(f"Failed to delete virtual machine: {e}")
             raise
@@ -654,13 +1268,8 @@ class VMwareManager:
         vm = self.find_vm(name)
         if not vm:
             raise Exception(f"Virtual machine {name} not found")
-        if vm.runtime.powerState == vim.VirtualMachine.PowerState.poweredOn:
+        if not self._power_on(vm):
             return f"VM '{name}' is already powered on."
-        task = vm.PowerOnVM_Task()
-        while task.info.state not in [vim.TaskInfo.State.success, vim.TaskInfo.State.error]:
-            continue
-        if task.info.state == vim.TaskInfo.State.error:
-            raise task.info.error
         logging.info(f"Virtual machine powered on: {name}")
         return f"VM '{name}' powered on."
 
@@ -669,57 +1278,196 @@ class VMwareManager:
         vm = self.find_vm(name)
         if not vm:
             raise Exception(f"Virtual machine {name} not found")
-        if vm.runtime.powerState == vim.VirtualMachine.PowerState.poweredOff:
+        if not self._power_off(vm):
             return f"VM '{name}' is already powered off."
-        task = vm.PowerOffVM_Task()
-        while task.info.state not in [vim.TaskInfo.State.success, vim.TaskInfo.State.error]:
-            continue
-        if task.info.state == vim.TaskInfo.State.error:
-            raise task.info.error
         logging.info(f"Virtual machine powered off: {name}")
         return f"VM '{name}' powered off."
 
+    def _power_on(self, vm: vim.VirtualMachine, on_progress=None) -> bool:
+        """Power on a VM and wait for it; return False if it was already on."""
+        if vm.runtime.powerState == vim.VirtualMachine.PowerState.poweredOn:
+            return False
+        self._wait_for_task(vm.PowerOnVM_Task(), on_progress)
+        return True
+
+    def _power_off(self, vm: vim.VirtualMachine, on_progress=None) -> bool:
+        """Power off a VM and wait for it; return False if it was already off."""
+        if vm.runtime.powerState == vim.VirtualMachine.PowerState.poweredOff:
+            return False
+        self._wait_for_task(vm.PowerOffVM_Task(), on_progress)
+        return True
+
+    def _destroy(self, vm: vim.VirtualMachine, on_progress=None):
+        """Delete a VM from inventory and disk and wait for it."""
+        self._wait_for_task(vm.Destroy_Task(), on_progress)
+
+    def _snapshot(self, vm: vim.VirtualMachine, snapshot_name: str, description: str = "",
+                  memory: bool = False, quiesce: bool = False, on_progress=None):
+        """Create a snapshot of a VM and wait for it."""
+        self._wait_for_task(vm.CreateSnapshot(snapshot_name, description, memory, quiesce), on_progress)
+
+    def _select_vms(self, names: Optional[List[str]] = None, pattern: Optional[str] = None,
+                    regex: Optional[str] = None) -> List[str]:
+        """
+        Resolve bulk-operation selectors to VM names.
+
+        Args:
+            names: Exact VM names
+            pattern: Shell-style glob matched against VM names (templates excluded)
+            regex: Regular expression searched in VM names (templates excluded)
+
+        Returns:
+            The selected names, explicit names first, without duplicates
+        """
+        if not names and not pattern and not regex:
+            raise Exception("Select VMs with names, pattern or regex")
+        selected = list(dict.fromkeys(names or []))
+        if pattern or regex:
+            compiled = re.compile(regex) if regex else None
+            templates = set(self.list_templates())
+            for name in self.list_vms():
+                if name in templates or name in selected:
+                    continue
+                if (pattern and fnmatch.fnmatchcase(name, pattern)) or (compiled and compiled.search(name)):
+                    selected.append(name)
+        return selected
+
+    def _fan_out(self, operation: str, items: List[tuple], action,
+                 concurrency: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Run action(item, on_progress) for (name, item) pairs with at most concurrency in flight.
+
+        action returns False when the item needed no change. All tasks are
+        followed by the shared TaskWaiter, so waiting costs no extra round
+        trips. Failures are recorded per item instead of raised.
+
+        Returns:
+            An outcome per name with its status and, for failures, the error
+        """
+        concurrency = max(1, min(concurrency or self.config.bulk_concurrency, self.config.bulk_concurrency))
+        results: Dict[str, Dict[str, Any]] = {}
+        job = current_job()
+        done = 0
+        lock = threading.Lock()
+
+        def ignore_task_progress(progress):
+            # Job progress counts finished items rather than the progress of single tasks
+            pass
+
+        def run(name, item):
+            nonlocal done
+            if job is not None and job.cancel_requested:
+                outcome = {"status": "canceled"}
+            else:
+                try:
+                    changed = action(item, ignore_task_progress)
+                    outcome = {"status": "succeeded" if changed is not False else "skipped"}
+                except Exception as e:
+                    outcome = {"status": "canceled" if job is not None and job.cancel_requested else "failed",
+                               "error": str(getattr(e, "msg", None) or e)}
+            with lock:
+                results[name] = outcome
+                done += 1
+                if job is not None:
+                    job.update(done * 100 // len(items), f"{done}/{len(items)} VMs processed")
+
+        if items:
+            with ThreadPoolExecutor(max_workers=min(concurrency, len(items)),
+                                    thread_name_prefix=f"bulk-{operation}") as executor:
+                # Workers inherit the job context so canceling the job cancels their tasks
+                for name, item in items:
+                    executor.submit(contextvars.copy_context().run, run, name, item)
+        return results
+
+    @staticmethod
+    def _bulk_result(operation: str, names: List[str], results: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """Summarize per-VM outcomes of a bulk operation."""
+        counts: Dict[str, int] = {}
+        for outcome in results.values():
+            counts[outcome["status"]] = counts.get(outcome["status"], 0) + 1
+        logging.info(f"Bulk {operation} on {len(names)} VM(s): {counts}")
+        return {
+            "operation": operation,
+            "requested": len(names),
+            "counts": counts,
+            "results": {name: results[name] for name in names},
+        }
+
+    def _bulk(self, operation: str, selected: List[str], action, concurrency: Optional[int] = None) -> Dict[str, Any]:
+        """Apply action(vm, on_progress) to the named VMs; names that do not resolve are reported as not_found."""
+        found, missing = self._find_entities(vim.VirtualMachine, selected)
+        results = {name: {"status": "not_found"} for name in missing}
+        results.update(self._fan_out(operation, found, action, concurrency))
+        return self._bulk_result(operation, selected, results)
+
+    def bulk_power_on(self, names: Optional[List[str]] = None, pattern: Optional[str] = None,
+                      regex: Optional[str] = None, concurrency: Optional[int] = None) -> Dict[str, Any]:
+        """Power on all selected VMs."""
+        return self._bulk("power_on", self._select_vms(names, pattern, regex), self._power_on, concurrency)
+
+    def bulk_power_off(self, names: Optional[List[str]] = None, pattern: Optional[str] = None,
+                       regex: Optional[str] = None, concurrency: Optional[int] = None) -> Dict[str, Any]:
+        """Power off all selected VMs."""
+        return self._bulk("power_off", self._select_vms(names, pattern, regex), self._power_off, concurrency)
+
+    def bulk_create_snapshot(self, snapshot_name: str, names: Optional[List[str]] = None,
+                             pattern: Optional[str] = None, regex: Optional[str] = None,
+                             description: str = "", memory: bool = False, quiesce: bool = False,
+                             concurrency: Optional[int] = None) -> Dict[str, Any]:
+        """Create a snapshot with the same name on all selected VMs."""
+        return self._bulk("create_snapshot", self._select_vms(names, pattern, regex),
+                          lambda vm, on_progress: self._snapshot(vm, snapshot_name, description,
+                                                                 memory, quiesce, on_progress),
+                          concurrency)
+
+    def bulk_delete(self, names: Optional[List[str]] = None, pattern: Optional[str] = None,
+                    regex: Optional[str] = None, concurrency: Optional[int] = None) -> Dict[str, Any]:
+        """Delete all selected VMs; powered-on VMs fail and must be powered off first."""
+        return self._bulk("delete", self._select_vms(names, pattern, regex), self._destroy, concurrency)
+
     def list_datastore_clusters(self) -> list:
         """List all datastore clusters (StoragePods)."""
         clusters = []
-        container = self.content.viewManager.CreateContainerView(
-            self.content.rootFolder, [vim.StoragePod], True)
-        for pod in container.view:
+        entries = self._retrieve_properties({
+            vim.StoragePod: ["name", "summary", "childEntity"],
+            vim.Datastore: ["name"],
+        })
+        datastore_names = {e.obj._moId: e.name for e in entries if isinstance(e.obj, vim.Datastore)}
+        for entry in entries:
+            if not isinstance(entry.obj, vim.StoragePod):
+                continue
+            summary = entry.props.get("summary")
             cluster_info = {
-                "name": pod.name,
-                "capacity_gb": round(pod.summary.capacity / (1024**3), 2) if pod.summary else 0,
-                "free_space_gb": round(pod.summary.freeSpace / (1024**3), 2) if pod.summary else 0,
-                "datastores": [ds.name for ds in pod.childEntity if isinstance(ds, vim.Datastore)]
+                "name": entry.name,
+                "capacity_gb": round(summary.capacity / (1024**3), 2) if summary else 0,
+                "free_space_gb": round(summary.freeSpace / (1024**3), 2) if summary else 0,
+                "datastores": [datastore_names[ds._moId] for ds in entry.props.get("childEntity", [])
+                               if isinstance(ds, vim.Datastore) and ds._moId in datastore_names]
             }
             clusters.append(cluster_info)
-        container.Destroy()
         return clusters
 
     def wait_for_task(self, task: vim.Task, timeout: int = 300) -> Dict[str, Any]:
         """Wait for a vCenter task to complete or timeout."""
-        import time
-        start_time = time.time()
-        while task.info.state not in [vim.TaskInfo.State.success, vim.TaskInfo.State.error]:
-            if time.time() - start_time > timeout:
-                return {
-                    "status": "timeout",
-                    "message": f"Task timed out after {timeout} seconds",
-                    "task_state": str(task.info.state)
-                }
-            time.sleep(1)
-        
-        if task.info.state == vim.TaskInfo.State.success:
+        try:
+            result = self.tasks.wait(task, timeout=timeout)
+        except TimeoutError:
             return {
-                "status": "success",
-                "message": "Task completed successfully",
-                "result": str(task.info.result) if task.info.result else None
+                "status": "timeout",
+                "message": f"Task timed out after {timeout} seconds",
+                "task_state": str(task.info.state)
             }
-        else:
+        except vmodl.MethodFault as e:
             return {
                 "status": "error",
-                "message": str(task.info.error) if task.info.error else "Unknown error",
-                "error": str(task.info.error) if task.info.error else None
+                "message": str(e),
+                "error": str(e)
             }
+        return {
+            "status": "success",
+            "message": "Task completed successfully",
+            "result": str(result) if result else None
+        }
 
     def create_snapshot(self, vm_name: str, snapshot_name: str, description: str = "", 
                        memory: bool = False, quiesce: bool = False) -> str:
@@ -728,11 +1476,7 @@ class VMwareManager:
         if not vm:
             raise Exception(f"VM {vm_name} not found")
         
-        task = vm.CreateSnapshot(snapshot_name, description, memory, quiesce)
-        while task.info.state not in [vim.TaskInfo.State.success, vim.TaskInfo.State.error]:
-            continue
-        if task.info.state == vim.TaskInfo.State.error:
-            raise task.info.error
+        self._snapshot(vm, snapshot_name, description, memory, quiesce)
         
         logging.info(f"Snapshot '{snapshot_name}' created for VM '{vm_name}'")
         return f"Snapshot '{snapshot_name}' created successfully for VM '{vm_name}'"
@@ -751,10 +1495,7 @@ class VMwareManager:
             raise Exception(f"Snapshot '{snapshot_name}' not found on VM '{vm_name}'")
         
         task = snapshot.snapshot.RemoveSnapshot_Task(remove_children)
-        while task.info.state not in [vim.TaskInfo.State.success, vim.TaskInfo.State.error]:
-            continue
-        if task.info.state == vim.TaskInfo.State.error:
-            raise task.info.error
+        self._wait_for_task(task)
         
         logging.info(f"Snapshot '{snapshot_name}' removed from VM '{vm_name}'")
         return f"Snapshot '{snapshot_name}' removed successfully from VM '{vm_name}'"
@@ -773,10 +1514,7 @@ class VMwareManager:
             raise Exception(f"Snapshot '{snapshot_name}' not found on VM '{vm_name}'")
         
         task = snapshot.snapshot.RevertToSnapshot_Task()
-        while task.info.state not in [vim.TaskInfo.State.success, vim.TaskInfo.State.error]:
-            continue
-        if task.info.state == vim.TaskInfo.State.error:
-            raise task.info.error
+        self._wait_for_task(task)
         
         logging.info(f"VM '{vm_name}' reverted to snapshot '{snapshot_name}'")
         return f"VM '{vm_name}' reverted successfully to snapshot '{snapshot_name}'"
@@ -804,10 +1542,7 @@ class VMwareManager:
             return f"VM '{vm_name}' has no snapshots to remove"
         
         task = vm.RemoveAllSnapshots()
-        while task.info.state not in [vim.TaskInfo.State.success, vim.TaskInfo.State.error]:
-            continue
-        if task.info.state == vim.TaskInfo.State.error:
-            raise task.info.error
+        self._wait_for_task(task)
         
         logging.info(f"All snapshots removed from VM '{vm_name}'")
         return f"All snapshots removed successfully from VM '{vm_name}'"
@@ -880,6 +1615,10 @@ class VMwareManager:
             max_wait = 30  # seconds
             wait_count = 0
             while wait_count < max_wait:
+                job = current_job()
+                if job is not None and job.cancel_requested:
+                    process_manager.TerminateProcessInGuest(vm, creds, pid)
+                    check_canceled()
                 processes = process_manager.ListProcessesInGuest(vm, creds, [pid])
                 if processes:
                     exit_code = processes[0].exitCode
@@ -903,10 +1642,18 @@ class VMwareManager:
             raise Exception("Failed to start program in VM")
 
     def upload_file_to_vm(self, vm_name: str, username: str, password: str,
-                         local_file_path: str, remote_file_path: str) -> str:
-        """Upload a file to a VM using VMware Tools."""
+                         local_file_path: str, remote_file_path: str,
+                         on_progress: Optional[Callable[[int, int], None]] = None) -> str:
+        """
+        Upload a file to a VM using VMware Tools.
+
+        The file is streamed from disk in chunks of config.transfer_chunk_size
+        bytes, so memory use does not depend on the file size. If the transfer
+        URL expires or the connection drops, a new URL is requested and the
+        upload restarts, up to config.transfer_retries times.
+        """
+        import os
         import re
-        import requests
         
         vm = self.find_vm(vm_name)
         if not vm:
@@ -922,9 +1669,7 @@ class VMwareManager:
         creds = vim.vm.guest.NamePasswordAuthentication(
             username=username, password=password)
         
-        # Read the local file
-        with open(local_file_path, 'rb') as f:
-            file_data = f.read()
+        file_size = os.path.getsize(local_file_path)
         
         # Get file manager
         file_manager = self.content.guestOperationsManager.fileManager
@@ -932,39 +1677,36 @@ class VMwareManager:
         # Create file attributes
         file_attribute = vim.vm.guest.FileManager.FileAttributes()
         
-        # Initiate file transfer
-        url = file_manager.InitiateFileTransferToGuest(
-            vm, creds, remote_file_path, file_attribute, len(file_data), True)
-        
-        # Fix the URL (replace wildcard with actual host)
-        url = re.sub(r"^https://\*:", f"https://{self.config.vcenter_host}:", url)
-        
-        # Upload the file
-        resp = requests.put(url, data=file_data, verify=False)
-        
-        if resp.status_code == 200:
-            logging.info(f"File uploaded to VM '{vm_name}': {remote_file_path}")
-            return f"Successfully uploaded file to {remote_file_path} in VM '{vm_name}'"
-        else:
-            raise Exception(f"Failed to upload file. HTTP status: {resp.status_code}")
+        def transfer_url():
+            # Each attempt needs a fresh URL; overwrite so a partial file from a failed attempt is replaced
+            url = file_manager.InitiateFileTransferToGuest(
+                vm, creds, remote_file_path, file_attribute, file_size, True)
+            # Fix the URL (replace wildcard with actual host)
+            host = join_host_port(split_host_port(self.config.vcenter_host)[0])
+            return re.sub(r"^https://\*:", f"https://{host}:", url)
+        
+        # Stream the file
+        progress = TransferProgress(file_size, f"Upload to VM '{vm_name}'", on_progress or transfer_callback())
+        chunks = FileChunks(local_file_path, self.config.transfer_chunk_size, progress=progress)
+        upload_with_retry(transfer_url, chunks, retries=self.config.transfer_retries, verify=False)
+        
+        stats = progress.summary()
+        logging.info(f"File uploaded to VM '{vm_name}': {remote_file_path} "
+                     f"({file_size} bytes in {stats['seconds']}s, {stats['mb_per_second']} MB/s)")
+        return (f"Successfully uploaded file to {remote_file_path} in VM '{vm_name}' "
+                f"({file_size} bytes in {stats['seconds']}s, {stats['mb_per_second']} MB/s)")
 
     def upload_file_to_datastore(self, datastore_name: str, local_file_path: str,
                                  remote_file_path: str) -> str:
-        """Upload a file to a datastore."""
-        import requests
-        
-        # Find the datastore
-        datastore = None
-        container = self.content.viewManager.CreateContainerView(
-            self.content.rootFolder, [vim.Datastore], True)
-        for ds in container.view:
-            if ds.name == datastore_name:
-                datastore = ds
-                break
-        container.Destroy()
+        """Upload a file to a datastore, streaming it from disk in fixed-size chunks."""
+        import os
         
+        # Find the datastore (by name or inventory path) and the datacenter it belongs to
+        datastore = self._lookup(vim.Datastore, datastore_name)
         if not datastore:
             raise Exception(f"Datastore '{datastore_name}' not found")
+        datacenter = self._datacenter_of(datastore)
+        dc_path = self.inventory.path(datacenter) if self._inventory_ready() else None
         
         # Build the URL
         if not remote_file_path.startswith("/"):
@@ -973,9 +1715,9 @@ class VMwareManager:
         resource = "/folder" + remote_file_path
         params = {
             "dsName": datastore.name,
-            "dcPath": self.datacenter_obj.name
+            "dcPath": dc_path.lstrip("/") if dc_path else datacenter.name
         }
-        http_url = f"https://{self.config.vcenter_host}:443{resource}"
+        http_url = f"https://{self._api_address()}{resource}"
         
         # Get the session cookie
         client_cookie = self.si._stub.cookie
@@ -985,32 +1727,29 @@ class VMwareManager:
         cookie_text = " " + cookie_value + "; $" + cookie_path
         cookie = {cookie_name: cookie_text}
         
-        # Set headers
-        headers = {'Content-Type': 'application/octet-stream'}
-        
         # Upload the file
-        with open(local_file_path, "rb") as file_data:
-            resp = requests.put(
-                http_url,
-                params=params,
-                data=file_data,
-                headers=headers,
-                cookies=cookie,
-                verify=False
-            )
-        
-        if resp.status_code in (200, 201):
-            logging.info(f"File uploaded to datastore '{datastore_name}': {remote_file_path}")
-            return f"Successfully uploaded file to {remote_file_path} on datastore '{datastore_name}'"
-        else:
-            raise Exception(f"Failed to upload file. HTTP status: {resp.status_code}")
+        progress = TransferProgress(os.path.getsize(local_file_path), f"Upload to datastore '{datastore_name}'",
+                                    transfer_callback())
+        chunks = FileChunks(local_file_path, self.config.transfer_chunk_size, progress=progress)
+        stream_upload(http_url, chunks, params=params, cookies=cookie, verify=False)
+        
+        stats = progress.summary()
+        logging.info(f"File uploaded to datastore '{datastore_name}': {remote_file_path} "
+                     f"({stats['bytes']} bytes in {stats['seconds']}s, {stats['mb_per_second']} MB/s)")
+        return f"Successfully uploaded file to {remote_file_path} on datastore '{datastore_name}'"
+
+    def deploy_ovf(self, ovf_path: str, vmdk_path: str = None, vm_name: str = None,
+                   datastore_name: str = None, resource_pool_name: str = None, folder: str = None) -> str:
+        """
+        Deploy a VM from OVF and VMDK files.
 
-    def deploy_ovf(self, ovf_path: str, vmdk_path: str, vm_name: str = None,
-                   datastore_name: str = None, resource_pool_name: str = None) -> str:
-        """Deploy a VM from OVF and VMDK files."""
+        Every disk of the import spec is streamed to its lease device URL,
+        up to config.deploy_parallelism at once and capped at
+        config.deploy_bandwidth_limit MB/s combined. Disk files are looked up
+        next to the OVF descriptor; vmdk_path overrides the file of a
+        single-disk OVF or of the disk with the same file name.
+        """
         import os
-        from threading import Thread
-        from time import sleep
         
         # Read OVF descriptor
         if not os.path.exists(ovf_path):
@@ -1022,25 +1761,16 @@ class VMwareManager:
         # Determine datastore
         datastore = self.datastore_obj
         if datastore_name:
-            datastore = None
-            for ds in self.datacenter_obj.datastoreFolder.childEntity:
-                if isinstance(ds, vim.Datastore) and ds.name == datastore_name:
-                    datastore = ds
-                    break
-            if not datastore:
-                raise Exception(f"Datastore '{datastore_name}' not found")
+            datastore = self._resolve(vim.Datastore, datastore_name, "Datastore")
         
-        # Determine resource pool
+        # Determine resource pool (or cluster) and the VM folder
         resource_pool = self.resource_pool
         if resource_pool_name:
-            # Search for specific resource pool
-            container = self.content.viewManager.CreateContainerView(
-                self.datacenter_obj, [vim.ResourcePool], True)
-            for rp in container.view:
-                if rp.name == resource_pool_name:
-                    resource_pool = rp
-                    break
-            container.Destroy()
+            resource_pool = self._resolve_pool(resource_pool_name)
+        if folder:
+            vm_folder = self._resolve(vim.Folder, folder, "Folder")
+        else:
+            vm_folder = (self._datacenter_of(resource_pool) if resource_pool_name else self.datacenter_obj).vmFolder
         
         # Create import spec
         ovf_manager = self.content.ovfManager
@@ -1056,104 +1786,83 @@ class VMwareManager:
             errors = [str(e) for e in import_spec.error]
             raise Exception(f"OVF import spec errors: {', '.join(errors)}")
         
+        # Resolve the local file of every disk in the import spec
+        ovf_dir = os.path.dirname(os.path.abspath(ovf_path))
+        file_items = list(import_spec.fileItem or [])
+        disk_paths = []
+        for file_item in file_items:
+            path = os.path.join(ovf_dir, file_item.path)
+            if vmdk_path and (len(file_items) == 1 or
+                              os.path.basename(vmdk_path) == os.path.basename(file_item.path)):
+                path = vmdk_path
+            if not os.path.isfile(path):
+                raise Exception(f"Disk file not found for {file_item.path}: {path}")
+            disk_paths.append(path)
+        
         # Import the VApp
-        lease = resource_pool.ImportVApp(
-            import_spec.importSpec, self.datacenter_obj.vmFolder)
+        lease = resource_pool.ImportVApp(import_spec.importSpec, vm_folder)
         
-        # Wait for lease to be ready
-        while lease.state == vim.HttpNfcLease.State.initializing:
-            sleep(1)
+        bandwidth = self.config.deploy_bandwidth_limit * 1048576
+        uploader = LeaseUploader(lease, self._api_address(), self.config.deploy_parallelism,
+                                 self.config.transfer_chunk_size, f"Deploy OVF '{vm_name or ovf_path}'",
+                                 bandwidth or None)
+        uploader.wait_ready()
         
-        if lease.state == vim.HttpNfcLease.State.error:
-            raise Exception(f"Lease error: {lease.error}")
+        try:
+            disks = [DiskUpload(uploader.device_url(file_item.deviceId), path)
+                     for file_item, path in zip(file_items, disk_paths)]
+        except Exception:
+            lease.HttpNfcLeaseAbort()
+            raise
         
-        if lease.state == vim.HttpNfcLease.State.ready:
-            # Upload VMDK
-            url = lease.info.deviceUrl[0].url.replace('*', self.config.vcenter_host)
-            
-            def keep_lease_alive(lease_obj):
-                while lease_obj.state not in [vim.HttpNfcLease.State.done, vim.HttpNfcLease.State.error]:
-                    sleep(5)
-                    try:
-                        lease_obj.HttpNfcLeaseProgress(50)
-                    except:
-                        return
-            
-            # Start keepalive thread
-            keepalive_thread = Thread(target=keep_lease_alive, args=(lease,))
-            keepalive_thread.start()
-            
-            # Upload VMDK file
-            import subprocess
-            curl_cmd = [
-                "curl", "-Ss", "-X", "POST", "--insecure",
-                "-T", vmdk_path,
-                "-H", "Content-Type: application/x-vnd.vmware-streamVmdk",
-                url
-            ]
-            result = subprocess.run(curl_cmd, capture_output=True)
-            
-            if result.returncode == 0:
-                lease.HttpNfcLeaseComplete()
-                keepalive_thread.join()
-                logging.info(f"Successfully deployed OVF: {vm_name or 'VM'}")
-                return f"Successfully deployed OVF as '{vm_name or 'VM'}'"
-            else:
-                lease.Abort()
-                raise Exception(f"Failed to upload VMDK: {result.stderr.decode()}")
+        try:
+            uploader.upload(disks, transfer_callback())
+        except Exception as ex:
+            raise Exception(f"Failed to upload VMDK: {str(ex)}")
         
-        raise Exception("Lease did not become ready")
+        logging.info(f"Successfully deployed OVF: {vm_name or 'VM'}")
+        return f"Successfully deployed OVF as '{vm_name or 'VM'}'"
 
     def deploy_ova(self, ova_path: str, vm_name: str = None,
-                   datastore_name: str = None, resource_pool_name: str = None) -> str:
-        """Deploy a VM from an OVA file."""
+                   datastore_name: str = None, resource_pool_name: str = None, folder: str = None) -> str:
+        """
+        Deploy a VM from an OVA file.
+
+        The tar headers are read once to index the members; each disk is then
+        streamed straight from its byte range in the OVA, with up to
+        config.deploy_parallelism disks uploading at once.
+        """
         import os
         import tarfile
-        import ssl
-        import time
-        from threading import Timer
-        from six.moves.urllib.request import Request, urlopen
         
         # Check if OVA exists
         if not os.path.exists(ova_path):
             raise Exception(f"OVA file not found: {ova_path}")
         
-        # Open OVA (tarball)
-        tar = tarfile.open(ova_path)
-        
-        # Extract OVF descriptor
-        ovf_file = None
-        for member in tar.getmembers():
-            if member.name.endswith('.ovf'):
-                ovf_file = tar.extractfile(member)
-                break
-        
-        if not ovf_file:
-            raise Exception("No OVF descriptor found in OVA")
-        
-        ovf_descriptor = ovf_file.read().decode()
+        # Index the OVA members; disks are read by offset, so the tarball must be uncompressed
+        try:
+            with tarfile.open(ova_path, "r:") as tar:
+                members = {member.name: member for member in tar.getmembers()}
+                ovf_member = next((m for m in members.values() if m.name.endswith('.ovf')), None)
+                if not ovf_member:
+                    raise Exception("No OVF descriptor found in OVA")
+                ovf_descriptor = tar.extractfile(ovf_member).read().decode()
+        except tarfile.ReadError as e:
+            raise Exception(f"Not an uncompressed OVA archive: {ova_path} ({e})")
         
         # Determine datastore
         datastore = self.datastore_obj
         if datastore_name:
-            datastore = None
-            for ds in self.datacenter_obj.datastoreFolder.childEntity:
-                if isinstance(ds, vim.Datastore) and ds.name == datastore_name:
-                    datastore = ds
-                    break
-            if not datastore:
-                raise Exception(f"Datastore '{datastore_name}' not found")
+            datastore = self._resolve(vim.Datastore, datastore_name, "Datastore")
         
-        # Determine resource pool
+        # Determine resource pool (or cluster) and the VM folder
         resource_pool = self.resource_pool
         if resource_pool_name:
-            container = self.content.viewManager.CreateContainerView(
-                self.datacenter_obj, [vim.ResourcePool], True)
-            for rp in container.view:
-                if rp.name == resource_pool_name:
-                    resource_pool = rp
-                    break
-            container.Destroy()
+            resource_pool = self._resolve_pool(resource_pool_name)
+        if folder:
+            vm_folder = self._resolve(vim.Folder, folder, "Folder")
+        else:
+            vm_folder = (self._datacenter_of(resource_pool) if resource_pool_name else self.datacenter_obj).vmFolder
         
         # Create import spec
         ovf_manager = self.content.ovfManager
@@ -1170,80 +1879,34 @@ class VMwareManager:
             raise Exception(f"OVA import spec errors: {', '.join(errors)}")
         
         # Import the VApp
-        lease = resource_pool.ImportVApp(
-            import_spec.importSpec, self.datacenter_obj.vmFolder)
+        lease = resource_pool.ImportVApp(import_spec.importSpec, vm_folder)
         
-        # Wait for lease to be ready
-        while lease.state == vim.HttpNfcLease.State.initializing:
-            time.sleep(1)
-        
-        if lease.state == vim.HttpNfcLease.State.error:
-            raise Exception(f"Lease error: {lease.error}")
-        
-        if lease.state != vim.HttpNfcLease.State.ready:
-            raise Exception("Lease did not become ready")
-        
-        # Upload disk files
-        def keep_lease_alive(lease_obj):
-            while True:
-                time.sleep(5)
-                try:
-                    lease_obj.HttpNfcLeaseProgress(50)
-                    if lease_obj.state == vim.HttpNfcLease.State.done:
-                        return
-                except:
-                    return
-        
-        # Start keepalive
-        keepalive_timer = Timer(5, keep_lease_alive, args=(lease,))
-        keepalive_timer.start()
+        bandwidth = self.config.deploy_bandwidth_limit * 1048576
+        uploader = LeaseUploader(lease, self._api_address(), self.config.deploy_parallelism,
+                                 self.config.transfer_chunk_size, f"Deploy OVA '{vm_name or ova_path}'",
+                                 bandwidth or None)
+        uploader.wait_ready()
         
         try:
-            # Upload each disk file
+            # Each disk is a contiguous byte range of the OVA
+            disks = []
             for file_item in import_spec.fileItem:
-                # Find disk in tarball
-                disk_file = None
-                for member in tar.getmembers():
-                    if member.name == file_item.path:
-                        disk_file = tar.extractfile(member)
-                        break
-                
-                if disk_file:
-                    # Find device URL
-                    device_url = None
-                    for dev_url in lease.info.deviceUrl:
-                        if dev_url.importKey == file_item.deviceId:
-                            device_url = dev_url
-                            break
-                    
-                    if device_url:
-                        url = device_url.url.replace('*', self.config.vcenter_host)
-                        
-                        # Get file size
-                        file_size = member.size
-                        
-                        # Upload
-                        headers = {'Content-length': str(file_size)}
-                        if hasattr(ssl, '_create_unverified_context'):
-                            ssl_context = ssl._create_unverified_context()
-                        else:
-                            ssl_context = None
-                        
-                        req = Request(url, disk_file, headers)
-                        urlopen(req, context=ssl_context)
-            
-            lease.Complete()
-            keepalive_timer.cancel()
-            tar.close()
-            
-            logging.info(f"Successfully deployed OVA: {vm_name or 'VM'}")
-            return f"Successfully deployed OVA as '{vm_name or 'VM'}'"
-            
+                member = members.get(file_item.path)
+                if member is None or not member.isreg() or member.issparse():
+                    raise Exception(f"Disk {file_item.path} not found in OVA")
+                disks.append(DiskUpload(uploader.device_url(file_item.deviceId), ova_path,
+                                        member.offset_data, member.size))
+        except Exception:
+            lease.HttpNfcLeaseAbort()
+            raise
+        
+        try:
+            uploader.upload(disks, transfer_callback())
         except Exception as ex:
-            lease.Abort()
-            keepalive_timer.cancel()
-            tar.close()
             raise Exception(f"Failed to deploy OVA: {str(ex)}")
+        
+        logging.info(f"Successfully deployed OVA: {vm_name or 'VM'}")
+        return f"Successfully deployed OVA as '{vm_name or 'VM'}'"
 
     def wait_for_updates(self, object_type: str, properties: list, 
                         max_wait_seconds: int = 30, max_iterations: int = 1) -> Dict[str, Any]:
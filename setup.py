@@ -16,7 +16,7 @@ setup(
     long_description=long_description,
     long_description_content_type="text/markdown",
     url="https://github.com/dylanturn/esxi-mcp-server",
-    packages=find_packages(),
+    packages=find_packages(exclude=["benchmarks", "benchmarks.*", "tests", "tests.*"]),
     classifiers=[
         "Development Status :: 3 - Alpha",
         "Intended Audience :: Developers",
@@ -34,6 +34,10 @@ setup(
     ],
     python_requires=">=3.7",
     install_requires=requirements,
+    extras_require={
+        # Faster event loop and HTTP parser, picked up by http_loop/http_protocol "auto"
+        "performance": ["uvloop", "httptools"],
+    },
     entry_points={
         "console_scripts": [
             "esxi-mcp-server=esxi_mcp_server.__main__:main",
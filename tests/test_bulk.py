@@ -0,0 +1,94 @@
+"""Tests for selection, fan-out and summaries of the bulk VM tools."""
+
+import threading
+
+import pytest
+
+from esxi_mcp_server.jobs import JobManager
+from tests.test_vmware_manager import bare_manager
+
+
+@pytest.fixture
+def manager():
+    manager = bare_manager(bulk_concurrency=4)
+    manager.list_vms = lambda: ["web-1", "web-2", "db-1", "web-tmpl", "app-10"]
+    manager.list_templates = lambda: ["web-tmpl"]
+    return manager
+
+
+def test_select_by_names_pattern_and_regex(manager):
+    assert manager._select_vms(names=["db-1", "db-1", "gone"]) == ["db-1", "gone"]
+    assert manager._select_vms(pattern="web-*") == ["web-1", "web-2"]
+    assert manager._select_vms(regex=r"-\d$") == ["web-1", "web-2", "db-1"]
+    # Explicit names come first and are not repeated by the pattern
+    assert manager._select_vms(names=["web-2"], pattern="web-*") == ["web-2", "web-1"]
+
+
+def test_select_requires_a_selector(manager):
+    with pytest.raises(Exception, match="Select VMs"):
+        manager._select_vms()
+
+
+def test_fan_out_records_each_outcome(manager):
+    def action(vm, on_progress):
+        if vm == "bad":
+            raise Exception("InvalidPowerState")
+        return vm != "idle"
+
+    results = manager._fan_out("power_on", [("a", "ok"), ("b", "idle"), ("c", "bad")], action)
+    assert results == {
+        "a": {"status": "succeeded"},
+        "b": {"status": "skipped"},
+        "c": {"status": "failed", "error": "InvalidPowerState"},
+    }
+
+
+def test_fan_out_caps_concurrency(manager):
+    running, peak, lock = [0], [0], threading.Lock()
+    barrier = threading.Barrier(2, timeout=5)
+
+    def action(vm, on_progress):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        try:
+            barrier.wait()
+        except threading.BrokenBarrierError:
+            pass
+        with lock:
+            running[0] -= 1
+
+    manager._fan_out("delete", [(str(i), i) for i in range(6)], action, concurrency=2)
+    assert peak[0] == 2
+    # A request above the configured ceiling is clamped to it
+    manager.config.bulk_concurrency = 1
+    peak[0] = 0
+    barrier = threading.Barrier(1)
+    manager._fan_out("delete", [(str(i), i) for i in range(3)], action, concurrency=8)
+    assert peak[0] == 1
+
+
+def test_fan_out_reports_job_progress_and_stops_on_cancel(manager):
+    jobs = JobManager(workers=1)
+    job = jobs.create("bulk_power_off")
+    manager.config.bulk_concurrency = 1
+
+    def action(vm, on_progress):
+        if vm == 2:
+            job.cancel()
+        return True
+
+    items = [(f"vm-{i}", i) for i in range(1, 5)]
+    results = jobs.run(job, manager._fan_out, "power_off", items, action)
+    assert [results[f"vm-{i}"]["status"] for i in range(1, 5)] == ["succeeded", "succeeded", "canceled", "canceled"]
+    assert job.progress == 100 and job.message == "4/4 VMs processed"
+    jobs.shutdown()
+
+
+def test_bulk_result_keeps_request_order_and_counts():
+    results = {"b": {"status": "failed", "error": "x"}, "a": {"status": "succeeded"},
+               "c": {"status": "not_found"}, "d": {"status": "succeeded"}}
+    summary = type(bare_manager())._bulk_result("power_on", ["a", "b", "c", "d"], results)
+    assert summary["operation"] == "power_on" and summary["requested"] == 4
+    assert summary["counts"] == {"failed": 1, "succeeded": 2, "not_found": 1}
+    assert list(summary["results"]) == ["a", "b", "c", "d"]
@@ -0,0 +1,77 @@
+"""Tests for the tool dispatcher's pool classification and admission accounting."""
+
+import asyncio
+import threading
+
+import pytest
+
+from esxi_mcp_server.config import Config
+from esxi_mcp_server.dispatch import ToolDispatcher, ToolBusyError, READ_POOL_TOOLS, LONG_RUNNING_TOOLS
+
+
+def make_dispatcher(**overrides) -> ToolDispatcher:
+    options = dict(vcenter_host="vc", vcenter_user="user", vcenter_password="secret",
+                   read_pool_size=1, write_pool_size=1, pool_queue_depth=0)
+    options.update(overrides)
+    return ToolDispatcher(Config(**options))
+
+
+def test_job_tools_run_on_read_pool():
+    assert {"get_job", "list_jobs", "cancel_job"} <= READ_POOL_TOOLS
+    assert not READ_POOL_TOOLS & LONG_RUNNING_TOOLS
+
+
+def test_cancel_job_accepted_while_draining():
+    dispatcher = make_dispatcher()
+    dispatcher.drain()
+
+    async def main():
+        assert await dispatcher.run("cancel_job", lambda: "cancelled") == "cancelled"
+        with pytest.raises(ToolBusyError):
+            await dispatcher.run("create_vm", lambda: None)
+
+    asyncio.run(main())
+    dispatcher.shutdown()
+
+
+def test_cancelled_call_holds_slot_until_worker_finishes():
+    dispatcher = make_dispatcher()
+    started = threading.Event()
+    finish = threading.Event()
+
+    def handler():
+        started.set()
+        finish.wait(5)
+
+    async def main():
+        call = asyncio.create_task(dispatcher.run("clone_vm", handler))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        call.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await call
+        # The handler is still running on the worker thread
+        assert dispatcher.running_writes() == 1
+        with pytest.raises(ToolBusyError):
+            await dispatcher.run("delete_vm", lambda: None)
+
+        finish.set()
+        for _ in range(100):
+            if dispatcher.running_writes() == 0:
+                break
+            await asyncio.sleep(0.01)
+        assert dispatcher.running_writes() == 0
+        assert await dispatcher.run("delete_vm", lambda: "deleted") == "deleted"
+
+    asyncio.run(main())
+    dispatcher.shutdown()
+
+
+def test_tool_limit_released_after_call():
+    dispatcher = make_dispatcher(write_pool_size=2, tool_concurrency={"clone_vm": 1})
+
+    async def main():
+        for _ in range(3):
+            assert await dispatcher.run("clone_vm", lambda: "ok") == "ok"
+
+    asyncio.run(main())
+    dispatcher.shutdown()
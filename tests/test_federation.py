@@ -0,0 +1,78 @@
+"""Tests for routing tool calls across several vCenters."""
+
+import pytest
+
+from esxi_mcp_server.config import Config
+from esxi_mcp_server.federation import ManagerRegistry, endpoint_configs
+
+
+class FakeInventory:
+    def __init__(self, vms=(), hosts=(), ready=True):
+        self.vms = set(vms)
+        self.hosts = set(hosts)
+        self.ready = ready
+
+    def find_vm(self, name):
+        return object() if name in self.vms else None
+
+    def find_host(self, name):
+        return object() if name in self.hosts else None
+
+
+class FakeManager:
+    def __init__(self, inventory=None):
+        self.config = Config(vcenter_host="vc", vcenter_user="user", vcenter_password="secret")
+        self.inventory = inventory
+
+    def find_vm(self, name):
+        raise AssertionError("routing must not search vCenters")
+
+    find_host = find_vm
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def managers():
+    registry = ManagerRegistry({
+        "eu": FakeManager(FakeInventory(vms=["web-1", "shared"], hosts=["esx-eu"])),
+        "us": FakeManager(FakeInventory(vms=["db-1", "shared"])),
+        "ap": FakeManager(None),
+    }, default="us")
+    yield registry
+    registry.close()
+
+
+def test_route_uses_inventory_caches(managers):
+    assert managers.route("power_on_vm", {"name": "web-1"}) == "eu"
+    assert managers.route("get_vm_details", {"vm_name": "db-1"}) == "us"
+    assert managers.route("get_host_details", {"host_name": "esx-eu"}) == "eu"
+
+
+def test_route_unknown_target_goes_to_default(managers):
+    assert managers.route("power_on_vm", {"name": "nowhere"}) == "us"
+    managers.get("eu").inventory.ready = False
+    assert managers.route("power_on_vm", {"name": "web-1"}) == "us"
+
+
+def test_route_explicit_fan_out_and_ambiguous(managers):
+    assert managers.route("power_on_vm", {"name": "web-1"}, vcenter="ap") == "ap"
+    assert managers.route("list_vms", {}) is None
+    assert managers.route("create_vm", {"name": "new"}) == "us"
+    with pytest.raises(Exception, match="several vCenters"):
+        managers.route("delete_vm", {"name": "shared"})
+    with pytest.raises(Exception, match="Unknown vCenter"):
+        managers.route("list_vms", {}, vcenter="mars")
+
+
+def test_endpoint_configs_inherit_top_level():
+    config = Config(vcenter_host="top", vcenter_user="admin", vcenter_password="pw", datacenter="DC",
+                    vcenters=[{"name": "a", "host": "vc-a"}, {"host": "vc-b", "user": "svc", "datacenter": "B"}])
+    configs = endpoint_configs(config)
+    assert list(configs) == ["a", "vc-b"]
+    assert (configs["a"].vcenter_user, configs["a"].datacenter) == ("admin", "DC")
+    assert (configs["vc-b"].vcenter_user, configs["vc-b"].datacenter) == ("svc", "B")
+    with pytest.raises(ValueError):
+        endpoint_configs(Config(vcenter_host="x", vcenter_user="u", vcenter_password="p",
+                                vcenters=[{"host": "vc", "colour": "red"}]))
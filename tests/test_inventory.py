@@ -0,0 +1,153 @@
+"""Tests for the PropertyCollector-backed inventory index."""
+
+import threading
+from types import SimpleNamespace
+
+import pytest
+from pyVmomi import vim, vmodl
+
+from esxi_mcp_server.inventory import InventoryCache
+
+
+def change(name, val=None, op="assign"):
+    return SimpleNamespace(name=name, val=val, op=op)
+
+
+def update(obj, kind="modify", **props):
+    return SimpleNamespace(obj=obj, kind=kind, changeSet=[change(k.replace("__", "."), v) for k, v in props.items()])
+
+
+def update_set(*object_sets, version="1", truncated=False):
+    return SimpleNamespace(filterSet=[SimpleNamespace(objectSet=list(object_sets))],
+                           version=version, truncated=truncated)
+
+
+ROOT = vim.Folder("group-d1")
+DC = vim.Datacenter("datacenter-1")
+VM_FOLDER = vim.Folder("group-v1")
+DS_FOLDER = vim.Folder("group-s1")
+DATASTORE = vim.Datastore("datastore-1")
+VM = vim.VirtualMachine("vm-1")
+TEMPLATE = vim.VirtualMachine("vm-2")
+HOST = vim.HostSystem("host-1")
+UUID = "5003a1b2-0000-1111-2222-333344445555"
+
+
+@pytest.fixture
+def cache():
+    cache = InventoryCache(si=None, content=None)
+    cache._apply(update_set(
+        update(DC, "enter", name="dc1", parent=ROOT),
+        update(VM_FOLDER, "enter", name="vm", parent=DC),
+        update(DS_FOLDER, "enter", name="datastore", parent=DC),
+        update(DATASTORE, "enter", name="ds1", parent=DS_FOLDER),
+        update(VM, "enter", name="web-1", config__instanceUuid=UUID, config__template=False),
+        update(TEMPLATE, "enter", name="tmpl", config__template=True),
+        update(HOST, "enter", name="esx-1"),
+    ))
+    cache._ready.set()
+    return cache
+
+
+def test_initial_load_indexes_names_morefs_and_uuids(cache):
+    assert cache.find_vm("web-1") is VM
+    assert cache.find_vm("vm-1") is VM
+    assert cache.find_vm(UUID) is VM
+    assert cache.find_vm("missing") is None
+    assert cache.find_host("esx-1") is HOST
+    assert sorted(cache.vm_names()) == ["tmpl", "web-1"]
+    assert cache.template_names() == ["tmpl"]
+    assert cache.resolve("/dc1/datastore/ds1") is DATASTORE
+    assert cache.resolve("dc1/datastore/ds1/", vim.Network) is None
+    assert cache.path(DATASTORE) == "/dc1/datastore/ds1"
+    assert cache._version == "1"
+
+
+def test_rename_moves_name_index_and_paths(cache):
+    cache._apply(update_set(update(VM, name="web-renamed"), update(DS_FOLDER, name="storage"), version="2"))
+    assert cache.find_vm("web-1") is None
+    assert cache.find_vm("web-renamed") is VM
+    assert cache.find_vm(UUID) is VM
+    assert cache.resolve("/dc1/datastore/ds1") is None
+    assert cache.resolve("/dc1/storage/ds1") is DATASTORE
+
+
+def test_modify_and_property_remove(cache):
+    cache._apply(update_set(update(VM, runtime__powerState="poweredOn")))
+    entry = cache.entries(vim.VirtualMachine)[0]
+    assert entry.props["runtime.powerState"] == "poweredOn"
+    cache._apply(update_set(SimpleNamespace(obj=VM, kind="modify",
+                                            changeSet=[change("config.instanceUuid", op="remove")])))
+    assert cache.find_vm(UUID) is None
+    assert cache.find_vm("web-1") is VM
+
+
+def test_leave_removes_every_index(cache):
+    cache._apply(update_set(update(VM, "leave"), update(DATASTORE, "leave")))
+    assert cache.find_vm("web-1") is None
+    assert cache.find_vm("vm-1") is None
+    assert cache.find_vm(UUID) is None
+    assert cache.resolve("/dc1/datastore/ds1") is None
+    assert cache.vm_names() == ["tmpl"]
+
+
+def test_duplicate_names_survive_removal_of_one(cache):
+    twin = vim.VirtualMachine("vm-3")
+    cache._apply(update_set(update(twin, "enter", name="web-1")))
+    cache._apply(update_set(update(VM, "leave")))
+    assert cache.find_vm("web-1") is twin
+
+
+class FakeCollector:
+    """Answers WaitForUpdatesEx from a script of update sets and exceptions."""
+
+    def __init__(self, cache, script):
+        self.cache = cache
+        self.script = list(script)
+        self.versions = []
+        self.done = threading.Event()
+
+    def WaitForUpdatesEx(self, version, options):
+        self.versions.append(version)
+        if not self.script:
+            self.done.set()
+            self.cache._stop_event.set()
+            raise vmodl.fault.RequestCanceled()
+        step = self.script.pop(0)
+        if callable(step):
+            step = step()
+        if isinstance(step, Exception):
+            raise step
+        return step
+
+
+def test_invalid_collector_version_clears_ready_until_reloaded(cache):
+    observed = []
+    reload = update_set(update(VM, "enter", name="web-1"), version="10")
+    cache._collector = FakeCollector(cache, [
+        vmodl.query.InvalidCollectorVersion(),
+        lambda: observed.append((cache.ready, cache.vm_names())) or reload,
+    ])
+    cache._run()
+    # While reloading, the cache neither claims readiness nor serves the emptied index
+    assert observed == [(False, [])]
+    assert cache.ready
+    assert cache.vm_names() == ["web-1"]
+    assert cache._collector.versions[:2] == ["1", ""]
+
+
+def test_truncated_updates_are_drained_in_one_sync():
+    cache = InventoryCache(si=None, content=None)
+    cache._collector = FakeCollector(cache, [
+        update_set(update(VM, "enter", name="web-1"), version="1", truncated=True),
+        update_set(update(HOST, "enter", name="esx-1"), version="2"),
+    ])
+    cache._sync(0)
+    assert cache.find_vm("web-1") is VM and cache.find_host("esx-1") is HOST
+    assert cache._collector.versions == ["", "1"]
+
+
+def test_lost_session_stops_the_cache(cache):
+    cache._collector = FakeCollector(cache, [vim.fault.NotAuthenticated()])
+    cache._run()
+    assert not cache.ready
@@ -0,0 +1,98 @@
+"""Tests for the job table: running, cancellation, per-tool limits and expiry."""
+
+import threading
+
+import pytest
+
+from esxi_mcp_server import jobs
+from esxi_mcp_server.dispatch import ToolBusyError
+from esxi_mcp_server.jobs import JobManager, JobCanceledError, check_canceled, current_job
+
+
+@pytest.fixture
+def manager():
+    manager = JobManager(workers=2, max_active=3, ttl=60, tool_limits={"clone_vm": 1})
+    yield manager
+    manager.shutdown()
+
+
+def test_run_records_result_and_progress(manager):
+    job = manager.create("create_vm")
+
+    def work(name):
+        assert current_job() is job
+        job.update(40, "cloning")
+        return f"created {name}"
+
+    assert manager.run(job, work, "web-1") == "created web-1"
+    info = manager.get(job.id).to_dict()
+    assert info["status"] == jobs.SUCCEEDED and info["progress"] == 100
+    assert info["result"] == "created web-1" and info["message"] == "cloning"
+    assert current_job() is None
+
+
+def test_run_records_failure(manager):
+    job = manager.create("create_vm")
+    with pytest.raises(ValueError):
+        manager.run(job, lambda: (_ for _ in ()).throw(ValueError("no datastore")))
+    assert job.to_dict()["error"] == "no datastore" and job.status == jobs.FAILED
+
+
+def test_cancel_running_job_calls_cancel_callbacks(manager):
+    job = manager.create("delete_vm")
+    started, task_canceled = threading.Event(), threading.Event()
+
+    def work():
+        # Stand-in for a vSphere task that stops when its cancel callback runs
+        job.on_cancel(task_canceled.set)
+        started.set()
+        task_canceled.wait(5)
+        check_canceled()
+
+    manager.start(job, work)
+    started.wait(5)
+    assert manager.cancel(job.id)["status"] == jobs.RUNNING
+    assert job.wait(5)
+    assert job.status == jobs.CANCELED
+    with pytest.raises(Exception, match="already canceled"):
+        manager.cancel(job.id)
+
+
+def test_cancel_before_start(manager):
+    job = manager.create("delete_vm")
+    job.cancel()
+    with pytest.raises(JobCanceledError):
+        manager.run(job, lambda: "never")
+    assert job.status == jobs.CANCELED and job.error == "Canceled before start"
+
+
+def test_active_job_limits(manager):
+    manager.create("create_vm")
+    manager.create("clone_vm")
+    with pytest.raises(ToolBusyError, match="clone_vm is limited to 1"):
+        manager.create("clone_vm")
+    manager.create("delete_vm")
+    with pytest.raises(ToolBusyError, match="3 jobs are already active"):
+        manager.create("create_vm")
+
+
+def test_async_job_holds_its_tool_slot_until_finished(manager):
+    release = threading.Event()
+    job = manager.create("clone_vm")
+    manager.start(job, release.wait, 5)
+    with pytest.raises(ToolBusyError):
+        manager.create("clone_vm")
+    release.set()
+    assert job.wait(5) and job.status == jobs.SUCCEEDED
+    manager.create("clone_vm")
+
+
+def test_finished_jobs_expire_after_ttl(manager, monkeypatch):
+    job = manager.create("create_vm")
+    manager.run(job, lambda: "done")
+    pending = manager.create("delete_vm")
+    now = job.finished_at + 61
+    monkeypatch.setattr(jobs.time, "time", lambda: now)
+    with pytest.raises(Exception, match="not found"):
+        manager.get(job.id)
+    assert [j["job_id"] for j in manager.list()] == [pending.id]
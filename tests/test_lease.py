@@ -0,0 +1,24 @@
+"""Tests for the import lease uploader."""
+
+from types import SimpleNamespace
+
+from esxi_mcp_server import lease
+from esxi_mcp_server.lease import LeaseUploader
+
+
+def test_device_url_replaces_wildcard_host():
+    info = SimpleNamespace(deviceUrl=[SimpleNamespace(importKey="disk-0", url="https://*/nfc/abc/disk-0.vmdk")])
+    uploader = LeaseUploader(SimpleNamespace(info=info), "[2001:db8::5]:8443")
+    assert uploader.device_url("disk-0") == "https://[2001:db8::5]:8443/nfc/abc/disk-0.vmdk"
+
+
+def test_disk_upload_skips_certificate_verification_per_request(monkeypatch):
+    # A session's verify=False is overridden by REQUESTS_CA_BUNDLE; only a per-request value wins
+    calls = []
+    monkeypatch.setattr(lease, "stream_upload", lambda url, chunks, **kwargs: calls.append(kwargs))
+    monkeypatch.setenv("REQUESTS_CA_BUNDLE", "/nonexistent/ca.pem")
+    uploader = LeaseUploader(SimpleNamespace(), "vc.example.com:443")
+    uploader._upload_disk("https://vc.example.com/nfc/disk-0.vmdk", chunks=None)
+    assert calls[0]["verify"] is False
+    assert calls[0]["method"] == "POST"
+    assert calls[0]["session"].verify is False
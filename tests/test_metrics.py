@@ -0,0 +1,100 @@
+"""Tests for the metrics registry and its Prometheus text rendering."""
+
+import threading
+
+import pytest
+
+from esxi_mcp_server.metrics import (MetricsRegistry, MetricFamily, Counter, Histogram, TOOL_CALLS,
+                                     TOOL_ERRORS, TOOL_IN_FLIGHT, TOOL_LATENCY, track_tool_call)
+from esxi_mcp_server.metrics import _Sharded
+
+
+def test_sharded_requires_merge():
+    with pytest.raises(TypeError):
+        _Sharded()
+
+
+def test_counter_and_gauge_render_with_labels():
+    registry = MetricsRegistry()
+    calls = registry.counter("calls_total", "Calls", ("tool",))
+    busy = registry.gauge("busy", "Busy calls")
+    calls.inc(("list_vms",))
+    calls.inc(("list_vms",), 2)
+    calls.inc(('say "hi"\n',))
+    busy.inc()
+    busy.dec()
+    assert registry.render() == (
+        "# HELP calls_total Calls\n"
+        "# TYPE calls_total counter\n"
+        'calls_total{tool="list_vms"} 3\n'
+        'calls_total{tool="say \\"hi\\"\\n"} 1\n'
+        "# HELP busy Busy calls\n"
+        "# TYPE busy gauge\n"
+        "busy 0\n")
+
+
+def test_registering_a_name_twice_returns_the_first_metric():
+    registry = MetricsRegistry()
+    first = registry.counter("calls_total", "Calls")
+    assert registry.counter("calls_total", "Other") is first
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("latency_seconds", "Latency", ("tool",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, ("get_job",))
+    assert histogram.render() == [
+        'latency_seconds_bucket{tool="get_job",le="0.1"} 2',
+        'latency_seconds_bucket{tool="get_job",le="1"} 3',
+        'latency_seconds_bucket{tool="get_job",le="+Inf"} 4',
+        'latency_seconds_sum{tool="get_job"} 3.65',
+        'latency_seconds_count{tool="get_job"} 4',
+    ]
+
+
+def test_shards_of_finished_threads_are_kept():
+    counter = Counter("work_total", "Work")
+
+    def work():
+        for _ in range(1000):
+            counter.inc()
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    counter.inc()
+    assert counter.render() == ["work_total 4001"]
+    assert len(counter._shards) == 1
+
+
+class Pool:
+    def collect(self):
+        return [MetricFamily("pool_calls", "gauge", "Calls per pool", ("pool",)).add(("read",), 2)]
+
+
+def test_collectors_share_family_headers_and_are_weak():
+    registry = MetricsRegistry()
+    first, second = Pool(), Pool()
+    registry.add_collector(first.collect)
+    registry.add_collector(second.collect)
+    assert registry.render().count("# TYPE pool_calls gauge") == 1
+    assert registry.render().count('pool_calls{pool="read"} 2') == 2
+
+    registry.remove_collector(first.collect)
+    del second
+    assert registry.render() == "\n"
+
+
+def test_track_tool_call_counts_errors_and_latency():
+    labels = ("test_tool_call",)
+    with track_tool_call("test_tool_call"):
+        assert TOOL_IN_FLIGHT._collect()[labels] == 1
+    with pytest.raises(RuntimeError):
+        with track_tool_call("test_tool_call"):
+            raise RuntimeError("boom")
+    assert TOOL_CALLS._collect()[labels] == 2
+    assert TOOL_ERRORS._collect()[labels] == 1
+    assert TOOL_IN_FLIGHT._collect()[labels] == 0
+    assert sum(TOOL_LATENCY._collect()[labels][:-1]) == 2
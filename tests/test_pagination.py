@@ -0,0 +1,111 @@
+"""Tests for list filtering, sorting and cursor paging."""
+
+from types import SimpleNamespace
+
+import pytest
+
+from esxi_mcp_server import pagination
+from esxi_mcp_server.config import Config
+from esxi_mcp_server.pagination import CursorStore, filter_rows, sort_rows
+from esxi_mcp_server.tools import ToolHandlers
+
+
+ROWS = [{"name": f"vm-{i:02d}", "cpu": i % 3, "host": "esx-a" if i % 2 else "esx-b"} for i in range(10)]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(pagination.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_filter_rows_glob_list_and_equality():
+    assert [r["name"] for r in filter_rows(ROWS, {"name": "vm-0[12]"})] == ["vm-01", "vm-02"]
+    assert len(filter_rows(ROWS, {"host": ["esx-a", "esx-c"]})) == 5
+    assert [r["name"] for r in filter_rows(ROWS, {"cpu": 0, "host": "esx-b"})] == ["vm-00", "vm-06"]
+    assert filter_rows(ROWS, None) is ROWS
+
+
+def test_sort_rows_descending_with_missing_last():
+    rows = [{"n": 2}, {"n": None}, {"n": 3}, {}, {"n": 1}]
+    assert sort_rows(rows, "-n") == [{"n": 3}, {"n": 2}, {"n": 1}, {"n": None}, {}]
+    assert sort_rows([{"n": 1}, {"n": "a"}], "n") == [{"n": 1}, {"n": "a"}]
+
+
+def test_single_page_has_no_cursor():
+    store = CursorStore()
+    page = store.page("list_vms", ROWS, limit=20)
+    assert page == {"items": ROWS, "total": 10, "next_cursor": None}
+    assert not store._snapshots
+
+
+def test_cursor_walks_snapshot_and_repeats_pages():
+    store = CursorStore()
+    page = store.page("list_vms", ROWS, limit=4, sort="-name")
+    assert [r["name"] for r in page["items"]] == ["vm-09", "vm-08", "vm-07", "vm-06"]
+    cursor = page["next_cursor"]
+
+    second = store.next("list_vms", cursor)
+    assert [r["name"] for r in second["items"]] == ["vm-05", "vm-04", "vm-03", "vm-02"]
+    assert store.next("list_vms", cursor) == second
+
+    last = store.next("list_vms", second["next_cursor"], limit=10)
+    assert [r["name"] for r in last["items"]] == ["vm-01", "vm-00"]
+    assert last["next_cursor"] is None and last["total"] == 10
+
+
+def test_cursor_rejects_other_tool_and_garbage():
+    store = CursorStore()
+    cursor = store.page("list_vms", ROWS, limit=2)["next_cursor"]
+    with pytest.raises(Exception, match="belongs to list_vms"):
+        store.next("list_hosts", cursor)
+    with pytest.raises(Exception, match="Invalid cursor"):
+        store.next("list_vms", "nodot")
+    with pytest.raises(Exception, match="limit must be at least 1"):
+        store.page("list_vms", ROWS, limit=0)
+
+
+def test_cursor_expires_after_ttl_since_last_use(clock):
+    store = CursorStore(ttl=60)
+    cursor = store.page("list_vms", ROWS, limit=2)["next_cursor"]
+    clock[0] += 50
+    cursor = store.next("list_vms", cursor)["next_cursor"]
+    clock[0] += 50
+    # Still alive: the previous use extended it
+    cursor = store.next("list_vms", cursor)["next_cursor"]
+    clock[0] += 61
+    with pytest.raises(Exception, match="expired"):
+        store.next("list_vms", cursor)
+
+
+def test_oldest_snapshot_evicted_beyond_max_cursors():
+    store = CursorStore(max_cursors=2)
+    first = store.page("list_vms", ROWS, limit=2)["next_cursor"]
+    store.page("list_vms", ROWS, limit=2)
+    store.page("list_vms", ROWS, limit=2)
+    assert len(store._snapshots) == 2
+    with pytest.raises(Exception, match="expired"):
+        store.next("list_vms", first)
+
+
+@pytest.mark.parametrize("suffix", ["-4", "x", "", "11"])
+def test_cursor_rejects_bad_offsets(suffix):
+    store = CursorStore()
+    snapshot_id = store.page("list_vms", ROWS, limit=2)["next_cursor"].rsplit(".", 1)[0]
+    with pytest.raises(Exception, match="Invalid cursor"):
+        store.next("list_vms", f"{snapshot_id}.{suffix}")
+
+
+@pytest.mark.parametrize("limit", [0, -1])
+def test_non_positive_limit_rejected_for_next_page_and_tools(limit):
+    store = CursorStore()
+    cursor = store.page("list_vms", ROWS, limit=2)["next_cursor"]
+    with pytest.raises(Exception, match="limit must be at least 1"):
+        store.next("list_vms", cursor, limit=limit)
+
+    config = Config(vcenter_host="vc", vcenter_user="user", vcenter_password="secret")
+    handlers = ToolHandlers(SimpleNamespace(config=config), config)
+    with pytest.raises(Exception, match="limit must be at least 1"):
+        handlers._list("list_vms", None, lambda manager: ROWS, limit, None, None, None)
+    handlers.jobs.shutdown()
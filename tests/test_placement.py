@@ -0,0 +1,108 @@
+"""Tests for host and datastore scoring and in-flight reservations."""
+
+import pytest
+from pyVmomi import vim
+
+from esxi_mcp_server.inventory import InventoryEntry
+from esxi_mcp_server.placement import PlacementEngine
+
+GB = 1073741824
+
+
+def datastore(moid, capacity_gb=100, free_gb=50, accessible=True):
+    entry = InventoryEntry(vim.Datastore(moid))
+    entry.props.update({"name": moid, "summary.accessible": accessible,
+                        "summary.capacity": capacity_gb * GB, "summary.freeSpace": free_gb * GB})
+    return entry
+
+
+def host(moid, datastores, cpu_used=1000, memory_used_mb=8192, state="connected", maintenance=False):
+    entry = InventoryEntry(vim.HostSystem(moid))
+    entry.props.update({
+        "name": moid, "datastore": [ds.obj for ds in datastores],
+        "runtime.connectionState": state, "runtime.inMaintenanceMode": maintenance,
+        "summary.hardware.cpuMhz": 2000, "summary.hardware.numCpuCores": 8,
+        "summary.hardware.memorySize": 65536 * 1048576,
+        "summary.quickStats.overallCpuUsage": cpu_used,
+        "summary.quickStats.overallMemoryUsage": memory_used_mb,
+    })
+    return entry
+
+
+def test_least_loaded_host_and_most_free_datastore_win():
+    small, large = datastore("ds-1", free_gb=30), datastore("ds-2", free_gb=60)
+    busy = host("host-1", [small, large], cpu_used=12000)
+    idle = host("host-2", [small, large])
+    engine = PlacementEngine()
+    with engine.place([busy, idle], [small, large], memory_mb=4096, disk_bytes=10 * GB) as reservation:
+        assert reservation.host._moId == "host-2"
+        assert reservation.datastore._moId == "ds-2"
+
+
+def test_unavailable_hosts_are_rejected_with_reasons():
+    ds = datastore("ds-1")
+    hosts = [host("host-1", [ds], state="disconnected"), host("host-2", [ds], maintenance=True),
+             host("host-3", [ds], cpu_used=15000), host("host-4", [ds], memory_used_mb=64000)]
+    with pytest.raises(Exception) as info:
+        PlacementEngine().place(hosts, [ds], memory_mb=1024)
+    message = str(info.value)
+    assert "not connected" in message and "maintenance" in message
+    assert "CPU 94% used" in message and "memory" in message
+
+
+def test_datastore_reserve_is_kept():
+    ds = datastore("ds-1", capacity_gb=100, free_gb=20)
+    engine = PlacementEngine(datastore_reserve=10)
+    engine.place([host("host-1", [ds])], [ds], disk_bytes=5 * GB)
+    with pytest.raises(Exception, match="No datastore keeps 10% free"):
+        engine.place([host("host-1", [ds])], [ds], disk_bytes=6 * GB)
+
+
+def test_reservations_spread_concurrent_placements():
+    ds1, ds2 = datastore("ds-1", free_gb=50), datastore("ds-2", free_gb=48)
+    hosts = [host("host-1", [ds1, ds2]), host("host-2", [ds1, ds2], memory_used_mb=9000)]
+    engine = PlacementEngine()
+    first = engine.place(hosts, [ds1, ds2], memory_mb=8192, disk_bytes=10 * GB)
+    second = engine.place(hosts, [ds1, ds2], memory_mb=8192, disk_bytes=10 * GB)
+    assert (first.host._moId, first.datastore._moId) == ("host-1", "ds-1")
+    assert (second.host._moId, second.datastore._moId) == ("host-2", "ds-2")
+    first.release()
+    second.release()
+    assert not engine._reserved_memory and not engine._reserved_disk
+
+
+def test_anti_affinity_group_skips_hosts_until_released():
+    ds = datastore("ds-1")
+    hosts = [host("host-1", [ds]), host("host-2", [ds])]
+    engine = PlacementEngine()
+    first = engine.place(hosts, [ds], group="web", group_hosts={"host-2"})
+    assert first.host._moId == "host-1"
+    with pytest.raises(Exception, match="anti-affinity group web"):
+        engine.place(hosts, [ds], group="web", group_hosts={"host-2"})
+    first.release()
+    assert not engine._reserved_groups
+    assert engine.place(hosts, [ds], group="web", group_hosts={"host-2"}).host._moId == "host-1"
+
+
+def test_zero_disk_reservations_share_a_datastore():
+    # Linked clones reserve no disk and all use the template's datastore
+    ds = datastore("ds-1")
+    hosts = [host("host-1", [ds]), host("host-2", [ds])]
+    engine = PlacementEngine()
+    first = engine.place(hosts, [ds], memory_mb=1024, group="batch", datastore=ds.obj)
+    second = engine.place(hosts, [ds], memory_mb=1024, group="batch", datastore=ds.obj)
+    assert {first.host._moId, second.host._moId} == {"host-1", "host-2"}
+    with first, second:
+        pass
+    # Releasing twice is a no-op
+    first.release()
+    assert not engine._reserved_memory and not engine._reserved_disk and not engine._reserved_groups
+
+
+def test_zero_memory_reservation_releases():
+    ds = datastore("ds-1")
+    engine = PlacementEngine()
+    reservations = [engine.place([host("host-1", [ds])], [ds]) for _ in range(2)]
+    for reservation in reservations:
+        reservation.release()
+    assert not engine._reserved_memory and not engine._reserved_disk
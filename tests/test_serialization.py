@@ -0,0 +1,51 @@
+"""Tests for tool result serialization and field projection."""
+
+import json
+
+import pytest
+
+from esxi_mcp_server.serialization import ResponseSerializer, project
+
+
+VM = {"name": "web-1", "power_state": "poweredOn", "summary": {"capacity": 100, "free": 40}}
+
+
+def test_project_without_fields_returns_result():
+    assert project(VM, None) is VM
+    assert project(VM, []) is VM
+
+
+def test_project_dict_top_level_and_dotted_fields():
+    assert project(VM, ["name", "summary.capacity"]) == {"name": "web-1", "summary.capacity": 100}
+
+
+def test_project_missing_fields_are_none():
+    assert project(VM, ["cpu", "summary.used", "name.first"]) == {
+        "cpu": None, "summary.used": None, "name.first": None}
+
+
+def test_project_list_and_page():
+    assert project([VM, "raw"], ["name"]) == [{"name": "web-1"}, "raw"]
+    page = {"items": [VM], "next_cursor": "abc", "total": 1}
+    assert project(page, ["power_state"]) == {
+        "items": [{"power_state": "poweredOn"}], "next_cursor": "abc", "total": 1}
+
+
+def test_project_passes_scalars_through():
+    assert project("done", ["name"]) == "done"
+
+
+def test_serializer_formats():
+    assert ResponseSerializer("compact").dumps({"a": [1, 2]}) == '{"a":[1,2]}'
+    pretty = ResponseSerializer("pretty").dumps({"a": 1})
+    assert "\n" in pretty and json.loads(pretty) == {"a": 1}
+
+
+def test_serializer_falls_back_for_unencodable_values():
+    big = 2 ** 70
+    assert json.loads(ResponseSerializer("compact").dumps({"n": big})) == {"n": big}
+
+
+def test_serializer_rejects_unknown_format():
+    with pytest.raises(ValueError):
+        ResponseSerializer("yaml")
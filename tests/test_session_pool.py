@@ -0,0 +1,131 @@
+"""Tests for the pooled vCenter session checkout/checkin logic."""
+
+import threading
+
+import pytest
+from pyVmomi import vim
+
+from esxi_mcp_server import session_pool
+from esxi_mcp_server.session_pool import SessionPool
+
+
+class FakeServiceInstance:
+    def __init__(self, number):
+        self.number = number
+        self.alive = True
+
+    def RetrieveContent(self):
+        return f"content-{self.number}"
+
+    def CurrentTime(self):
+        if not self.alive:
+            raise vim.fault.NotAuthenticated()
+
+
+@pytest.fixture
+def logged_out(monkeypatch):
+    logged_out = []
+    monkeypatch.setattr(session_pool.connect, "Disconnect", logged_out.append)
+    return logged_out
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(session_pool.time, "monotonic", lambda: now[0])
+    return now
+
+
+def make_pool(size=2, idle_timeout=300):
+    opened = []
+
+    def connect():
+        opened.append(FakeServiceInstance(len(opened) + 1))
+        return opened[-1]
+
+    return SessionPool(connect, size, idle_timeout), opened
+
+
+def test_checkout_opens_lazily_and_reuses_most_recent(logged_out):
+    pool, opened = make_pool(size=2)
+    assert opened == []
+    first = pool.checkout()
+    second = pool.checkout()
+    assert first.content == "content-1" and len(opened) == 2
+    pool.checkin(first)
+    pool.checkin(second)
+    assert pool.checkout() is second
+    assert pool.stats() == {"size": 2, "open": 2, "idle": 1}
+
+
+def test_checkout_waits_for_a_free_session(logged_out):
+    pool, opened = make_pool(size=1)
+    held = pool.checkout()
+    with pytest.raises(TimeoutError):
+        pool.checkout(timeout=0.01)
+    threading.Timer(0.02, pool.checkin, args=(held,)).start()
+    assert pool.checkout(timeout=5) is held
+    assert len(opened) == 1
+
+
+def test_failed_open_frees_its_slot(logged_out):
+    pool = SessionPool(lambda: (_ for _ in ()).throw(ConnectionError("refused")), size=1)
+    with pytest.raises(ConnectionError):
+        pool.checkout()
+    assert pool.stats()["open"] == 0
+
+
+def test_not_authenticated_discards_the_session(logged_out):
+    pool, opened = make_pool(size=1)
+    with pytest.raises(vim.fault.NotAuthenticated):
+        with pool.session() as s:
+            raise vim.fault.NotAuthenticated()
+    assert logged_out == [s.si]
+    assert pool.stats() == {"size": 1, "open": 0, "idle": 0}
+    assert pool.checkout().si is opened[1]
+
+
+def test_other_errors_return_the_session(logged_out):
+    pool, _ = make_pool(size=1)
+    with pytest.raises(ValueError):
+        with pool.session() as s:
+            raise ValueError("bad argument")
+    assert logged_out == []
+    assert pool.checkout() is s
+
+
+def test_evict_idle_logs_out_only_expired_sessions(logged_out, clock):
+    pool, _ = make_pool(size=2, idle_timeout=60)
+    old, recent = pool.checkout(), pool.checkout()
+    pool.checkin(old)
+    clock[0] += 50
+    pool.checkin(recent)
+    clock[0] += 20
+    pool.evict_idle()
+    assert logged_out == [old.si]
+    assert pool.stats() == {"size": 2, "open": 1, "idle": 1}
+    assert pool.checkout() is recent
+
+
+def test_keepalive_drops_dead_idle_sessions(logged_out):
+    pool, opened = make_pool(size=2)
+    alive, dead = pool.checkout(), pool.checkout()
+    pool.checkin(alive)
+    pool.checkin(dead)
+    opened[1].alive = False
+    pool.keepalive()
+    assert logged_out == [dead.si]
+    assert pool.stats()["idle"] == 1
+
+
+def test_close_logs_out_idle_and_returned_sessions(logged_out):
+    pool, _ = make_pool(size=2)
+    idle, busy = pool.checkout(), pool.checkout()
+    pool.checkin(idle)
+    pool.close()
+    assert logged_out == [idle.si]
+    with pytest.raises(Exception, match="closed"):
+        pool.checkout()
+    pool.checkin(busy)
+    assert logged_out == [idle.si, busy.si]
+    assert pool.stats()["open"] == 0
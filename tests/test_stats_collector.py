@@ -0,0 +1,38 @@
+"""Tests for the stats collector's ring buffer and window summaries."""
+
+from esxi_mcp_server.stats_collector import RingBuffer, summarize
+
+
+def test_ring_buffer_empty():
+    buffer = RingBuffer(3)
+    assert len(buffer) == 0
+    assert buffer.last_timestamp() is None
+    assert buffer.since(0) == ([], None)
+
+
+def test_ring_buffer_keeps_newest_samples_in_order():
+    buffer = RingBuffer(3)
+    for second in range(5):
+        buffer.append(float(second), second * 10.0)
+    assert len(buffer) == 3
+    assert buffer.last_timestamp() == 4.0
+    assert buffer.since(0) == ([20.0, 30.0, 40.0], 40.0)
+
+
+def test_ring_buffer_since_filters_by_timestamp():
+    buffer = RingBuffer(4)
+    for second in range(4):
+        buffer.append(float(second), float(second))
+    assert buffer.since(2.0) == ([2.0, 3.0], 3.0)
+    # The newest value is reported even when the window holds no samples
+    assert buffer.since(10.0) == ([], 3.0)
+
+
+def test_summarize_empty():
+    assert summarize([]) == {"count": 0, "min": None, "max": None, "avg": None, "p95": None}
+
+
+def test_summarize_nearest_rank_p95():
+    summary = summarize([float(value) for value in range(1, 21)])
+    assert summary == {"count": 20, "min": 1.0, "max": 20.0, "avg": 10.5, "p95": 19.0}
+    assert summarize([7.0])["p95"] == 7.0
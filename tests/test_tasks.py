@@ -0,0 +1,167 @@
+"""Tests for collector-driven task completion tracking."""
+
+import threading
+from types import SimpleNamespace
+
+import pytest
+from pyVmomi import vim
+
+from esxi_mcp_server import tasks
+from esxi_mcp_server.tasks import TaskWaiter
+
+
+class FakeView:
+    def __init__(self):
+        self.tasks = []
+
+    def ModifyListView(self, add=None, remove=None):
+        for task in add or []:
+            self.tasks.append(task)
+        for task in remove or []:
+            self.tasks.remove(task)
+        return []
+
+
+class FakeCollector:
+    """Hands out queued update sets; an exception in the queue ends the waiter loop."""
+
+    def __init__(self):
+        self.updates = []
+        self.ready = threading.Condition()
+
+    def push(self, item):
+        with self.ready:
+            self.updates.append(item)
+            self.ready.notify()
+
+    def WaitForUpdatesEx(self, version, options):
+        with self.ready:
+            self.ready.wait_for(lambda: self.updates)
+            item = self.updates.pop(0)
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    def CancelWaitForUpdates(self):
+        self.push(Exception("cancelled"))
+
+
+class PolledTask:
+    """A task whose info property returns successive snapshots."""
+
+    def __init__(self, moid, infos):
+        self._moId = moid
+        self._infos = infos
+
+    @property
+    def info(self):
+        return next(self._infos)
+
+
+def task_update(task, **changes):
+    change_set = [SimpleNamespace(name=name.replace("__", "."), val=val, op="assign")
+                  for name, val in changes.items()]
+    object_set = SimpleNamespace(obj=task, kind="modify", changeSet=change_set)
+    return SimpleNamespace(filterSet=[SimpleNamespace(objectSet=[object_set])], version="1")
+
+
+@pytest.fixture
+def waiter(monkeypatch):
+    waiter = TaskWaiter(content=None)
+    waiter._collector = FakeCollector()
+    waiter._view = FakeView()
+
+    def start():
+        if waiter._thread is None:
+            waiter._thread = threading.Thread(target=waiter._run, daemon=True)
+            waiter._thread.start()
+
+    monkeypatch.setattr(waiter, "_ensure_started", start)
+    yield waiter
+    waiter.stop()
+
+
+def wait_async(waiter, task, **kwargs):
+    outcome = {}
+
+    def run():
+        try:
+            outcome["result"] = waiter.wait(task, **kwargs)
+        except BaseException as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread, outcome
+
+
+def until_tracked(waiter, task):
+    for _ in range(200):
+        if task in waiter._view.tasks:
+            return
+        threading.Event().wait(0.005)
+    raise AssertionError("task was never tracked")
+
+
+def test_completion_reports_progress_and_result(waiter):
+    task = vim.Task("task-1")
+    seen = []
+    thread, outcome = wait_async(waiter, task, timeout=5, on_progress=seen.append)
+    until_tracked(waiter, task)
+    waiter._collector.push(task_update(task, info__state="running", info__progress=40))
+    waiter._collector.push(task_update(task, info__state="success", info__result="vm-9"))
+    thread.join(5)
+    assert outcome == {"result": "vm-9"}
+    assert seen == [40]
+    assert waiter._view.tasks == [] and waiter._pending == {}
+
+
+def test_error_raises_the_task_fault(waiter):
+    task = vim.Task("task-1")
+    fault = vim.fault.InvalidState()
+    thread, outcome = wait_async(waiter, task, timeout=5)
+    until_tracked(waiter, task)
+    waiter._collector.push(task_update(task, info__state="error", info__error=fault))
+    thread.join(5)
+    assert outcome["error"] is fault
+
+
+def test_lost_filter_falls_back_to_polling(waiter, monkeypatch):
+    monkeypatch.setattr(tasks, "POLL_INTERVAL_SECONDS", 0)
+    infos = iter([SimpleNamespace(state="running", progress=70, result=None, error=None),
+                  SimpleNamespace(state="success", progress=100, result="done", error=None)])
+    task = PolledTask("task-1", infos)
+    seen = []
+    thread, outcome = wait_async(waiter, task, timeout=5, on_progress=seen.append)
+    until_tracked(waiter, task)
+    waiter._collector.push(Exception("session lost"))
+    thread.join(5)
+    assert outcome == {"result": "done"}
+    assert seen == [70]
+    # Later tasks skip the collector entirely
+    assert waiter.track(vim.Task("task-2")).lost
+
+
+def test_timeout_stops_tracking_and_progress_callbacks(waiter):
+    task = vim.Task("task-1")
+    seen = []
+    with pytest.raises(TimeoutError):
+        waiter.wait(task, timeout=0.01, on_progress=seen.append)
+    assert waiter._pending == {} and waiter._view.tasks == []
+    waiter._collector.push(task_update(task, info__progress=50))
+    assert waiter.progress(task) is None
+    assert seen == []
+
+
+def test_timeout_keeps_task_tracked_for_other_waiters(waiter):
+    task = vim.Task("task-1")
+    first, second = [], []
+    thread, outcome = wait_async(waiter, task, timeout=5, on_progress=first.append)
+    until_tracked(waiter, task)
+    with pytest.raises(TimeoutError):
+        waiter.wait(task, timeout=0.01, on_progress=second.append)
+    waiter._collector.push(task_update(task, info__progress=10))
+    waiter._collector.push(task_update(task, info__state="success", info__result="ok"))
+    thread.join(5)
+    assert outcome == {"result": "ok"}
+    assert first == [10] and second == []
@@ -0,0 +1,78 @@
+"""Tests for the HTTP transport's draining shutdown."""
+
+import asyncio
+import time
+
+import uvicorn
+
+from esxi_mcp_server.config import Config
+from esxi_mcp_server.transport import HttpApp, DrainingServer
+
+
+class Resources:
+    """Resources with a number of long-running calls that never finish."""
+
+    def __init__(self, calls: int = 0):
+        self.calls = calls
+        self.drained = False
+
+    def drain(self):
+        self.drained = True
+
+    def busy(self):
+        return self.calls, 0
+
+
+class Sessions:
+    def __init__(self, requests: int = 0):
+        self.accepting = True
+        self.requests = requests
+        self.closed_with = None
+
+    async def close(self):
+        self.closed_with = self.requests
+
+
+def make_app(drain_timeout: int, resources: Resources, sessions: Sessions) -> HttpApp:
+    config = Config(vcenter_host="vc", vcenter_user="user", vcenter_password="secret", drain_timeout=drain_timeout)
+    app = HttpApp(config, factory=None)
+    app.resources, app.sessions = resources, sessions
+    return app
+
+
+def test_shutdown_stays_within_drain_timeout(monkeypatch):
+    app = make_app(1, Resources(calls=1), Sessions())
+    server = DrainingServer(uvicorn.Config(app, lifespan="off", timeout_graceful_shutdown=1))
+    granted = []
+
+    async def uvicorn_shutdown(self, sockets=None):
+        granted.append(self.config.timeout_graceful_shutdown)
+
+    monkeypatch.setattr(uvicorn.Server, "shutdown", uvicorn_shutdown)
+    started = time.monotonic()
+    asyncio.run(server.shutdown())
+
+    assert app.resources.drained and not app.sessions.accepting
+    assert time.monotonic() - started < 2
+    assert 0 <= granted[0] < 0.5
+    # The configured timeout is restored for later shutdowns
+    assert server.config.timeout_graceful_shutdown == 1
+
+
+def test_drain_waits_for_responses_in_progress():
+    sessions = Sessions(requests=1)
+    app = make_app(5, Resources(), sessions)
+
+    async def main():
+        async def respond():
+            await asyncio.sleep(0.2)
+            sessions.requests = 0
+
+        responding = asyncio.create_task(respond())
+        await app.drain()
+        await responding
+
+    started = time.monotonic()
+    asyncio.run(main())
+    assert sessions.closed_with == 0
+    assert time.monotonic() - started < 1
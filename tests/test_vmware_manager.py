@@ -0,0 +1,118 @@
+"""Tests for vCenter address handling, session retries and host details of VMwareManager."""
+
+import threading
+from types import SimpleNamespace
+
+import pytest
+from pyVmomi import vim
+
+from esxi_mcp_server import vmware_manager
+from esxi_mcp_server.config import Config
+from esxi_mcp_server.vmware_manager import VMwareManager, split_host_port, join_host_port
+
+
+def bare_manager(vcenter_host: str = "vc.example.com", **overrides) -> VMwareManager:
+    """A manager that has not connected; only config-driven helpers are usable."""
+    manager = VMwareManager.__new__(VMwareManager)
+    manager.config = Config(vcenter_host=vcenter_host, vcenter_user="user", vcenter_password="secret", **overrides)
+    return manager
+
+
+@pytest.mark.parametrize("address, expected", [
+    ("vc.example.com", ("vc.example.com", 443)),
+    ("vc.example.com:8443", ("vc.example.com", 8443)),
+    ("10.0.0.5:9443", ("10.0.0.5", 9443)),
+    ("fe80::1", ("fe80::1", 443)),
+    ("[fe80::1]", ("fe80::1", 443)),
+    ("[2001:db8::5]:8443", ("2001:db8::5", 8443)),
+])
+def test_split_host_port(address, expected):
+    assert split_host_port(address) == expected
+
+
+@pytest.mark.parametrize("address", ["vc:https", "[fe80::1]:x"])
+def test_split_host_port_rejects_bad_port(address):
+    with pytest.raises(ValueError, match="Invalid vcenter_host"):
+        split_host_port(address)
+
+
+def test_join_host_port_brackets_ipv6():
+    assert join_host_port("vc.example.com") == "vc.example.com"
+    assert join_host_port("vc.example.com", 443) == "vc.example.com:443"
+    assert join_host_port("2001:db8::5", 8443) == "[2001:db8::5]:8443"
+    assert join_host_port("fe80::1") == "[fe80::1]"
+
+
+@pytest.mark.parametrize("address, url", [
+    ("vc.example.com", "vc.example.com:443"),
+    ("vc.example.com:8443", "vc.example.com:8443"),
+    ("[2001:db8::5]:8443", "[2001:db8::5]:8443"),
+])
+def test_api_address(address, url):
+    assert bare_manager(address)._api_address() == url
+
+
+@pytest.mark.parametrize("insecure", [False, True])
+def test_open_session_passes_port(monkeypatch, insecure):
+    calls = []
+    monkeypatch.setattr(vmware_manager.connect, "SmartConnect", lambda **kwargs: calls.append(kwargs) or "si")
+    assert bare_manager("[2001:db8::5]:8443", insecure=insecure, soap_trace=False)._open_session() == "si"
+    assert (calls[0]["host"], calls[0]["port"]) == ("2001:db8::5", 8443)
+    assert ("sslContext" in calls[0]) == insecure
+
+
+def test_host_details_cpu_model_from_cpu_package():
+    hardware = SimpleNamespace(
+        systemInfo=SimpleNamespace(vendor="Dell", model="R750", uuid="u-1"),
+        cpuPkg=[SimpleNamespace(description="Intel(R) Xeon(R) Gold 6338")],
+        cpuInfo=SimpleNamespace(numCpuCores=32, numCpuThreads=64, hz=2000000000),
+        memorySize=512 * 1024 ** 3)
+    host = SimpleNamespace(
+        name="esx-1", hardware=hardware,
+        runtime=SimpleNamespace(connectionState="connected", powerState="poweredOn", standbyMode=None,
+                                inMaintenanceMode=False),
+        config=SimpleNamespace(product=SimpleNamespace(version="8.0.2", build="22380479")))
+    manager = bare_manager()
+    manager.find_host = lambda name: host
+    details = manager.get_host_details("esx-1")
+    assert details["cpu_model"] == "Intel(R) Xeon(R) Gold 6338"
+    assert (details["cpu_cores"], details["cpu_mhz"], details["memory_gb"]) == (32, 2000, 512.0)
+
+    host.hardware.cpuPkg = []
+    assert manager.get_host_details("esx-1")["cpu_model"] is None
+
+
+def expiring_manager():
+    """A manager whose first vCenter call fails with NotAuthenticated."""
+    manager = bare_manager()
+    manager.pool = None
+    manager._local = threading.local()
+    manager._si = "stale-si"
+    manager.reconnects = []
+    manager._reconnect = manager.reconnects.append
+    return manager
+
+
+def flaky(calls):
+    def run(name):
+        calls.append(name)
+        if len(calls) == 1:
+            raise vim.fault.NotAuthenticated()
+        return f"ok {name}"
+    return run
+
+
+def test_call_retries_read_only_methods_after_reconnect():
+    manager, calls = expiring_manager(), []
+    assert manager.call(flaky(calls), "vm-1", retry=True) == "ok vm-1"
+    assert calls == ["vm-1", "vm-1"]
+    assert manager.reconnects == ["stale-si"]
+
+
+def test_call_does_not_repeat_mutating_methods():
+    manager, calls = expiring_manager(), []
+    with pytest.raises(vim.fault.NotAuthenticated):
+        manager.call(flaky(calls), "vm-1")
+    assert calls == ["vm-1"]
+    # The session is still replaced so the next call succeeds
+    assert manager.reconnects == ["stale-si"]